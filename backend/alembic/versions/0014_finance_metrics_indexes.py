@@ -0,0 +1,42 @@
+"""finance metrics indexes
+
+Revision ID: 0014_finance_metrics_indexes
+Revises: 0013_invoices_bank_transactions
+Create Date: 2026-10-19
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+revision = '0014_finance_metrics_indexes'
+down_revision = '0013_invoices_bank_transactions'
+branch_labels = None
+depends_on = None
+
+# (nombre, tabla, columnas) para la agregación condicional de finanzas
+INDEXES = [
+    ('ix_invoices_project_status', 'invoices', ['project_id', 'status']),
+    ('ix_invoices_project_status_created', 'invoices', ['project_id', 'status', 'created_at']),
+    ('ix_invoice_payments_invoice_amount', 'invoice_payments', ['invoice_id', 'amount']),
+]
+
+
+def upgrade():
+    bind = op.get_bind()
+    inspector = sa.inspect(bind)
+    tables = set(inspector.get_table_names())
+    for name, table, cols in INDEXES:
+        if table not in tables:
+            continue
+        existing = {ix['name'] for ix in inspector.get_indexes(table)}
+        if name not in existing:
+            op.create_index(name, table, cols)
+
+
+def downgrade():
+    # ix_invoices_project_status pertenece a 0013
+    for name, table, _ in INDEXES[1:]:
+        try:
+            op.drop_index(name, table_name=table)
+        except Exception:
+            pass
@@ -0,0 +1,33 @@
+"""bank transactions content hash for idempotent imports
+
+Revision ID: 0015_bank_txn_content_hash
+Revises: 0014_finance_metrics_indexes
+Create Date: 2026-10-19
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+revision = '0015_bank_txn_content_hash'
+down_revision = '0014_finance_metrics_indexes'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    bind = op.get_bind()
+    inspector = sa.inspect(bind)
+    if 'bank_transactions' not in inspector.get_table_names():
+        return
+    cols = {c['name'] for c in inspector.get_columns('bank_transactions')}
+    if 'content_hash' not in cols:
+        op.add_column('bank_transactions', sa.Column('content_hash', sa.String(64), nullable=True))
+    existing = {ix['name'] for ix in inspector.get_indexes('bank_transactions')}
+    if 'uq_bank_txn_project_hash' not in existing:
+        # filas históricas quedan con hash NULL (no colisionan en el índice único)
+        op.create_index('uq_bank_txn_project_hash', 'bank_transactions', ['project_id', 'content_hash'], unique=True)
+
+
+def downgrade():
+    op.drop_index('uq_bank_txn_project_hash', table_name='bank_transactions')
+    op.drop_column('bank_transactions', 'content_hash')
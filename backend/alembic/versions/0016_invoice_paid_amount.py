@@ -0,0 +1,33 @@
+"""invoice running paid_amount
+
+Revision ID: 0016_invoice_paid_amount
+Revises: 0015_bank_txn_content_hash
+Create Date: 2026-10-19
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+revision = '0016_invoice_paid_amount'
+down_revision = '0015_bank_txn_content_hash'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    bind = op.get_bind()
+    inspector = sa.inspect(bind)
+    if 'invoices' not in inspector.get_table_names():
+        return
+    cols = {c['name'] for c in inspector.get_columns('invoices')}
+    if 'paid_amount' not in cols:
+        op.add_column('invoices', sa.Column('paid_amount', sa.Numeric(16, 2), nullable=False, server_default='0'))
+    # backfill desde los pagos existentes
+    op.execute(
+        "UPDATE invoices SET paid_amount = COALESCE("
+        "(SELECT SUM(p.amount) FROM invoice_payments p WHERE p.invoice_id = invoices.id), 0)"
+    )
+
+
+def downgrade():
+    op.drop_column('invoices', 'paid_amount')
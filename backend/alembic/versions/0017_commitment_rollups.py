@@ -0,0 +1,48 @@
+"""commitment rollups (PO committed cost per item and status)
+
+Revision ID: 0017_commitment_rollups
+Revises: 0016_invoice_paid_amount
+Create Date: 2026-10-19
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+revision = '0017_commitment_rollups'
+down_revision = '0016_invoice_paid_amount'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    bind = op.get_bind()
+    inspector = sa.inspect(bind)
+    if 'commitment_rollups' in inspector.get_table_names():
+        return
+    op.create_table(
+        'commitment_rollups',
+        sa.Column('id', sa.Integer(), primary_key=True),
+        sa.Column('project_id', sa.Integer(), sa.ForeignKey('projects.id', ondelete='CASCADE'), nullable=False),
+        sa.Column('item_id', sa.Integer(), sa.ForeignKey('items.id', ondelete='CASCADE'), nullable=False),
+        sa.Column('status', sa.String(), nullable=False),
+        sa.Column('qty', sa.Numeric(18, 3), nullable=False, server_default='0'),
+        sa.Column('amount', sa.Numeric(18, 2), nullable=False, server_default='0'),
+        sa.Column('updated_at', sa.DateTime(timezone=True), server_default=sa.func.now()),
+    )
+    op.create_index('ix_commitment_rollups_project_id', 'commitment_rollups', ['project_id'])
+    op.create_index('uq_commitment_item_status', 'commitment_rollups', ['item_id', 'status'], unique=True)
+    # backfill desde las OC existentes
+    op.execute(
+        "INSERT INTO commitment_rollups (project_id, item_id, status, qty, amount) "
+        "SELECT po.project_id, l.item_id, COALESCE(po.status, 'created'), "
+        "COALESCE(SUM(l.qty), 0), COALESCE(SUM(l.qty * l.unit_price), 0) "
+        "FROM purchase_order_lines l JOIN purchase_orders po ON po.id = l.po_id "
+        "WHERE l.item_id IS NOT NULL "
+        "GROUP BY po.project_id, l.item_id, COALESCE(po.status, 'created')"
+    )
+
+
+def downgrade():
+    op.drop_index('uq_commitment_item_status', table_name='commitment_rollups')
+    op.drop_index('ix_commitment_rollups_project_id', table_name='commitment_rollups')
+    op.drop_table('commitment_rollups')
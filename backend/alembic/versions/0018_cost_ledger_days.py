@@ -0,0 +1,50 @@
+"""daily actual cost ledger
+
+Revision ID: 0018_cost_ledger_days
+Revises: 0017_commitment_rollups
+Create Date: 2026-10-19
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+revision = '0018_cost_ledger_days'
+down_revision = '0017_commitment_rollups'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    bind = op.get_bind()
+    inspector = sa.inspect(bind)
+    if 'cost_ledger_days' in inspector.get_table_names():
+        return
+    op.create_table(
+        'cost_ledger_days',
+        sa.Column('id', sa.Integer(), primary_key=True),
+        sa.Column('project_id', sa.Integer(), sa.ForeignKey('projects.id', ondelete='CASCADE'), nullable=False),
+        sa.Column('day', sa.Date(), nullable=False),
+        sa.Column('source', sa.String(), nullable=False),
+        sa.Column('amount', sa.Numeric(18, 2), nullable=False, server_default='0'),
+        sa.Column('updated_at', sa.DateTime(timezone=True), server_default=sa.func.now()),
+    )
+    op.create_index('uq_cost_ledger_project_day_source', 'cost_ledger_days', ['project_id', 'day', 'source'], unique=True)
+    # backfill: OC en estado de costo (cost_ledger.COST_PO_STATUSES, por fecha de creación) y pagos
+    op.execute(
+        "INSERT INTO cost_ledger_days (project_id, day, source, amount) "
+        "SELECT po.project_id, date(po.created_at), 'po', COALESCE(SUM(l.qty * l.unit_price), 0) "
+        "FROM purchase_orders po JOIN purchase_order_lines l ON l.po_id = po.id "
+        "WHERE po.status IN ('approved', 'received', 'closed') "
+        "GROUP BY po.project_id, date(po.created_at)"
+    )
+    op.execute(
+        "INSERT INTO cost_ledger_days (project_id, day, source, amount) "
+        "SELECT i.project_id, date(p.created_at), 'payment', COALESCE(SUM(p.amount), 0) "
+        "FROM invoice_payments p JOIN invoices i ON i.id = p.invoice_id "
+        "GROUP BY i.project_id, date(p.created_at)"
+    )
+
+
+def downgrade():
+    op.drop_index('uq_cost_ledger_project_day_source', table_name='cost_ledger_days')
+    op.drop_table('cost_ledger_days')
@@ -0,0 +1,37 @@
+"""baseline schedule entries (per item / chapter)
+
+Revision ID: 0019_schedule_entries
+Revises: 0018_cost_ledger_days
+Create Date: 2026-10-19
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+revision = '0019_schedule_entries'
+down_revision = '0018_cost_ledger_days'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    bind = op.get_bind()
+    inspector = sa.inspect(bind)
+    if 'schedule_entries' in inspector.get_table_names():
+        return
+    op.create_table(
+        'schedule_entries',
+        sa.Column('id', sa.Integer(), primary_key=True),
+        sa.Column('version_id', sa.Integer(), sa.ForeignKey('budget_versions.id', ondelete='CASCADE'), nullable=False),
+        sa.Column('level', sa.String(), nullable=False),
+        sa.Column('code', sa.String(), nullable=False),
+        sa.Column('start_date', sa.Date(), nullable=False),
+        sa.Column('end_date', sa.Date(), nullable=False),
+        sa.Column('profile', sa.String(), nullable=False, server_default='linear'),
+    )
+    op.create_index('uq_schedule_version_level_code', 'schedule_entries', ['version_id', 'level', 'code'], unique=True)
+
+
+def downgrade():
+    op.drop_index('uq_schedule_version_level_code', table_name='schedule_entries')
+    op.drop_table('schedule_entries')
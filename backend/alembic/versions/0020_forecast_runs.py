@@ -0,0 +1,38 @@
+"""monte carlo forecast runs cached by input hash
+
+Revision ID: 0020_forecast_runs
+Revises: 0019_schedule_entries
+Create Date: 2026-10-19
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+revision = '0020_forecast_runs'
+down_revision = '0019_schedule_entries'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    bind = op.get_bind()
+    inspector = sa.inspect(bind)
+    if 'forecast_runs' in inspector.get_table_names():
+        return
+    op.create_table(
+        'forecast_runs',
+        sa.Column('id', sa.Integer(), primary_key=True),
+        sa.Column('project_id', sa.Integer(), sa.ForeignKey('projects.id', ondelete='CASCADE'), nullable=False),
+        sa.Column('input_hash', sa.String(64), nullable=False),
+        sa.Column('params', sa.JSON()),
+        sa.Column('result', sa.JSON()),
+        sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.func.now()),
+    )
+    op.create_index('ix_forecast_runs_project_id', 'forecast_runs', ['project_id'])
+    op.create_index('uq_forecast_runs_project_hash', 'forecast_runs', ['project_id', 'input_hash'], unique=True)
+
+
+def downgrade():
+    op.drop_index('uq_forecast_runs_project_hash', table_name='forecast_runs')
+    op.drop_index('ix_forecast_runs_project_id', table_name='forecast_runs')
+    op.drop_table('forecast_runs')
@@ -0,0 +1,36 @@
+"""risk analytics indexes
+
+Revision ID: 0021_risk_analytics_indexes
+Revises: 0020_forecast_runs
+Create Date: 2026-10-19
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+revision = '0021_risk_analytics_indexes'
+down_revision = '0020_forecast_runs'
+branch_labels = None
+depends_on = None
+
+# (nombre, columnas): matriz agrupada por proyecto y filtros por estado/categoría
+INDEXES = [
+    ('ix_risks_project_status_prob_impact', ['project_id', 'status', 'probability', 'impact']),
+    ('ix_risks_project_category', ['project_id', 'category']),
+]
+
+
+def upgrade():
+    bind = op.get_bind()
+    inspector = sa.inspect(bind)
+    if 'risks' not in inspector.get_table_names():
+        return
+    existing = {ix['name'] for ix in inspector.get_indexes('risks')}
+    for name, cols in INDEXES:
+        if name not in existing:
+            op.create_index(name, 'risks', cols)
+
+
+def downgrade():
+    for name, _ in INDEXES:
+        op.drop_index(name, table_name='risks')
@@ -0,0 +1,38 @@
+"""workflow inbox indexes
+
+Revision ID: 0022_workflow_inbox_indexes
+Revises: 0021_risk_analytics_indexes
+Create Date: 2026-10-19
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+revision = '0022_workflow_inbox_indexes'
+down_revision = '0021_risk_analytics_indexes'
+branch_labels = None
+depends_on = None
+
+# (tabla, nombre, columnas): roles del usuario para la bandeja cross-proyecto;
+# los de instancias/pasos vienen de 0011 y solo se crean si faltan
+INDEXES = [
+    ('user_project_roles', 'ix_user_project_roles_user_project_role', ['user_id', 'project_id', 'role']),
+    ('workflow_instances', 'ix_workflow_instances_proj_status_step', ['project_id', 'status', 'current_step']),
+    ('workflow_instance_steps', 'ix_workflow_inst_steps_instance_pos_decision', ['instance_id', 'position', 'decision']),
+]
+
+
+def upgrade():
+    bind = op.get_bind()
+    inspector = sa.inspect(bind)
+    tables = set(inspector.get_table_names())
+    for table, name, cols in INDEXES:
+        if table not in tables:
+            continue
+        existing = {ix['name'] for ix in inspector.get_indexes(table)}
+        if name not in existing:
+            op.create_index(name, table, cols)
+
+
+def downgrade():
+    op.drop_index('ix_user_project_roles_user_project_role', table_name='user_project_roles')
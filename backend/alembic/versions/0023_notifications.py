@@ -0,0 +1,39 @@
+"""notifications produced by event consumers
+
+Revision ID: 0023_notifications
+Revises: 0022_workflow_inbox_indexes
+Create Date: 2026-10-19
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+revision = '0023_notifications'
+down_revision = '0022_workflow_inbox_indexes'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    bind = op.get_bind()
+    inspector = sa.inspect(bind)
+    if 'notifications' in inspector.get_table_names():
+        return
+    op.create_table(
+        'notifications',
+        sa.Column('id', sa.Integer(), primary_key=True),
+        sa.Column('user_id', sa.Integer(), sa.ForeignKey('users.id', ondelete='CASCADE'), nullable=False),
+        sa.Column('project_id', sa.Integer(), sa.ForeignKey('projects.id', ondelete='CASCADE'), nullable=True),
+        sa.Column('kind', sa.String(), nullable=False),
+        sa.Column('entity', sa.String()),
+        sa.Column('entity_id', sa.Integer()),
+        sa.Column('data', sa.JSON()),
+        sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.func.now()),
+        sa.Column('read_at', sa.DateTime(timezone=True), nullable=True),
+    )
+    op.create_index('ix_notifications_user_read', 'notifications', ['user_id', 'read_at', 'id'])
+
+
+def downgrade():
+    op.drop_index('ix_notifications_user_read', table_name='notifications')
+    op.drop_table('notifications')
@@ -0,0 +1,28 @@
+"""dedup key for job submissions
+
+Revision ID: 0024_job_dedup_key
+Revises: 0023_notifications
+Create Date: 2026-10-19
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+revision = '0024_job_dedup_key'
+down_revision = '0023_notifications'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    bind = op.get_bind()
+    inspector = sa.inspect(bind)
+    if 'dedup_key' in {c['name'] for c in inspector.get_columns('jobs')}:
+        return
+    op.add_column('jobs', sa.Column('dedup_key', sa.String(), nullable=True))
+    op.create_index('ix_jobs_dedup_key', 'jobs', ['dedup_key'])
+
+
+def downgrade():
+    op.drop_index('ix_jobs_dedup_key', table_name='jobs')
+    op.drop_column('jobs', 'dedup_key')
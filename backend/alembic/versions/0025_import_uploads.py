@@ -0,0 +1,41 @@
+"""import uploads by content hash
+
+Revision ID: 0025_import_uploads
+Revises: 0024_job_dedup_key
+Create Date: 2026-10-19
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+revision = '0025_import_uploads'
+down_revision = '0024_job_dedup_key'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    bind = op.get_bind()
+    inspector = sa.inspect(bind)
+    if 'import_uploads' in inspector.get_table_names():
+        return
+    op.create_table(
+        'import_uploads',
+        sa.Column('id', sa.Integer(), primary_key=True),
+        sa.Column('sha256', sa.String(length=64), nullable=False),
+        sa.Column('kind', sa.String(), nullable=False),
+        sa.Column('project_name', sa.String(), nullable=False),
+        sa.Column('project_id', sa.Integer(), sa.ForeignKey('projects.id', ondelete='CASCADE'), nullable=False),
+        sa.Column('user_id', sa.Integer(), sa.ForeignKey('users.id'), nullable=True),
+        sa.Column('filename', sa.String(), nullable=True),
+        sa.Column('size', sa.BigInteger(), nullable=False),
+        sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.func.now()),
+    )
+    op.create_index('ix_import_uploads_project_id', 'import_uploads', ['project_id'])
+    op.create_index('ix_import_uploads_lookup', 'import_uploads', ['sha256', 'kind', 'project_name'])
+
+
+def downgrade():
+    op.drop_index('ix_import_uploads_lookup', table_name='import_uploads')
+    op.drop_index('ix_import_uploads_project_id', table_name='import_uploads')
+    op.drop_table('import_uploads')
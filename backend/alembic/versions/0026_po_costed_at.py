@@ -0,0 +1,40 @@
+"""purchase order cost date and ledger po backfill
+
+Revision ID: 0026_po_costed_at
+Revises: 0025_import_uploads
+Create Date: 2026-10-19
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+revision = '0026_po_costed_at'
+down_revision = '0025_import_uploads'
+branch_labels = None
+depends_on = None
+
+# mismo conjunto que app.services.cost_ledger.COST_PO_STATUSES
+COST_STATUSES = "('approved', 'received', 'closed')"
+
+
+def upgrade():
+    bind = op.get_bind()
+    inspector = sa.inspect(bind)
+    if 'costed_at' in {c['name'] for c in inspector.get_columns('purchase_orders')}:
+        return
+    op.add_column('purchase_orders', sa.Column('costed_at', sa.DateTime(timezone=True), nullable=True))
+    # el día de aprobación de las OC existentes no se guardó: se usa la creación, como rebuild_cost_ledger
+    op.execute(f"UPDATE purchase_orders SET costed_at = created_at WHERE status IN {COST_STATUSES}")
+    # la fuente 'po' se recalcula con el conjunto corregido (antes no incluía 'closed')
+    op.execute("DELETE FROM cost_ledger_days WHERE source = 'po'")
+    op.execute(
+        "INSERT INTO cost_ledger_days (project_id, day, source, amount) "
+        "SELECT po.project_id, date(po.costed_at), 'po', COALESCE(SUM(l.qty * l.unit_price), 0) "
+        "FROM purchase_orders po JOIN purchase_order_lines l ON l.po_id = po.id "
+        f"WHERE po.status IN {COST_STATUSES} "
+        "GROUP BY po.project_id, date(po.costed_at)"
+    )
+
+
+def downgrade():
+    op.drop_column('purchase_orders', 'costed_at')
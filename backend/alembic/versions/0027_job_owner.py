@@ -0,0 +1,32 @@
+"""job owner and attached submitters
+
+Revision ID: 0027_job_owner
+Revises: 0026_po_costed_at
+Create Date: 2026-10-19
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+revision = '0027_job_owner'
+down_revision = '0026_po_costed_at'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    bind = op.get_bind()
+    inspector = sa.inspect(bind)
+    if 'created_by' in {c['name'] for c in inspector.get_columns('jobs')}:
+        return
+    op.add_column('jobs', sa.Column('project_id', sa.Integer(), nullable=True))
+    op.add_column('jobs', sa.Column('created_by', sa.Integer(), nullable=True))
+    op.add_column('jobs', sa.Column('submitters', sa.JSON(), nullable=True))
+    op.create_index('ix_jobs_project_id', 'jobs', ['project_id'])
+
+
+def downgrade():
+    op.drop_index('ix_jobs_project_id', table_name='jobs')
+    op.drop_column('jobs', 'submitters')
+    op.drop_column('jobs', 'created_by')
+    op.drop_column('jobs', 'project_id')
@@ -0,0 +1,26 @@
+"""budget version schedule revision (PV curve cache token)
+
+Revision ID: 0028_schedule_revision
+Revises: 0027_job_owner
+Create Date: 2026-10-19
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+revision = '0028_schedule_revision'
+down_revision = '0027_job_owner'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    bind = op.get_bind()
+    inspector = sa.inspect(bind)
+    if 'schedule_revision' in {c['name'] for c in inspector.get_columns('budget_versions')}:
+        return
+    op.add_column('budget_versions', sa.Column('schedule_revision', sa.Integer(), nullable=False, server_default='0'))
+
+
+def downgrade():
+    op.drop_column('budget_versions', 'schedule_revision')
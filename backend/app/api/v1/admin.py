@@ -0,0 +1,41 @@
+import time
+from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi.responses import FileResponse
+from app.core.profiling import list_profiles, load_profile, svg_path, sign_token, PROFILE_HEADER
+from app.core.settings import get_settings
+from app.services.rbac import require_platform_admin
+
+router = APIRouter()
+
+
+@router.get("/profiles")
+def profiles(limit: int = Query(100, ge=1, le=1000), user=Depends(require_platform_admin)):
+    """Perfiles guardados, del más reciente al más antiguo (sin las pilas)."""
+    return list_profiles(limit)
+
+
+@router.post("/profiles/token")
+def profile_token(ttl: int = Query(900, ge=60, le=86400), user=Depends(require_platform_admin)):
+    """Valor del header ``X-Profile`` para perfilar requests durante ``ttl`` segundos."""
+    settings = get_settings()
+    if not settings.profiling_enabled or not settings.profiling_secret:
+        raise HTTPException(400, "Perfilado deshabilitado (PROFILING_ENABLED / PROFILING_SECRET)")
+    expires = int(time.time()) + ttl
+    return {"header": PROFILE_HEADER, "value": sign_token(expires), "expires_at": expires}
+
+
+@router.get("/profiles/{profile_id}")
+def profile_detail(profile_id: str, user=Depends(require_platform_admin)):
+    """Metadata y pilas en formato folded (``{"a;b;c": muestras}``)."""
+    data = load_profile(profile_id)
+    if data is None:
+        raise HTTPException(404, "Perfil no encontrado")
+    return data
+
+
+@router.get("/profiles/{profile_id}/flamegraph.svg")
+def profile_flamegraph(profile_id: str, user=Depends(require_platform_admin)):
+    path = svg_path(profile_id)
+    if path is None:
+        raise HTTPException(404, "Perfil no encontrado")
+    return FileResponse(path, media_type="image/svg+xml")
@@ -25,13 +25,22 @@ class TokenOut(BaseModel):
     refresh_token: str
     token_type: str = "bearer"
 
-def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)) -> User:
-    username = decode_token(token)
+def user_from_token(db: Session, token: str | None) -> User | None:
+    """Usuario activo del access token (también para WebSocket, donde no hay header OAuth2)."""
+    username = decode_token(token) if token else None
     if not username:
-        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Token inválido")
+        return None
     user = db.query(User).filter(User.username == username).first()
     # user.is_active puede ser una columna; asegurar coerción booleana
     if not user or not bool(getattr(user, "is_active", True)):
+        return None
+    return user
+
+def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)) -> User:
+    if not decode_token(token):
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Token inválido")
+    user = user_from_token(db, token)
+    if not user:
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Usuario no encontrado")
     return user
 
@@ -7,6 +7,7 @@ from app.db.models.project import Project
 from app.db.models.budget import Chapter, Item, Resource, APU
 from app.services.kpis import compute_item_price
 from app.services.audit import log_action
+from app.services.events import emit
 from app.services.rbac import require_role, check_role
 from app.db.models.audit import UserProjectRole
 from sqlalchemy import desc, func
@@ -82,6 +83,7 @@ async def delete_chapter(chapter_id: int, db: Session = Depends(get_db), user=De
     ch.deleted_at = func.now()
     db.commit()
     log_action(db, ch.project_id, "chapter", ch.id, "delete_chapter", {}, user.id)
+    emit(db, "budget.chapter_deleted", ch.project_id, "chapter", ch.id, user_id=user.id)
     return {"status": "deleted", "id": ch.id}
 
 class ItemIn(BaseModel):
@@ -101,6 +103,7 @@ async def create_item(i: ItemIn, db: Session = Depends(get_db), user=Depends(get
     obj = Item(**i.model_dump())
     db.add(obj); db.commit(); db.refresh(obj)
     log_action(db, ch.project_id, "item", obj.id, "create", {"code": obj.code, "name": obj.name}, user.id)
+    emit(db, "budget.item_created", ch.project_id, "item", obj.id, user_id=user.id)
     return {"id": obj.id, "code": obj.code, "name": obj.name}
 
 @router.get("/chapters/{chapter_id}/items")
@@ -134,6 +137,7 @@ async def update_item(item_id: int, payload: ItemUpdate, db: Session = Depends(g
         return {"id": it.id, "code": it.code, "name": it.name}
     db.commit(); db.refresh(it)
     log_action(db, ch.project_id, "item", it.id, "update_item", changed, user.id)
+    emit(db, "budget.item_updated", ch.project_id, "item", it.id, changed, user.id)
     return {"id": it.id, "code": it.code, "name": it.name}
 
 @router.delete("/items/{item_id}")
@@ -146,6 +150,7 @@ async def delete_item(item_id: int, db: Session = Depends(get_db), user=Depends(
     it.deleted_at = func.now()
     db.commit()
     log_action(db, ch.project_id, "item", it.id, "delete_item", {}, user.id)
+    emit(db, "budget.item_deleted", ch.project_id, "item", it.id, user_id=user.id)
     return {"status": "deleted", "id": it.id}
 
 class APULineIn(BaseModel):
@@ -177,6 +182,7 @@ async def set_apu(item_id: int, lines: list[APULineIn], db: Session = Depends(ge
     item.price = compute_item_price(apu_payload)
     db.commit(); db.refresh(item)
     log_action(db, ch.project_id, "item", item.id, "set_apu", {"lines": len(lines), "price": str(item.price)}, user.id)
+    emit(db, "budget.item_priced", ch.project_id, "item", item.id, {"price": str(item.price)}, user.id)
     return {"item_id": item.id, "price": str(item.price), "lines": len(lines)}
 
 class RoleAssignIn(BaseModel):
@@ -1,97 +1,129 @@
-from fastapi import APIRouter, Depends, HTTPException
+import asyncio
+import json
+import time
+from fastapi import APIRouter, Depends, HTTPException, WebSocket, WebSocketDisconnect
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import StreamingResponse
 from sqlalchemy.orm import Session
-from sqlalchemy import func, case
 from app.db.session import get_db
 from app.api.v1.auth import get_current_user
-from app.services.rbac import check_role
-from app.db.models.budget import Chapter, Item, MeasurementBatch, MeasurementLine
-from app.db.models.risk import Risk
-from app.db.models.versioning import WorkflowInstance, WorkflowInstanceStep, WorkflowStep
+from app.services.rbac import check_role, token_project_role
 from app.db.models.audit import UserProjectRole
-from app.services.invoices import financial_metrics
+from app.services.finance import financial_metrics
+from app.services.dashboard import budget_fragment, risks_fragment, workflows_fragment, for_user, live_snapshot, \
+    mark_watched, hub
+from app.services.events import HEARTBEAT_MS
+from app.services.portfolio import PORTFOLIO_KPIS, portfolio_metrics, filter_and_sort, iter_json_array, iter_ndjson
 
 router = APIRouter()
 
-def _float(x):
-    try:
-        return float(x or 0)
-    except Exception:
-        return 0.0
+READ_ROLES = ["admin", "editor", "viewer"]
+
+@router.get('/portfolio')
+def portfolio_dashboard(
+    sort_by: str = 'project_id',
+    order: str = 'asc',
+    kpi: str | None = None,
+    kpi_min: float | None = None,
+    kpi_max: float | None = None,
+    format: str = 'json',
+    db: Session = Depends(get_db),
+    user=Depends(get_current_user)
+):
+    """KPIs de todos los proyectos accesibles por el usuario (consultas agrupadas por proyecto).
+
+    - ``sort_by``: cualquier KPI de ``PORTFOLIO_KPIS`` o ``project_id``/``name``; ``order`` asc|desc.
+    - ``kpi`` + ``kpi_min``/``kpi_max``: filtra por rango de un KPI.
+    - ``format``: ``json`` (array) o ``ndjson`` (una línea por proyecto); ambos se emiten en streaming.
+    """
+    if sort_by not in PORTFOLIO_KPIS + ['project_id', 'name']:
+        raise HTTPException(400, f"sort_by inválido: {sort_by}")
+    if kpi is not None and kpi not in PORTFOLIO_KPIS:
+        raise HTTPException(400, f"kpi inválido: {kpi}")
+    if order not in ('asc', 'desc') or format not in ('json', 'ndjson'):
+        raise HTTPException(400, "Parámetros inválidos")
+    rows = portfolio_metrics(db, int(user.id), READ_ROLES)
+    rows = filter_and_sort(rows, sort_by, order == 'desc', kpi, kpi_min, kpi_max)
+    if format == 'ndjson':
+        return StreamingResponse(iter_ndjson(rows, json.dumps), media_type='application/x-ndjson')
+    return StreamingResponse(iter_json_array(rows, json.dumps), media_type='application/json')
+
 
 @router.get('/projects/{project_id}')
 def project_dashboard(project_id: int, db: Session = Depends(get_db), user=Depends(get_current_user)):
     # RBAC lectura
-    check_role(db, int(user.id), int(project_id), ["admin", "editor", "viewer"])
+    check_role(db, int(user.id), int(project_id), READ_ROLES)
+    # Roles del usuario en el proyecto (normalmente 1)
+    user_role = db.query(UserProjectRole).filter_by(user_id=int(user.id), project_id=int(project_id)).first()
+    role_list = [user_role.role] if user_role else []
+    wf = for_user({'workflows': workflows_fragment(db, project_id)}, role_list)['workflows']
+    return {
+        'project_id': project_id,
+        'budget': budget_fragment(db, project_id),
+        'finance': financial_metrics(db, project_id),
+        'risks': risks_fragment(db, project_id),
+        'workflows': {
+            'pending_steps': wf['pending_steps'],  # compat: campo existente ahora específico del usuario
+            'pending_steps_total': wf['pending_steps_total']
+        }
+    }
 
-    # --- Presupuesto (PV) ---
-    pv = db.query(func.coalesce(func.sum(Item.quantity * Item.price), 0)) \
-        .join(Chapter, Item.chapter_id == Chapter.id) \
-        .filter(
-            Chapter.project_id == project_id,
-            Chapter.deleted_at.is_(None),
-            Item.deleted_at.is_(None)
-        ).scalar() or 0
 
-    # --- Valor ganado (EV) usando solo batches cerrados ---
-    ev = db.query(func.coalesce(func.sum(MeasurementLine.qty * Item.price), 0)) \
-        .join(MeasurementBatch, MeasurementLine.batch_id == MeasurementBatch.id) \
-        .join(Item, Item.id == MeasurementLine.item_id) \
-        .join(Chapter, Chapter.id == Item.chapter_id) \
-        .filter(
-            MeasurementBatch.project_id == project_id,
-            MeasurementBatch.status == 'closed',
-            Chapter.project_id == project_id,
-            Chapter.deleted_at.is_(None),
-            Item.deleted_at.is_(None)
-        ).scalar() or 0
+async def _live_messages(db: Session, project_id: int, roles: list[str]):
+    """Snapshot inicial y luego deltas del proyecto; ``None`` = heartbeat."""
+    snapshot = await run_in_threadpool(live_snapshot, db, project_id)
+    db.close()  # la conexión vuelve al pool mientras la suscripción sigue abierta
+    yield {'type': 'dashboard.snapshot', 'project_id': project_id, 'fragments': for_user(snapshot, roles)}
+    sub = await hub.subscribe(project_id)
+    watched_at = time.monotonic()  # live_snapshot ya marcó al proyecto como observado
+    try:
+        while True:
+            if time.monotonic() - watched_at >= HEARTBEAT_MS / 1000:
+                # presencia del espectador: mientras la conexión siga abierta se recalculan los fragmentos
+                await run_in_threadpool(mark_watched, project_id)
+                watched_at = time.monotonic()
+            try:
+                msg = await asyncio.wait_for(sub.queue.get(), HEARTBEAT_MS / 1000)
+            except asyncio.TimeoutError:
+                yield None
+                continue
+            if msg['type'] == 'dashboard.resync':
+                snapshot = await run_in_threadpool(live_snapshot, db, project_id)
+                db.close()
+                msg = {'type': 'dashboard.snapshot', 'project_id': project_id, 'fragments': snapshot}
+            yield {**msg, 'fragments': for_user(msg['fragments'], roles)}
+    finally:
+        hub.unsubscribe(sub)
 
-    # Riesgos: conteos y matriz ligera (totales open vs closed)
-    risk_counts = db.query(
-        func.coalesce(func.sum(case((Risk.status=='open',1), else_=0)),0).label('open'),
-        func.coalesce(func.sum(case((Risk.status=='mitigating',1), else_=0)),0).label('mitigating'),
-        func.coalesce(func.sum(case((Risk.status=='closed',1), else_=0)),0).label('closed')
-    ).filter(Risk.project_id==project_id).one()
 
-    # Roles del usuario en el proyecto (normalmente 1)
-    user_role = db.query(UserProjectRole).filter_by(user_id=int(user.id), project_id=int(project_id)).first()
-    role_list = [user_role.role] if user_role else []
+@router.get('/projects/{project_id}/live')
+def project_dashboard_live(project_id: int, db: Session = Depends(get_db), user=Depends(get_current_user)):
+    """SSE: snapshot de fragmentos y luego solo las claves que cambian (``dashboard.delta``)."""
+    check_role(db, int(user.id), int(project_id), READ_ROLES)
+    role = db.query(UserProjectRole.role).filter_by(user_id=int(user.id), project_id=int(project_id)).scalar()
 
-    # Pasos pendientes totales (sin decisión, instancias en ejecución y en el paso actual)
-    pending_total_q = db.query(func.count(WorkflowInstanceStep.id)) \
-        .join(WorkflowInstance, WorkflowInstanceStep.instance_id == WorkflowInstance.id) \
-        .join(WorkflowStep, WorkflowInstanceStep.step_id == WorkflowStep.id) \
-        .filter(
-            WorkflowInstance.project_id == project_id,
-            WorkflowInstance.status == 'running',
-            WorkflowInstanceStep.decision.is_(None),
-            WorkflowInstanceStep.position == WorkflowInstance.current_step
-        )
-    pending_total = pending_total_q.scalar() or 0
+    async def body():
+        async for msg in _live_messages(db, project_id, [role] if role else []):
+            if msg is None:
+                yield ": ping\n\n"
+            else:
+                yield f"event: {msg['type']}\ndata: {json.dumps(msg, default=str)}\n\n"
 
-    # Pasos pendientes para el usuario (filtrando por rol requerido)
-    if role_list:
-        pending_user_q = pending_total_q.filter(WorkflowStep.role_required.in_(role_list))
-        pending_user = pending_user_q.scalar() or 0
-    else:
-        pending_user = 0
+    return StreamingResponse(body(), media_type='text/event-stream',
+                             headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
 
-    fin = financial_metrics(db, project_id)
 
-    return {
-        'project_id': project_id,
-        'budget': {
-            'pv': _float(pv),
-            'ev': _float(ev),
-            'progress_percent': (_float(ev)/_float(pv)*100) if pv else 0.0
-        },
-        'finance': fin,
-        'risks': {
-            'open': int(risk_counts.open),
-            'mitigating': int(risk_counts.mitigating),
-            'closed': int(risk_counts.closed)
-        },
-        'workflows': {
-            'pending_steps': int(pending_user),  # compat: campo existente ahora específico del usuario
-            'pending_steps_total': int(pending_total)
-        }
-    }
\ No newline at end of file
+@router.websocket('/projects/{project_id}/live/ws')
+async def project_dashboard_live_ws(websocket: WebSocket, project_id: int, token: str | None = None,
+                                    db: Session = Depends(get_db)):
+    access = await run_in_threadpool(token_project_role, db, token, project_id, READ_ROLES)
+    if access is None:
+        db.close()
+        await websocket.close(code=1008)
+        return
+    await websocket.accept()
+    try:
+        async for msg in _live_messages(db, project_id, [access[1]]):
+            await websocket.send_text(json.dumps(msg or {'type': 'ping'}, default=str))
+    except WebSocketDisconnect:
+        pass
@@ -0,0 +1,85 @@
+import json
+from datetime import datetime
+from fastapi import APIRouter, Depends, HTTPException, Header, Query, WebSocket, WebSocketDisconnect
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel
+from sqlalchemy.orm import Session
+from sqlalchemy import update
+from app.db.session import get_db
+from app.api.v1.auth import get_current_user
+from app.db.models.notification import Notification
+from app.services.rbac import check_role, token_project_role
+from app.services.events import recent_events, subscribe, format_sse
+
+router = APIRouter()
+
+READ_ROLES = ["admin", "editor", "viewer"]
+
+@router.get("/project/{project_id}")
+def list_events(project_id: int, after: str | None = None, limit: int = Query(100, ge=1, le=1000),
+                db: Session = Depends(get_db), user=Depends(get_current_user)):
+    """Eventos recientes del proyecto posteriores a ``after`` (id de stream); reemplaza el polling."""
+    check_role(db, user.id, project_id, READ_ROLES)
+    return recent_events(project_id, after, limit)
+
+@router.get("/project/{project_id}/stream")
+def stream_events(project_id: int, after: str | None = None, last_event_id: str | None = Header(None),
+                  db: Session = Depends(get_db), user=Depends(get_current_user)):
+    """Server-sent events del proyecto; reanuda desde ``Last-Event-ID`` al reconectar."""
+    check_role(db, user.id, project_id, READ_ROLES)
+    db.close()  # la conexión no se retiene mientras dure el stream
+
+    async def body():
+        async for batch in subscribe(project_id, last_event_id or after):
+            if not batch:
+                yield ": ping\n\n"
+            for ev in batch:
+                yield format_sse(ev)
+
+    return StreamingResponse(body(), media_type="text/event-stream",
+                             headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+@router.websocket("/project/{project_id}/ws")
+async def events_ws(websocket: WebSocket, project_id: int, token: str | None = None, after: str | None = None,
+                    db: Session = Depends(get_db)):
+    """Mismo feed por WebSocket; el token va en ``?token=`` (los navegadores no envían headers)."""
+    allowed = token_project_role(db, token, project_id, READ_ROLES)
+    db.close()
+    if allowed is None:
+        await websocket.close(code=1008)
+        return
+    await websocket.accept()
+    try:
+        async for batch in subscribe(project_id, after):
+            if not batch:
+                await websocket.send_json({"type": "ping"})
+            for ev in batch:
+                await websocket.send_text(json.dumps(ev, default=str))
+    except WebSocketDisconnect:
+        pass
+
+@router.get("/notifications")
+def list_notifications(unread: bool = True, limit: int = Query(50, ge=1, le=500),
+                       db: Session = Depends(get_db), user=Depends(get_current_user)):
+    q = db.query(Notification).filter(Notification.user_id == user.id)
+    if unread:
+        q = q.filter(Notification.read_at.is_(None))
+    return [
+        {"id": n.id, "project_id": n.project_id, "kind": n.kind, "entity": n.entity, "entity_id": n.entity_id,
+         "data": n.data, "created_at": n.created_at, "read_at": n.read_at}
+        for n in q.order_by(Notification.id.desc()).limit(limit).all()
+    ]
+
+class MarkRead(BaseModel):
+    ids: list[int] | None = None  # None = todas
+
+@router.post("/notifications/read")
+def mark_notifications_read(body: MarkRead, db: Session = Depends(get_db), user=Depends(get_current_user)):
+    stmt = update(Notification).where(Notification.user_id == user.id, Notification.read_at.is_(None))
+    if body.ids is not None:
+        if not body.ids:
+            raise HTTPException(400, "ids vacío")
+        stmt = stmt.where(Notification.id.in_(body.ids))
+    res = db.execute(stmt.values(read_at=datetime.utcnow()))
+    db.commit()
+    return {"updated": res.rowcount}
@@ -1,43 +1,76 @@
-from fastapi import APIRouter, Depends, HTTPException, Response
+from fastapi import APIRouter, Depends, HTTPException, Request, Response
 from sqlalchemy.orm import Session
 from app.db.session import get_db
 from app.api.v1.auth import get_current_user
+from app.services.artifacts import artifact_response
+from app.services.evm import evm_metrics
 from app.services.exporting import (
     export_budget_excel, export_measurements_excel, export_versions_diff_excel, export_budget_pdf
 )
+from app.services.jobs import precomputed
 
 router = APIRouter()
 
+XLSX = "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+
+
+def _precomputed(db: Session, request: Request, filename: str, job_type: str, **params) -> Response | None:
+    # reporte precalculado (app.services.reports) o exportación encolada con los mismos datos
+    artifact = precomputed(db, job_type, **params)
+    return artifact_response(artifact, request, filename) if artifact is not None else None
+
 
 @router.get("/budget/{project_id}.xlsx")
-def budget_excel(project_id: int, db: Session = Depends(get_db), user=Depends(get_current_user)):
+def budget_excel(project_id: int, request: Request, db: Session = Depends(get_db), user=Depends(get_current_user)):
+    filename = f"budget_{project_id}.xlsx"
+    hit = _precomputed(db, request, filename, "export_budget_excel", project_id=project_id)
+    if hit is not None:
+        return hit
     try:
         content = export_budget_excel(db, project_id)
     except ValueError as e:
         raise HTTPException(404, str(e))
-    return Response(content, media_type="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
-                    headers={"Content-Disposition": f"attachment; filename=budget_{project_id}.xlsx"})
+    return Response(content, media_type=XLSX, headers={"Content-Disposition": f"attachment; filename={filename}"})
 
 
 @router.get("/measurements/{project_id}.xlsx")
-def measurements_excel(project_id: int, db: Session = Depends(get_db), user=Depends(get_current_user)):
+def measurements_excel(project_id: int, request: Request, db: Session = Depends(get_db), user=Depends(get_current_user)):
+    filename = f"measurements_{project_id}.xlsx"
+    hit = _precomputed(db, request, filename, "export_measurements_excel", project_id=project_id)
+    if hit is not None:
+        return hit
     content = export_measurements_excel(db, project_id)
-    return Response(content, media_type="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
-                    headers={"Content-Disposition": f"attachment; filename=measurements_{project_id}.xlsx"})
+    return Response(content, media_type=XLSX, headers={"Content-Disposition": f"attachment; filename={filename}"})
 
 
 @router.get("/diff.xlsx")
-def diff_excel(v_from: int, v_to: int, db: Session = Depends(get_db), user=Depends(get_current_user)):
+def diff_excel(v_from: int, v_to: int, request: Request, db: Session = Depends(get_db), user=Depends(get_current_user)):
+    filename = f"diff_{v_from}_{v_to}.xlsx"
+    hit = _precomputed(db, request, filename, "export_versions_diff_excel", v_from=v_from, v_to=v_to)
+    if hit is not None:
+        return hit
     content = export_versions_diff_excel(db, v_from, v_to)
-    return Response(content, media_type="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
-                    headers={"Content-Disposition": f"attachment; filename=diff_{v_from}_{v_to}.xlsx"})
+    return Response(content, media_type=XLSX, headers={"Content-Disposition": f"attachment; filename={filename}"})
 
 
 @router.get("/budget/{project_id}.pdf")
-def budget_pdf(project_id: int, db: Session = Depends(get_db), user=Depends(get_current_user)):
+def budget_pdf(project_id: int, request: Request, db: Session = Depends(get_db), user=Depends(get_current_user)):
+    filename = f"budget_{project_id}.pdf"
+    hit = _precomputed(db, request, filename, "export_budget_pdf", project_id=project_id)
+    if hit is not None:
+        return hit
     try:
         content = export_budget_pdf(db, project_id)
     except ValueError as e:
         raise HTTPException(404, str(e))
     return Response(content, media_type="application/pdf",
-                    headers={"Content-Disposition": f"attachment; filename=budget_{project_id}.pdf"})
+                    headers={"Content-Disposition": f"attachment; filename={filename}"})
+
+
+@router.get("/evm/{project_id}.json")
+def evm_json(project_id: int, request: Request, db: Session = Depends(get_db), user=Depends(get_current_user)):
+    """Indicadores y curvas EVM del día (los de ``GET /evm/projects/{id}``) para reportes."""
+    hit = _precomputed(db, request, f"evm_{project_id}.json", "evm_curves", project_id=project_id)
+    if hit is not None:
+        return hit
+    return evm_metrics(db, project_id)
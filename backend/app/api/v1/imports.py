@@ -1,50 +1,51 @@
 from fastapi import APIRouter, UploadFile, File, Form, Depends, HTTPException
+from fastapi.responses import JSONResponse
 from sqlalchemy.orm import Session
 from app.db.session import get_db
 from app.api.v1.auth import get_current_user
-import tempfile, os
-from app.services.excel_io import import_budget_xlsx
-from app.services.bc3_parser import import_budget_bc3, BC3ParseError
-from app.services.audit import log_action
-from app.db.models.audit import UserProjectRole
+from app.core.settings import get_settings
+from app.services.bc3_parser import BC3ParseError
+from app.services.jobs import enqueue_job, job_key, reusable_job
+from app.services.uploads import IMPORTERS, save_upload, find_imported, import_upload
 
 router = APIRouter()
 
-@router.post("/excel")
-async def import_excel(project_name: str = Form(...), file: UploadFile = File(...), db: Session = Depends(get_db), user=Depends(get_current_user)):
-    try:
-        with tempfile.NamedTemporaryFile(delete=False, suffix=".xlsx") as tmp:
-            tmp.write(await file.read())
-            tmp.flush()
-            project_id = import_budget_xlsx(db, tmp.name, project_name)
-            # Asignar rol admin al usuario si aún no existe rol para ese proyecto
-            if not db.query(UserProjectRole).filter_by(user_id=user.id, project_id=project_id).first():
-                db.add(UserProjectRole(user_id=user.id, project_id=project_id, role="admin")); db.commit()
-            log_action(db, project_id, "project", project_id, "import_excel", {"filename": file.filename}, user.id)
-    except ValueError as e:
-        raise HTTPException(status_code=400, detail=str(e))
-    finally:
-        try:
-            os.unlink(tmp.name)  # type: ignore
-        except Exception:
-            pass
-    return {"project_id": project_id}
 
-@router.post("/bc3")
-async def import_bc3(project_name: str = Form(...), file: UploadFile = File(...), db: Session = Depends(get_db), user=Depends(get_current_user)):
+def _import(kind: str, project_name: str, file: UploadFile, db: Session, user):
+    # def (no async): FastAPI lo corre en el threadpool, la copia y el parseo no bloquean el loop
+    upload = save_upload(file.file, IMPORTERS[kind][1])
+    project_id = find_imported(db, kind, upload.sha256, project_name, user.id)
+    if project_id is not None:
+        upload.discard()
+        return {"project_id": project_id, "duplicate": True}
+    params = {"kind": kind, "path": str(upload.path), "project_name": project_name, "user_id": user.id,
+              "filename": file.filename, "sha256": upload.sha256, "size": upload.size}
+    if upload.size > get_settings().import_inline_max_mb * 1024 * 1024:
+        # archivo grande: a la cola; una re-subida idéntica se engancha al job en curso
+        key = job_key(f"import_{kind}", {"sha256": upload.sha256, "project_name": project_name, "user_id": user.id},
+                      "upload")
+        job = reusable_job(db, key)
+        duplicate = job is not None
+        if duplicate:
+            upload.discard()
+        else:
+            try:
+                job = enqueue_job(db, f"import_{kind}", import_upload, dedup_key=key, created_by=user.id, **params)
+            except Exception:
+                upload.discard()
+                raise
+        return JSONResponse(status_code=202, content={"job_id": job.id, "status": job.status, "duplicate": duplicate})
     try:
-        with tempfile.NamedTemporaryFile(delete=False, suffix=".bc3") as tmp:
-            tmp.write(await file.read())
-            tmp.flush()
-            project_id = import_budget_bc3(db, tmp.name, project_name)
-            if not db.query(UserProjectRole).filter_by(user_id=user.id, project_id=project_id).first():
-                db.add(UserProjectRole(user_id=user.id, project_id=project_id, role="admin")); db.commit()
-            log_action(db, project_id, "project", project_id, "import_bc3", {"filename": file.filename}, user.id)
+        return import_upload(db, **params)
     except (ValueError, BC3ParseError) as e:
         raise HTTPException(status_code=400, detail=str(e))
-    finally:
-        try:
-            os.unlink(tmp.name)  # type: ignore
-        except Exception:
-            pass
-    return {"project_id": project_id}
+
+
+@router.post("/excel")
+def import_excel(project_name: str = Form(...), file: UploadFile = File(...), db: Session = Depends(get_db), user=Depends(get_current_user)):
+    return _import("excel", project_name, file, db, user)
+
+
+@router.post("/bc3")
+def import_bc3(project_name: str = Form(...), file: UploadFile = File(...), db: Session = Depends(get_db), user=Depends(get_current_user)):
+    return _import("bc3", project_name, file, db, user)
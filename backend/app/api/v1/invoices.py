@@ -1,4 +1,4 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, UploadFile, File, Form
 from sqlalchemy.orm import Session
 from typing import List, Optional
 from pydantic import BaseModel
@@ -11,9 +11,14 @@ from app.services.invoices import (
     list_invoices as svc_list_invoices,
     send_sii as svc_send_sii,
     register_payment as svc_register_payment,
+    register_payments_bulk as svc_register_payments_bulk,
     import_bank_transactions as svc_import_bank,
     reconcile_transaction as svc_reconcile
 )
+from app.services.reconciliation import auto_reconcile as svc_auto_reconcile
+from app.services.bank_ingest import ingest_bank_file
+from app.services.tabular_io import iter_table_rows, parse_amount
+from app.services.uploads import upload_on_disk
 
 router = APIRouter(prefix="/invoices", tags=["invoices"])
 
@@ -32,6 +37,7 @@ class InvoiceOut(BaseModel):
     currency: str
     status: str
     dte_number: Optional[str]
+    paid_amount: float = 0
     class Config:
         orm_mode = True
         from_attributes = True
@@ -52,6 +58,11 @@ class PaymentCreate(BaseModel):
     reference: Optional[str] = None
 
 
+class BulkPayments(BaseModel):
+    project_id: int
+    payments: List[dict]  # {invoice_id | dte_number, amount, method?, reference?}
+
+
 class BankTxnImport(BaseModel):
     project_id: int
     items: List[dict]
@@ -63,6 +74,13 @@ class ReconcileRequest(BaseModel):
     invoice_id: int
 
 
+class AutoReconcileRequest(BaseModel):
+    project_id: int
+    apply: bool = False
+    amount_tolerance: float = 1.0
+    date_window_days: int = 45
+
+
 @router.post("/", response_model=InvoiceOut)
 def create_invoice(data: InvoiceCreate, db: Session = Depends(get_db), user=Depends(get_current_user)):
     assert_project_access(db, user, int(data.project_id))
@@ -97,11 +115,55 @@ def register_payment(invoice_id: int, data: PaymentCreate, db: Session = Depends
     return svc_register_payment(db, user.id, inv, data.amount, data.method, data.reference)
 
 
+def _bulk_payments_response(result: dict) -> dict:
+    if result["errors"]:
+        raise HTTPException(status_code=400, detail={"message": "Pagos inválidos; no se aplicó ninguno", "errors": result["errors"]})
+    return result
+
+
+@router.post("/payments/bulk", response_model=dict)
+def register_payments_bulk(data: BulkPayments, db: Session = Depends(get_db), user=Depends(get_current_user)):
+    assert_project_access(db, user, int(data.project_id), ["admin", "editor"])
+    return _bulk_payments_response(svc_register_payments_bulk(db, user.id, data.project_id, data.payments))
+
+
+@router.post("/payments/bulk/file", response_model=dict)
+def register_payments_bulk_file(project_id: int = Form(...), file: UploadFile = File(...),
+                                 db: Session = Depends(get_db), user=Depends(get_current_user)):
+    """CSV/XLSX con columnas ``invoice_id`` o ``dte_number``, ``amount`` (o ``monto``), ``method``, ``reference``."""
+    assert_project_access(db, user, int(project_id), ["admin", "editor"])
+    with upload_on_disk(file) as upload:
+        try:
+            payments = [{
+                "invoice_id": r.get("invoice_id") or None,
+                "dte_number": r.get("dte_number") or r.get("dte"),
+                "amount": parse_amount(r.get("amount", r.get("monto"))),
+                "method": r.get("method") or r.get("metodo"),
+                "reference": r.get("reference") or r.get("referencia"),
+            } for r in iter_table_rows(str(upload.path), file.filename)]
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+    return _bulk_payments_response(svc_register_payments_bulk(db, user.id, int(project_id), payments))
+
+
 @router.post("/bank/import", response_model=dict)
 def import_bank(data: BankTxnImport, db: Session = Depends(get_db), user=Depends(get_current_user)):
     assert_project_access(db, user, int(data.project_id))
-    created = svc_import_bank(db, user.id, data.project_id, data.items, data.source)
-    return {"created": created}
+    stats = svc_import_bank(db, user.id, data.project_id, data.items, data.source)
+    return {"created": stats["new"], **stats}
+
+
+@router.post("/bank/import/file", response_model=dict)
+def import_bank_file(project_id: int = Form(...), source: str = Form("file"), file: UploadFile = File(...),
+                     db: Session = Depends(get_db), user=Depends(get_current_user)):
+    """Cartola CSV/XLSX/OFX: se copia a disco por bloques y se ingiere en streaming (idempotente)."""
+    assert_project_access(db, user, int(project_id), ["admin", "editor"])
+    with upload_on_disk(file) as upload:
+        try:
+            stats = ingest_bank_file(db, int(project_id), str(upload.path), file.filename, source=source, user_id=user.id)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+    return {"created": stats["new"], **stats}
 
 
 @router.post("/bank/reconcile", response_model=dict)
@@ -115,3 +177,13 @@ def reconcile(req: ReconcileRequest, db: Session = Depends(get_db), user=Depends
         raise HTTPException(status_code=400, detail="Project mismatch")
     status = svc_reconcile(db, user.id, bt, inv)
     return {"matched": True, "invoice_status": status}
+
+
+@router.post("/bank/auto_reconcile", response_model=dict)
+def auto_reconcile(req: AutoReconcileRequest, db: Session = Depends(get_db), user=Depends(get_current_user)):
+    """Propone (apply=false) o aplica en lote las conciliaciones de un proyecto.
+    Para varios proyectos usar el job ``POST /jobs/reconcile/auto``.
+    """
+    assert_project_access(db, user, int(req.project_id), ["admin", "editor"] if req.apply else None)
+    return svc_auto_reconcile(db, [req.project_id], apply=req.apply, user_id=user.id,
+                              amount_tolerance=req.amount_tolerance, date_window_days=req.date_window_days)
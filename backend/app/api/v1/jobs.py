@@ -1,68 +1,168 @@
-from fastapi import APIRouter, Depends, HTTPException, Response
+import json
+from fastapi import APIRouter, Depends, HTTPException, Request
 from sqlalchemy.orm import Session
 from app.db.session import get_db
 from app.api.v1.auth import get_current_user
-from app.services.jobs import enqueue_job, get_job_status
+from app.services.jobs import enqueue_job, submit_job, get_job_status, cancel_job, detach_submitter
+from app.services.job_progress import get_progress
+from app.services import artifacts
 from app.services.excel_io import import_budget_xlsx
 from app.services.bc3_parser import import_budget_bc3
 from app.services.exporting import export_budget_excel, export_measurements_excel, export_versions_diff_excel, export_budget_pdf
+from app.services.reconciliation import auto_reconcile
+from app.services.forecast import run_forecast, cached_forecast, default_params, DEFAULT_ITERATIONS, DEFAULT_SEED
+from app.services.rbac import check_role
 from app.db.models.job import Job
-import os
+from app.db.models.audit import UserProjectRole
+from app.db.models.versioning import BudgetVersion
 
 router = APIRouter()
 
+READ_ROLES = ["admin", "editor", "viewer"]
+
+def _submitted(job: Job, deduplicated: bool) -> dict:
+    # deduplicated: se reutilizó un job idéntico (en curso o ya terminado, descargable)
+    return {"job_id": job.id, "status": job.status, "deduplicated": deduplicated}
+
+def _version_projects(db: Session, *version_ids: int) -> set[int]:
+    rows = db.query(BudgetVersion.id, BudgetVersion.project_id).filter(BudgetVersion.id.in_(version_ids)).all()
+    if len(rows) != len(set(version_ids)):
+        raise HTTPException(404, "Versión no encontrada")
+    return {project_id for _, project_id in rows}
+
+def _job_projects(db: Session, job: Job) -> set[int]:
+    """Proyectos cuyos datos lee el job (el diff de versiones no guarda project_id)."""
+    if job.project_id is not None:
+        return {job.project_id}
+    params = json.loads(job.params or "{}")
+    if "v_from" in params:
+        return _version_projects(db, params["v_from"], params["v_to"])
+    return set(params.get("project_ids") or [])
+
+def _check_job_access(db: Session, job: Job, user, roles: list[str]) -> None:
+    """Quien lo envió (o se enganchó por deduplicación) o un usuario con rol en todos sus proyectos."""
+    if user.id == job.created_by or user.id in (job.submitters or []):
+        return
+    projects = _job_projects(db, job)
+    if not projects:
+        raise HTTPException(403, "No permission")
+    for project_id in projects:
+        check_role(db, user.id, project_id, roles)
+
 @router.post("/import/excel")
 def queue_import_excel(project_name: str, file_path: str, db: Session = Depends(get_db), user=Depends(get_current_user)):
-    job = enqueue_job(db, "import_excel", import_budget_xlsx, file_path=file_path, project_name=project_name)
+    job = enqueue_job(db, "import_excel", import_budget_xlsx, created_by=user.id, file_path=file_path, project_name=project_name)
     return {"job_id": job.id, "rq_id": job.rq_id}
 
 @router.post("/import/bc3")
 def queue_import_bc3(project_name: str, file_path: str, db: Session = Depends(get_db), user=Depends(get_current_user)):
-    job = enqueue_job(db, "import_bc3", import_budget_bc3, file_path=file_path, project_name=project_name)
+    job = enqueue_job(db, "import_bc3", import_budget_bc3, created_by=user.id, file_path=file_path, project_name=project_name)
     return {"job_id": job.id, "rq_id": job.rq_id}
 
 @router.post("/export/budget/{project_id}")
 def queue_export_budget(project_id: int, db: Session = Depends(get_db), user=Depends(get_current_user)):
-    job = enqueue_job(db, "export_budget_excel", export_budget_excel, project_id=project_id)
-    return {"job_id": job.id}
+    check_role(db, user.id, project_id, READ_ROLES)
+    job, dedup = submit_job(db, "export_budget_excel", export_budget_excel, created_by=user.id, project_id=project_id)
+    return _submitted(job, dedup)
 
 @router.post("/export/budget_pdf/{project_id}")
 def queue_export_budget_pdf(project_id: int, db: Session = Depends(get_db), user=Depends(get_current_user)):
-    job = enqueue_job(db, "export_budget_pdf", export_budget_pdf, project_id=project_id)
-    return {"job_id": job.id}
+    check_role(db, user.id, project_id, READ_ROLES)
+    job, dedup = submit_job(db, "export_budget_pdf", export_budget_pdf, created_by=user.id, project_id=project_id)
+    return _submitted(job, dedup)
 
 @router.post("/export/measurements/{project_id}")
 def queue_export_measurements(project_id: int, db: Session = Depends(get_db), user=Depends(get_current_user)):
-    job = enqueue_job(db, "export_measurements_excel", export_measurements_excel, project_id=project_id)
-    return {"job_id": job.id}
+    check_role(db, user.id, project_id, READ_ROLES)
+    job, dedup = submit_job(db, "export_measurements_excel", export_measurements_excel, created_by=user.id, project_id=project_id)
+    return _submitted(job, dedup)
 
 @router.post("/export/diff")
 def queue_export_diff(v_from: int, v_to: int, db: Session = Depends(get_db), user=Depends(get_current_user)):
-    job = enqueue_job(db, "export_versions_diff_excel", export_versions_diff_excel, v_from=v_from, v_to=v_to)
-    return {"job_id": job.id}
+    for project_id in _version_projects(db, v_from, v_to):
+        check_role(db, user.id, project_id, READ_ROLES)
+    job, dedup = submit_job(db, "export_versions_diff_excel", export_versions_diff_excel, created_by=user.id, v_from=v_from, v_to=v_to)
+    return _submitted(job, dedup)
+
+@router.post("/reconcile/auto")
+def queue_auto_reconcile(project_id: int | None = None, apply: bool = True, amount_tolerance: float = 1.0, date_window_days: int = 45,
+                         db: Session = Depends(get_db), user=Depends(get_current_user)):
+    # Sin project_id: todos los proyectos donde el usuario es admin
+    if project_id is not None:
+        check_role(db, user.id, project_id, ["admin", "editor"])
+        project_ids = [project_id]
+    else:
+        project_ids = [r.project_id for r in db.query(UserProjectRole.project_id).filter_by(user_id=user.id, role="admin").all()]
+    job = enqueue_job(db, "auto_reconcile", auto_reconcile, created_by=user.id, project_ids=project_ids, apply=apply, user_id=user.id,
+                      amount_tolerance=amount_tolerance, date_window_days=date_window_days)
+    return {"job_id": job.id, "projects": len(project_ids)}
+
+@router.post("/forecast/{project_id}")
+def queue_forecast(project_id: int, iterations: int = DEFAULT_ITERATIONS, seed: int = DEFAULT_SEED,
+                   qty_low: float | None = None, qty_high: float | None = None,
+                   price_low: float | None = None, price_high: float | None = None,
+                   db: Session = Depends(get_db), user=Depends(get_current_user)):
+    """Encola la simulación Monte Carlo del EAC; si ya existe una corrida con las mismas entradas la devuelve."""
+    check_role(db, user.id, project_id, READ_ROLES)
+    if not 1000 <= iterations <= 1_000_000:
+        raise HTTPException(400, "iterations fuera de rango (1000 - 1000000)")
+    base = default_params()
+    try:
+        params = default_params(
+            iterations=iterations, seed=seed,
+            qty_spread=[qty_low if qty_low is not None else base["qty_spread"][0], qty_high if qty_high is not None else base["qty_spread"][1]],
+            price_spread=[price_low if price_low is not None else base["price_spread"][0], price_high if price_high is not None else base["price_spread"][1]],
+        )
+    except ValueError as e:
+        raise HTTPException(400, str(e))
+    input_hash, run = cached_forecast(db, project_id, params)
+    if run is not None:
+        return {"cached": True, "input_hash": input_hash, "result": run.result}
+    job = enqueue_job(db, "forecast", run_forecast, created_by=user.id, project_id=project_id, **params)
+    return {"cached": False, "input_hash": input_hash, "job_id": job.id}
 
 @router.get("/{job_id}")
 def job_status(job_id: int, db: Session = Depends(get_db), user=Depends(get_current_user)):
     job: Job | None = get_job_status(db, job_id)
     if not job:
         raise HTTPException(404, "Job no encontrado")
-    return {"id": job.id, "type": job.type, "status": job.status, "error": job.error, "result_path": job.result_path}
+    _check_job_access(db, job, user, READ_ROLES)
+    return {"id": job.id, "type": job.type, "status": job.status, "error": job.error, "result_path": job.result_path,
+            "progress": get_progress(job.id)}
+
+@router.post("/{job_id}/cancel")
+def job_cancel(job_id: int, db: Session = Depends(get_db), user=Depends(get_current_user)):
+    job: Job | None = get_job_status(db, job_id)
+    if not job:
+        raise HTTPException(404, "Job no encontrado")
+    if job.status not in ("queued", "started"):
+        raise HTTPException(409, f"Job ya terminado ({job.status})")
+    submitters = job.submitters or []
+    if user.id not in submitters:
+        # job ajeno: solo admin/editor de su proyecto
+        projects = _job_projects(db, job)
+        if not projects:
+            raise HTTPException(403, "No permission")
+        for project_id in projects:
+            check_role(db, user.id, project_id, ["admin", "editor"])
+    if len(submitters) > 1:
+        # compartido por deduplicación: quien lo pidió se desengancha, el job sigue para los demás
+        if user.id not in submitters:
+            raise HTTPException(409, "Job compartido con otros envíos")
+        detach_submitter(db, job, user.id)
+        return {"id": job.id, "status": job.status, "cancel_requested": False, "detached": True}
+    job = cancel_job(db, job)
+    return {"id": job.id, "status": job.status, "cancel_requested": True}
 
 @router.get("/{job_id}/download")
-def job_download(job_id: int, db: Session = Depends(get_db), user=Depends(get_current_user)):
+def job_download(job_id: int, request: Request, db: Session = Depends(get_db), user=Depends(get_current_user)):
     job: Job | None = get_job_status(db, job_id)
     if not job:
         raise HTTPException(404, "Job no encontrado")
-    if job.status != "finished" or not job.result_path or not os.path.exists(job.result_path):
+    _check_job_access(db, job, user, READ_ROLES)
+    if job.status != "finished" or not job.result_path:
         raise HTTPException(400, "Resultado no disponible")
-    # Heurística de media-type básica
-    if job.result_path.endswith('.xlsx'):
-        media_type = 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
-    elif job.result_path.endswith('.pdf'):
-        media_type = 'application/pdf'
-    else:
-        media_type = 'application/octet-stream'
-    with open(job.result_path, 'rb') as f:
-        data = f.read()
-    filename = os.path.basename(job.result_path)
-    return Response(data, media_type=media_type, headers={"Content-Disposition": f"attachment; filename={filename}"})
+    artifact = artifacts.resolve(job.result_path)
+    if artifact is None:
+        raise HTTPException(410, "Resultado expirado")
+    return artifacts.artifact_response(artifact, request, f"{job.type}_{job.id}.{artifact.ext}")
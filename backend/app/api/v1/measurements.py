@@ -5,6 +5,7 @@ from app.db.session import get_db
 from app.api.v1.auth import get_current_user
 from app.db.models.budget import MeasurementBatch, MeasurementLine, Item, Chapter
 from app.services.kpis import compute_item_price
+from app.services.events import emit
 from sqlalchemy import func
 
 router = APIRouter()
@@ -48,6 +49,7 @@ def close_batch(batch_id: int, db: Session = Depends(get_db), user=Depends(get_c
         raise HTTPException(status_code=404, detail="Batch no encontrado")
     batch.status = "closed"  # type: ignore[assignment]
     db.commit(); db.refresh(batch)
+    emit(db, "measurement.batch_closed", batch.project_id, "measurement_batch", batch.id, user_id=user.id)
     return {"id": batch.id, "status": batch.status}
 
 
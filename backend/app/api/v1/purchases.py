@@ -1,10 +1,17 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, UploadFile, File, Form
 from sqlalchemy.orm import Session
 from pydantic import BaseModel
 from app.db.session import get_db
 from app.api.v1.auth import get_current_user
-from app.db.models.purchases import Supplier, RFQ, RFQItem, Quote, QuoteLine, PurchaseOrder, PurchaseOrderLine
-from app.db.models.budget import Item, Chapter
+from app.db.models.purchases import Supplier, PurchaseOrder, PurchaseOrderLine
+from app.services.quotes import compare_quotes, invalidate_rfq
+from app.services import purchase_lines as svc_lines
+from app.services.purchase_lines import LineValidationError, normalize_upload_row
+from app.services.tabular_io import iter_table_rows
+from app.services.uploads import upload_on_disk
+from app.services.commitments import record_po_status_change, over_committed_items, commitment_variance, rebuild_commitments
+from app.services.cost_ledger import record_po_cost
+from app.services.rbac import check_role
 
 router = APIRouter()
 
@@ -30,70 +37,88 @@ def list_suppliers(db: Session = Depends(get_db), user=Depends(get_current_user)
 
 class RFQCreate(BaseModel):
     project_id: int
-    items: list[dict]  # {item_id, qty}
+    items: list[dict]  # {item_id | item_code, qty}
+
+
+def _lines_or_400(fn, *args, **kwargs) -> dict:
+    try:
+        return fn(*args, **kwargs)
+    except LineValidationError as e:
+        raise HTTPException(status_code=400, detail={"message": "Líneas inválidas; no se creó nada", "errors": e.errors})
+
+
+def _upload_lines(file: UploadFile) -> list[dict]:
+    """Lee un CSV/XLSX subido (en streaming vía copia en disco) como líneas normalizadas."""
+    with upload_on_disk(file) as upload:
+        try:
+            return [normalize_upload_row(r) for r in iter_table_rows(str(upload.path), file.filename)]
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
 
 
 @router.post("/rfq")
 def create_rfq(body: RFQCreate, db: Session = Depends(get_db), user=Depends(get_current_user)):
-    rfq = RFQ(project_id=body.project_id)
-    db.add(rfq); db.flush()
-    for it in body.items:
-        rfq_item = RFQItem(rfq_id=rfq.id, item_id=it["item_id"], qty=it.get("qty", 0))
-        db.add(rfq_item)
-    db.commit(); db.refresh(rfq)
-    return {"rfq_id": rfq.id}
+    return _lines_or_400(svc_lines.create_rfq, db, body.project_id, body.items)
+
+
+@router.post("/rfq/upload")
+def upload_rfq(project_id: int = Form(...), file: UploadFile = File(...),
+               db: Session = Depends(get_db), user=Depends(get_current_user)):
+    """RFQ desde planilla: columnas ``item_id`` o ``codigo``/``item_code`` y ``cantidad``/``qty``."""
+    return _lines_or_400(svc_lines.create_rfq, db, project_id, _upload_lines(file))
 
 
 class QuoteIn(BaseModel):
     rfq_id: int
     supplier_id: int
-    lines: list[dict]  # {rfq_item_id, unit_price}
+    lines: list[dict]  # {rfq_item_id | item_id, unit_price}
 
 
 @router.post("/quote")
 def create_quote(body: QuoteIn, db: Session = Depends(get_db), user=Depends(get_current_user)):
-    q = Quote(rfq_id=body.rfq_id, supplier_id=body.supplier_id)
-    db.add(q); db.flush()
-    for l in body.lines:
-        db.add(QuoteLine(quote_id=q.id, rfq_item_id=l["rfq_item_id"], unit_price=l.get("unit_price", 0)))
-    db.commit(); db.refresh(q)
-    return {"quote_id": q.id}
+    result = _lines_or_400(svc_lines.create_quote, db, body.rfq_id, body.supplier_id, body.lines)
+    invalidate_rfq(body.rfq_id)
+    return result
+
+
+@router.post("/quote/upload")
+def upload_quote(rfq_id: int = Form(...), supplier_id: int = Form(...), file: UploadFile = File(...),
+                 db: Session = Depends(get_db), user=Depends(get_current_user)):
+    """Cotización desde planilla: ``rfq_item_id`` o ``item_id`` y ``precio_unitario``/``unit_price``."""
+    result = _lines_or_400(svc_lines.create_quote, db, rfq_id, supplier_id, _upload_lines(file))
+    invalidate_rfq(rfq_id)
+    return result
 
 
 @router.get("/rank/{rfq_id}")
 def rank(rfq_id: int, db: Session = Depends(get_db), user=Depends(get_current_user)):
-    # Ranking simple: suma total líneas por cotización
-    quotes = db.query(Quote).filter(Quote.rfq_id == rfq_id).all()
-    result = []
-    def _f(v):
-        try:
-            return float(v) if v is not None else 0.0
-        except Exception:
-            return 0.0
-    for q in quotes:
-        lines = db.query(QuoteLine).filter(QuoteLine.quote_id == q.id).all()
-        total = sum(_f(l.unit_price) for l in lines)
-        result.append({"quote_id": q.id, "supplier_id": q.supplier_id, "total": total})
-    result.sort(key=lambda x: x["total"])  # menor total primero
-    return result
+    # Ranking: total = SUM(unit_price * qty solicitada); completas primero, menor total primero
+    return compare_quotes(db, rfq_id)["ranking"]
+
+
+@router.get("/rank/{rfq_id}/compare")
+def compare(rfq_id: int, db: Session = Depends(get_db), user=Depends(get_current_user)):
+    """Ranking, matriz proveedor × ítem y adjudicación más barata repartida entre proveedores."""
+    return compare_quotes(db, rfq_id)
 
 
 class POCreate(BaseModel):
     project_id: int
     supplier_id: int
-    lines: list[dict]  # {item_id, qty, unit_price}
+    lines: list[dict]  # {item_id | item_code, qty, unit_price}
     rfq_id: int | None = None
 
 
 @router.post("/po")
 def create_po(body: POCreate, db: Session = Depends(get_db), user=Depends(get_current_user)):
-    po = PurchaseOrder(project_id=body.project_id, supplier_id=body.supplier_id, rfq_id=body.rfq_id)
-    db.add(po); db.flush()
-    for l in body.lines:
-        pol = PurchaseOrderLine(po_id=po.id, item_id=l["item_id"], qty=l.get("qty", 0), unit_price=l.get("unit_price", 0))
-        db.add(pol)
-    db.commit(); db.refresh(po)
-    return {"po_id": po.id}
+    return _lines_or_400(svc_lines.create_po, db, body.project_id, body.supplier_id, body.lines, rfq_id=body.rfq_id)
+
+
+@router.post("/po/upload")
+def upload_po(project_id: int = Form(...), supplier_id: int = Form(...), rfq_id: int | None = Form(None),
+              file: UploadFile = File(...), db: Session = Depends(get_db), user=Depends(get_current_user)):
+    """OC desde planilla: ``item_id`` o ``codigo``, ``cantidad`` y ``precio_unitario``."""
+    return _lines_or_400(svc_lines.create_po, db, project_id, supplier_id, _upload_lines(file), rfq_id=rfq_id)
 
 
 @router.get("/po/{po_id}")
@@ -131,9 +156,14 @@ def update_po_status(po_id: int, body: POStatusUpdate, db: Session = Depends(get
     allowed = {"approved", "received", "closed"}
     if body.status not in allowed:
         raise HTTPException(status_code=400, detail="Estado inválido")
+    old_status = po.status
     po.status = body.status  # type: ignore[assignment]
+    db.flush()
+    affected = record_po_status_change(db, po, old_status)
+    record_po_cost(db, po, old_status)
     db.commit(); db.refresh(po)
-    return {"id": po.id, "status": po.status}
+    return {"id": po.id, "status": po.status,
+            "over_committed_items": [r["item_id"] for r in over_committed_items(db, po.project_id, affected)]}
 
 
 @router.get("/po/project/{project_id}")
@@ -143,3 +173,16 @@ def list_pos(project_id: int, db: Session = Depends(get_db), user=Depends(get_cu
         {"id": p.id, "supplier_id": p.supplier_id, "status": p.status, "rfq_id": p.rfq_id} for p in pos
     ]
 
+
+
+@router.get("/commitments/project/{project_id}")
+def commitments_variance(project_id: int, only_over: bool = False, db: Session = Depends(get_db), user=Depends(get_current_user)):
+    """Presupuesto vs comprometido (OC) por ítem/capítulo/proyecto, desde el rollup precalculado."""
+    check_role(db, int(user.id), int(project_id), ["admin", "editor", "viewer"])
+    return commitment_variance(db, project_id, only_over=only_over)
+
+
+@router.post("/commitments/project/{project_id}/rebuild")
+def commitments_rebuild(project_id: int, db: Session = Depends(get_db), user=Depends(get_current_user)):
+    check_role(db, int(user.id), int(project_id), ["admin"])
+    return {"project_id": project_id, "rows": rebuild_commitments(db, project_id)}
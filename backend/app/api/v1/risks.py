@@ -1,4 +1,5 @@
-from fastapi import APIRouter, Depends, HTTPException
+from datetime import date
+from fastapi import APIRouter, Depends, HTTPException, Query, Response
 from pydantic import BaseModel
 from sqlalchemy.orm import Session
 from sqlalchemy import func
@@ -7,6 +8,12 @@ from app.api.v1.auth import get_current_user
 from app.db.models.risk import Risk
 from app.services.rbac import check_role
 from app.services.audit import log_action
+from app.services.events import emit
+from app.services.portfolio import accessible_projects_select
+from app.services.risk_analytics import (
+    STATUSES, MAX_PAGE_SIZE, risk_filters, matrix_rows, build_matrices,
+    project_analytics, portfolio_heatmap, list_risks_page
+)
 
 router = APIRouter()
 
@@ -36,26 +43,53 @@ def create_risk(payload: RiskCreate, db: Session = Depends(get_db), user=Depends
              probability=payload.probability, impact=payload.impact, mitigation=payload.mitigation, owner=payload.owner)
     db.add(r); db.commit(); db.refresh(r)
     log_action(db, payload.project_id, "risk", r.id, "create", {"category": r.category}, user.id)
+    emit(db, "risk.created", payload.project_id, "risk", r.id, {"category": r.category}, user.id)
     return {"id": r.id}
 
+def _filters(status: list[str] | None, category: list[str] | None, created_from: date | None, created_to: date | None) -> list:
+    if status and any(st not in STATUSES for st in status):
+        raise HTTPException(400, f"status inválido; usar {', '.join(STATUSES)}")
+    return risk_filters(status, category, created_from, created_to)
+
 @router.get("/project/{project_id}")
-def list_risks(project_id: int, db: Session = Depends(get_db), user=Depends(get_current_user)):
+def list_risks(project_id: int, response: Response,
+               status: list[str] | None = Query(None), category: list[str] | None = Query(None),
+               created_from: date | None = None, created_to: date | None = None,
+               limit: int | None = Query(None, ge=1, le=MAX_PAGE_SIZE), cursor: str | None = None,
+               db: Session = Depends(get_db), user=Depends(get_current_user)):
+    """Riesgos filtrados; con ``limit``/``cursor`` se paginan y la siguiente página viene en ``X-Next-Cursor``."""
     check_role(db, user.id, project_id, ["admin", "editor", "viewer"])
-    rows = db.query(Risk).filter(Risk.project_id==project_id).order_by(Risk.id).all()
+    try:
+        rows, next_cursor = list_risks_page(db, project_id, _filters(status, category, created_from, created_to), limit, cursor)
+    except ValueError as e:
+        raise HTTPException(400, str(e))
+    if next_cursor:
+        response.headers["X-Next-Cursor"] = next_cursor
     return [
-        {"id": r.id, "category": r.category, "probability": r.probability, "impact": r.impact, "status": r.status}
+        {"id": r.id, "category": r.category, "probability": r.probability, "impact": r.impact, "status": r.status, "owner": r.owner}
         for r in rows
     ]
 
 @router.get("/project/{project_id}/matrix")
 def risk_matrix(project_id: int, db: Session = Depends(get_db), user=Depends(get_current_user)):
     check_role(db, user.id, project_id, ["admin", "editor", "viewer"])
-    rows = db.query(Risk).filter(Risk.project_id==project_id).all()
-    matrix = [[0]*5 for _ in range(5)]
-    for r in rows:
-        if 1 <= (r.probability or 0) <=5 and 1 <= (r.impact or 0) <=5:
-            matrix[int(r.probability)-1][int(r.impact)-1] += 1
-    return {"project_id": project_id, "matrix": matrix}
+    matrices = build_matrices(matrix_rows(db, [project_id], []))
+    return {"project_id": project_id, "matrix": matrices[project_id]["matrix"] if project_id in matrices else [[0]*5 for _ in range(5)]}
+
+@router.get("/project/{project_id}/analytics")
+def risk_analytics(project_id: int, status: list[str] | None = Query(None), category: list[str] | None = Query(None),
+                   created_from: date | None = None, created_to: date | None = None,
+                   db: Session = Depends(get_db), user=Depends(get_current_user)):
+    """Matriz P×I (total y por estado) y exposición P×I por categoría y responsable, con filtros."""
+    check_role(db, user.id, project_id, ["admin", "editor", "viewer"])
+    return project_analytics(db, project_id, _filters(status, category, created_from, created_to))
+
+@router.get("/portfolio/heatmap")
+def risk_heatmap(status: list[str] | None = Query(None), category: list[str] | None = Query(None),
+                 created_from: date | None = None, created_to: date | None = None,
+                 db: Session = Depends(get_db), user=Depends(get_current_user)):
+    """Heatmap de riesgos de todos los proyectos accesibles por el usuario."""
+    return portfolio_heatmap(db, accessible_projects_select(int(user.id)), _filters(status, category, created_from, created_to))
 
 @router.patch("/{risk_id}")
 def update_risk(risk_id: int, payload: RiskUpdate, db: Session = Depends(get_db), user=Depends(get_current_user)):
@@ -73,4 +107,5 @@ def update_risk(risk_id: int, payload: RiskUpdate, db: Session = Depends(get_db)
         return {"id": r.id}
     db.commit(); db.refresh(r)
     log_action(db, r.project_id, "risk", r.id, "update", changed, user.id)
+    emit(db, "risk.updated", r.project_id, "risk", r.id, changed, user.id)
     return {"id": r.id, "changed": changed}
\ No newline at end of file
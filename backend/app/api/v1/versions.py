@@ -1,4 +1,5 @@
 from fastapi import APIRouter, Depends, HTTPException
+from pydantic import BaseModel
 from sqlalchemy.orm import Session
 from app.db.session import get_db
 from app.api.v1.auth import get_current_user
@@ -6,10 +7,16 @@ from app.db.models.versioning import BudgetVersion, BudgetVersionItem
 from app.db.models.budget import Item, Chapter
 from app.db.models.project import Project
 from app.services.audit import log_action
+from app.services.events import emit
 from app.services.rbac import require_role, check_role
+from app.services.schedule import replace_schedule, list_schedule, pv_curve, BUCKETS
 
 router = APIRouter()
 
+
+class ScheduleIn(BaseModel):
+    entries: list[dict]  # {level: item|chapter, code, start_date, end_date, profile: linear|s_curve|front_loaded}
+
 def snapshot_logic(db: Session, project_id: int, name: str, note: str | None, user_id: int | None = None):
     v = BudgetVersion(project_id=project_id, name=name, note=note, created_by=user_id)
     db.add(v); db.flush()
@@ -151,6 +158,7 @@ def restore_version(version_id: int, project_id: int, make_snapshot: bool = True
         db.add(Item(chapter_id=ch.id, code=li.item_code, name=li.item_name, unit=li.unit, quantity=li.qty, price=li.unit_price))
     db.commit()
     log_action(db, project_id, "version", version_id, "restore", {"project_id": project_id}, user.id)
+    emit(db, "version.restored", project_id, "version", version_id, user_id=user.id)
     return {"restored_version": version_id}
 
 @router.post("/{project_id}/baseline")
@@ -165,5 +173,40 @@ def set_baseline(project_id: int, version_id: int, db: Session = Depends(get_db)
     project.baseline_version_id = version_id  # type: ignore[assignment]
     db.commit()
     log_action(db, project_id, "project", project_id, "set_baseline", {"baseline_version_id": version_id}, user.id)
+    emit(db, "version.baseline_set", project_id, "version", version_id, user_id=user.id)
     return {"project_id": project_id, "baseline_version_id": version_id}
 
+
+
+def _get_version(db: Session, version_id: int) -> BudgetVersion:
+    ver = db.get(BudgetVersion, version_id)
+    if ver is None:
+        raise HTTPException(404, "Version no encontrada")
+    return ver
+
+@router.put("/version/{version_id}/schedule")
+def put_schedule(version_id: int, body: ScheduleIn, db: Session = Depends(get_db), user=Depends(get_current_user)):
+    """Reemplaza el calendario (por ítem o capítulo) de la versión; errores por línea."""
+    ver = _get_version(db, version_id)
+    check_role(db, user.id, ver.project_id, ["admin", "editor"])
+    result = replace_schedule(db, version_id, body.entries)
+    if result["errors"]:
+        raise HTTPException(400, {"message": "Calendario inválido", "errors": result["errors"]})
+    log_action(db, ver.project_id, "version", version_id, "schedule", {"entries": result["entries"]}, user.id)
+    emit(db, "version.schedule_replaced", ver.project_id, "version", version_id, user_id=user.id)
+    return result
+
+@router.get("/version/{version_id}/schedule")
+def get_schedule(version_id: int, db: Session = Depends(get_db), user=Depends(get_current_user)):
+    ver = _get_version(db, version_id)
+    check_role(db, user.id, ver.project_id, ["admin", "editor", "viewer"])
+    return list_schedule(db, version_id)
+
+@router.get("/version/{version_id}/pv_curve")
+def get_pv_curve(version_id: int, bucket: str = "week", db: Session = Depends(get_db), user=Depends(get_current_user)):
+    """Curva PV(t) de la versión (diaria o semanal), cacheada hasta que cambie el calendario."""
+    if bucket not in BUCKETS:
+        raise HTTPException(400, f"bucket inválido: {bucket}")
+    ver = _get_version(db, version_id)
+    check_role(db, user.id, ver.project_id, ["admin", "editor", "viewer"])
+    return pv_curve(db, version_id, bucket)
@@ -1,13 +1,13 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Query, Response
 from sqlalchemy.orm import Session
 from sqlalchemy import func
-from datetime import datetime
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
 from app.db.session import get_db
 from app.api.v1.auth import get_current_user
 from app.db.models.versioning import Workflow, WorkflowStep, WorkflowInstance, WorkflowInstanceStep
 from app.services.rbac import check_role
 from app.services.audit import log_action
+from app.services.workflows import MAX_PAGE_SIZE, MAX_BULK, WorkflowConflict, inbox_page, decide_many, start_instance as svc_start_instance
 
 router = APIRouter()
 
@@ -29,6 +29,19 @@ def create_workflow(body: WorkflowCreate, db: Session = Depends(get_db), user=De
     db.commit(); log_action(db, body.project_id, "workflow", wf.id, "create", {"steps": len(body.steps)}, user.id)
     return {"workflow_id": wf.id}
 
+@router.get("/inbox")
+def inbox(response: Response, project_id: int | None = None, entity_type: str | None = None,
+          limit: int = Query(50, ge=1, le=MAX_PAGE_SIZE), cursor: str | None = None,
+          db: Session = Depends(get_db), user=Depends(get_current_user)):
+    """Aprobaciones pendientes del usuario en todos sus proyectos; siguiente página en ``X-Next-Cursor``."""
+    try:
+        rows, next_cursor = inbox_page(db, user.id, limit, cursor, project_id=project_id, entity_type=entity_type)
+    except ValueError as e:
+        raise HTTPException(400, str(e))
+    if next_cursor:
+        response.headers["X-Next-Cursor"] = next_cursor
+    return rows
+
 @router.get("/{project_id}")
 def list_workflows(project_id: int, db: Session = Depends(get_db), user=Depends(get_current_user)):
     wfs = db.query(Workflow).filter(Workflow.project_id==project_id, Workflow.active==True).all()
@@ -45,12 +58,7 @@ def start_instance(body: StartInstance, db: Session = Depends(get_db), user=Depe
     if not wf or wf.entity_type != body.entity_type:
         raise HTTPException(400, "Workflow inválido")
     check_role(db, user.id, wf.project_id, ["admin", "editor"])  # iniciar
-    inst = WorkflowInstance(workflow_id=wf.id, project_id=wf.project_id, entity_type=body.entity_type, entity_id=body.entity_id, created_by=user.id)
-    db.add(inst); db.flush()
-    steps = db.query(WorkflowStep).filter(WorkflowStep.workflow_id==wf.id).order_by(WorkflowStep.position).all()
-    for s in steps:
-        db.add(WorkflowInstanceStep(instance_id=inst.id, step_id=s.id, position=s.position))
-    db.commit(); log_action(db, wf.project_id, "workflow_instance", inst.id, "start", {"entity_id": body.entity_id}, user.id)
+    inst = svc_start_instance(db, user.id, wf, body.entity_type, body.entity_id)
     return {"instance_id": inst.id}
 
 @router.get("/instance/{instance_id}")
@@ -75,32 +83,33 @@ class DecideBody(BaseModel):
     decision: str  # approve/reject
     comment: str | None = None
 
+def _decide_or_raise(db: Session, user_id: int, instance_ids: list[int], decision: str, comment: str | None) -> dict:
+    try:
+        result = decide_many(db, user_id, instance_ids, decision, comment)
+    except WorkflowConflict as e:
+        raise HTTPException(409, str(e))
+    return result
+
 @router.post("/instance/{instance_id}/decide")
 def decide(instance_id: int, body: DecideBody, db: Session = Depends(get_db), user=Depends(get_current_user)):
-    inst = db.get(WorkflowInstance, instance_id)
-    if not inst or inst.status != "running":
-        raise HTTPException(400, "Instancia no válida para decisión")
-    # obtener step actual
-    step = db.query(WorkflowInstanceStep).filter(WorkflowInstanceStep.instance_id==inst.id, WorkflowInstanceStep.position==inst.current_step).first()
-    if not step:
-        raise HTTPException(400, "Step actual no encontrado")
-    # verificar rol usuario
-    wf_step = db.get(WorkflowStep, step.step_id)
-    check_role(db, user.id, inst.project_id, [wf_step.role_required])
-    if body.decision not in ("approve", "reject"):
-        raise HTTPException(400, "Decisión inválida")
-    step.decision = body.decision
-    step.decided_by = user.id
-    step.decided_at = datetime.utcnow()
-    step.comment = body.comment
-    if body.decision == "reject":
-        inst.status = "rejected"  # type: ignore[assignment]
-    else:
-        # verificar si hay más steps
-        next_step = db.query(WorkflowInstanceStep).filter(WorkflowInstanceStep.instance_id==inst.id, WorkflowInstanceStep.position==inst.current_step+1).first()
-        if next_step:
-            inst.current_step += 1  # type: ignore[assignment]
-        else:
-            inst.status = "approved"  # type: ignore[assignment]
-    db.commit(); log_action(db, inst.project_id, "workflow_instance", inst.id, "decide", {"decision": step.decision, "step": step.position}, user.id)
-    return {"status": inst.status, "current_step": inst.current_step}
+    result = _decide_or_raise(db, user.id, [instance_id], body.decision, body.comment)
+    if result["errors"]:
+        err = result["errors"][0]
+        if err["code"] == "forbidden":
+            raise HTTPException(status_code=403, detail="No permission")
+        raise HTTPException(400, err["error"])
+    out = result["results"][0]
+    return {"status": out["status"], "current_step": out["current_step"]}
+
+class BulkDecideBody(BaseModel):
+    instance_ids: list[int] = Field(min_length=1, max_length=MAX_BULK)
+    decision: str  # approve/reject
+    comment: str | None = None
+
+@router.post("/instances/decide")
+def decide_bulk(body: BulkDecideBody, db: Session = Depends(get_db), user=Depends(get_current_user)):
+    """Decide varias instancias en una transacción; si alguna no es válida no se aplica ninguna."""
+    result = _decide_or_raise(db, user.id, body.instance_ids, body.decision, body.comment)
+    if result["errors"]:
+        raise HTTPException(status_code=400, detail={"message": "Decisiones inválidas; no se aplicó ninguna", "errors": result["errors"]})
+    return {"decided": len(result["results"]), "results": result["results"]}
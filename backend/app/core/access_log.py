@@ -0,0 +1,68 @@
+"""Log de accesos JSON sin bloquear el event loop.
+
+El middleware solo encola el registro (``QueueHandler``); un hilo (``QueueListener``)
+serializa y escribe a stdout. La cola es acotada: si el destino se atrasa se descartan
+líneas (``app_access_log_dropped_total``) en vez de frenar los requests.
+"""
+from __future__ import annotations
+import atexit
+import json
+import logging
+import queue
+import sys
+import threading
+from logging.handlers import QueueHandler, QueueListener
+from app.core.metrics import ACCESS_LOG_DROPPED
+
+QUEUE_SIZE = 10_000
+
+logger = logging.getLogger("app.access")
+_listener: QueueListener | None = None
+_lock = threading.Lock()
+
+
+class _JSONFormatter(logging.Formatter):
+    def format(self, record: logging.LogRecord) -> str:
+        return json.dumps(record.msg, default=str) if isinstance(record.msg, dict) else super().format(record)
+
+
+class _DroppingQueueHandler(QueueHandler):
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        return record  # el formateo (json.dumps) ocurre en el hilo del listener
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            ACCESS_LOG_DROPPED.inc()
+
+
+def _setup() -> None:
+    global _listener
+    with _lock:
+        if _listener is not None:
+            return
+        q: queue.Queue = queue.Queue(maxsize=QUEUE_SIZE)
+        out = logging.StreamHandler(sys.stdout)
+        out.setFormatter(_JSONFormatter())
+        _listener = QueueListener(q, out, respect_handler_level=False)
+        _listener.start()
+        atexit.register(_listener.stop)
+        logger.addHandler(_DroppingQueueHandler(q))
+        logger.setLevel(logging.INFO)
+        logger.propagate = False
+
+
+def access_log(entry: dict) -> None:
+    if _listener is None:
+        _setup()
+    logger.info(entry)
+
+
+def flush() -> None:
+    """Espera a que el listener escriba lo encolado (tests y apagado)."""
+    with _lock:
+        if _listener is None:
+            return
+        _listener.stop()
+        _listener.start()
@@ -0,0 +1,81 @@
+"""Caché JSON compartida entre procesos (Redis) o en proceso (``realtime_backend=memory``).
+
+Se usa para valores que invalidan los consumidores de eventos, que pueden correr en
+otro proceso que la API; por eso no alcanza con un dict del módulo en producción.
+"""
+from __future__ import annotations
+import json
+import threading
+import time
+from typing import Any
+from app.core.settings import get_settings
+
+
+class MemoryCache:
+    def __init__(self):
+        self._data: dict[str, tuple[float | None, str]] = {}
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Any | None:
+        with self._lock:
+            hit = self._data.get(key)
+            if hit is None:
+                return None
+            expires, raw = hit
+            if expires is not None and expires < time.monotonic():
+                self._data.pop(key, None)
+                return None
+        return json.loads(raw)
+
+    def set(self, key: str, value: Any, ttl: int | None = None) -> None:
+        raw = json.dumps(value, default=str)
+        with self._lock:
+            self._data[key] = (time.monotonic() + ttl if ttl else None, raw)
+
+    def delete(self, *keys: str) -> None:
+        with self._lock:
+            for k in keys:
+                self._data.pop(k, None)
+
+
+class RedisCache:
+    def __init__(self, client):
+        self._r = client
+
+    def get(self, key: str) -> Any | None:
+        raw = self._r.get(key)
+        return json.loads(raw) if raw is not None else None
+
+    def set(self, key: str, value: Any, ttl: int | None = None) -> None:
+        self._r.set(key, json.dumps(value, default=str), ex=ttl)
+
+    def delete(self, *keys: str) -> None:
+        if keys:
+            self._r.delete(*keys)
+
+
+_memory = MemoryCache()
+
+
+def get_cache() -> MemoryCache | RedisCache:
+    if get_settings().realtime_backend == "memory":
+        return _memory
+    from app.core.redis import get_redis
+    return RedisCache(get_redis())
+
+
+def cached_json(key: str, ttl: int, compute):
+    """Valor cacheado o ``compute()``; si la caché no responde se calcula sin cachear."""
+    try:
+        cache = get_cache()
+        hit = cache.get(key)
+    except Exception:
+        return compute()
+    if hit is not None:
+        return hit
+    value = compute()
+    try:
+        cache.set(key, value, ttl)
+    except Exception:
+        pass
+    return value
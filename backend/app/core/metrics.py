@@ -0,0 +1,51 @@
+"""Métricas Prometheus de la API (las expone ``GET /metrics``).
+
+``path`` es siempre la plantilla de la ruta (``/api/v1/evm/projects/{project_id}``), nunca
+la URL: una serie por endpoint y no por id. Lo que no calza con ninguna ruta se agrupa en
+``UNMATCHED``.
+"""
+from prometheus_client import Counter, Gauge, Histogram
+
+UNMATCHED = "<unmatched>"
+
+REQUEST_COUNT = Counter(
+    'app_requests_total',
+    'Total requests',
+    ['method', 'path', 'status']
+)
+REQUEST_LATENCY = Histogram(
+    'app_request_duration_seconds',
+    'Request latency seconds',
+    ['method', 'path']
+)
+REQUESTS_IN_PROGRESS = Gauge(
+    'app_requests_in_progress',
+    'Requests being served',
+    ['method']
+)
+RESPONSE_SIZE = Histogram(
+    'app_response_size_bytes',
+    'Response body size in bytes',
+    ['method', 'path'],
+    buckets=(100, 1_000, 10_000, 100_000, 1_000_000, 10_000_000, 100_000_000)
+)
+REQUEST_DB_QUERIES = Histogram(
+    'app_request_db_queries',
+    'SQL statements per request',
+    ['method', 'path'],
+    buckets=(0, 1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 5000)
+)
+REQUEST_DB_DURATION = Histogram(
+    'app_request_db_duration_seconds',
+    'Time spent in SQL per request',
+    ['method', 'path']
+)
+REQUEST_N_PLUS_ONE = Counter(
+    'app_request_db_repeated_total',
+    'Requests with a statement shape repeated query_repeat_threshold+ times (possible N+1)',
+    ['method', 'path']
+)
+ACCESS_LOG_DROPPED = Counter(
+    'app_access_log_dropped_total',
+    'Access log lines dropped because the log queue was full'
+)
@@ -0,0 +1,301 @@
+"""Perfilado por muestreo de requests (opt-in) y flamegraphs en disco.
+
+Se activa con ``profiling_enabled`` y perfila un request cuando:
+
+- trae ``X-Profile: <expira>.<firma>`` válido (HMAC-SHA256 con ``profiling_secret``;
+  lo genera ``POST /api/v1/admin/profiles/token`` o ``sign_token``), o
+- cae en la muestra aleatoria ``profiling_sample_rate`` (0.01 = 1% de los requests).
+
+Un hilo muestreador lee ``sys._current_frames()`` cada ``profiling_interval_ms`` solo
+para los hilos que ejecutan el endpoint del request (el del threadpool en endpoints sync,
+el del event loop en los async): ``instrument_routes`` envuelve cada endpoint para
+registrarlos. Las pilas se acumulan en formato "folded" (``a;b;c N``, el de
+flamegraph.pl/speedscope) y se guardan como ``{id}.json`` + ``{id}.svg`` en
+``profiling_dir``, conservando los ``profiling_keep`` más recientes.
+
+No depende de pyinstrument/yappi: esos perfiladores solo ven el hilo que los inicia y
+la mayoría de los endpoints son sync (threadpool).
+"""
+from __future__ import annotations
+import asyncio
+import functools
+import hashlib
+import hmac
+import html
+import json
+import os
+import random
+import sys
+import threading
+import time
+import uuid
+import zlib
+from collections import Counter
+from contextlib import contextmanager
+from contextvars import ContextVar
+from datetime import datetime, timezone
+from pathlib import Path
+from starlette.types import ASGIApp, Receive, Scope, Send
+from app.core.settings import get_settings
+
+PROFILE_HEADER = "X-Profile"
+MAX_DEPTH = 128
+
+_HEADER = PROFILE_HEADER.lower().encode("latin-1")
+_active: ContextVar["Sampler | None"] = ContextVar("profiler", default=None)
+_ROOT = str(Path(__file__).resolve().parents[2]) + os.sep
+
+
+# ---------- token firmado ----------
+
+def sign_token(expires_at: int, secret: str | None = None) -> str:
+    secret = secret or get_settings().profiling_secret
+    sig = hmac.new(secret.encode(), str(expires_at).encode(), hashlib.sha256).hexdigest()
+    return f"{expires_at}.{sig}"
+
+
+def verify_token(value: str, secret: str | None = None, now: float | None = None) -> bool:
+    secret = secret or get_settings().profiling_secret
+    expires, _, sig = value.partition(".")
+    if not secret or not expires.isdigit() or int(expires) < (now or time.time()):
+        return False
+    return hmac.compare_digest(sign_token(int(expires), secret), value)
+
+
+# ---------- muestreo ----------
+
+def _frame_name(code) -> str:
+    path = code.co_filename
+    if path.startswith(_ROOT):
+        path = path[len(_ROOT):]
+    elif "site-packages" + os.sep in path:
+        path = path.split("site-packages" + os.sep, 1)[1]
+    return f"{getattr(code, 'co_qualname', code.co_name)} ({path}:{code.co_firstlineno})"
+
+
+def _folded(frame) -> str:
+    names = []
+    while frame is not None and len(names) < MAX_DEPTH:
+        names.append(_frame_name(frame.f_code))
+        frame = frame.f_back
+    return ";".join(reversed(names))
+
+
+class Sampler(threading.Thread):
+    """Acumula pilas de los hilos registrados hasta ``stop()``."""
+
+    def __init__(self, interval_ms: float | None = None):
+        super().__init__(name="profiler", daemon=True)
+        self.interval = (interval_ms or get_settings().profiling_interval_ms) / 1000
+        self.threads: set[int] = set()
+        self.stacks: Counter[str] = Counter()
+        self.samples = 0
+        self._stop_event = threading.Event()
+        self._threads_lock = threading.Lock()
+
+    def add_thread(self, ident: int) -> None:
+        with self._threads_lock:
+            self.threads.add(ident)
+
+    def remove_thread(self, ident: int) -> None:
+        with self._threads_lock:
+            self.threads.discard(ident)
+
+    def run(self) -> None:
+        while not self._stop_event.wait(self.interval):
+            with self._threads_lock:
+                threads = list(self.threads)
+            if not threads:
+                continue
+            frames = sys._current_frames()
+            for ident in threads:
+                frame = frames.get(ident)
+                if frame is not None:
+                    self.stacks[_folded(frame)] += 1
+                    self.samples += 1
+
+    def stop(self) -> None:
+        self._stop_event.set()
+        if self.is_alive():
+            self.join()
+
+    def __enter__(self) -> "Sampler":
+        self.start()
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.stop()
+
+
+@contextmanager
+def attach():
+    """Registra el hilo actual en el perfilado del request en curso, si lo hay."""
+    sampler = _active.get()
+    if sampler is None:
+        yield
+        return
+    ident = threading.get_ident()
+    sampler.add_thread(ident)
+    try:
+        yield
+    finally:
+        sampler.remove_thread(ident)
+
+
+def _wrap(call):
+    if asyncio.iscoroutinefunction(call):
+        @functools.wraps(call)
+        async def async_endpoint(*args, **kwargs):
+            with attach():
+                return await call(*args, **kwargs)
+        return async_endpoint
+
+    @functools.wraps(call)
+    def endpoint(*args, **kwargs):
+        with attach():
+            return call(*args, **kwargs)
+    return endpoint
+
+
+def instrument_routes(app) -> None:
+    """Envuelve los endpoints HTTP ya registrados (llamar después de ``include_router``)."""
+    from fastapi.routing import APIRoute
+    for route in app.router.routes:
+        if isinstance(route, APIRoute) and not getattr(route.dependant.call, "_profiled", False):
+            route.dependant.call = _wrap(route.dependant.call)
+            route.dependant.call._profiled = True
+
+
+# ---------- artefactos ----------
+
+def profiles_dir() -> Path:
+    path = Path(get_settings().profiling_dir)
+    path.mkdir(parents=True, exist_ok=True)
+    return path
+
+
+def new_profile_id() -> str:
+    return f"{datetime.now(timezone.utc):%Y%m%dT%H%M%S}-{uuid.uuid4().hex[:8]}"
+
+
+def render_svg(stacks: dict[str, int], title: str, width: int = 1200, row: int = 16) -> str:
+    """Flamegraph SVG autocontenido (raíz arriba, ancho proporcional a las muestras)."""
+    tree: dict = {"n": 0, "c": {}}
+    for stack, count in stacks.items():
+        node = tree
+        node["n"] += count
+        for name in stack.split(";"):
+            node = node["c"].setdefault(name, {"n": 0, "c": {}})
+            node["n"] += count
+    total = tree["n"] or 1
+    rects: list[str] = []
+    depth_max = 0
+
+    def walk(node: dict, x: float, depth: int) -> None:
+        nonlocal depth_max
+        for name, child in sorted(node["c"].items()):
+            w = child["n"] / total * width
+            if w >= 0.5:
+                depth_max = max(depth_max, depth)
+                y = 20 + depth * row
+                label = html.escape(name)
+                hue = 15 + zlib.crc32(name.encode()) % 45
+                text = f'<text x="{x + 3:.1f}" y="{y + row - 4}">{html.escape(name[: int(w / 7)])}</text>' if w > 30 else ""
+                rects.append(
+                    f'<g><title>{label} — {child["n"]} muestras ({child["n"] / total * 100:.1f}%)</title>'
+                    f'<rect x="{x:.1f}" y="{y}" width="{w:.1f}" height="{row - 1}" fill="hsl({hue},85%,60%)"/>{text}</g>')
+                walk(child, x, depth + 1)
+            x += w
+
+    walk(tree, 0.0, 0)
+    height = 20 + (depth_max + 1) * row + 4
+    return (f'<svg xmlns="http://www.w3.org/2000/svg" width="{width}" height="{height}" font-family="monospace" font-size="11">'
+            f'<text x="4" y="14">{html.escape(title)} — {tree["n"]} muestras</text>{"".join(rects)}</svg>')
+
+
+def save_profile(sampler: Sampler, meta: dict, profile_id: str | None = None) -> dict:
+    """Escribe ``{id}.json`` y ``{id}.svg`` y poda los más antiguos; devuelve la metadata."""
+    settings = get_settings()
+    pid = profile_id or new_profile_id()
+    meta = {"id": pid, "created_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            "samples": sampler.samples, "interval_ms": sampler.interval * 1000, **meta}
+    out = profiles_dir()
+    stacks = dict(sampler.stacks.most_common())
+    (out / f"{pid}.json").write_text(json.dumps({**meta, "stacks": stacks}), encoding="utf-8")
+    title = f"{meta.get('method', '')} {meta.get('route') or meta.get('path') or meta.get('target') or pid}".strip()
+    (out / f"{pid}.svg").write_text(render_svg(stacks, title), encoding="utf-8")
+    for old in sorted(out.glob("*.json"), reverse=True)[settings.profiling_keep:]:
+        old.unlink(missing_ok=True)
+        old.with_suffix(".svg").unlink(missing_ok=True)
+    return meta
+
+
+def list_profiles(limit: int = 100) -> list[dict]:
+    items = []
+    for path in sorted(profiles_dir().glob("*.json"), reverse=True)[:limit]:
+        try:
+            data = json.loads(path.read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            continue
+        data.pop("stacks", None)
+        items.append(data)
+    return items
+
+
+def load_profile(profile_id: str) -> dict | None:
+    path = profiles_dir() / f"{Path(profile_id).name}.json"
+    if not path.exists():
+        return None
+    return json.loads(path.read_text(encoding="utf-8"))
+
+
+def svg_path(profile_id: str) -> Path | None:
+    path = profiles_dir() / f"{Path(profile_id).name}.svg"
+    return path if path.exists() else None
+
+
+# ---------- middleware ----------
+
+def should_profile(scope: Scope) -> bool:
+    settings = get_settings()
+    for key, value in scope.get("headers", ()):
+        if key == _HEADER:
+            return verify_token(value.decode("latin-1"))
+    return settings.profiling_sample_rate > 0 and random.random() < settings.profiling_sample_rate
+
+
+class ProfilingMiddleware:
+    """Perfila los requests elegidos por ``should_profile``; el resto pasa sin costo."""
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or not should_profile(scope):
+            await self.app(scope, receive, send)
+            return
+        status = 500
+
+        async def send_wrapper(message) -> None:
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                headers = [*message.get("headers", ()), (b"x-profile-id", profile_id.encode())]
+                message = {**message, "headers": headers}
+            await send(message)
+
+        profile_id = new_profile_id()
+        sampler = Sampler()
+        token = _active.set(sampler)
+        start = time.perf_counter()
+        sampler.start()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            sampler.stop()
+            _active.reset(token)
+            route = scope.get("route")
+            meta = {"method": scope["method"], "path": scope["path"],
+                    "route": getattr(route, "path_format", None) or getattr(route, "path", None),
+                    "status": status, "duration_ms": round((time.perf_counter() - start) * 1000, 2)}
+            await asyncio.to_thread(save_profile, sampler, meta, profile_id)
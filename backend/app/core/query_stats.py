@@ -0,0 +1,103 @@
+"""Conteo de consultas SQL por request y detección de N+1.
+
+``install(engine)`` engancha ``before_cursor_execute``/``after_cursor_execute``; mientras
+haya un ``QueryStats`` activo (``track_queries``, lo abre el middleware de métricas por
+request) cada sentencia suma a la cantidad, al tiempo de BD y a su "forma" (SQL con los
+literales y las listas de IN normalizadas). Una forma que se repite ``query_repeat_threshold``
+veces o más en un mismo request es candidata a N+1.
+
+El estado viaja en un ``ContextVar``: los endpoints sync corren en el threadpool con una
+copia del contexto, que apunta al mismo objeto. Fuera de un request no se registra nada.
+"""
+from __future__ import annotations
+import re
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Iterator
+from sqlalchemy import event
+from app.core.settings import get_settings
+
+DEBUG_HEADER = "X-Debug-Queries"
+TOP_STATEMENTS = 5
+SHAPE_MAX_LEN = 300
+
+_current: ContextVar["QueryStats | None"] = ContextVar("query_stats", default=None)
+
+_IN_LIST = re.compile(r"\(\s*(?:\?|%\([^)]*\)s|:[\w]+|\$\d+)(?:\s*,\s*(?:\?|%\([^)]*\)s|:[\w]+|\$\d+))*\s*\)")
+_STRING = re.compile(r"'(?:[^']|'')*'")
+_NUMBER = re.compile(r"\b\d+(?:\.\d+)?\b")
+_SPACES = re.compile(r"\s+")
+
+
+def statement_shape(statement: str) -> str:
+    """SQL sin literales ni largo de listas: dos consultas por distinto id tienen la misma forma."""
+    shape = _STRING.sub("?", statement)
+    shape = _NUMBER.sub("?", shape)
+    shape = _IN_LIST.sub("(?…)", shape)
+    return _SPACES.sub(" ", shape).strip()
+
+
+class QueryStats:
+    def __init__(self):
+        self.count = 0
+        self.db_seconds = 0.0
+        self.shapes: dict[str, list] = {}  # forma -> [veces, segundos]
+
+    def record(self, statement: str, seconds: float) -> None:
+        self.count += 1
+        self.db_seconds += seconds
+        entry = self.shapes.setdefault(statement_shape(statement), [0, 0.0])
+        entry[0] += 1
+        entry[1] += seconds
+
+    def top(self, n: int = TOP_STATEMENTS) -> list[dict]:
+        ranked = sorted(self.shapes.items(), key=lambda kv: (kv[1][0], kv[1][1]), reverse=True)[:n]
+        return [{"count": c, "ms": round(s * 1000, 2), "sql": shape[:SHAPE_MAX_LEN]} for shape, (c, s) in ranked]
+
+    def repeated(self, threshold: int | None = None) -> list[dict]:
+        """Formas ejecutadas al menos ``threshold`` veces (posibles N+1)."""
+        threshold = threshold or get_settings().query_repeat_threshold
+        return [s for s in self.top(len(self.shapes)) if s["count"] >= threshold]
+
+    def summary(self) -> dict:
+        return {"db_queries": self.count, "db_ms": round(self.db_seconds * 1000, 2),
+                "db_repeated": [{"count": s["count"], "sql": s["sql"]} for s in self.repeated()]}
+
+
+def current_stats() -> QueryStats | None:
+    return _current.get()
+
+
+@contextmanager
+def track_queries() -> Iterator[QueryStats]:
+    stats = QueryStats()
+    token = _current.set(stats)
+    try:
+        yield stats
+    finally:
+        _current.reset(token)
+
+
+def _before(conn, cursor, statement, parameters, context, executemany):
+    if _current.get() is not None and context is not None:
+        context._query_started = time.perf_counter()
+
+
+def _after(conn, cursor, statement, parameters, context, executemany):
+    stats = _current.get()
+    started = getattr(context, "_query_started", None)
+    if stats is not None and started is not None:
+        stats.record(statement, time.perf_counter() - started)
+
+
+def install(engine) -> None:
+    """Registra los listeners en ``engine`` (idempotente)."""
+    if not event.contains(engine, "before_cursor_execute", _before):
+        event.listen(engine, "before_cursor_execute", _before)
+        event.listen(engine, "after_cursor_execute", _after)
+
+
+def debug_enabled() -> bool:
+    settings = get_settings()
+    return settings.query_debug_header or settings.environment == "development"
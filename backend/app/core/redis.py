@@ -0,0 +1,15 @@
+"""Clientes Redis compartidos (sync y asyncio) a partir de ``settings.redis_url``."""
+from functools import lru_cache
+from redis import Redis
+from redis.asyncio import Redis as AsyncRedis
+from app.core.settings import get_settings
+
+
+@lru_cache()
+def get_redis() -> Redis:
+    return Redis.from_url(get_settings().redis_url, decode_responses=True)
+
+
+@lru_cache()
+def get_async_redis() -> AsyncRedis:
+    return AsyncRedis.from_url(get_settings().redis_url, decode_responses=True)
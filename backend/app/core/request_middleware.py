@@ -0,0 +1,92 @@
+"""Middleware ASGI de métricas, consultas SQL y log de accesos.
+
+Reemplaza a ``LoggingMiddleware`` (``BaseHTTPMiddleware``) y al ``metrics_middleware``
+de ``app.main``: envuelve ``send`` sin crear tareas ni copiar la respuesta, etiqueta por
+la plantilla de la ruta que resolvió el router (``scope["route"]``), mide el tamaño del
+cuerpo enviado y deja el log en una cola (``app.core.access_log``).
+
+Cada request abre un ``QueryStats`` (``app.core.query_stats``); con ``X-Debug-Queries``
+las cifras van en los headers de la respuesta.
+"""
+from __future__ import annotations
+import json
+import time
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+from app.core.access_log import access_log
+from app.core.metrics import (
+    UNMATCHED, REQUEST_COUNT, REQUEST_LATENCY, REQUESTS_IN_PROGRESS, RESPONSE_SIZE,
+    REQUEST_DB_QUERIES, REQUEST_DB_DURATION, REQUEST_N_PLUS_ONE,
+)
+from app.core.query_stats import DEBUG_HEADER, debug_enabled, track_queries
+from app.core.tracing import current_trace_id
+
+_DEBUG_HEADER = DEBUG_HEADER.lower().encode("latin-1")
+
+
+def route_template(scope: Scope) -> str:
+    route = scope.get("route")
+    path = getattr(route, "path_format", None) or getattr(route, "path", None)
+    return path or UNMATCHED
+
+
+class RequestMetricsMiddleware:
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        method = scope["method"]
+        debug = any(k == _DEBUG_HEADER for k, _ in scope.get("headers", ())) and debug_enabled()
+        status = 500
+        size = 0
+        start = time.perf_counter()
+        in_progress = REQUESTS_IN_PROGRESS.labels(method)
+        in_progress.inc()
+        with track_queries() as stats:
+            async def send_wrapper(message: Message) -> None:
+                nonlocal status, size
+                if message["type"] == "http.response.start":
+                    status = message["status"]
+                    if debug:
+                        message = {**message, "headers": [*message.get("headers", ()), *_debug_headers(stats)]}
+                elif message["type"] == "http.response.body":
+                    size += len(message.get("body", b""))
+                await send(message)
+
+            try:
+                await self.app(scope, receive, send_wrapper)
+            finally:
+                elapsed = time.perf_counter() - start
+                in_progress.dec()
+                path = route_template(scope)
+                REQUEST_COUNT.labels(method, path, status).inc()
+                REQUEST_LATENCY.labels(method, path).observe(elapsed)
+                RESPONSE_SIZE.labels(method, path).observe(size)
+                REQUEST_DB_QUERIES.labels(method, path).observe(stats.count)
+                REQUEST_DB_DURATION.labels(method, path).observe(stats.db_seconds)
+                summary = stats.summary()
+                if summary["db_repeated"]:
+                    REQUEST_N_PLUS_ONE.labels(method, path).inc()
+                entry = {
+                    "method": method,
+                    "path": scope["path"],
+                    "route": path,
+                    "status": status,
+                    "duration_ms": round(elapsed * 1000, 2),
+                    "bytes": size,
+                    **summary,
+                }
+                trace_id = current_trace_id()
+                if trace_id:
+                    entry["trace_id"] = trace_id
+                access_log(entry)
+
+
+def _debug_headers(stats) -> list[tuple[bytes, bytes]]:
+    return [
+        (b"x-db-queries", str(stats.count).encode()),
+        (b"x-db-time-ms", f"{stats.db_seconds * 1000:.2f}".encode()),
+        (b"x-db-top-statements", json.dumps(stats.top()).encode("latin-1")),
+    ]
@@ -16,6 +16,52 @@ class Settings(BaseSettings):
     app_name: str = "OFITEC API"
     version: str = "0.1.0"
     skip_migrations: bool = Field(default=False)
+    # Plazo de pago (días) para considerar una factura vencida / aging
+    invoice_payment_terms_days: int = Field(default=30)
+    # Procesos para la simulación Monte Carlo (0/1 = en el mismo proceso)
+    forecast_workers: int = Field(default=4)
+    # Eventos / caché compartida: "redis" (multi-proceso) o "memory" (un proceso: dev y tests)
+    realtime_backend: str = Field(default="redis")
+    events_stream_maxlen: int = Field(default=10000)
+    # Monto máximo de OC que el workflow aprueba automáticamente (0 = desactivado)
+    workflow_auto_approve_po_max: float = Field(default=0)
+    # Forma de SQL repetida estas veces en un request -> posible N+1 (log y métricas)
+    query_repeat_threshold: int = Field(default=10)
+    # Header X-Debug-Queries fuera de development (expone las sentencias SQL)
+    query_debug_header: bool = Field(default=False)
+    # Usuarios administradores de la plataforma (coma), p.ej. para los perfiles de rendimiento
+    admin_usernames: str = Field(default="")
+    # Perfilado por muestreo (opt-in): header X-Profile firmado o porcentaje de requests
+    profiling_enabled: bool = Field(default=False)
+    profiling_secret: str = Field(default="")
+    profiling_sample_rate: float = Field(default=0.0)
+    profiling_interval_ms: float = Field(default=5.0)
+    profiling_dir: str = Field(default="./profiles")
+    profiling_keep: int = Field(default=200)
+    # OpenTelemetry (requiere los paquetes opentelemetry-*): otlp | console | file
+    otel_enabled: bool = Field(default=False)
+    otel_service_name: str = Field(default="ofitec-api")
+    otel_exporter: str = Field(default="otlp")
+    otel_endpoint: str = Field(default="")
+    otel_file_path: str = Field(default="./traces.jsonl")
+    # Artefactos de jobs (direccionados por contenido): expiración por antigüedad y tamaño total
+    artifacts_dir: str = Field(default="./artifacts")
+    artifacts_ttl_hours: float = Field(default=72)
+    artifacts_max_mb: int = Field(default=2048)
+    artifacts_evict_interval_s: int = Field(default=300)
+    # Compresión de artefactos CSV/JSON: none | gzip | zstd (zstd requiere zstandard)
+    artifacts_compression: str = Field(default="gzip")
+    # Intervalo mínimo entre escrituras de progreso de un job (y chequeos de cancelación)
+    job_progress_interval_s: float = Field(default=1.0)
+    # Precálculo de reportes (opt-in): cada noche a esta hora UTC y al cerrar un batch de mediciones
+    reports_precompute_enabled: bool = Field(default=False)
+    reports_precompute: str = Field(default="budget_xlsx,budget_pdf,measurements_xlsx,baseline_diff_xlsx,evm_curves")
+    reports_precompute_hour: int = Field(default=2)
+    reports_on_batch_close: bool = Field(default=True)
+    # Subidas de importación: copia en disco (compartida con el worker) y tamaño máximo en línea;
+    # por encima se importa en la cola de jobs
+    uploads_dir: str = Field(default="./uploads")
+    import_inline_max_mb: int = Field(default=20)
 
     model_config = SettingsConfigDict(
         env_file=".env",
@@ -0,0 +1,223 @@
+"""Trazas OpenTelemetry: request HTTP -> encolado RQ -> ejecución del job -> SQL.
+
+Se activa con ``otel_enabled``; si los paquetes ``opentelemetry-*`` no están instalados
+todo queda en no-op (se avisa una vez en el log). Exportadores (``otel_exporter``):
+
+- ``otlp``: OTLP/HTTP a ``otel_endpoint`` (o ``OTEL_EXPORTER_OTLP_ENDPOINT``);
+- ``console``: spans a stdout (desarrollo);
+- ``file``: un span JSON por línea en ``otel_file_path``.
+
+Spans que se generan:
+
+- ``TracingMiddleware``: un span SERVER por request, hijo del ``traceparent`` entrante y
+  renombrado con la plantilla de la ruta;
+- ``enqueue_job``: span PRODUCER ``rq.enqueue {tipo}``; su contexto viaja en el kwarg
+  ``trace_context`` del job junto con ``enqueued_at``;
+- ``call_wrapped`` (worker): span ``rq.queue_wait {tipo}`` desde ``enqueued_at`` hasta que
+  el worker lo toma y span CONSUMER ``rq.job {tipo}`` con la ejecución;
+- ``instrument_engine``: un span CLIENT por sentencia SQL, hijo del span activo.
+"""
+from __future__ import annotations
+import logging
+import threading
+from contextlib import contextmanager
+from typing import Iterator
+from starlette.types import ASGIApp, Receive, Scope, Send
+from app.core.settings import get_settings
+
+try:
+    from opentelemetry import context as otel_context, propagate, trace
+    from opentelemetry.trace import SpanKind, Status, StatusCode
+except ImportError:  # pragma: no cover - depende del entorno
+    trace = None
+
+logger = logging.getLogger(__name__)
+
+TRACER_NAME = "ofitec"
+_configured: bool | None = None
+_lock = threading.Lock()
+
+
+def _build_exporter(kind: str):
+    settings = get_settings()
+    if kind == "otlp":
+        from opentelemetry.exporter.otlp.proto.http.trace_exporter import OTLPSpanExporter
+        endpoint = settings.otel_endpoint.rstrip("/")
+        return OTLPSpanExporter(endpoint=f"{endpoint}/v1/traces") if endpoint else OTLPSpanExporter()
+    from opentelemetry.sdk.trace.export import ConsoleSpanExporter
+    if kind == "console":
+        return ConsoleSpanExporter()
+    if kind == "file":
+        out = open(settings.otel_file_path, "a", encoding="utf-8")
+        return ConsoleSpanExporter(out=out, formatter=lambda span: span.to_json(indent=None) + "\n")
+    raise ValueError(f"otel_exporter desconocido: {kind}")
+
+
+def setup_tracing(service_name: str | None = None) -> bool:
+    """Configura el TracerProvider global una vez por proceso; True si las trazas quedan activas."""
+    global _configured
+    if _configured is not None:
+        return _configured
+    with _lock:
+        if _configured is not None:
+            return _configured
+        settings = get_settings()
+        if not settings.otel_enabled:
+            _configured = False
+        elif trace is None:
+            logger.warning("otel_enabled pero opentelemetry no está instalado; trazas deshabilitadas")
+            _configured = False
+        else:
+            try:
+                from opentelemetry.sdk.resources import Resource
+                from opentelemetry.sdk.trace import TracerProvider
+                from opentelemetry.sdk.trace.export import BatchSpanProcessor
+                provider = TracerProvider(resource=Resource.create(
+                    {"service.name": service_name or settings.otel_service_name,
+                     "deployment.environment": settings.environment}))
+                provider.add_span_processor(BatchSpanProcessor(_build_exporter(settings.otel_exporter)))
+                trace.set_tracer_provider(provider)
+                _configured = True
+            except Exception as e:
+                logger.warning("no se pudo configurar OpenTelemetry: %s", e)
+                _configured = False
+        return _configured
+
+
+def enabled() -> bool:
+    return bool(_configured)
+
+
+def tracer():
+    return trace.get_tracer(TRACER_NAME)
+
+
+def current_trace_id() -> str | None:
+    if not enabled():
+        return None
+    ctx = trace.get_current_span().get_span_context()
+    return format(ctx.trace_id, "032x") if ctx.is_valid else None
+
+
+def inject_context() -> dict:
+    """Contexto W3C (``traceparent``/``tracestate``) del span activo, para viajar con el job."""
+    carrier: dict = {}
+    if enabled():
+        propagate.inject(carrier)
+    return carrier
+
+
+@contextmanager
+def span(name: str, kind: str = "internal", parent: dict | None = None, start_time: float | None = None,
+         **attributes) -> Iterator[object | None]:
+    """Span hijo del activo (o de ``parent``, un carrier W3C); no-op si no hay trazas."""
+    if not enabled():
+        yield None
+        return
+    ctx = propagate.extract(parent) if parent else None
+    start_ns = int(start_time * 1e9) if start_time is not None else None
+    with tracer().start_as_current_span(name, context=ctx, kind=getattr(SpanKind, kind.upper()),
+                                        start_time=start_ns, attributes=attributes or None) as s:
+        yield s
+
+
+def record_interval(name: str, start: float, end: float, parent: dict | None = None, **attributes) -> None:
+    """Span ya terminado (p.ej. la espera en cola entre ``enqueued_at`` y el inicio del job)."""
+    if not enabled():
+        return
+    ctx = propagate.extract(parent) if parent else None
+    s = tracer().start_span(name, context=ctx, start_time=int(start * 1e9), attributes=attributes or None)
+    s.end(end_time=int(end * 1e9))
+
+
+def flush(timeout_millis: int = 5000) -> None:
+    """Exporta los spans en buffer del ``BatchSpanProcessor``.
+
+    El work-horse de RQ es un fork que termina con ``os._exit`` (no corre atexit): sin esto
+    los spans del job se pierden.
+    """
+    if not enabled():
+        return
+    force_flush = getattr(trace.get_tracer_provider(), "force_flush", None)
+    if force_flush is not None:
+        force_flush(timeout_millis)
+
+
+# ---------- SQLAlchemy ----------
+
+def _before_cursor(conn, cursor, statement, parameters, context, executemany):
+    if context is None:
+        return
+    s = tracer().start_span(statement.split(None, 1)[0].upper() if statement else "SQL", kind=SpanKind.CLIENT,
+                            attributes={"db.system": conn.engine.dialect.name, "db.statement": statement[:2000],
+                                        "db.executemany": bool(executemany)})
+    context._otel_span = s
+
+
+def _after_cursor(conn, cursor, statement, parameters, context, executemany):
+    s = getattr(context, "_otel_span", None)
+    if s is not None:
+        if cursor is not None and getattr(cursor, "rowcount", -1) >= 0:
+            s.set_attribute("db.rowcount", cursor.rowcount)
+        s.end()
+        context._otel_span = None
+
+
+def _on_error(exception_context):
+    s = getattr(exception_context.execution_context, "_otel_span", None)
+    if s is not None:
+        s.record_exception(exception_context.original_exception)
+        s.set_status(Status(StatusCode.ERROR))
+        s.end()
+        exception_context.execution_context._otel_span = None
+
+
+def instrument_engine(engine) -> None:
+    """Spans por sentencia en ``engine`` si las trazas están activas (llamar tras ``setup_tracing``)."""
+    from sqlalchemy import event
+    if not enabled() or event.contains(engine, "before_cursor_execute", _before_cursor):
+        return
+    event.listen(engine, "before_cursor_execute", _before_cursor)
+    event.listen(engine, "after_cursor_execute", _after_cursor)
+    event.listen(engine, "handle_error", _on_error)
+
+
+# ---------- ASGI ----------
+
+class TracingMiddleware:
+    """Span SERVER por request HTTP con el contexto de los headers entrantes."""
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or not enabled():
+            await self.app(scope, receive, send)
+            return
+        carrier = {k.decode("latin-1"): v.decode("latin-1") for k, v in scope.get("headers", ())}
+        token = otel_context.attach(propagate.extract(carrier))
+        status = 500
+        try:
+            with tracer().start_as_current_span(
+                f"{scope['method']} {scope['path']}", kind=SpanKind.SERVER,
+                attributes={"http.method": scope["method"], "http.target": scope["path"]},
+            ) as s:
+                async def send_wrapper(message) -> None:
+                    nonlocal status
+                    if message["type"] == "http.response.start":
+                        status = message["status"]
+                    await send(message)
+                try:
+                    await self.app(scope, receive, send_wrapper)
+                finally:
+                    route = scope.get("route")
+                    template = getattr(route, "path_format", None) or getattr(route, "path", None)
+                    if template:
+                        s.update_name(f"{scope['method']} {template}")
+                        s.set_attribute("http.route", template)
+                    s.set_attribute("http.status_code", status)
+                    if status >= 500:
+                        s.set_status(Status(StatusCode.ERROR))
+        finally:
+            otel_context.detach(token)
+
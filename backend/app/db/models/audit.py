@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, ForeignKey, DateTime, JSON, func
+from sqlalchemy import Column, Integer, String, ForeignKey, DateTime, JSON, func, Index
 from app.db.base import Base
 
 
@@ -20,3 +20,5 @@ class UserProjectRole(Base):
     user_id = Column(Integer)
     project_id = Column(Integer, ForeignKey("projects.id", ondelete="CASCADE"))
     role = Column(String)
+    # bandeja de aprobaciones: roles del usuario -> proyectos
+    __table_args__ = (Index("ix_user_project_roles_user_project_role", "user_id", "project_id", "role"),)
@@ -0,0 +1,14 @@
+from sqlalchemy import Column, Integer, String, ForeignKey, Date, DateTime, Numeric, Index, func
+from app.db.base import Base
+
+
+class CostLedgerDay(Base):
+    """Costo real (AC) agregado por proyecto, día y fuente; se acumula al registrar costos."""
+    __tablename__ = "cost_ledger_days"
+    id = Column(Integer, primary_key=True)
+    project_id = Column(Integer, ForeignKey("projects.id", ondelete="CASCADE"), nullable=False)
+    day = Column(Date, nullable=False)
+    source = Column(String, nullable=False)  # po | payment
+    amount = Column(Numeric(18,2), nullable=False, default=0)
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+    __table_args__ = (Index("uq_cost_ledger_project_day_source", "project_id", "day", "source", unique=True),)
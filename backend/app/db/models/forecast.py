@@ -0,0 +1,14 @@
+from sqlalchemy import Column, Integer, String, ForeignKey, DateTime, JSON, Index, func
+from app.db.base import Base
+
+
+class ForecastRun(Base):
+    """Resultado de una simulación Monte Carlo, cacheado por hash de sus entradas."""
+    __tablename__ = "forecast_runs"
+    id = Column(Integer, primary_key=True)
+    project_id = Column(Integer, ForeignKey("projects.id", ondelete="CASCADE"), nullable=False, index=True)
+    input_hash = Column(String(64), nullable=False)
+    params = Column(JSON)
+    result = Column(JSON)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    __table_args__ = (Index("uq_forecast_runs_project_hash", "project_id", "input_hash", unique=True),)
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, DateTime, Text
+from sqlalchemy import Column, Integer, String, DateTime, Text, JSON
 from datetime import datetime
 from app.db.base import Base
 
@@ -9,6 +9,13 @@ class Job(Base):
     type = Column(String, nullable=False)  # e.g., import_excel, import_bc3, export_budget
     status = Column(String, nullable=False, default="queued")  # queued, started, finished, failed
     params = Column(Text, nullable=True)
+    # hash(tipo, params, versión de datos): envíos idénticos reutilizan el job (ver submit_job)
+    dedup_key = Column(String, nullable=True, index=True)
+    # dueño: proyecto (si el job es de uno) y usuario que lo encoló; submitters = usuarios que
+    # esperan el resultado (el creador y los envíos deduplicados enganchados al job)
+    project_id = Column(Integer, nullable=True, index=True)
+    created_by = Column(Integer, nullable=True)
+    submitters = Column(JSON, nullable=True)
     result_path = Column(String, nullable=True)  # path a archivo generado (export)
     error = Column(Text, nullable=True)
     created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
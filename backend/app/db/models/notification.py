@@ -0,0 +1,17 @@
+from sqlalchemy import Column, Integer, String, ForeignKey, DateTime, JSON, Index, func
+from app.db.base import Base
+
+
+class Notification(Base):
+    """Aviso para un usuario generado por el consumidor de eventos (p. ej. aprobación pendiente)."""
+    __tablename__ = "notifications"
+    id = Column(Integer, primary_key=True)
+    user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), nullable=False)
+    project_id = Column(Integer, ForeignKey("projects.id", ondelete="CASCADE"), nullable=True)
+    kind = Column(String, nullable=False)  # workflow.step_pending | workflow.completed
+    entity = Column(String)
+    entity_id = Column(Integer)
+    data = Column(JSON)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    read_at = Column(DateTime(timezone=True), nullable=True)
+    __table_args__ = (Index("ix_notifications_user_read", "user_id", "read_at", "id"),)
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, ForeignKey, DateTime, Numeric, func
+from sqlalchemy import Column, Integer, String, ForeignKey, DateTime, Numeric, Index, func
 from app.db.base import Base
 
 
@@ -50,6 +50,8 @@ class PurchaseOrder(Base):
     rfq_id = Column(Integer, ForeignKey("rfqs.id", ondelete="SET NULL"), nullable=True)
     status = Column(String, default="created")  # created, approved, received, closed
     created_at = Column(DateTime(timezone=True), server_default=func.now())
+    # entrada al primer estado de costo (ver cost_ledger.record_po_cost); fecha del costo real
+    costed_at = Column(DateTime(timezone=True), nullable=True)
 
 
 class PurchaseOrderLine(Base):
@@ -59,3 +61,16 @@ class PurchaseOrderLine(Base):
     item_id = Column(Integer, ForeignKey("items.id", ondelete="CASCADE"), index=True)
     qty = Column(Numeric(16,3), default=0)
     unit_price = Column(Numeric(16,4), default=0)
+
+
+class CommitmentRollup(Base):
+    """Comprometido acumulado por ítem y estado de OC (mantenido incrementalmente)."""
+    __tablename__ = "commitment_rollups"
+    id = Column(Integer, primary_key=True)
+    project_id = Column(Integer, ForeignKey("projects.id", ondelete="CASCADE"), index=True, nullable=False)
+    item_id = Column(Integer, ForeignKey("items.id", ondelete="CASCADE"), nullable=False)
+    status = Column(String, nullable=False)  # estado de la OC: created, approved, received, closed
+    qty = Column(Numeric(18,3), nullable=False, default=0)
+    amount = Column(Numeric(18,2), nullable=False, default=0)
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+    __table_args__ = (Index("uq_commitment_item_status", "item_id", "status", unique=True),)
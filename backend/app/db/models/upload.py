@@ -0,0 +1,17 @@
+from sqlalchemy import Column, Integer, String, BigInteger, ForeignKey, DateTime, Index, func
+from app.db.base import Base
+
+
+class ImportUpload(Base):
+    """Archivo importado (por hash de contenido): una re-subida idéntica devuelve el mismo proyecto."""
+    __tablename__ = "import_uploads"
+    id = Column(Integer, primary_key=True)
+    sha256 = Column(String(64), nullable=False)
+    kind = Column(String, nullable=False)  # excel | bc3
+    project_name = Column(String, nullable=False)
+    project_id = Column(Integer, ForeignKey("projects.id", ondelete="CASCADE"), nullable=False, index=True)
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=True)
+    filename = Column(String, nullable=True)
+    size = Column(BigInteger, nullable=False)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    __table_args__ = (Index("ix_import_uploads_lookup", "sha256", "kind", "project_name"),)
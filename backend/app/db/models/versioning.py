@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, ForeignKey, String, Numeric, DateTime, Text, func, Boolean
+from sqlalchemy import Column, Integer, ForeignKey, String, Numeric, DateTime, Text, func, Boolean, Index
 from app.db.base import Base
 from sqlalchemy import Date, JSON
 
@@ -12,6 +12,8 @@ class BudgetVersion(Base):
     created_by = Column(Integer, ForeignKey("users.id", ondelete="SET NULL"), nullable=True)
     is_baseline = Column(Boolean, default=False)
     is_locked = Column(Boolean, default=False)
+    # sube en cada replace_schedule: token de las curvas PV cacheadas en cada proceso
+    schedule_revision = Column(Integer, nullable=False, default=0, server_default="0")
 
 class BudgetVersionItem(Base):
     __tablename__ = "budget_version_items"
@@ -26,6 +28,20 @@ class BudgetVersionItem(Base):
     unit_price = Column(Numeric(16,2))
 
 
+
+class ScheduleEntry(Base):
+    """Calendario de un ítem o capítulo en una versión (línea base) del presupuesto."""
+    __tablename__ = "schedule_entries"
+    id = Column(Integer, primary_key=True)
+    version_id = Column(Integer, ForeignKey("budget_versions.id", ondelete="CASCADE"), nullable=False)
+    level = Column(String, nullable=False)  # item | chapter
+    code = Column(String, nullable=False)   # item_code / chapter_code de BudgetVersionItem
+    start_date = Column(Date, nullable=False)
+    end_date = Column(Date, nullable=False)
+    profile = Column(String, nullable=False, default="linear")  # linear | s_curve | front_loaded
+    __table_args__ = (Index("uq_schedule_version_level_code", "version_id", "level", "code", unique=True),)
+
+
 class Workflow(Base):
     __tablename__ = "workflows"
     id = Column(Integer, primary_key=True)
@@ -56,6 +72,7 @@ class WorkflowInstance(Base):
     created_by = Column(Integer, ForeignKey("users.id", ondelete="SET NULL"), nullable=True)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     current_step = Column(Integer, default=1)
+    __table_args__ = (Index("ix_workflow_instances_proj_status_step", "project_id", "status", "current_step"),)
 
 
 class WorkflowInstanceStep(Base):
@@ -68,6 +85,7 @@ class WorkflowInstanceStep(Base):
     decided_by = Column(Integer, ForeignKey("users.id", ondelete="SET NULL"), nullable=True)
     decided_at = Column(DateTime(timezone=True))
     comment = Column(Text)
+    __table_args__ = (Index("ix_workflow_inst_steps_instance_pos_decision", "instance_id", "position", "decision"),)
 
 
 # --- Facturación & Banco (Sprint 11-12) ---
@@ -79,6 +97,8 @@ class Invoice(Base):
     dte_number = Column(String, index=True)
     status = Column(String, default="pending")  # pending|accepted|rejected|paid
     amount = Column(Numeric(16,2))
+    # Acumulado de pagos; se actualiza atómicamente (UPDATE ... SET paid_amount = paid_amount + :x)
+    paid_amount = Column(Numeric(16,2), nullable=False, default=0, server_default="0")
     currency = Column(String, default="CLP")
     xml_ref = Column(String)  # path o hash del XML
     created_at = Column(DateTime(timezone=True), server_default=func.now())
@@ -104,6 +124,9 @@ class BankTransaction(Base):
     source = Column(String)  # banco_chile|santander|manual
     raw = Column(JSON)
     matched_invoice_id = Column(Integer, ForeignKey("invoices.id", ondelete="SET NULL"), nullable=True, index=True)
+    # sha256(fecha|monto|descripción|saldo) para deduplicar re-importaciones de cartolas
+    content_hash = Column(String(64), nullable=True)
 
-git config --global user.name "Tu Nombre"
-git config --global user.email "tu_email@dominio.com"
+    __table_args__ = (
+        Index("uq_bank_txn_project_hash", "project_id", "content_hash", unique=True),
+    )
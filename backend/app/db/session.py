@@ -1,9 +1,14 @@
 from sqlalchemy import create_engine
 from sqlalchemy.orm import sessionmaker, Session
 from app.core.settings import get_settings
+from app.core.query_stats import install as install_query_stats
+from app.core.tracing import setup_tracing, instrument_engine
 
 settings = get_settings()
 engine = create_engine(settings.database_url, pool_pre_ping=True)
+install_query_stats(engine)
+if setup_tracing():
+    instrument_engine(engine)
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
 def get_db() -> Session:
@@ -0,0 +1,54 @@
+"""Upserts portables (Postgres / SQLite con ``ON CONFLICT``; otros motores por consulta)."""
+from __future__ import annotations
+from sqlalchemy import Table, insert, update, select, and_, func, tuple_
+from sqlalchemy.orm import Session
+
+
+def dialect_insert(db: Session):
+    """``insert`` del dialecto si soporta ``ON CONFLICT``; None en otro caso."""
+    name = db.get_bind().dialect.name
+    if name == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert as ins
+        return ins
+    if name == "sqlite":
+        from sqlalchemy.dialects.sqlite import insert as ins
+        return ins
+    return None
+
+
+def upsert_add(db: Session, table: Table, rows: list[dict], keys: list[str], add: list[str],
+               touch: str | None = "updated_at") -> None:
+    """Inserta ``rows``; si la clave única ``keys`` ya existe suma las columnas ``add`` (executemany)."""
+    if not rows:
+        return
+    ins = dialect_insert(db)
+    if ins is not None:
+        stmt = ins(table)
+        set_ = {c: table.c[c] + stmt.excluded[c] for c in add}
+        if touch:
+            set_[touch] = func.now()
+        db.execute(stmt.on_conflict_do_update(index_elements=keys, set_=set_), rows)
+        return
+    for r in rows:
+        cond = and_(*(table.c[k] == r[k] for k in keys))
+        if db.execute(select(table.c[keys[0]]).where(cond)).first() is None:
+            db.execute(insert(table).values(**r))
+        else:
+            db.execute(update(table).where(cond).values(**{c: table.c[c] + r[c] for c in add}))
+
+
+def insert_ignore(db: Session, table: Table, rows: list[dict], keys: list[str]) -> int:
+    """Inserta ``rows`` ignorando los que chocan con la clave única ``keys``; devuelve cuántos entraron."""
+    if not rows:
+        return 0
+    ins = dialect_insert(db)
+    if ins is not None:
+        # executemany + RETURNING ("insertmanyvalues"): SQL compilado una vez y cacheado entre chunks
+        stmt = ins(table).on_conflict_do_nothing(index_elements=keys).returning(table.c[keys[0]])
+        return len(db.execute(stmt, rows).all())
+    cols = [table.c[k] for k in keys]
+    existing = set(db.execute(select(*cols).where(tuple_(*cols).in_([tuple(r[k] for k in keys) for r in rows]))).all())
+    fresh = [r for r in rows if tuple(r[k] for k in keys) not in existing]
+    if fresh:
+        db.execute(insert(table), fresh)
+    return len(fresh)
@@ -8,11 +8,13 @@ import os
 from sqlalchemy.exc import SQLAlchemyError
 from app.db.session import engine
 from fastapi.middleware.cors import CORSMiddleware
-from app.api.v1 import budgets, measurements, imports, purchases, auth, versions, evm, exports, jobs, workflows, risks, dashboard, invoices
+from app.api.v1 import budgets, measurements, imports, purchases, auth, versions, evm, exports, jobs, workflows, risks, dashboard, invoices, events, admin
 from app.core.settings import get_settings
-from app.core.logging_middleware import LoggingMiddleware
-from prometheus_client import Counter, Histogram, generate_latest, CONTENT_TYPE_LATEST
-import time
+from app.core.request_middleware import RequestMetricsMiddleware
+from app.core.access_log import flush as flush_access_log
+from app.core.profiling import ProfilingMiddleware, instrument_routes
+from app.core.tracing import TracingMiddleware, setup_tracing
+from prometheus_client import generate_latest, CONTENT_TYPE_LATEST
 
 settings = get_settings()
 
@@ -31,7 +33,8 @@ async def lifespan(app: FastAPI):
     else:
         print("[startup] SKIP_MIGRATIONS=True -> no se ejecutan migraciones")
     yield
-    # Shutdown: (placeholder para futuras tareas de cierre limpio)
+    # Shutdown: escribir lo que quede en la cola del log de accesos
+    flush_access_log()
 
 app = FastAPI(title=settings.app_name, version=settings.version, lifespan=lifespan)
 
@@ -42,36 +45,11 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
-app.add_middleware(LoggingMiddleware)
-
-# -------- Prometheus metrics --------
-REQUEST_COUNT = Counter(
-    'app_requests_total',
-    'Total requests',
-    ['method', 'path', 'status']
-)
-REQUEST_LATENCY = Histogram(
-    'app_request_duration_seconds',
-    'Request latency seconds',
-    ['method', 'path']
-)
-
-@app.middleware("http")
-async def metrics_middleware(request, call_next):
-    start = time.perf_counter()
-    response = await call_next(request)
-    elapsed = time.perf_counter() - start
-    path = request.url.path
-    # Opcional: agrupar rutas dinámicas simples
-    if path.startswith('/api/v1/budgets/chapters/'):
-        path_label = '/api/v1/budgets/chapters/:id'
-    elif path.startswith('/api/v1/budgets/items/'):
-        path_label = '/api/v1/budgets/items/:id'
-    else:
-        path_label = path
-    REQUEST_COUNT.labels(request.method, path_label, response.status_code).inc()
-    REQUEST_LATENCY.labels(request.method, path_label).observe(elapsed)
-    return response
+if settings.profiling_enabled:
+    app.add_middleware(ProfilingMiddleware)
+app.add_middleware(RequestMetricsMiddleware)
+if setup_tracing():
+    app.add_middleware(TracingMiddleware)
 
 @app.get('/metrics')
 async def metrics():
@@ -90,6 +68,8 @@ app.include_router(workflows.router, prefix="/api/v1/workflows", tags=["workflow
 app.include_router(risks.router, prefix="/api/v1/risks", tags=["risks"])
 app.include_router(dashboard.router, prefix="/api/v1/dashboard", tags=["dashboard"])
 app.include_router(invoices.router, prefix="/api/v1", tags=["invoices"])
+app.include_router(events.router, prefix="/api/v1/events", tags=["events"])
+app.include_router(admin.router, prefix="/api/v1/admin", tags=["admin"])
 
 
 @app.get("/health")
@@ -110,3 +90,8 @@ async def health():
     except Exception as e:
         status["redis"] = f"down: {e}"; status["status"] = "degraded"
     return status
+
+
+# después de registrar todas las rutas
+if settings.profiling_enabled:
+    instrument_routes(app)
@@ -0,0 +1,285 @@
+"""Almacén de artefactos de jobs direccionado por contenido.
+
+Cada resultado se guarda una vez en ``artifacts_dir/{sha[:2]}/{sha}.{ext}`` (sha256 del
+contenido sin comprimir): dos exportaciones idénticas comparten archivo. La extensión se
+toma del llamador o se detecta por contenido (PDF, XLSX, JSON, CSV) y define el media type.
+CSV y JSON se guardan comprimidos según ``artifacts_compression`` (``.gz`` / ``.zst``).
+
+Expiración (``evict``): se borran los artefactos no usados en ``artifacts_ttl_hours`` y,
+si el total supera ``artifacts_max_mb``, los de uso más antiguo (mtime, que se renueva al
+reescribir o descargar). Corre como mucho cada ``artifacts_evict_interval_s`` desde ``put``.
+
+``artifact_response`` sirve el archivo sin cargarlo en memoria: ``Range`` (un rango),
+``ETag`` = sha256 con ``If-None-Match``/``If-Range`` y, si el cliente acepta la
+codificación almacenada, el archivo comprimido tal cual con ``Content-Encoding``.
+"""
+from __future__ import annotations
+import gzip
+import hashlib
+import io
+import json
+import logging
+import os
+import re
+import shutil
+import tempfile
+import threading
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from typing import BinaryIO, Iterator
+from starlette.requests import Request
+from starlette.responses import FileResponse, Response, StreamingResponse
+from app.core.settings import get_settings
+
+try:
+    import zstandard
+except ImportError:  # pragma: no cover - depende del entorno
+    zstandard = None
+
+logger = logging.getLogger(__name__)
+
+CHUNK = 64 * 1024
+MIN_COMPRESS_BYTES = 1024
+MEDIA_TYPES = {
+    "xlsx": "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+    "pdf": "application/pdf",
+    "csv": "text/csv; charset=utf-8",
+    "json": "application/json",
+    "zip": "application/zip",
+    "bin": "application/octet-stream",
+}
+COMPRESSIBLE = {"csv", "json"}
+ENCODING_SUFFIX = {"gzip": "gz", "zstd": "zst"}
+_SUFFIX_ENCODING = {v: k for k, v in ENCODING_SUFFIX.items()}
+_NAME = re.compile(r"^(?P<sha>[0-9a-f]{64})\.(?P<ext>[a-z0-9]+)(?:\.(?P<enc>gz|zst))?$")
+_RANGE = re.compile(r"^bytes=(\d*)-(\d*)$")
+
+_evict_lock = threading.Lock()
+_last_evict = 0.0
+
+
+@dataclass(frozen=True)
+class Artifact:
+    path: Path
+    ext: str
+    sha256: str | None = None
+    encoding: str | None = None
+
+    @property
+    def media_type(self) -> str:
+        return MEDIA_TYPES.get(self.ext, MEDIA_TYPES["bin"])
+
+
+def store_dir() -> Path:
+    path = Path(get_settings().artifacts_dir).resolve()
+    path.mkdir(parents=True, exist_ok=True)
+    return path
+
+
+def sniff_extension(head: bytes) -> str:
+    """Extensión por contenido (primeros bytes)."""
+    if head.startswith(b"%PDF-"):
+        return "pdf"
+    if head.startswith(b"PK\x03\x04"):
+        return "xlsx" if b"[Content_Types].xml" in head or b"xl/" in head else "zip"
+    text = head.lstrip()
+    if text[:1] in (b"{", b"["):
+        return "json"
+    try:
+        first = head.split(b"\n", 1)[0].decode("utf-8")
+    except UnicodeDecodeError:
+        return "bin"
+    return "csv" if any(sep in first for sep in (",", ";", "\t")) else "bin"
+
+
+def _encoding_for(ext: str, size: int) -> str | None:
+    encoding = get_settings().artifacts_compression.lower()
+    if ext not in COMPRESSIBLE or size < MIN_COMPRESS_BYTES or encoding not in ENCODING_SUFFIX:
+        return None
+    if encoding == "zstd" and zstandard is None:
+        logger.warning("artifacts_compression=zstd sin el paquete zstandard; se usa gzip")
+        return "gzip"
+    return encoding
+
+
+def _write(src: BinaryIO, dst: BinaryIO, encoding: str | None) -> None:
+    if encoding == "gzip":
+        with gzip.GzipFile(fileobj=dst, mode="wb", compresslevel=6, mtime=0) as gz:
+            shutil.copyfileobj(src, gz, CHUNK)
+    elif encoding == "zstd":
+        zstandard.ZstdCompressor(level=10).copy_stream(src, dst)
+    else:
+        shutil.copyfileobj(src, dst, CHUNK)
+
+
+def _store(src: BinaryIO, sha: str, ext: str, size: int) -> Artifact:
+    encoding = _encoding_for(ext, size)
+    name = f"{sha}.{ext}" + (f".{ENCODING_SUFFIX[encoding]}" if encoding else "")
+    folder = store_dir() / sha[:2]
+    folder.mkdir(exist_ok=True)
+    path = folder / name
+    if path.exists():
+        os.utime(path)
+    else:
+        fd, tmp = tempfile.mkstemp(dir=folder, prefix=".tmp-")
+        try:
+            with os.fdopen(fd, "wb") as dst:
+                _write(src, dst, encoding)
+            os.replace(tmp, path)
+        except BaseException:
+            Path(tmp).unlink(missing_ok=True)
+            raise
+    maybe_evict()
+    return Artifact(path, ext, sha, encoding)
+
+
+def put(data: bytes, ext: str | None = None) -> Artifact:
+    """Guarda ``data`` (o reutiliza el artefacto idéntico) y devuelve su ubicación."""
+    ext = (ext or sniff_extension(data[:CHUNK])).lower().lstrip(".")
+    return _store(io.BytesIO(data), hashlib.sha256(data).hexdigest(), ext, len(data))
+
+
+def put_json(value) -> Artifact:
+    return put(json.dumps(value, ensure_ascii=False, default=str).encode("utf-8"), "json")
+
+
+def put_file(src: str | os.PathLike, ext: str | None = None) -> Artifact:
+    """Copia un archivo al almacén en streaming (hash y copia por bloques)."""
+    src = Path(src)
+    digest = hashlib.sha256()
+    with open(src, "rb") as fh:
+        head = fh.read(CHUNK)
+        digest.update(head)
+        for chunk in iter(lambda: fh.read(CHUNK), b""):
+            digest.update(chunk)
+        ext = (ext or src.suffix or sniff_extension(head)).lower().lstrip(".")
+        fh.seek(0)
+        return _store(fh, digest.hexdigest(), ext, src.stat().st_size)
+
+
+def resolve(path: str | os.PathLike) -> Artifact | None:
+    """Artefacto para un ``result_path``; None si ya no existe (expirado)."""
+    path = Path(path)
+    if not path.is_file():
+        return None
+    m = _NAME.match(path.name)
+    if m:
+        return Artifact(path, m["ext"], m["sha"], _SUFFIX_ENCODING.get(m["enc"]))
+    # resultados previos al almacén (tempfiles): solo la extensión
+    return Artifact(path, path.suffix.lstrip(".").lower() or "bin")
+
+
+# ---------- expiración ----------
+
+def evict(now: float | None = None) -> dict:
+    """Borra artefactos vencidos por TTL y luego los menos usados hasta el límite de tamaño."""
+    settings = get_settings()
+    now = now or time.time()
+    cutoff = now - settings.artifacts_ttl_hours * 3600
+    limit = settings.artifacts_max_mb * 1024 * 1024
+    files = []
+    for path in store_dir().glob("*/*"):
+        try:
+            st = path.stat()
+        except FileNotFoundError:
+            continue
+        if path.name.startswith(".tmp-") and st.st_mtime > now - 3600:
+            continue  # escritura en curso
+        files.append((st.st_mtime, st.st_size, path))
+    files.sort()
+    removed = freed = 0
+    total = sum(size for _, size, _ in files)
+    for mtime, size, path in files:
+        if mtime >= cutoff and total <= limit:
+            break
+        path.unlink(missing_ok=True)
+        removed += 1
+        freed += size
+        total -= size
+    return {"removed": removed, "freed_bytes": freed, "total_bytes": total}
+
+
+def maybe_evict() -> None:
+    global _last_evict
+    now = time.time()
+    if now - _last_evict < get_settings().artifacts_evict_interval_s or not _evict_lock.acquire(blocking=False):
+        return
+    try:
+        _last_evict = now
+        stats = evict(now)
+        if stats["removed"]:
+            logger.info("artefactos expirados: %s", stats)
+    finally:
+        _evict_lock.release()
+
+
+# ---------- descarga ----------
+
+def _iter_range(path: Path, start: int, length: int) -> Iterator[bytes]:
+    with open(path, "rb") as fh:
+        fh.seek(start)
+        while length > 0:
+            chunk = fh.read(min(CHUNK, length))
+            if not chunk:
+                break
+            length -= len(chunk)
+            yield chunk
+
+
+def _iter_decoded(artifact: Artifact) -> Iterator[bytes]:
+    with open(artifact.path, "rb") as raw:
+        fh = gzip.GzipFile(fileobj=raw) if artifact.encoding == "gzip" else zstandard.ZstdDecompressor().stream_reader(raw)
+        with fh:
+            for chunk in iter(lambda: fh.read(CHUNK), b""):
+                yield chunk
+
+
+def parse_range(header: str | None, size: int) -> tuple[int, int] | None:
+    """``(inicio, fin)`` inclusivo de un único rango; None = archivo completo; ValueError = 416."""
+    if not header:
+        return None
+    m = _RANGE.match(header.strip())
+    if not m:
+        return None  # múltiples rangos u otra unidad: se responde completo
+    first, last = m.groups()
+    if not first and not last:
+        return None
+    if not first:
+        start, end = max(size - int(last), 0), size - 1
+    else:
+        start = int(first)
+        end = min(int(last), size - 1) if last else size - 1
+    if start >= size or start > end:
+        raise ValueError(header)
+    return start, end
+
+
+def artifact_response(artifact: Artifact, request: Request, filename: str) -> Response:
+    st = artifact.path.stat()
+    etag = f'"{artifact.sha256}"' if artifact.sha256 else f'"{int(st.st_mtime)}-{st.st_size}"'
+    headers = {"ETag": etag, "Content-Disposition": f'attachment; filename="{filename}"',
+               "Cache-Control": "private, max-age=3600"}
+    if artifact.sha256:
+        os.utime(artifact.path)  # uso reciente: retrasa la expiración por tamaño
+    if request.headers.get("if-none-match") == etag:
+        return Response(status_code=304, headers=headers)
+    if artifact.encoding:
+        headers["Vary"] = "Accept-Encoding"
+        accepted = request.headers.get("accept-encoding", "")
+        if artifact.encoding not in [e.split(";")[0].strip() for e in accepted.split(",")]:
+            headers["Accept-Ranges"] = "none"
+            return StreamingResponse(_iter_decoded(artifact), media_type=artifact.media_type, headers=headers)
+        headers["Content-Encoding"] = artifact.encoding
+    headers["Accept-Ranges"] = "bytes"
+    if_range = request.headers.get("if-range")
+    try:
+        byte_range = parse_range(request.headers.get("range"), st.st_size) if if_range in (None, etag) else None
+    except ValueError:
+        return Response(status_code=416, headers={"Content-Range": f"bytes */{st.st_size}"})
+    if byte_range is None:
+        return FileResponse(artifact.path, media_type=artifact.media_type, headers=headers, stat_result=st)
+    start, end = byte_range
+    headers.update({"Content-Range": f"bytes {start}-{end}/{st.st_size}", "Content-Length": str(end - start + 1)})
+    return StreamingResponse(_iter_range(artifact.path, start, end - start + 1), status_code=206,
+                             media_type=artifact.media_type, headers=headers)
@@ -1,4 +1,5 @@
 from sqlalchemy.orm import Session
+from sqlalchemy import insert
 from app.db.models.audit import AuditLog
 
 
@@ -6,3 +7,13 @@ def log_action(db: Session, project_id: int, entity: str, entity_id: int, action
     log = AuditLog(project_id=project_id, entity=entity, entity_id=entity_id, action=action, data=data, user_id=user_id)
     db.add(log)
     db.commit()
+
+
+def log_actions(db: Session, entries: list[dict]):
+    """Registra varias acciones en un único INSERT (executemany) y un solo commit.
+
+    Cada entrada usa las mismas claves que ``log_action``.
+    """
+    if entries:
+        db.execute(insert(AuditLog), entries)
+    db.commit()
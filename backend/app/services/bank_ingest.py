@@ -0,0 +1,145 @@
+"""Ingesta de cartolas bancarias (CSV / XLSX / OFX) en lote e idempotente.
+
+- Lectores en streaming: nunca se materializa el archivo completo.
+- Cada línea normalizada lleva ``content_hash`` = sha256(fecha|monto|descripción|saldo);
+  el índice único ``(project_id, content_hash)`` hace que re-importar sea barato.
+- Inserción por chunks con ``upsert.insert_ignore`` (``ON CONFLICT DO NOTHING``).
+- Estadísticas: recibidas, nuevas, duplicadas, rechazadas.
+"""
+from __future__ import annotations
+import hashlib
+import os
+import re
+from datetime import date, datetime
+from decimal import Decimal
+from typing import Iterable, Iterator, Any
+from sqlalchemy.orm import Session
+from app.db.models.versioning import BankTransaction
+from app.db.upsert import insert_ignore
+from app.services.tabular_io import iter_table_rows, normalize_header, parse_amount, parse_date
+from app.services.audit import log_action
+
+CHUNK_SIZE = 1000
+
+# alias normalizados (ver tabular_io.normalize_header) -> campo canónico
+COLUMN_ALIASES = {
+    "date": ("date", "fecha", "fecha_operacion", "fecha_movimiento", "dtposted"),
+    "amount": ("amount", "monto", "importe", "trnamt"),
+    "credit": ("abono", "abonos", "credito", "creditos", "deposito", "depositos"),
+    "debit": ("cargo", "cargos", "debito", "debitos", "giro", "giros"),
+    "description": ("description", "descripcion", "glosa", "detalle", "concepto", "name", "memo"),
+    "balance": ("balance", "saldo", "saldo_contable"),
+}
+_ALIAS_LOOKUP = {alias: field for field, aliases in COLUMN_ALIASES.items() for alias in aliases}
+
+
+def content_hash(dt: date, amount: Decimal, description: str | None, balance: Decimal | None) -> str:
+    canonical = "|".join([
+        dt.isoformat(),
+        f"{amount:.2f}",
+        " ".join((description or "").split()).lower(),
+        f"{balance:.2f}" if balance is not None else "",
+    ])
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+
+def _jsonable(raw: dict) -> dict:
+    return {k: (v.isoformat() if isinstance(v, (date, datetime)) else v if v is None or isinstance(v, (str, int, float, bool)) else str(v))
+            for k, v in raw.items()}
+
+
+def normalize_row(raw: dict) -> dict | None:
+    """Mapea alias de columnas a (date, amount, description, balance); None si la fila es inválida."""
+    fields: dict[str, Any] = {}
+    for key, value in raw.items():
+        field = _ALIAS_LOOKUP.get(normalize_header(key))
+        if field and field not in fields:
+            fields[field] = value
+    dt = parse_date(fields.get("date"))
+    amount = parse_amount(fields.get("amount"))
+    if amount is None and ("credit" in fields or "debit" in fields):
+        credit = parse_amount(fields.get("credit")) or Decimal("0")
+        debit = parse_amount(fields.get("debit")) or Decimal("0")
+        amount = credit - abs(debit) if (credit or debit) else None
+    if dt is None or amount is None:
+        return None
+    description = fields.get("description")
+    description = str(description).strip() if description not in (None, "") else None
+    balance = parse_amount(fields.get("balance"))
+    return {
+        "date": dt,
+        "amount": amount,
+        "description": description,
+        "balance": balance,
+        "content_hash": content_hash(dt, amount, description, balance),
+        "raw": _jsonable(raw),
+    }
+
+
+_OFX_TAG_RE = re.compile(r"<(\w+)>([^<\r\n]*)")
+
+
+def iter_ofx_rows(path: str) -> Iterator[dict]:
+    """Lector OFX (SGML o XML) línea a línea: emite un dict por ``<STMTTRN>``."""
+    current: dict | None = None
+    with open(path, encoding="latin-1", errors="replace") as f:
+        for line in f:
+            upper = line.upper()
+            if "<STMTTRN>" in upper:
+                current = {}
+            if current is not None:
+                for tag, value in _OFX_TAG_RE.findall(line):
+                    if value.strip():
+                        current[tag.lower()] = value.strip()
+            if "</STMTTRN>" in upper and current is not None:
+                if "memo" in current and "name" in current:
+                    current["name"] = f"{current['name']} {current.pop('memo')}"
+                yield current
+                current = None
+
+
+def iter_bank_file(path: str, filename: str | None = None) -> Iterator[dict]:
+    ext = os.path.splitext((filename or path).lower())[1]
+    if ext in (".ofx", ".qfx"):
+        return iter_ofx_rows(path)
+    return iter_table_rows(path, filename)
+
+
+def ingest_bank_rows(db: Session, project_id: int, rows: Iterable[dict], source: str = "manual",
+                     user_id: int | None = None, chunk_size: int = CHUNK_SIZE) -> dict:
+    """Normaliza e inserta en chunks; un solo commit al final (todo o nada)."""
+    stats = {"received": 0, "new": 0, "duplicate": 0, "rejected": 0, "rejected_rows": []}
+    chunk: dict[str, dict] = {}
+
+    def flush():
+        if chunk:
+            inserted = insert_ignore(db, BankTransaction.__table__, list(chunk.values()), ["project_id", "content_hash"])
+            stats["new"] += inserted
+            stats["duplicate"] += len(chunk) - inserted
+            chunk.clear()
+
+    for n, raw in enumerate(rows, start=1):
+        stats["received"] += 1
+        row = normalize_row(raw)
+        if row is None:
+            stats["rejected"] += 1
+            if len(stats["rejected_rows"]) < 100:
+                stats["rejected_rows"].append(n)
+            continue
+        if row["content_hash"] in chunk:
+            stats["duplicate"] += 1
+            continue
+        row.update(project_id=project_id, source=source)
+        chunk[row["content_hash"]] = row
+        if len(chunk) >= chunk_size:
+            flush()
+    flush()
+    db.commit()
+    log_action(db, project_id=project_id, entity="project", entity_id=project_id, action="bank_import",
+               data={k: v for k, v in stats.items() if k != "rejected_rows"} | {"source": source}, user_id=user_id)
+    return stats
+
+
+def ingest_bank_file(db: Session, project_id: int, path: str, filename: str | None = None,
+                     source: str = "file", user_id: int | None = None) -> dict:
+    return ingest_bank_rows(db, project_id, iter_bank_file(path, filename), source=source, user_id=user_id)
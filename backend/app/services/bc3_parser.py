@@ -198,6 +198,7 @@ def import_budget_bc3(db, path: str, project_name: str):
     from app.db.models.project import Project
     from app.db.models.budget import Chapter, Item, Resource, APU
     from app.services.kpis import compute_item_price
+    from app.services import job_progress
 
     # Detección rápida del formato leyendo primeras líneas
     is_extended = False
@@ -217,7 +218,10 @@ def import_budget_bc3(db, path: str, project_name: str):
     db.add(project); db.flush()
 
     if is_extended:
+        job_progress.plan("parse", "capitulos", "recursos", "items", "precios")
+        job_progress.stage("parse")
         result = parse_bc3_extended(path)
+        job_progress.stage("capitulos", total=len(result.chapters))
         # Crear capítulos declarados
         chapter_ids: dict[str, int] = {}
         for ch in result.chapters:
@@ -225,18 +229,22 @@ def import_budget_bc3(db, path: str, project_name: str):
             chapter = Chapter(project_id=project.id, code=code, name=ch.get("name") or code)
             db.add(chapter); db.flush()
             chapter_ids[code] = cast(int, chapter.id)
+            job_progress.advance()
         # Capítulo fallback
         if "GENERAL" not in chapter_ids:
             general = Chapter(project_id=project.id, code="GENERAL", name="GENERAL")
             db.add(general); db.flush()
             chapter_ids["GENERAL"] = cast(int, general.id)
         # Crear recursos primero (para map rápido por code)
+        job_progress.stage("recursos", total=len(result.resources))
         resource_ids: dict[str, int] = {}
         for rcode, r in result.resources.items():
             res = Resource(type="GEN", code=rcode, name=r.get("name") or rcode, unit=r.get("unit") or "u", unit_cost=r.get("unit_cost", 0.0))
             db.add(res); db.flush()
             resource_ids[rcode] = cast(int, res.id)
+            job_progress.advance()
         # Crear ítems
+        job_progress.stage("items", total=len(result.items))
         item_ids: dict[str, int] = {}
         for it in result.items:
             icode = it["code"]
@@ -252,6 +260,7 @@ def import_budget_bc3(db, path: str, project_name: str):
             item = Item(chapter_id=chapter_ids[chapter_code], code=icode, name=it.get("name") or icode, unit=it.get("unit") or "u", quantity=0, price=0)
             db.add(item); db.flush()
             item_ids[icode] = cast(int, item.id)
+            job_progress.advance()
         # APU (descompuestos)
         for apu in result.apus:
             icode, rcode, coeff = apu["item_code"], apu["res_code"], apu["coeff"]
@@ -259,6 +268,7 @@ def import_budget_bc3(db, path: str, project_name: str):
                 continue  # ya se registró error en parseo
             db.add(APU(item_id=item_ids[icode], resource_id=resource_ids[rcode], coeff=coeff))
         # Calcular precios ítem según APU
+        job_progress.stage("precios")
         from collections import defaultdict
         apu_map: dict[int, list[dict]] = defaultdict(list)
         from app.db.models.budget import APU as APUModel
@@ -280,8 +290,11 @@ def import_budget_bc3(db, path: str, project_name: str):
         return project.id
     else:
         # Formato simple existente
+        job_progress.plan("parse", "items")
+        job_progress.stage("parse")
         parsed = read_bc3(path)
         validate_bc3_structure(parsed)
+        job_progress.stage("items", total=len(parsed["items"]))
         # Map chapter code to db id
         chapter_ids: dict[str, int] = {}
         for ccode, c in parsed["chapters"].items():
@@ -308,6 +321,7 @@ def import_budget_bc3(db, path: str, project_name: str):
                 # compute_item_price devuelve Decimal -> asignar directamente
                 from typing import Any
                 item.price = cast(Any, compute_item_price(apu_payload))
+            job_progress.advance()
         db.commit()
         return project.id
 
@@ -0,0 +1,166 @@
+"""Seguimiento de compromisos (OC) contra presupuesto.
+
+``commitment_rollups`` guarda, por ítem y estado de OC, la cantidad y el monto
+comprometido. Se mantiene incrementalmente en la misma transacción que la OC:
+
+- al crear una OC se suman sus líneas (agrupadas por ítem) en su estado inicial;
+- al cambiar de estado se mueven los montos del estado anterior al nuevo.
+
+La tabla de variaciones de un proyecto se arma desde el rollup + ítems, sin
+recorrer las líneas de OC. ``rebuild_commitments`` recalcula desde cero (backfill).
+"""
+from __future__ import annotations
+from decimal import Decimal
+from sqlalchemy.orm import Session
+from sqlalchemy import select, func, case, delete, insert
+from app.db.models.budget import Chapter, Item
+from app.db.models.purchases import PurchaseOrder, PurchaseOrderLine, CommitmentRollup
+from app.db.upsert import upsert_add
+
+PO_STATUSES = ("created", "approved", "received", "closed")
+# Estados que cuentan como comprometido firme; 'created' se informa como pendiente
+COMMITTED_STATUSES = ("approved", "received", "closed")
+TOLERANCE = Decimal("0.01")
+
+
+def _po_item_totals(db: Session, po_id: int) -> list[tuple[int, Decimal, Decimal]]:
+    rows = db.query(
+        PurchaseOrderLine.item_id,
+        func.coalesce(func.sum(PurchaseOrderLine.qty), 0),
+        func.coalesce(func.sum(PurchaseOrderLine.qty * PurchaseOrderLine.unit_price), 0),
+    ).filter(PurchaseOrderLine.po_id == po_id, PurchaseOrderLine.item_id.isnot(None)) \
+        .group_by(PurchaseOrderLine.item_id).all()
+    return [(item_id, Decimal(str(qty)), Decimal(str(amount))) for item_id, qty, amount in rows]
+
+
+def _apply_deltas(db: Session, project_id: int, deltas: list[dict]) -> None:
+    """Suma ``deltas`` (item_id, status, qty, amount) al rollup con un upsert executemany."""
+    if not deltas:
+        return
+    upsert_add(db, CommitmentRollup.__table__, [dict(d, project_id=project_id) for d in deltas],
+               keys=["item_id", "status"], add=["qty", "amount"])
+
+
+def record_po_created(db: Session, po: PurchaseOrder) -> list[int]:
+    """Suma las líneas de una OC recién creada (llamar antes del commit). Devuelve ítems afectados."""
+    totals = _po_item_totals(db, po.id)
+    status = po.status or "created"
+    _apply_deltas(db, po.project_id, [
+        {"item_id": item_id, "status": status, "qty": qty, "amount": amount} for item_id, qty, amount in totals
+    ])
+    return [t[0] for t in totals]
+
+
+def record_po_status_change(db: Session, po: PurchaseOrder, old_status: str | None) -> list[int]:
+    """Mueve el comprometido de la OC de ``old_status`` a su estado actual."""
+    old_status = old_status or "created"
+    if old_status == po.status:
+        return []
+    totals = _po_item_totals(db, po.id)
+    deltas = []
+    for item_id, qty, amount in totals:
+        deltas.append({"item_id": item_id, "status": old_status, "qty": -qty, "amount": -amount})
+        deltas.append({"item_id": item_id, "status": po.status, "qty": qty, "amount": amount})
+    _apply_deltas(db, po.project_id, deltas)
+    return [t[0] for t in totals]
+
+
+def rebuild_commitments(db: Session, project_id: int) -> int:
+    """Recalcula el rollup de un proyecto desde las líneas de OC. Devuelve filas escritas."""
+    db.execute(delete(CommitmentRollup).where(CommitmentRollup.project_id == project_id))
+    src = select(
+        PurchaseOrder.project_id,
+        PurchaseOrderLine.item_id,
+        func.coalesce(PurchaseOrder.status, "created"),
+        func.coalesce(func.sum(PurchaseOrderLine.qty), 0),
+        func.coalesce(func.sum(PurchaseOrderLine.qty * PurchaseOrderLine.unit_price), 0),
+    ).join(PurchaseOrderLine, PurchaseOrderLine.po_id == PurchaseOrder.id) \
+        .where(PurchaseOrder.project_id == project_id, PurchaseOrderLine.item_id.isnot(None)) \
+        .group_by(PurchaseOrder.project_id, PurchaseOrderLine.item_id, func.coalesce(PurchaseOrder.status, "created"))
+    result = db.execute(insert(CommitmentRollup).from_select(
+        ["project_id", "item_id", "status", "qty", "amount"], src))
+    db.commit()
+    return result.rowcount or 0
+
+
+def _variance_rows(db: Session, project_id: int, item_ids: list[int] | None = None):
+    firm = CommitmentRollup.status.in_(COMMITTED_STATUSES)
+    rollup = select(
+        CommitmentRollup.item_id.label("item_id"),
+        func.sum(case((firm, CommitmentRollup.amount), else_=0)).label("committed"),
+        func.sum(case((firm, CommitmentRollup.qty), else_=0)).label("committed_qty"),
+        func.sum(case((CommitmentRollup.status == "created", CommitmentRollup.amount), else_=0)).label("pending"),
+        *[func.sum(case((CommitmentRollup.status == s, CommitmentRollup.amount), else_=0)).label(f"status_{s}")
+          for s in PO_STATUSES],
+    ).where(CommitmentRollup.project_id == project_id).group_by(CommitmentRollup.item_id).subquery()
+    q = db.query(
+        Item.id, Item.code, Item.name, Item.quantity, Item.price,
+        Chapter.id.label("chapter_id"), Chapter.code.label("chapter_code"), Chapter.name.label("chapter_name"),
+        rollup,
+    ).join(Chapter, Chapter.id == Item.chapter_id) \
+        .outerjoin(rollup, rollup.c.item_id == Item.id) \
+        .filter(Chapter.project_id == project_id, Chapter.deleted_at.is_(None), Item.deleted_at.is_(None))
+    if item_ids is not None:
+        q = q.filter(Item.id.in_(item_ids))
+    return q.order_by(Chapter.id, Item.id).all()
+
+
+def _dec(v) -> Decimal:
+    return Decimal(str(v)) if v is not None else Decimal("0")
+
+
+def _item_row(r) -> dict:
+    budget = _dec(r.quantity) * _dec(r.price)
+    committed, pending = _dec(r.committed), _dec(r.pending)
+    return {
+        "item_id": r.id,
+        "code": r.code,
+        "name": r.name,
+        "chapter_id": r.chapter_id,
+        "budget_qty": float(_dec(r.quantity)),
+        "budget": float(budget),
+        "committed_qty": float(_dec(r.committed_qty)),
+        "committed": float(committed),
+        "pending": float(pending),
+        "by_status": {s: float(_dec(getattr(r, f"status_{s}"))) for s in PO_STATUSES},
+        "variance": float(budget - committed),
+        "committed_ratio": float(committed / budget) if budget else None,
+        "over_committed": committed - budget > TOLERANCE,
+        "over_committed_with_pending": committed + pending - budget > TOLERANCE,
+    }
+
+
+def over_committed_items(db: Session, project_id: int, item_ids: list[int] | None = None) -> list[dict]:
+    """Ítems cuyo comprometido firme supera el presupuesto (opcionalmente solo ``item_ids``)."""
+    if item_ids is not None and not item_ids:
+        return []
+    return [row for row in map(_item_row, _variance_rows(db, project_id, item_ids)) if row["over_committed"]]
+
+
+def commitment_variance(db: Session, project_id: int, only_over: bool = False) -> dict:
+    """Tabla de variaciones presupuesto vs comprometido por ítem, capítulo y proyecto."""
+    rows = _variance_rows(db, project_id)
+    items = [_item_row(r) for r in rows]
+    meta = {r.chapter_id: (r.chapter_code, r.chapter_name) for r in rows}
+    chapters: dict[int, dict] = {}
+    keys = ("budget", "committed", "pending", "variance")
+    totals = {k: 0.0 for k in keys}
+    for it in items:
+        ch = chapters.setdefault(it["chapter_id"], {
+            "chapter_id": it["chapter_id"], "code": meta[it["chapter_id"]][0], "name": meta[it["chapter_id"]][1],
+            **{k: 0.0 for k in keys}, "over_committed_items": 0,
+        })
+        for k in keys:
+            ch[k] += it[k]
+            totals[k] += it[k]
+        ch["over_committed_items"] += int(it["over_committed"])
+    for ch in chapters.values():
+        ch["over_committed"] = ch["committed"] - ch["budget"] > float(TOLERANCE)
+    over = [it for it in items if it["over_committed"]]
+    return {
+        "project_id": project_id,
+        "totals": {**totals, "over_committed": totals["committed"] - totals["budget"] > float(TOLERANCE),
+                   "over_committed_items": len(over)},
+        "chapters": list(chapters.values()),
+        "items": over if only_over else items,
+    }
@@ -0,0 +1,104 @@
+"""Libro diario de costo real (AC) por proyecto.
+
+Fuentes:
+ - ``po``: total de la OC el día en que entra por primera vez en ``COST_PO_STATUSES``
+   (``costed_at``; una sola vez aunque después pase a ``received``/``closed``).
+ - ``payment``: pagos registrados (``InvoicePayment``) el día del pago.
+
+Cada costo se acumula en ``cost_ledger_days`` (proyecto, día, fuente) con un upsert
+en la misma transacción que el evento, de modo que la serie diaria siempre está
+precalculada y el EVM no recorre filas crudas. ``rebuild_cost_ledger`` (y el backfill de
+las migraciones) la recalcula con el mismo conjunto de estados y la misma fecha, así el
+resultado coincide con el incremental.
+"""
+from __future__ import annotations
+from datetime import date, datetime
+from decimal import Decimal
+from sqlalchemy.orm import Session
+from sqlalchemy import select, func, delete
+from app.db.models.cost import CostLedgerDay
+from app.db.models.purchases import PurchaseOrder, PurchaseOrderLine
+from app.db.models.versioning import Invoice, InvoicePayment
+from app.db.upsert import upsert_add
+
+# Estados de OC que generan costo real (una OC cerrada sigue siendo costo incurrido)
+COST_PO_STATUSES = ("approved", "received", "closed")
+SOURCES = ("po", "payment")
+
+
+def record_costs(db: Session, entries: list[dict]) -> None:
+    """Acumula ``entries`` (project_id, day, source, amount) en el libro diario (sin commit)."""
+    merged: dict[tuple, Decimal] = {}
+    for e in entries:
+        day = e.get("day") or datetime.utcnow().date()
+        key = (int(e["project_id"]), day, e["source"])
+        merged[key] = merged.get(key, Decimal("0")) + Decimal(str(e["amount"] or 0))
+    upsert_add(db, CostLedgerDay.__table__, [
+        {"project_id": pid, "day": day, "source": source, "amount": amount}
+        for (pid, day, source), amount in merged.items() if amount
+    ], keys=["project_id", "day", "source"], add=["amount"])
+
+
+def po_total(db: Session, po_id: int) -> Decimal:
+    total = db.query(func.coalesce(func.sum(PurchaseOrderLine.qty * PurchaseOrderLine.unit_price), 0)) \
+        .filter(PurchaseOrderLine.po_id == po_id).scalar()
+    return Decimal(str(total or 0))
+
+
+def record_po_cost(db: Session, po: PurchaseOrder, old_status: str | None, day: date | None = None) -> None:
+    """Registra el costo de la OC la primera vez que entra en un estado de costo (sin commit)."""
+    if po.status not in COST_PO_STATUSES or old_status in COST_PO_STATUSES or po.costed_at is not None:
+        return
+    po.costed_at = datetime.utcnow()
+    day = day or po.costed_at.date()
+    record_costs(db, [{"project_id": po.project_id, "day": day, "source": "po", "amount": po_total(db, po.id)}])
+
+
+def rebuild_cost_ledger(db: Session, project_id: int) -> None:
+    """Recalcula la serie del proyecto: OC en estado de costo (por ``costed_at``) y pagos."""
+    db.execute(delete(CostLedgerDay).where(CostLedgerDay.project_id == project_id))
+    # date() existe en Postgres y SQLite; el valor crudo se normaliza con _as_date.
+    # OC anteriores a costed_at: la fecha de creación es lo único que se conoce
+    po_day = func.date(func.coalesce(PurchaseOrder.costed_at, PurchaseOrder.created_at))
+    po_rows = db.execute(
+        select(po_day, func.sum(PurchaseOrderLine.qty * PurchaseOrderLine.unit_price))
+        .join(PurchaseOrderLine, PurchaseOrderLine.po_id == PurchaseOrder.id)
+        .where(PurchaseOrder.project_id == project_id, PurchaseOrder.status.in_(COST_PO_STATUSES))
+        .group_by(po_day)
+    ).all()
+    pay_day = func.date(InvoicePayment.created_at)
+    pay_rows = db.execute(
+        select(pay_day, func.sum(InvoicePayment.amount))
+        .join(Invoice, Invoice.id == InvoicePayment.invoice_id)
+        .where(Invoice.project_id == project_id)
+        .group_by(pay_day)
+    ).all()
+    record_costs(db, [
+        {"project_id": project_id, "day": _as_date(d), "source": source, "amount": amount}
+        for source, rows in (("po", po_rows), ("payment", pay_rows)) for d, amount in rows if d is not None
+    ])
+    db.commit()
+
+
+def _as_date(v) -> date:
+    return v if isinstance(v, date) else date.fromisoformat(str(v)[:10])
+
+
+def daily_series(db: Session, project_id: int, until: date | None = None) -> list[dict]:
+    """Serie diaria de AC (por fuente y acumulada) desde el libro precalculado, hasta ``until`` inclusive."""
+    q = db.query(CostLedgerDay.day, CostLedgerDay.source, CostLedgerDay.amount) \
+        .filter(CostLedgerDay.project_id == project_id)
+    if until is not None:
+        q = q.filter(CostLedgerDay.day <= until)
+    rows = q.order_by(CostLedgerDay.day).all()
+    series: list[dict] = []
+    cumulative = 0.0
+    for day, source, amount in rows:
+        if not series or series[-1]["day"] != day:
+            series.append({"day": day, **{s: 0.0 for s in SOURCES}, "amount": 0.0, "cumulative": cumulative})
+        point = series[-1]
+        point[source] = point.get(source, 0.0) + float(amount or 0)
+        point["amount"] += float(amount or 0)
+        cumulative += float(amount or 0)
+        point["cumulative"] = cumulative
+    return series
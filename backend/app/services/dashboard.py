@@ -0,0 +1,263 @@
+"""Dashboard de proyecto por fragmentos y feed en vivo de deltas.
+
+El dashboard se arma con fragmentos independientes (``budget``, ``finance``, ``risks``,
+``workflows``). Cada evento de dominio afecta solo a algunos (``FRAGMENT_EVENTS``): el
+consumidor ``dashboard`` recalcula esos fragmentos una vez por lote de eventos y por
+proyecto, compara con la última versión publicada (caché compartida
+``dashboard:fragment:*``) y emite solo las claves que cambiaron por Redis pub/sub
+(``dashboard:live:{id}``).
+
+En cada proceso de la API un único listener de pub/sub (``LiveHub``) reparte los deltas a
+las colas de las conexiones SSE/WebSocket abiertas: una suscripción Redis por worker, no
+por espectador, y el recálculo ocurre una vez por cambio, no por conexión. Solo se
+recalculan proyectos con espectadores: cada conexión abierta refresca
+``dashboard:viewers:{id}`` (``mark_watched``) al menos una vez por heartbeat; sin
+conexiones la marca expira y los eventos ya no recalculan nada.
+"""
+from __future__ import annotations
+import asyncio
+import json
+import logging
+import threading
+from datetime import datetime, timezone
+from sqlalchemy.orm import Session
+from sqlalchemy import func, case
+from app.core.cache import get_cache
+from app.core.settings import get_settings
+from app.db.models.budget import Chapter, Item, MeasurementBatch, MeasurementLine
+from app.db.models.risk import Risk
+from app.services.events import HEARTBEAT_MS
+from app.services.finance import financial_metrics
+from app.services.schedule import baseline_version_id, pv_at
+from app.services.workflows import pending_by_role, invalidate_pending
+
+logger = logging.getLogger(__name__)
+
+FRAGMENTS = ("budget", "finance", "risks", "workflows")
+# prefijo de tipo de evento -> fragmentos afectados
+FRAGMENT_EVENTS = {
+    "budget.": ("budget",),
+    "measurement.": ("budget",),
+    "version.": ("budget",),
+    "invoice.": ("finance",),
+    "risk.": ("risks",),
+    "workflow.": ("workflows",),
+}
+LIVE_TTL = 600  # última versión publicada de cada fragmento (base de los deltas)
+VIEWER_TTL = 3 * HEARTBEAT_MS // 1000  # presencia de espectadores: sobrevive a dos heartbeats perdidos
+CHANNEL_PREFIX = "dashboard:live:"
+QUEUE_SIZE = 64
+
+
+def _float(x) -> float:
+    try:
+        return float(x or 0)
+    except Exception:
+        return 0.0
+
+
+def budget_fragment(db: Session, project_id: int) -> dict:
+    pv = db.query(func.coalesce(func.sum(Item.quantity * Item.price), 0)) \
+        .join(Chapter, Item.chapter_id == Chapter.id) \
+        .filter(Chapter.project_id == project_id, Chapter.deleted_at.is_(None), Item.deleted_at.is_(None)).scalar() or 0
+    # Valor ganado (EV) usando solo batches cerrados
+    ev = db.query(func.coalesce(func.sum(MeasurementLine.qty * Item.price), 0)) \
+        .join(MeasurementBatch, MeasurementLine.batch_id == MeasurementBatch.id) \
+        .join(Item, Item.id == MeasurementLine.item_id) \
+        .join(Chapter, Chapter.id == Item.chapter_id) \
+        .filter(MeasurementBatch.project_id == project_id, MeasurementBatch.status == 'closed',
+                Chapter.project_id == project_id, Chapter.deleted_at.is_(None), Item.deleted_at.is_(None)).scalar() or 0
+    # PV a la fecha desde el calendario de la línea base (None si no hay calendario)
+    baseline = baseline_version_id(db, project_id)
+    pv_to_date = pv_at(db, baseline, datetime.utcnow().date()) if baseline else None
+    return {
+        'pv': _float(pv),
+        'ev': _float(ev),
+        'progress_percent': (_float(ev) / _float(pv) * 100) if pv else 0.0,
+        'pv_to_date': pv_to_date,
+        'spi': (_float(ev) / pv_to_date) if pv_to_date else None,
+    }
+
+
+def risks_fragment(db: Session, project_id: int) -> dict:
+    counts = db.query(
+        func.coalesce(func.sum(case((Risk.status == 'open', 1), else_=0)), 0).label('open'),
+        func.coalesce(func.sum(case((Risk.status == 'mitigating', 1), else_=0)), 0).label('mitigating'),
+        func.coalesce(func.sum(case((Risk.status == 'closed', 1), else_=0)), 0).label('closed'),
+    ).filter(Risk.project_id == project_id).one()
+    return {'open': int(counts.open), 'mitigating': int(counts.mitigating), 'closed': int(counts.closed)}
+
+
+def workflows_fragment(db: Session, project_id: int) -> dict:
+    """Compartido entre espectadores; ``pending_steps`` del usuario lo deriva ``for_user``."""
+    by_role = pending_by_role(db, project_id)
+    return {'pending_steps_total': sum(by_role.values()), 'pending_by_role': by_role}
+
+
+COMPUTE = {
+    "budget": budget_fragment,
+    "finance": lambda db, pid: financial_metrics(db, pid),
+    "risks": risks_fragment,
+    "workflows": workflows_fragment,
+}
+
+
+def for_user(fragments: dict, roles: list[str]) -> dict:
+    """Agrega a ``workflows`` los pasos pendientes de los roles del usuario."""
+    wf = fragments.get("workflows")
+    if wf is None:
+        return fragments
+    by_role = wf.get("pending_by_role") or {}
+    return {**fragments, "workflows": {**wf, "pending_steps": sum(by_role.get(r, 0) for r in roles)}}
+
+
+def fragments_for(event_types) -> set[str]:
+    out: set[str] = set()
+    for t in event_types:
+        for prefix, frags in FRAGMENT_EVENTS.items():
+            if t.startswith(prefix):
+                out.update(frags)
+    return out
+
+
+def _live_key(project_id: int, fragment: str) -> str:
+    return f"dashboard:fragment:{project_id}:{fragment}"
+
+
+def _viewers_key(project_id: int) -> str:
+    return f"dashboard:viewers:{project_id}"
+
+
+def mark_watched(project_id: int) -> None:
+    """Hay al menos una conexión en vivo abierta sobre el proyecto (expira en ``VIEWER_TTL``)."""
+    get_cache().set(_viewers_key(project_id), 1, VIEWER_TTL)
+
+
+def is_watched(project_id: int) -> bool:
+    return get_cache().get(_viewers_key(project_id)) is not None
+
+
+def live_snapshot(db: Session, project_id: int) -> dict:
+    """Todos los fragmentos (desde la caché o calculados); deja al proyecto marcado como observado."""
+    mark_watched(project_id)
+    cache = get_cache()
+    out = {}
+    for name in FRAGMENTS:
+        value = cache.get(_live_key(project_id, name))
+        if value is None:
+            value = json.loads(json.dumps(COMPUTE[name](db, project_id), default=str))
+            cache.set(_live_key(project_id, name), value, LIVE_TTL)
+        out[name] = value
+    return out
+
+
+def refresh_fragments(db: Session, project_id: int, fragments) -> dict:
+    """Recalcula los fragmentos de un proyecto observado y devuelve solo las claves que cambiaron."""
+    if not is_watched(project_id):
+        return {}  # nadie lo está mirando
+    cache = get_cache()
+    delta = {}
+    for name in fragments:
+        old = cache.get(_live_key(project_id, name)) or {}
+        new = json.loads(json.dumps(COMPUTE[name](db, project_id), default=str))
+        cache.set(_live_key(project_id, name), new, LIVE_TTL)
+        changed = {k: v for k, v in new.items() if old.get(k) != v}
+        if changed:
+            delta[name] = changed
+    return delta
+
+
+def apply_events(db: Session, events: list[dict]) -> None:
+    """Consumidor ``dashboard``: un recálculo por proyecto y lote, y publicación del delta."""
+    by_project: dict[int, set[str]] = {}
+    for ev in events:
+        by_project.setdefault(ev["project_id"], set()).add(ev["type"])
+    for project_id, types in by_project.items():
+        if any(t.startswith("workflow.") for t in types):
+            invalidate_pending(project_id)
+        delta = refresh_fragments(db, project_id, fragments_for(types))
+        if delta:
+            publish_delta(project_id, {"type": "dashboard.delta", "project_id": project_id, "fragments": delta,
+                                       "ts": datetime.now(timezone.utc).isoformat()})
+
+
+class _Subscriber:
+    def __init__(self, project_id: int):
+        self.project_id = project_id
+        self.loop = asyncio.get_running_loop()
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=QUEUE_SIZE)
+
+    def offer(self, message: dict) -> None:
+        try:
+            self.queue.put_nowait(message)
+        except asyncio.QueueFull:
+            # espectador lento: se descartan los deltas y se le pide un snapshot completo
+            while not self.queue.empty():
+                self.queue.get_nowait()
+            self.queue.put_nowait({"type": "dashboard.resync", "project_id": self.project_id})
+
+
+class LiveHub:
+    """Reparte deltas a las conexiones abiertas en este proceso."""
+
+    def __init__(self):
+        self._subs: dict[int, set[_Subscriber]] = {}
+        self._lock = threading.Lock()
+        self._listener: asyncio.Task | None = None
+
+    async def subscribe(self, project_id: int) -> _Subscriber:
+        sub = _Subscriber(project_id)
+        with self._lock:
+            self._subs.setdefault(project_id, set()).add(sub)
+        if get_settings().realtime_backend != "memory" and (self._listener is None or self._listener.done()):
+            self._listener = asyncio.create_task(self._listen())
+        return sub
+
+    def unsubscribe(self, sub: _Subscriber) -> None:
+        with self._lock:
+            subs = self._subs.get(sub.project_id)
+            if subs:
+                subs.discard(sub)
+                if not subs:
+                    self._subs.pop(sub.project_id, None)
+
+    def viewers(self, project_id: int) -> int:
+        with self._lock:
+            return len(self._subs.get(project_id, ()))
+
+    def deliver(self, project_id: int, message: dict) -> None:
+        """Seguro desde cualquier hilo: cada cola se alimenta en el loop de su conexión."""
+        with self._lock:
+            subs = list(self._subs.get(project_id, ()))
+        for sub in subs:
+            sub.loop.call_soon_threadsafe(sub.offer, message)
+
+    async def _listen(self) -> None:
+        from app.core.redis import get_async_redis
+        pubsub = get_async_redis().pubsub()
+        await pubsub.psubscribe(f"{CHANNEL_PREFIX}*")
+        try:
+            async for msg in pubsub.listen():
+                if msg.get("type") != "pmessage":
+                    continue
+                try:
+                    data = json.loads(msg["data"])
+                    self.deliver(int(data["project_id"]), data)
+                except Exception:
+                    logger.exception("delta de dashboard inválido")
+        finally:
+            await pubsub.aclose()
+
+
+hub = LiveHub()
+
+
+def publish_delta(project_id: int, message: dict) -> None:
+    if get_settings().realtime_backend == "memory":
+        hub.deliver(project_id, message)
+        return
+    from app.core.redis import get_redis
+    try:
+        get_redis().publish(f"{CHANNEL_PREFIX}{project_id}", json.dumps(message, default=str))
+    except Exception as e:
+        logger.warning("no se pudo publicar delta del dashboard %s: %s", project_id, e)
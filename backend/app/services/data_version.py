@@ -0,0 +1,96 @@
+"""Versión de los datos que lee cada job (para deduplicar envíos).
+
+No hay un contador de cambios por proyecto (muchas escrituras son inserts masivos que no
+pasan por el ORM), así que la versión es un hash de las filas que la exportación va a
+leer, como ``forecast.input_hash``: consultas de columnas, mucho más baratas que generar
+el XLSX/PDF. Si cambia cualquier dato que el job usa, cambia la versión.
+"""
+from __future__ import annotations
+import hashlib
+from datetime import datetime
+from typing import Callable, Iterable
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+from app.db.models.budget import Chapter, Item, MeasurementBatch, MeasurementLine
+from app.db.models.cost import CostLedgerDay
+from app.db.models.measurement import Measurement
+from app.db.models.project import Project
+from app.db.models.versioning import BudgetVersionItem
+from app.services.schedule import schedule_revision
+
+
+def _digest(*parts: Iterable) -> str:
+    h = hashlib.sha256()
+    for rows in parts:
+        for row in rows:
+            h.update(repr(tuple(row)).encode("utf-8"))
+        h.update(b"\x00")
+    return h.hexdigest()[:32]
+
+
+def _project_row(db: Session, project_id: int):
+    return db.query(Project.id, Project.name).filter(Project.id == project_id).all()
+
+
+def budget_version(db: Session, project_id: int) -> str:
+    """Capítulos e ítems del proyecto (los de ``export_budget_excel``/``export_budget_pdf``)."""
+    rows = db.query(Chapter.id, Chapter.code, Chapter.name, Chapter.deleted_at, Item.id, Item.code, Item.name,
+                    Item.unit, Item.quantity, Item.price, Item.deleted_at) \
+        .outerjoin(Item, Item.chapter_id == Chapter.id) \
+        .filter(Chapter.project_id == project_id) \
+        .order_by(Chapter.id, Item.id)
+    return _digest(_project_row(db, project_id), rows.yield_per(5000))
+
+
+def measurements_version(db: Session, project_id: int) -> str:
+    """Ítems con sus totales medidos (los de ``export_measurements_excel``)."""
+    rows = db.query(Item.id, Item.code, Item.name, Item.unit, Item.price,
+                    func.count(Measurement.id), func.sum(Measurement.qty), func.max(Measurement.id)) \
+        .join(Chapter, Chapter.id == Item.chapter_id) \
+        .outerjoin(Measurement, Measurement.item_id == Item.id) \
+        .filter(Chapter.project_id == project_id) \
+        .group_by(Item.id, Item.code, Item.name, Item.unit, Item.price) \
+        .order_by(Item.id)
+    return _digest(rows.yield_per(5000))
+
+
+def versions_diff_version(db: Session, v_from: int, v_to: int) -> str:
+    rows = db.query(BudgetVersionItem.version_id, BudgetVersionItem.chapter_code, BudgetVersionItem.item_code,
+                    BudgetVersionItem.item_name, BudgetVersionItem.unit, BudgetVersionItem.qty,
+                    BudgetVersionItem.unit_price) \
+        .filter(BudgetVersionItem.version_id.in_([v_from, v_to])) \
+        .order_by(BudgetVersionItem.version_id, BudgetVersionItem.id)
+    return _digest(rows.yield_per(5000))
+
+
+def evm_version(db: Session, project_id: int) -> str:
+    """Entradas de ``evm_metrics``: ítems, batches cerrados, libro de costos, calendario base y la fecha."""
+    items = db.query(Item.id, Item.quantity, Item.price, Item.deleted_at) \
+        .join(Chapter, Chapter.id == Item.chapter_id).filter(Chapter.project_id == project_id).order_by(Item.id)
+    batches = db.query(MeasurementBatch.id, MeasurementBatch.status, MeasurementBatch.created_at,
+                       func.count(MeasurementLine.id), func.sum(MeasurementLine.qty), func.max(MeasurementLine.id)) \
+        .outerjoin(MeasurementLine, MeasurementLine.batch_id == MeasurementBatch.id) \
+        .filter(MeasurementBatch.project_id == project_id) \
+        .group_by(MeasurementBatch.id, MeasurementBatch.status, MeasurementBatch.created_at).order_by(MeasurementBatch.id)
+    ledger = db.query(CostLedgerDay.day, CostLedgerDay.source, CostLedgerDay.amount) \
+        .filter(CostLedgerDay.project_id == project_id).order_by(CostLedgerDay.day, CostLedgerDay.source)
+    baseline = db.query(Project.baseline_version_id).filter(Project.id == project_id).scalar()
+    schedule = [(schedule_revision(db, baseline),)] if baseline else []
+    # PV(t) depende del día de corte: la versión cambia cada día
+    return _digest([(datetime.utcnow().date(), baseline)], items.yield_per(5000), batches, ledger, schedule)
+
+
+# tipo de job -> versión de sus datos a partir de los mismos kwargs del job
+VERSIONS: dict[str, Callable[..., str]] = {
+    "export_budget_excel": lambda db, project_id: budget_version(db, project_id),
+    "export_budget_pdf": lambda db, project_id: budget_version(db, project_id),
+    "export_measurements_excel": lambda db, project_id: measurements_version(db, project_id),
+    "export_versions_diff_excel": lambda db, v_from, v_to: versions_diff_version(db, v_from, v_to),
+    "evm_curves": lambda db, project_id: evm_version(db, project_id),
+}
+
+
+def data_version(db: Session, job_type: str, **params) -> str | None:
+    """Versión de los datos del job; None si el tipo no se deduplica."""
+    fn = VERSIONS.get(job_type)
+    return fn(db, **params) if fn is not None else None
@@ -0,0 +1,193 @@
+"""Consumidores de ``events:all`` (un grupo de Redis Streams por consumidor).
+
+- ``notifications``: avisa a los usuarios con el rol del paso pendiente y al creador
+  de la instancia cuando el workflow termina.
+- ``dashboard``: recalcula los fragmentos del dashboard afectados y publica el delta
+  (por lote de eventos, ver ``app.services.dashboard``).
+- ``auto_advance``: aprueba automáticamente el paso pendiente si una regla del tipo de
+  entidad lo permite (``AUTO_ADVANCE_RULES``).
+- ``reports``: encola el precálculo de los reportes del proyecto al cerrar un batch de
+  mediciones o fijar la línea base (``app.services.reports``).
+
+Producción: ``python -m app.services.event_consumers [grupo ...]`` (un hilo por grupo,
+XREADGROUP + XACK; lo no confirmado se reintenta al reiniciar). Con
+``realtime_backend=memory`` ``dispatch`` se llama inline desde ``events.publish``.
+"""
+from __future__ import annotations
+import argparse
+import json
+import logging
+import socket
+import threading
+from typing import Callable
+from sqlalchemy.orm import Session
+from sqlalchemy import insert
+from app.core.settings import get_settings
+from app.db.models.audit import UserProjectRole
+from app.db.models.notification import Notification
+from app.db.models.purchases import PurchaseOrder
+from app.db.models.versioning import WorkflowInstance
+from app.services.cost_ledger import po_total
+from app.services.events import ALL_STREAM
+
+logger = logging.getLogger(__name__)
+
+CONSUMERS: dict[str, Callable] = {}
+# grupos cuyo handler recibe la lista de eventos del lote en vez de uno a uno
+BATCH_CONSUMERS: set[str] = set()
+# entity_type -> regla(db, evento) -> True si el paso pendiente se aprueba solo
+AUTO_ADVANCE_RULES: dict[str, Callable[[Session, dict], bool]] = {}
+
+
+def consumer(group: str, batch: bool = False):
+    def register(fn):
+        CONSUMERS[group] = fn
+        if batch:
+            BATCH_CONSUMERS.add(group)
+        return fn
+    return register
+
+
+def auto_advance_rule(entity_type: str):
+    def register(fn):
+        AUTO_ADVANCE_RULES[entity_type] = fn
+        return fn
+    return register
+
+
+@consumer("notifications")
+def notify(db: Session, event: dict) -> None:
+    data = event["data"]
+    if event["type"] == "workflow.step_pending":
+        users = [u for (u,) in db.query(UserProjectRole.user_id).filter(
+            UserProjectRole.project_id == event["project_id"], UserProjectRole.role == data.get("role_required")
+        ).distinct().all()]
+    elif event["type"] == "workflow.completed":
+        users = [u for (u,) in db.query(WorkflowInstance.created_by).filter(WorkflowInstance.id == event["entity_id"]).all()]
+    else:
+        return
+    rows = [
+        {"user_id": u, "project_id": event["project_id"], "kind": event["type"], "entity": event["entity"],
+         "entity_id": event["entity_id"], "data": data}
+        for u in users if u is not None and u != event.get("user_id")
+    ]
+    if rows:
+        db.execute(insert(Notification), rows)
+        db.commit()
+
+
+@consumer("dashboard", batch=True)
+def dashboard_deltas(db: Session, events: list[dict]) -> None:
+    from app.services.dashboard import apply_events
+    apply_events(db, events)
+
+
+@consumer("auto_advance")
+def auto_advance(db: Session, event: dict) -> None:
+    if event["type"] != "workflow.step_pending":
+        return
+    rule = AUTO_ADVANCE_RULES.get(event["data"].get("entity_type"))
+    if rule is None or not rule(db, event):
+        return
+    from app.services.workflows import decide_many
+    current = db.query(WorkflowInstance.current_step, WorkflowInstance.status) \
+        .filter(WorkflowInstance.id == event["entity_id"]).first()
+    if current is None or current.status != "running" or current.current_step != event["data"].get("step"):
+        return  # ya lo decidió alguien
+    decide_many(db, None, [event["entity_id"]], "approve", comment="Aprobación automática", system=True)
+
+
+@consumer("reports")
+def precompute_reports(db: Session, event: dict) -> None:
+    settings = get_settings()
+    if not (settings.reports_precompute_enabled and settings.reports_on_batch_close):
+        return
+    from app.services.reports import TRIGGERS, precompute_project
+    if event["type"] in TRIGGERS:
+        precompute_project(db, event["project_id"])
+
+
+@auto_advance_rule("purchase_order")
+def small_purchase_order(db: Session, event: dict) -> bool:
+    limit = get_settings().workflow_auto_approve_po_max
+    if limit <= 0:
+        return False
+    po = db.query(PurchaseOrder.id).filter(PurchaseOrder.id == event["data"].get("entity_id"),
+                                          PurchaseOrder.project_id == event["project_id"]).first()
+    return po is not None and po_total(db, po.id) <= limit
+
+
+def dispatch(db: Session, events: list[dict], groups: list[str] | None = None) -> None:
+    """Ejecuta los consumidores en el proceso actual (backend en memoria)."""
+    for group in groups or list(CONSUMERS):
+        handler = CONSUMERS[group]
+        for arg in ([events] if group in BATCH_CONSUMERS else events):
+            try:
+                handler(db, arg)
+            except Exception:
+                logger.exception("consumidor %s falló", group)
+                db.rollback()
+
+
+def _run_group(group: str, consumer_name: str, block_ms: int) -> None:
+    from redis.exceptions import ResponseError
+    from app.core.redis import get_redis
+    from app.db.session import SessionLocal
+    r = get_redis()
+    try:
+        r.xgroup_create(ALL_STREAM, group, id="$", mkstream=True)
+    except ResponseError as e:
+        if "BUSYGROUP" not in str(e):
+            raise
+    pending_from: str | None = "0"  # primero lo pendiente de este consumidor (reinicio)
+    handler = CONSUMERS[group]
+    while True:
+        res = r.xreadgroup(group, consumer_name, {ALL_STREAM: pending_from or ">"}, count=100, block=block_ms)
+        entries = [e for _, batch in res for e in batch]
+        if pending_from is not None and not entries:
+            pending_from = None
+            continue
+        db = SessionLocal()
+        try:
+            if group in BATCH_CONSUMERS and entries:
+                try:
+                    handler(db, [json.loads(f["event"]) for _, f in entries])
+                    r.xack(ALL_STREAM, group, *[sid for sid, _ in entries])
+                except Exception:
+                    logger.exception("consumidor %s falló en lote; queda pendiente", group)
+                    db.rollback()
+            else:
+                for sid, fields in entries:
+                    try:
+                        handler(db, json.loads(fields["event"]))
+                    except Exception:
+                        logger.exception("consumidor %s falló en %s; queda pendiente", group, sid)
+                        db.rollback()
+                        continue
+                    r.xack(ALL_STREAM, group, sid)
+        finally:
+            db.close()
+        if pending_from is not None:
+            pending_from = entries[-1][0]
+
+
+def run(groups: list[str] | None = None, consumer_name: str | None = None, block_ms: int = 5000) -> None:
+    consumer_name = consumer_name or socket.gethostname()
+    threads = [threading.Thread(target=_run_group, args=(g, consumer_name, block_ms), name=f"events-{g}", daemon=True)
+               for g in groups or list(CONSUMERS)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Consumidores de eventos de dominio")
+    parser.add_argument("groups", nargs="*", help=f"grupos a ejecutar: {', '.join(CONSUMERS)} (default: todos)")
+    parser.add_argument("--consumer", default=None, help="nombre del consumidor dentro del grupo")
+    args = parser.parse_args()
+    unknown = set(args.groups) - set(CONSUMERS)
+    if unknown:
+        parser.error(f"grupos desconocidos: {', '.join(sorted(unknown))}")
+    logging.basicConfig(level=logging.INFO)
+    run(args.groups or None, args.consumer)
@@ -0,0 +1,183 @@
+"""Bus de eventos de dominio sobre Redis Streams.
+
+Cada evento se agrega (XADD con MAXLEN aproximado) a dos streams:
+
+- ``events:all``: lo leen los consumidores con grupos (notificaciones, deltas del
+  dashboard, avance automático), ver ``app.services.event_consumers``;
+- ``events:project:{id}``: lo leen las suscripciones SSE/WebSocket de la UI, que
+  reanudan desde el último id recibido (``Last-Event-ID``).
+
+Con ``realtime_backend=memory`` (dev/tests, un proceso) los streams viven en memoria y
+los consumidores se ejecutan inline al publicar, con la misma sesión de BD.
+
+Publicar nunca rompe la operación de negocio: si Redis no responde se registra y sigue.
+"""
+from __future__ import annotations
+import asyncio
+import json
+import logging
+import threading
+import time
+from collections import deque
+from datetime import datetime, timezone
+from typing import AsyncIterator
+from sqlalchemy.orm import Session
+from app.core.settings import get_settings
+
+logger = logging.getLogger(__name__)
+
+ALL_STREAM = "events:all"
+HEARTBEAT_MS = 15000
+
+
+def project_stream(project_id: int) -> str:
+    return f"events:project:{project_id}"
+
+
+def make_event(type_: str, project_id: int, entity: str, entity_id: int | None, data: dict | None = None,
+               user_id: int | None = None) -> dict:
+    return {
+        "type": type_,
+        "project_id": project_id,
+        "entity": entity,
+        "entity_id": entity_id,
+        "user_id": user_id,
+        "data": data or {},
+        "ts": datetime.now(timezone.utc).isoformat(),
+    }
+
+
+def _id_key(stream_id: str) -> tuple[int, int]:
+    ms, _, seq = stream_id.partition("-")
+    return int(ms), int(seq or 0)
+
+
+class MemoryBus:
+    """Streams en memoria con ids al estilo Redis (``ms-seq``)."""
+
+    def __init__(self, maxlen: int):
+        self._streams: dict[str, deque] = {}
+        self._maxlen = maxlen
+        self._lock = threading.Lock()
+        self._last = (0, 0)
+
+    def _next_id(self) -> str:
+        ms = int(time.time() * 1000)
+        last_ms, last_seq = self._last
+        self._last = (ms, 0) if ms > last_ms else (last_ms, last_seq + 1)
+        return f"{self._last[0]}-{self._last[1]}"
+
+    def append(self, events: list[dict]) -> list[str]:
+        ids = []
+        with self._lock:
+            for ev in events:
+                for stream in (ALL_STREAM, project_stream(ev["project_id"])):
+                    sid = self._next_id()
+                    self._streams.setdefault(stream, deque(maxlen=self._maxlen)).append((sid, ev))
+                ids.append(sid)
+        return ids
+
+    def read(self, stream: str, after: str | None, count: int = 100) -> list[tuple[str, dict]]:
+        with self._lock:
+            entries = list(self._streams.get(stream, ()))
+        if after:
+            key = _id_key(after)
+            entries = [e for e in entries if _id_key(e[0]) > key]
+        return entries[:count]
+
+    def last_id(self, stream: str) -> str:
+        with self._lock:
+            entries = self._streams.get(stream)
+            return entries[-1][0] if entries else "0-0"
+
+    async def subscribe(self, stream: str, after: str, block_ms: int) -> list[tuple[str, dict]]:
+        deadline = time.monotonic() + block_ms / 1000
+        while True:
+            entries = self.read(stream, after)
+            if entries or time.monotonic() >= deadline:
+                return entries
+            await asyncio.sleep(0.05)
+
+
+class RedisBus:
+    def __init__(self, maxlen: int):
+        self._maxlen = maxlen
+
+    def append(self, events: list[dict]) -> list[str]:
+        from app.core.redis import get_redis
+        pipe = get_redis().pipeline(transaction=False)
+        for ev in events:
+            fields = {"event": json.dumps(ev, default=str)}
+            pipe.xadd(ALL_STREAM, fields, maxlen=self._maxlen, approximate=True)
+            pipe.xadd(project_stream(ev["project_id"]), fields, maxlen=self._maxlen, approximate=True)
+        ids = pipe.execute()
+        return ids[1::2]  # ids del stream del proyecto
+
+    def read(self, stream: str, after: str | None, count: int = 100) -> list[tuple[str, dict]]:
+        from app.core.redis import get_redis
+        start = f"({after}" if after else "-"
+        return [(sid, json.loads(f["event"])) for sid, f in get_redis().xrange(stream, min=start, count=count)]
+
+    def last_id(self, stream: str) -> str:
+        from app.core.redis import get_redis
+        last = get_redis().xrevrange(stream, count=1)
+        return last[0][0] if last else "0-0"
+
+    async def subscribe(self, stream: str, after: str, block_ms: int) -> list[tuple[str, dict]]:
+        from app.core.redis import get_async_redis
+        res = await get_async_redis().xread({stream: after}, block=block_ms, count=100)
+        return [(sid, json.loads(f["event"])) for _, entries in res for sid, f in entries]
+
+
+_memory_bus: MemoryBus | None = None
+
+
+def get_bus() -> MemoryBus | RedisBus:
+    global _memory_bus
+    settings = get_settings()
+    if settings.realtime_backend == "memory":
+        if _memory_bus is None:
+            _memory_bus = MemoryBus(settings.events_stream_maxlen)
+        return _memory_bus
+    return RedisBus(settings.events_stream_maxlen)
+
+
+def publish(events: list[dict], db: Session | None = None) -> None:
+    """Publica eventos ya confirmados en BD (llamar después del commit)."""
+    if not events:
+        return
+    try:
+        get_bus().append(events)
+    except Exception as e:  # el bus es best-effort: la transición ya quedó en BD
+        logger.warning("no se pudieron publicar %d eventos: %s", len(events), e)
+        return
+    if get_settings().realtime_backend == "memory" and db is not None:
+        from app.services.event_consumers import dispatch
+        dispatch(db, events)
+
+
+def emit(db: Session | None, type_: str, project_id: int, entity: str, entity_id: int | None,
+         data: dict | None = None, user_id: int | None = None) -> None:
+    """Atajo para publicar un único evento."""
+    publish([make_event(type_, project_id, entity, entity_id, data, user_id)], db)
+
+
+def recent_events(project_id: int, after: str | None = None, limit: int = 100) -> list[dict]:
+    return [{"id": sid, **ev} for sid, ev in get_bus().read(project_stream(project_id), after, limit)]
+
+
+async def subscribe(project_id: int, after: str | None = None,
+                    block_ms: int = HEARTBEAT_MS) -> AsyncIterator[list[dict]]:
+    """Lotes de eventos del proyecto desde ``after`` (o desde ahora); lote vacío = heartbeat."""
+    bus = get_bus()
+    stream = project_stream(project_id)
+    last = after or await asyncio.to_thread(bus.last_id, stream)
+    while True:
+        entries = await bus.subscribe(stream, last, block_ms)
+        if entries:
+            last = entries[-1][0]
+        yield [{"id": sid, **ev} for sid, ev in entries]
+
+
+def format_sse(event: dict) -> str:
+    return f"id: {event['id']}\nevent: {event['type']}\ndata: {json.dumps(event, default=str)}\n\n"
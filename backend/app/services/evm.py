@@ -0,0 +1,110 @@
+"""Indicadores EVM (valor ganado) por proyecto.
+
+- BAC: presupuesto vigente. PV(t): curva de la línea base con calendario
+  (``services.schedule``); sin calendario PV = BAC.
+- EV: líneas de batches de medición cerrados, en una consulta agrupada.
+- AC: serie diaria precalculada de ``cost_ledger`` (no se leen OC ni pagos crudos).
+- CPI = EV/AC, SPI = EV/PV, EAC = BAC/CPI, ETC = EAC - AC, VAC = BAC - EAC.
+
+Con ``as_of`` los tres valores se cortan en esa fecha: PV(as_of), EV de batches creados
+hasta ese día y AC del libro hasta ese día (la curva PV sigue siendo el plan completo).
+"""
+from __future__ import annotations
+from datetime import date, datetime, time, timedelta
+from sqlalchemy.orm import Session
+from sqlalchemy import func
+from app.db.models.budget import Item, Chapter, MeasurementBatch, MeasurementLine
+from app.services.cost_ledger import daily_series
+from app.services.schedule import baseline_version_id, pv_at, pv_curve
+
+
+def _f(v) -> float:
+    try:
+        return float(v) if v is not None else 0.0
+    except Exception:
+        return 0.0
+
+
+def _ratio(a: float, b: float) -> float:
+    return a / b if b > 0 else 0
+
+
+def forecast(bac: float, pv: float, ev: float, ac: float) -> dict:
+    """Índices y proyecciones a término a partir de los totales EVM."""
+    cpi = _ratio(ev, ac)
+    spi = _ratio(ev, pv)
+    eac = bac / cpi if cpi > 0 else bac
+    etc = max(eac - ac, 0.0)
+    return {
+        "spi": spi,
+        "cpi": cpi,
+        "cost_variance": ev - ac,
+        "schedule_variance": ev - pv,
+        "eac": eac,
+        "etc": etc,
+        "vac": bac - eac,
+        "tcpi": _ratio(bac - ev, bac - ac),
+    }
+
+
+def evm_metrics(db: Session, project_id: int, as_of: date | None = None) -> dict:
+    as_of = as_of or datetime.utcnow().date()
+    active = (Chapter.project_id == project_id, Chapter.deleted_at.is_(None), Item.deleted_at.is_(None))
+    n_items, bac = db.query(func.count(Item.id), func.coalesce(func.sum(Item.quantity * Item.price), 0)) \
+        .join(Chapter, Item.chapter_id == Chapter.id).filter(*active).one()
+    if not n_items:
+        # Métricas vacías en lugar de 404 para facilitar consumo temprano
+        return {"project_id": project_id, "planned_value": 0, "earned_value": 0, "actual_cost": 0,
+                "spi": 0, "cpi": 0, "curve_s": [], "curve_ac": [], "curve_pv": []}
+    bac = _f(bac)
+
+    # EV por batch cerrado (una consulta); la curva S acumula en orden cronológico
+    batch_rows = db.query(
+        MeasurementBatch.id, MeasurementBatch.name, MeasurementBatch.status, MeasurementBatch.created_at,
+        func.coalesce(func.sum(MeasurementLine.qty * Item.price), 0),
+    ).join(MeasurementLine, MeasurementLine.batch_id == MeasurementBatch.id) \
+        .join(Item, Item.id == MeasurementLine.item_id) \
+        .join(Chapter, Item.chapter_id == Chapter.id) \
+        .filter(MeasurementBatch.project_id == project_id, MeasurementBatch.status == 'closed',
+                MeasurementBatch.created_at < datetime.combine(as_of + timedelta(days=1), time.min), *active) \
+        .group_by(MeasurementBatch.id, MeasurementBatch.name, MeasurementBatch.status, MeasurementBatch.created_at) \
+        .order_by(MeasurementBatch.created_at, MeasurementBatch.id).all()
+    curve = []
+    earned_value = 0.0
+    for batch_id, name, status, created_at, batch_ev in batch_rows:
+        earned_value += _f(batch_ev)
+        curve.append({
+            "batch_id": batch_id,
+            "name": name,
+            "status": status,
+            "batch_ev": _f(batch_ev),
+            "cumulative_ev": earned_value,
+            "created_at": created_at,
+        })
+
+    ac_curve = daily_series(db, project_id, until=as_of)
+    actual_cost = ac_curve[-1]["cumulative"] if ac_curve else 0.0
+
+    # PV(t) desde el calendario de la línea base (curva cacheada por versión)
+    baseline = baseline_version_id(db, project_id)
+    planned_value = pv_at(db, baseline, as_of) if baseline else None
+    curve_pv = []
+    if planned_value is None:
+        planned_value = bac  # sin calendario: PV = presupuesto completo
+    else:
+        curve_pv = pv_curve(db, baseline, "week")["points"]
+        if curve:
+            for point, pv in zip(curve, pv_at(db, baseline, [p["created_at"] for p in curve])):
+                point["planned_value"] = pv
+    return {
+        "project_id": project_id,
+        "budget_at_completion": bac,
+        "pv_source": "baseline_schedule" if curve_pv else "budget",
+        "planned_value": planned_value,
+        "earned_value": earned_value,
+        "actual_cost": actual_cost,
+        **forecast(bac, planned_value, earned_value, actual_cost),
+        "curve_s": curve,
+        "curve_ac": ac_curve,
+        "curve_pv": curve_pv,
+    }
@@ -7,6 +7,7 @@ from sqlalchemy.orm import Session
 from app.db.models.project import Project
 from app.db.models.budget import Chapter, Item, Resource, APU
 from app.services.kpis import compute_item_price
+from app.services import job_progress
 import pandas as pd
 
 BUDGET_COLUMNS = [
@@ -15,6 +16,8 @@ BUDGET_COLUMNS = [
 ]
 
 def import_budget_xlsx(db: Session, file_path: str, project_name: str) -> int:
+	job_progress.plan("lectura", "partidas")
+	job_progress.stage("lectura")
 	df = pd.read_excel(file_path)
 	missing = [c for c in BUDGET_COLUMNS if c not in df.columns]
 	if missing:
@@ -23,9 +26,11 @@ def import_budget_xlsx(db: Session, file_path: str, project_name: str) -> int:
 	project = Project(name=project_name)
 	db.add(project); db.flush()
 	# Agrupamos por Capitulo + Partida para construir estructura
-	for (ccod, cnom, pcod, pnom, unit), grp in df.groupby([
+	groups = df.groupby([
 		"CapituloCodigo","CapituloNombre","PartidaCodigo","PartidaNombre","Unidad"
-	]):
+	])
+	job_progress.stage("partidas", total=groups.ngroups)
+	for (ccod, cnom, pcod, pnom, unit), grp in groups:
 		chapter = Chapter(project_id=project.id, code=ccod, name=cnom)
 		db.add(chapter); db.flush()
 		item = Item(chapter_id=chapter.id, code=pcod, name=pnom, unit=unit, quantity=float(grp.iloc[0]["Cantidad"] or 0), price=0)
@@ -37,6 +42,7 @@ def import_budget_xlsx(db: Session, file_path: str, project_name: str) -> int:
 			db.add(APU(item_id=item.id, resource_id=res.id, coeff=float(r.Coef)))
 			apu_payload.append({"coeff": float(r.Coef), "unit_cost": float(r.CostoUnitRecurso)})
 		item.price = compute_item_price(apu_payload)
+		job_progress.advance()
 	db.commit()
 	return project.id
 
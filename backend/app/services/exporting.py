@@ -17,15 +17,19 @@ from app.db.models.project import Project
 from app.db.models.measurement import Measurement
 from app.db.models.versioning import BudgetVersionItem
 from app.api.v1.versions import diff_logic
+from app.services import job_progress
 
 
 def export_budget_excel(db: Session, project_id: int) -> bytes:
     project = db.get(Project, project_id)
     if not project:
         raise ValueError("Proyecto no encontrado")
+    job_progress.plan("capitulos", "escritura")
     rows = []
     chapters = db.query(Chapter).filter(Chapter.project_id == project_id).all()
+    job_progress.stage("capitulos", total=len(chapters))
     for ch in chapters:
+        job_progress.advance()
         items = db.query(Item).filter(Item.chapter_id == ch.id).all()
         for it in items:
             total = (Decimal(str(it.quantity or 0)) * Decimal(str(it.price or 0))) if it.quantity and it.price else Decimal("0")
@@ -39,6 +43,7 @@ def export_budget_excel(db: Session, project_id: int) -> bytes:
                 "Precio Unit": float(it.price or 0),
                 "Total": float(total)
             })
+    job_progress.stage("escritura")
     df = pd.DataFrame(rows)
     buffer = BytesIO()
     with pd.ExcelWriter(buffer, engine="openpyxl") as writer:
@@ -51,8 +56,11 @@ def export_measurements_excel(db: Session, project_id: int) -> bytes:
     # Similar a /measurements/{project_id}/summary
     from app.db.models.budget import Item, Chapter
     rows = []
+    job_progress.plan("items", "escritura")
     q_items = db.query(Item).join(Chapter, Chapter.id == Item.chapter_id).filter(Chapter.project_id == project_id).all()
+    job_progress.stage("items", total=len(q_items))
     for it in q_items:
+        job_progress.advance()
         qty_total = sum(float(m.qty) for m in db.query(Measurement).filter(Measurement.item_id == it.id))
         rows.append({
             "Item Código": it.code,
@@ -62,6 +70,7 @@ def export_measurements_excel(db: Session, project_id: int) -> bytes:
             "Precio Unit": float(it.price or 0),
             "Valor": qty_total * float(it.price or 0)
         })
+    job_progress.stage("escritura")
     df = pd.DataFrame(rows)
     buffer = BytesIO()
     with pd.ExcelWriter(buffer, engine="openpyxl") as writer:
@@ -71,7 +80,10 @@ def export_measurements_excel(db: Session, project_id: int) -> bytes:
 
 
 def export_versions_diff_excel(db: Session, v_from: int, v_to: int) -> bytes:
+    job_progress.plan("diff", "escritura")
+    job_progress.stage("diff")
     diff = diff_logic(db, v_from, v_to)
+    job_progress.stage("escritura")
     rows_added = [{"code": c, "status": "added"} for c in diff["added"]]
     rows_removed = [{"code": c, "status": "removed"} for c in diff["removed"]]
     rows_changed = [{
@@ -107,7 +119,9 @@ def export_budget_pdf(db: Session, project_id: int) -> bytes:
     c.drawString(40, y, " | ".join(headers))
     y -= 15
     chapters = db.query(Chapter).filter(Chapter.project_id == project_id).all()
+    job_progress.stage("capitulos", total=len(chapters))
     for ch in chapters:
+        job_progress.advance()
         items = db.query(Item).filter(Item.chapter_id == ch.id).all()
         for it in items:
             total = (Decimal(str(it.quantity or 0)) * Decimal(str(it.price or 0))) if it.quantity and it.price else Decimal("0")
@@ -0,0 +1,96 @@
+"""Métricas financieras (facturación, cobros, morosidad y aging) por proyecto.
+
+Todo se resuelve en una sola consulta de agregación condicional sobre
+``invoices`` usando el acumulado ``paid_amount`` (mantenido al registrar pagos),
+de modo que los pagos parciales cuentan sin unir ``invoice_payments`` y el mismo
+SQL sirve para uno o muchos proyectos (variante batch agrupada por ``project_id``).
+
+Convenciones:
+ - Facturas ``rejected`` no son cobrables y se excluyen.
+ - Una factura ``paid`` (p.ej. conciliada con banco) cuenta como pagada completa.
+ - Vencida = saldo pendiente con antigüedad mayor al plazo de pago configurado.
+"""
+from __future__ import annotations
+from datetime import datetime, timedelta
+from typing import Iterable
+from sqlalchemy.orm import Session
+from sqlalchemy import func, case, and_
+from app.db.models.versioning import Invoice
+from app.core.settings import get_settings
+
+# (etiqueta, días desde, días hasta) — hasta=None => sin límite
+AGING_BUCKETS = [("0_30", 0, 30), ("31_60", 31, 60), ("61_90", 61, 90), ("90_plus", 91, None)]
+
+
+def empty_financial_metrics() -> dict:
+    return {
+        "invoiced_total": 0.0,
+        "paid_total": 0.0,
+        "pending_total": 0.0,
+        "paid_ratio": 0,
+        "partially_paid_count": 0,
+        "partially_paid_outstanding": 0.0,
+        "overdue_total": 0.0,
+        "aging": {label: 0.0 for label, _, _ in AGING_BUCKETS},
+    }
+
+
+def _aggregate_columns(as_of: datetime, terms_days: int):
+    amount = func.coalesce(Invoice.amount, 0)
+    payments = func.coalesce(Invoice.paid_amount, 0)
+    paid = case(
+        (Invoice.status == 'paid', amount),
+        (payments >= amount, amount),
+        else_=payments,
+    )
+    outstanding = amount - paid
+    is_open = and_(Invoice.status != 'paid', payments < amount)
+    cols = [
+        func.coalesce(func.sum(amount), 0).label("invoiced_total"),
+        func.coalesce(func.sum(paid), 0).label("paid_total"),
+        func.coalesce(func.sum(case((and_(is_open, payments > 0), 1), else_=0)), 0).label("partially_paid_count"),
+        func.coalesce(func.sum(case((and_(is_open, payments > 0), outstanding), else_=0)), 0).label("partially_paid_outstanding"),
+        func.coalesce(func.sum(case((and_(is_open, Invoice.created_at < as_of - timedelta(days=terms_days)), outstanding), else_=0)), 0).label("overdue_total"),
+    ]
+    for label, start, end in AGING_BUCKETS:
+        # antigüedad en [start, end] días  <=>  as_of-end-1d < created_at <= as_of-start
+        cond = [is_open, Invoice.created_at <= as_of - timedelta(days=start)]
+        if end is not None:
+            cond.append(Invoice.created_at > as_of - timedelta(days=end + 1))
+        cols.append(func.coalesce(func.sum(case((and_(*cond), outstanding), else_=0)), 0).label(f"aging_{label}"))
+    return cols
+
+
+def _row_to_metrics(row) -> dict:
+    m = row._mapping
+    total = float(m["invoiced_total"] or 0)
+    paid = float(m["paid_total"] or 0)
+    return {
+        "invoiced_total": total,
+        "paid_total": paid,
+        "pending_total": total - paid,
+        "paid_ratio": (paid / total) if total else 0,
+        "partially_paid_count": int(m["partially_paid_count"] or 0),
+        "partially_paid_outstanding": float(m["partially_paid_outstanding"] or 0),
+        "overdue_total": float(m["overdue_total"] or 0),
+        "aging": {label: float(m[f"aging_{label}"] or 0) for label, _, _ in AGING_BUCKETS},
+    }
+
+
+def financial_metrics_batch(db: Session, project_ids: Iterable[int] | None = None, as_of: datetime | None = None) -> dict[int, dict]:
+    """Métricas financieras para varios proyectos en una sola consulta agrupada.
+
+    ``project_ids`` puede ser una lista o una subconsulta de ids; los proyectos sin
+    facturas no aparecen en el resultado (usar ``.get(pid)`` con ``empty_financial_metrics``).
+    """
+    as_of = as_of or datetime.utcnow()
+    cols = _aggregate_columns(as_of, get_settings().invoice_payment_terms_days)
+    q = db.query(Invoice.project_id, *cols).filter(Invoice.status != 'rejected')
+    if project_ids is not None:
+        q = q.filter(Invoice.project_id.in_(project_ids))
+    return {row.project_id: _row_to_metrics(row) for row in q.group_by(Invoice.project_id).all()}
+
+
+def financial_metrics(db: Session, project_id: int, as_of: datetime | None = None) -> dict:
+    """Métricas financieras de un proyecto (misma consulta que la variante batch)."""
+    return financial_metrics_batch(db, [project_id], as_of).get(project_id) or empty_financial_metrics()
@@ -0,0 +1,229 @@
+"""Pronóstico probabilístico del costo final (EAC) por simulación Monte Carlo.
+
+Modelo por iteración::
+
+    EAC = AC + Σ_items trabajo_restante_i · f_cantidad_i · f_precio_i + Σ_riesgos evento_j · impacto_j
+
+- ``trabajo_restante_i`` = (cantidad presupuestada - ejecutada en batches cerrados) · precio.
+- ``f_cantidad`` / ``f_precio``: factores triangulares (moda 1) según ``qty_spread`` / ``price_spread``.
+- Riesgos abiertos/en mitigación: ocurren con probabilidad ``PROBABILITY_MAP[Risk.probability]``
+  (mitigación reduce a la mitad) y cuestan ``U(IMPACT_MAP[Risk.impact]) · BAC``.
+
+Las iteraciones se parten en chunks (matriz entradas × iteraciones acotada en memoria) que se
+reparten en un pool de procesos; cada chunk usa su propia semilla derivada de ``seed`` con
+``SeedSequence.spawn``, así el resultado no depende de la cantidad de procesos. Las
+sensibilidades (tornado) se calculan con sumas acumuladas por chunk (correlación entrada/EAC).
+
+Los resultados se guardan en ``forecast_runs`` por hash de entradas + parámetros.
+"""
+from __future__ import annotations
+import hashlib
+import json
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+from sqlalchemy.orm import Session
+from sqlalchemy import func
+from sqlalchemy.exc import IntegrityError
+from app.core.settings import get_settings
+from app.db.models.budget import Item, Chapter, MeasurementBatch, MeasurementLine
+from app.db.models.risk import Risk
+from app.db.models.forecast import ForecastRun
+from app.services import job_progress
+from app.services.cost_ledger import daily_series
+
+# Escala cualitativa 1-5 -> probabilidad de ocurrencia
+PROBABILITY_MAP = {1: 0.05, 2: 0.15, 3: 0.35, 4: 0.60, 5: 0.85}
+# Escala 1-5 -> rango de impacto como fracción del BAC (uniforme)
+IMPACT_MAP = {1: (0.001, 0.005), 2: (0.005, 0.02), 3: (0.02, 0.05), 4: (0.05, 0.10), 5: (0.10, 0.20)}
+ACTIVE_RISK_STATUSES = ("open", "mitigating")
+MITIGATION_FACTOR = 0.5
+
+DEFAULT_ITERATIONS = 100_000
+DEFAULT_SEED = 20240101
+CHUNK_CELLS = 2_000_000  # celdas (entradas × iteraciones) por chunk
+TORNADO_SIZE = 10
+HISTOGRAM_BINS = 20
+
+
+def _spread(name: str, value) -> list[float]:
+    """Valida ``[low, high]`` antes de encolar: un rango inválido haría fallar al worker en ``triangular``."""
+    low, high = (float(x) for x in value)
+    if low == high == 0:
+        return [low, high]  # sin variación
+    if not (-1 < low <= 0 <= high) or low >= high:
+        raise ValueError(f"{name} inválido: se requiere -1 < low <= 0 <= high y low < high")
+    return [low, high]
+
+
+def default_params(**overrides) -> dict:
+    params = {
+        "iterations": DEFAULT_ITERATIONS,
+        "seed": DEFAULT_SEED,
+        "qty_spread": [-0.05, 0.15],
+        "price_spread": [-0.05, 0.10],
+    }
+    params.update({k: v for k, v in overrides.items() if v is not None})
+    params["qty_spread"] = _spread("qty_spread", params["qty_spread"])
+    params["price_spread"] = _spread("price_spread", params["price_spread"])
+    params["iterations"] = int(params["iterations"])
+    params["seed"] = int(params["seed"])
+    return params
+
+
+def gather_inputs(db: Session, project_id: int) -> dict:
+    """Entradas de la simulación (tres consultas agrupadas + serie AC precalculada)."""
+    executed = db.query(MeasurementLine.item_id.label("item_id"), func.sum(MeasurementLine.qty).label("qty")) \
+        .join(MeasurementBatch, MeasurementBatch.id == MeasurementLine.batch_id) \
+        .filter(MeasurementBatch.project_id == project_id, MeasurementBatch.status == 'closed') \
+        .group_by(MeasurementLine.item_id).subquery()
+    items = db.query(Item.id, Item.code, Item.quantity, Item.price, func.coalesce(executed.c.qty, 0)) \
+        .join(Chapter, Chapter.id == Item.chapter_id) \
+        .outerjoin(executed, executed.c.item_id == Item.id) \
+        .filter(Chapter.project_id == project_id, Chapter.deleted_at.is_(None), Item.deleted_at.is_(None)) \
+        .order_by(Item.id).all()
+    risks = db.query(Risk.id, Risk.category, Risk.probability, Risk.impact, Risk.status) \
+        .filter(Risk.project_id == project_id, Risk.status.in_(ACTIVE_RISK_STATUSES)).order_by(Risk.id).all()
+    bac = sum(float(q or 0) * float(p or 0) for _, _, q, p, _ in items)
+    series = daily_series(db, project_id)
+    risk_p, risk_lo, risk_hi = [], [], []
+    for _, _, prob, impact, status in risks:
+        p = PROBABILITY_MAP.get(int(prob or 0), 0.0) * (MITIGATION_FACTOR if status == "mitigating" else 1.0)
+        lo, hi = IMPACT_MAP.get(int(impact or 0), (0.0, 0.0))
+        risk_p.append(p); risk_lo.append(lo * bac); risk_hi.append(hi * bac)
+    return {
+        "bac": round(bac, 2),
+        "actual_cost": round(series[-1]["cumulative"] if series else 0.0, 2),
+        "item_ids": [i for i, *_ in items],
+        "item_codes": [c for _, c, *_ in items],
+        "remaining": [round(max(float(q or 0) - float(e or 0), 0.0) * float(p or 0), 2) for _, _, q, p, e in items],
+        "risk_ids": [r[0] for r in risks],
+        "risk_labels": [r[1] for r in risks],
+        "risk_p": risk_p,
+        "risk_lo": [round(x, 2) for x in risk_lo],
+        "risk_hi": [round(x, 2) for x in risk_hi],
+    }
+
+
+def input_hash(inputs: dict, params: dict) -> str:
+    payload = json.dumps({"inputs": inputs, "params": params}, sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def _triangular(rng: np.random.Generator, spread: tuple[float, float], size) -> np.ndarray:
+    low, high = spread
+    if low == 0 and high == 0:
+        return np.ones(size)
+    return rng.triangular(1 + low, 1.0, 1 + high, size)
+
+
+def _simulate_chunk(args) -> dict:
+    """Un chunk de iteraciones (ejecutado en un proceso del pool)."""
+    seed_seq, n, base, remaining, qty_spread, price_spread, risk_p, risk_lo, risk_hi = args
+    rng = np.random.default_rng(seed_seq)
+    k = len(remaining)
+    item_cost = remaining[:, None] * _triangular(rng, qty_spread, (k, n)) * _triangular(rng, price_spread, (k, n))
+    hits = rng.random((len(risk_p), n)) < risk_p[:, None]
+    risk_cost = np.where(hits, rng.uniform(risk_lo[:, None], risk_hi[:, None], (len(risk_p), n)), 0.0)
+    x = np.vstack([item_cost, risk_cost])
+    y = base + x.sum(axis=0)
+    return {"y": y, "sx": x.sum(axis=1), "sxx": np.einsum("ij,ij->i", x, x), "sxy": x @ y}
+
+
+def chunk_sizes(iterations: int, n_inputs: int) -> list[int]:
+    """Iteraciones por chunk: nunca más de ``CHUNK_CELLS`` celdas, aunque el proyecto sea enorme."""
+    chunk = max(1, min(iterations, CHUNK_CELLS // max(n_inputs, 1)))
+    return [min(chunk, iterations - start) for start in range(0, iterations, chunk)]
+
+
+def simulate(inputs: dict, params: dict, workers: int | None = None) -> dict:
+    remaining = np.asarray(inputs["remaining"], dtype=np.float64)
+    risk_p = np.asarray(inputs["risk_p"], dtype=np.float64)
+    risk_lo = np.asarray(inputs["risk_lo"], dtype=np.float64)
+    risk_hi = np.asarray(inputs["risk_hi"], dtype=np.float64)
+    iterations = params["iterations"]
+    n_inputs = len(remaining) + len(risk_p)
+    sizes = chunk_sizes(iterations, n_inputs)
+    seeds = np.random.SeedSequence(params["seed"]).spawn(len(sizes))
+    tasks = [(s, n, inputs["actual_cost"], remaining, tuple(params["qty_spread"]), tuple(params["price_spread"]),
+              risk_p, risk_lo, risk_hi) for s, n in zip(seeds, sizes)]
+    workers = get_settings().forecast_workers if workers is None else workers
+    job_progress.stage("simulacion", total=len(tasks))
+    parts = []
+    if workers > 1 and len(tasks) > 1:
+        with ProcessPoolExecutor(max_workers=min(workers, len(tasks))) as pool:
+            try:
+                for part in pool.map(_simulate_chunk, tasks):
+                    parts.append(part)
+                    job_progress.advance()
+            except job_progress.JobCancelled:
+                pool.shutdown(cancel_futures=True)
+                raise
+    else:
+        for t in tasks:
+            parts.append(_simulate_chunk(t))
+            job_progress.advance()
+
+    y = np.concatenate([p["y"] for p in parts])
+    n = float(len(y))
+    mean_y, var_y = y.mean(), y.var()
+    sx = sum(p["sx"] for p in parts); sxx = sum(p["sxx"] for p in parts); sxy = sum(p["sxy"] for p in parts)
+    mean_x = sx / n
+    var_x = np.maximum(sxx / n - mean_x ** 2, 0.0)
+    cov = sxy / n - mean_x * mean_y
+    with np.errstate(divide="ignore", invalid="ignore"):
+        corr = np.where((var_x > 0) & (var_y > 0), cov / np.sqrt(var_x * var_y), 0.0)
+    share = corr ** 2 / (corr ** 2).sum() if (corr ** 2).sum() > 0 else corr ** 2
+    labels = [("item", i, c) for i, c in zip(inputs["item_ids"], inputs["item_codes"])] + \
+             [("risk", i, c) for i, c in zip(inputs["risk_ids"], inputs["risk_labels"])]
+    order = np.argsort(-np.abs(corr), kind="stable")[:TORNADO_SIZE]
+    counts, edges = np.histogram(y, bins=HISTOGRAM_BINS)
+    p10, p50, p90 = np.percentile(y, [10, 50, 90])
+    deterministic = inputs["actual_cost"] + float(remaining.sum()) + float((risk_p * (risk_lo + risk_hi) / 2).sum())
+    return {
+        "iterations": iterations,
+        "seed": params["seed"],
+        "bac": inputs["bac"],
+        "actual_cost": inputs["actual_cost"],
+        "expected_eac": deterministic,
+        "eac": {"p10": float(p10), "p50": float(p50), "p90": float(p90), "mean": float(mean_y), "std": float(np.sqrt(var_y))},
+        "histogram": {"edges": edges.tolist(), "counts": counts.tolist()},
+        "tornado": [
+            {"kind": labels[i][0], "id": labels[i][1], "label": labels[i][2],
+             "correlation": float(corr[i]), "variance_share": float(share[i])}
+            for i in order if corr[i] != 0
+        ],
+    }
+
+
+def cached_forecast(db: Session, project_id: int, params: dict) -> tuple[str, ForecastRun | None]:
+    """Hash de las entradas actuales y la corrida cacheada (si existe)."""
+    h = input_hash(gather_inputs(db, project_id), params)
+    run = db.query(ForecastRun).filter(ForecastRun.project_id == project_id, ForecastRun.input_hash == h).first()
+    return h, run
+
+
+def run_forecast(db: Session, project_id: int, workers: int | None = None, **overrides) -> dict:
+    """Simula (o reutiliza la corrida con el mismo hash) y guarda el resultado. Usado por el job."""
+    params = default_params(**overrides)
+    job_progress.plan("entradas", "simulacion")
+    job_progress.stage("entradas")
+    inputs = gather_inputs(db, project_id)
+    h = input_hash(inputs, params)
+    run = db.query(ForecastRun).filter(ForecastRun.project_id == project_id, ForecastRun.input_hash == h).first()
+    if run is not None:
+        return {**run.result, "input_hash": h, "cached": True}
+    result = simulate(inputs, params, workers=workers)
+    db.add(ForecastRun(project_id=project_id, input_hash=h, params=params, result=result))
+    try:
+        db.commit()
+    except IntegrityError:  # otra corrida concurrente con las mismas entradas
+        db.rollback()
+    return {**result, "input_hash": h, "cached": False}
+
+
+def latest_forecast(db: Session, project_id: int) -> dict | None:
+    run = db.query(ForecastRun).filter(ForecastRun.project_id == project_id) \
+        .order_by(ForecastRun.id.desc()).first()
+    if run is None:
+        return None
+    return {**run.result, "input_hash": run.input_hash, "params": run.params, "created_at": run.created_at}
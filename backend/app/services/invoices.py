@@ -1,10 +1,16 @@
 from sqlalchemy.orm import Session
-from sqlalchemy import func
+from sqlalchemy import func, case, and_, or_, update, insert, bindparam
 from decimal import Decimal
 from typing import List, Dict
 from app.db.models.versioning import Invoice, InvoicePayment, BankTransaction
-from datetime import date
-from app.services.audit import log_action
+from app.services.audit import log_action, log_actions
+from app.services.bank_ingest import ingest_bank_rows
+from app.services.tabular_io import as_int
+from app.services.cost_ledger import record_costs
+from app.services.events import emit
+
+# Estados que pasan a 'paid' al completar el monto
+PAYABLE_STATUSES = ("pending", "accepted")
 
 
 def create_invoice(db: Session, user_id: int, project_id: int, amount: float, currency: str = "CLP", dte_number: str | None = None) -> Invoice:
@@ -13,6 +19,7 @@ def create_invoice(db: Session, user_id: int, project_id: int, amount: float, cu
     db.commit()
     db.refresh(inv)
     log_action(db, project_id=project_id, entity="invoice", entity_id=inv.id, action="invoice_create", data={"amount": str(amount)}, user_id=user_id)
+    emit(db, "invoice.created", project_id, "invoice", inv.id, {"amount": str(amount)}, user_id)
     return inv
 
 
@@ -27,49 +34,88 @@ def send_sii(db: Session, user_id: int, inv: Invoice) -> Invoice:
     inv.status = "accepted"
     db.commit()
     log_action(db, project_id=inv.project_id, entity="invoice", entity_id=inv.id, action="invoice_send_sii", data={"dte_number": inv.dte_number}, user_id=user_id)
+    emit(db, "invoice.sent", inv.project_id, "invoice", inv.id, {"status": inv.status}, user_id)
     return inv
 
 
+def _apply_payment_stmt(amount_param):
+    """UPDATE atómico: suma al acumulado y marca 'paid' en la misma sentencia (sin SUM por pago)."""
+    t = Invoice.__table__
+    new_paid = t.c.paid_amount + amount_param
+    # or_ de igualdades en vez de IN: los IN "expanding" no admiten executemany
+    settled = and_(new_paid >= t.c.amount, or_(*(t.c.status == s for s in PAYABLE_STATUSES)))
+    return update(t).values(
+        paid_amount=new_paid,
+        status=case((settled, "paid"), else_=t.c.status),
+        paid_at=case((settled, func.now()), else_=t.c.paid_at),
+    )
+
+
 def register_payment(db: Session, user_id: int, inv: Invoice, amount: float, method: str, reference: str | None) -> Invoice:
-    pay = InvoicePayment(invoice_id=inv.id, amount=amount, method=method, reference=reference)
-    db.add(pay)
-    paid_total = db.query(func.coalesce(func.sum(InvoicePayment.amount), 0)).filter(InvoicePayment.invoice_id == inv.id).scalar() or 0
-    paid_total = Decimal(str(paid_total))
-    amt = Decimal(str(amount))
-    inv_amount = Decimal(str(inv.amount))
-    if paid_total + amt >= inv_amount:
-        inv.status = "paid"
+    db.add(InvoicePayment(invoice_id=inv.id, amount=amount, method=method, reference=reference))
+    t = Invoice.__table__
+    row = db.execute(
+        _apply_payment_stmt(Decimal(str(amount))).where(t.c.id == inv.id).returning(t.c.paid_amount, t.c.status)
+    ).one()
+    record_costs(db, [{"project_id": inv.project_id, "source": "payment", "amount": amount}])
     db.commit()
     db.refresh(inv)
-    log_action(db, project_id=inv.project_id, entity="invoice", entity_id=inv.id, action="invoice_payment", data={"payment": str(amount)}, user_id=user_id)
+    log_action(db, project_id=inv.project_id, entity="invoice", entity_id=inv.id, action="invoice_payment", data={"payment": str(amount), "paid_amount": str(row.paid_amount), "status": row.status}, user_id=user_id)
+    emit(db, "invoice.paid", inv.project_id, "invoice", inv.id, {"status": row.status}, user_id)
     return inv
 
 
-def import_bank_transactions(db: Session, user_id: int, project_id: int, items: List[Dict], source: str) -> int:
-    created = 0
-    for item in items:
-        dt = item.get('date')
-        if isinstance(dt, str):
-            try:
-                parts = dt.split('-')
-                if len(parts) == 3:
-                    dt = date(int(parts[0]), int(parts[1]), int(parts[2]))
-            except Exception:
-                dt = None
-        bt = BankTransaction(
-            project_id=project_id,
-            date=dt,
-            description=item.get('description'),
-            amount=item.get('amount'),
-            balance=item.get('balance'),
-            source=source,
-            raw=item
-        )
-        db.add(bt)
-        created += 1
-    db.commit()
-    log_action(db, project_id=project_id, entity="project", entity_id=project_id, action="bank_import", data={"count": created}, user_id=user_id)
-    return created
+def register_payments_bulk(db: Session, user_id: int | None, project_id: int, payments: List[Dict]) -> dict:
+    """Aplica muchos pagos de un proyecto en una sola transacción.
+
+    ``payments``: dicts con ``invoice_id`` o ``dte_number``, ``amount``, ``method`` y ``reference``.
+    Se validan todas las referencias con una consulta ``IN``; si hay errores no se aplica nada
+    y se devuelven por línea. Pagos, acumulados y auditoría se escriben con executemany.
+    """
+    errors: list[dict] = []
+    dte_refs = {str(p["dte_number"]).strip() for p in payments if not p.get("invoice_id") and p.get("dte_number")}
+    by_dte = dict(db.query(Invoice.dte_number, Invoice.id).filter(Invoice.project_id == project_id, Invoice.dte_number.in_(dte_refs)).all()) if dte_refs else {}
+    ids = {i for i in (as_int(p.get("invoice_id")) for p in payments) if i is not None} | set(by_dte.values())
+    invoices = {i.id: i for i in db.query(Invoice.id, Invoice.status).filter(Invoice.project_id == project_id, Invoice.id.in_(ids)).all()} if ids else {}
+    rows: list[dict] = []
+    for n, p in enumerate(payments, start=1):
+        invoice_id = as_int(p.get("invoice_id")) if p.get("invoice_id") else by_dte.get(str(p.get("dte_number") or "").strip())
+        try:
+            amount = Decimal(str(p.get("amount")))
+        except Exception:
+            amount = None
+        if invoice_id not in invoices:
+            errors.append({"line": n, "error": "Factura no encontrada"})
+        elif amount is None or not amount.is_finite() or amount <= 0:
+            errors.append({"line": n, "error": "Monto inválido"})
+        else:
+            rows.append({"invoice_id": invoice_id, "amount": amount, "method": p.get("method") or "transfer", "reference": p.get("reference")})
+    if errors:
+        return {"applied": 0, "errors": errors}
+
+    totals: dict[int, Decimal] = {}
+    for r in rows:
+        totals[r["invoice_id"]] = totals.get(r["invoice_id"], Decimal("0")) + r["amount"]
+    db.execute(insert(InvoicePayment), rows)
+    db.execute(
+        _apply_payment_stmt(bindparam("b_amount")).where(Invoice.__table__.c.id == bindparam("b_id")),
+        [{"b_id": inv_id, "b_amount": total} for inv_id, total in totals.items()],
+    )
+    paid = [i for (i,) in db.query(Invoice.id).filter(Invoice.id.in_(list(totals)), Invoice.status == "paid").all()
+            if invoices[i].status != "paid"]
+    record_costs(db, [{"project_id": project_id, "source": "payment", "amount": sum(totals.values())}])
+    log_actions(db, [
+        dict(project_id=project_id, entity="invoice", entity_id=inv_id, action="invoice_payment",
+             data={"payment": str(total), "bulk": True}, user_id=user_id)
+        for inv_id, total in totals.items()
+    ])
+    emit(db, "invoice.paid", project_id, "invoice", None, {"invoices": list(totals), "bulk": True}, user_id)
+    return {"applied": len(rows), "invoices_updated": len(totals), "invoices_paid": paid, "errors": []}
+
+
+def import_bank_transactions(db: Session, user_id: int, project_id: int, items: List[Dict], source: str) -> dict:
+    """Importa movimientos ya parseados (JSON) vía el pipeline idempotente de ``bank_ingest``."""
+    return ingest_bank_rows(db, project_id, items, source=source, user_id=user_id)
 
 
 def reconcile_transaction(db: Session, user_id: int, bt: BankTransaction, inv: Invoice):
@@ -78,12 +124,6 @@ def reconcile_transaction(db: Session, user_id: int, bt: BankTransaction, inv: I
         inv.status = "paid"
     db.commit()
     log_action(db, project_id=inv.project_id, entity="invoice", entity_id=inv.id, action="bank_reconcile", data={"bank_txn": bt.id}, user_id=user_id)
+    emit(db, "invoice.reconciled", inv.project_id, "invoice", inv.id, {"status": inv.status}, user_id)
     return inv.status
 
-
-def financial_metrics(db: Session, project_id: int) -> dict:
-    total = db.query(func.coalesce(func.sum(Invoice.amount), 0)).filter(Invoice.project_id == project_id).scalar() or 0
-    paid = db.query(func.coalesce(func.sum(Invoice.amount), 0)).filter(Invoice.project_id == project_id, Invoice.status == 'paid').scalar() or 0
-    pending = total - paid
-    ratio = (paid / total) if total else 0
-    return {"invoiced_total": float(total), "paid_total": float(paid), "pending_total": float(pending), "paid_ratio": ratio}
@@ -0,0 +1,181 @@
+"""Progreso y cancelación cooperativa de jobs largos.
+
+``call_wrapped`` abre ``tracking(job_id)`` alrededor de la función del job; los servicios
+informan avance con funciones de módulo que son no-op fuera de un job (p.ej. cuando la
+API llama al mismo servicio en línea):
+
+    job_progress.plan("parse", "items", "precios")   # etapas previstas (para el % global)
+    job_progress.stage("items", total=len(items))     # cambia de etapa (escribe siempre)
+    job_progress.advance()                            # por fila/bloque (escritura limitada)
+
+El estado vive en la caché compartida (Redis o memoria, ``app.core.cache``), no en la BD,
+y se escribe como mucho cada ``job_progress_interval_s``. En cada escritura se consulta
+la marca de cancelación (``request_cancel``): si está puesta se lanza ``JobCancelled`` en
+ese límite de bloque y ``call_wrapped`` hace rollback de lo no confirmado.
+"""
+from __future__ import annotations
+import logging
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Iterator
+from app.core.cache import get_cache
+from app.core.settings import get_settings
+
+logger = logging.getLogger(__name__)
+
+STATE_TTL = 24 * 3600
+_current: ContextVar["_Reporter | None"] = ContextVar("job_progress", default=None)
+
+
+class JobCancelled(Exception):
+    """El usuario pidió cancelar el job; se lanza en un límite de bloque."""
+
+
+def _progress_key(job_id: int) -> str:
+    return f"jobs:{job_id}:progress"
+
+
+def _cancel_key(job_id: int) -> str:
+    return f"jobs:{job_id}:cancel"
+
+
+class _Reporter:
+    def __init__(self, job_id: int):
+        self.job_id = job_id
+        self.started_at = time.time()
+        self.interval = get_settings().job_progress_interval_s
+        self.planned: list[str] = []
+        self.stages: list[dict] = []
+        self.done = 0
+        self.total: int | None = None
+        self._last_flush = 0.0
+
+    @property
+    def current(self) -> str | None:
+        return self.stages[-1]["name"] if self.stages else None
+
+    def percent(self) -> float | None:
+        frac = min(self.done / self.total, 1.0) if self.total else 0.0
+        if self.planned and self.current in self.planned:
+            return (self.planned.index(self.current) + frac) / len(self.planned) * 100
+        return frac * 100 if self.total else None
+
+    def snapshot(self, now: float) -> dict:
+        percent = self.percent()
+        elapsed = now - self.started_at
+        eta = elapsed * (100 - percent) / percent if percent else None
+        return {
+            "stage": self.current,
+            "stages": self.stages,
+            "planned_stages": self.planned,
+            "done": self.done,
+            "total": self.total,
+            "percent": round(percent, 1) if percent is not None else None,
+            "eta_seconds": round(eta, 1) if eta is not None else None,
+            "started_at": self.started_at,
+            "updated_at": now,
+        }
+
+    def stage(self, name: str, total: int | None) -> None:
+        now = time.time()
+        if self.stages:
+            self.stages[-1]["finished_at"] = now
+        self.stages.append({"name": name, "started_at": now})
+        self.done, self.total = 0, total
+        self.flush(now)
+
+    def tick(self) -> None:
+        now = time.time()
+        if now - self._last_flush >= self.interval:
+            self.flush(now)
+
+    def flush(self, now: float) -> None:
+        self._last_flush = now
+        try:
+            cache = get_cache()
+            cache.set(_progress_key(self.job_id), self.snapshot(now), STATE_TTL)
+            cancelled = cache.get(_cancel_key(self.job_id))
+        except Exception as e:  # el progreso nunca debe tumbar el job
+            logger.warning("no se pudo escribir el progreso del job %s: %s", self.job_id, e)
+            return
+        if cancelled:
+            raise JobCancelled(f"job {self.job_id} cancelado")
+
+    def finish(self, status: str) -> None:
+        now = time.time()
+        if self.stages:
+            self.stages[-1].setdefault("finished_at", now)
+        state = self.snapshot(now)
+        state["status"] = status
+        if status == "finished":
+            state.update(percent=100.0, eta_seconds=0.0)
+        try:
+            get_cache().set(_progress_key(self.job_id), state, STATE_TTL)
+        except Exception:
+            pass
+
+
+@contextmanager
+def tracking(job_id: int) -> Iterator[_Reporter]:
+    """Activa el reporte de progreso para el job en curso (lo usa ``call_wrapped``)."""
+    reporter = _Reporter(job_id)
+    token = _current.set(reporter)
+    status = "failed"
+    try:
+        yield reporter
+        status = "finished"
+    except JobCancelled:
+        status = "cancelled"
+        raise
+    finally:
+        _current.reset(token)
+        reporter.finish(status)
+
+
+# ---------- API para los servicios ----------
+
+def plan(*stages: str) -> None:
+    reporter = _current.get()
+    if reporter is not None:
+        reporter.planned = list(stages)
+
+
+def stage(name: str, total: int | None = None) -> None:
+    reporter = _current.get()
+    if reporter is not None:
+        reporter.stage(name, total)
+
+
+def advance(n: int = 1) -> None:
+    reporter = _current.get()
+    if reporter is not None:
+        reporter.done += n
+        reporter.tick()
+
+
+def check_cancelled() -> None:
+    """Límite de bloque sin avance que informar (p.ej. antes de un paso largo)."""
+    reporter = _current.get()
+    if reporter is not None:
+        reporter.tick()
+
+
+# ---------- API para los endpoints ----------
+
+def get_progress(job_id: int) -> dict | None:
+    try:
+        return get_cache().get(_progress_key(job_id))
+    except Exception:
+        return None
+
+
+def request_cancel(job_id: int) -> None:
+    get_cache().set(_cancel_key(job_id), True, STATE_TTL)
+
+
+def cancel_requested(job_id: int) -> bool:
+    try:
+        return bool(get_cache().get(_cancel_key(job_id)))
+    except Exception:
+        return False
@@ -1,13 +1,19 @@
-import os, json, uuid, tempfile, traceback
-from datetime import datetime
+import os, json, uuid, time, hashlib, traceback
+from contextlib import nullcontext
+from datetime import datetime, timedelta
 from typing import Callable, Any
 from rq import Queue
 from redis import Redis
 from sqlalchemy.orm import Session
 from app.db.session import SessionLocal
 from app.db.models.job import Job
+from app.core import tracing
+from app.services import artifacts, job_progress
+from app.services.data_version import data_version
 
 REDIS_URL = os.getenv("REDIS_URL", "redis://localhost:6379/0")
+# un job en cola/en curso más antiguo que esto se considera perdido (worker caído) y no se reutiliza
+INFLIGHT_MAX_AGE = timedelta(hours=1)
 
 def _redis_conn():
     return Redis.from_url(REDIS_URL)
@@ -15,15 +21,92 @@ def _redis_conn():
 def get_queue(name: str = "default") -> Queue:
     return Queue(name, connection=_redis_conn())
 
-def enqueue_job(db: Session, job_type: str, func: Callable, **kwargs) -> Job:
+def enqueue_job(db: Session, job_type: str, func: Callable, dedup_key: str | None = None,
+                created_by: int | None = None, **kwargs) -> Job:
+    """Encola ``func(**kwargs)``; el job queda a nombre de ``created_by`` y del ``project_id`` de los kwargs."""
     q = get_queue()
-    rq_job = q.enqueue(call_wrapped, func_path=f"{func.__module__}:{func.__name__}", job_type=job_type, kwargs=kwargs)
-    job = Job(rq_id=rq_job.id, type=job_type, status="queued", params=json.dumps(kwargs))
+    with tracing.span(f"rq.enqueue {job_type}", kind="producer", **{"messaging.system": "rq", "job.type": job_type}):
+        rq_job = q.enqueue(call_wrapped, func_path=f"{func.__module__}:{func.__name__}", job_type=job_type, kwargs=kwargs,
+                           trace_context=tracing.inject_context(), enqueued_at=time.time())
+    project_id = kwargs.get("project_id")
+    job = Job(rq_id=rq_job.id, type=job_type, status="queued", params=json.dumps(kwargs), dedup_key=dedup_key,
+              project_id=project_id if isinstance(project_id, int) else None, created_by=created_by,
+              submitters=[created_by] if created_by is not None else [])
     db.add(job); db.commit(); db.refresh(job)
     return job
 
-def call_wrapped(func_path: str, job_type: str, kwargs: dict):
-    """Wrapper ejecutado en el worker RQ. Maneja DB y actualización de estado."""
+def job_key(job_type: str, params: dict, version: str) -> str:
+    payload = json.dumps({"type": job_type, "params": params, "version": version}, sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+def reusable_job(db: Session, key: str, finished_only: bool = False) -> Job | None:
+    statuses = ("finished",) if finished_only else ("queued", "started", "finished")
+    candidates = db.query(Job).filter(Job.dedup_key == key, Job.status.in_(statuses)).order_by(Job.id.desc()).all()
+    stale = datetime.utcnow() - INFLIGHT_MAX_AGE
+    for job in candidates:
+        if job.status == "finished":
+            if job.result_path and artifacts.resolve(job.result_path) is not None:
+                return job
+        elif job.created_at >= stale:
+            return job
+    return None
+
+def submit_job(db: Session, job_type: str, func: Callable, created_by: int | None = None, **kwargs) -> tuple[Job, bool]:
+    """Encola salvo que exista el mismo job (tipo, params, versión de datos) en curso o terminado.
+
+    Devuelve ``(job, deduplicated)``: un duplicado se engancha al job en cola/en curso (queda
+    entre sus ``submitters``) o reutiliza el artefacto ya generado (si no expiró).
+    """
+    version = data_version(db, job_type, **kwargs)
+    if version is None:
+        return enqueue_job(db, job_type, func, created_by=created_by, **kwargs), False
+    key = job_key(job_type, kwargs, version)
+    job = reusable_job(db, key)
+    if job is not None:
+        attach_submitter(db, job, created_by)
+        return job, True
+    return enqueue_job(db, job_type, func, dedup_key=key, created_by=created_by, **kwargs), False
+
+def attach_submitter(db: Session, job: Job, user_id: int | None) -> None:
+    if user_id is None or job.status not in ("queued", "started") or user_id in (job.submitters or []):
+        return
+    job.submitters = [*(job.submitters or []), user_id]  # lista nueva: JSON no rastrea mutaciones
+    db.commit()
+
+def detach_submitter(db: Session, job: Job, user_id: int) -> list[int]:
+    """Saca a ``user_id`` de los que esperan el job; devuelve los que siguen enganchados."""
+    others = [u for u in (job.submitters or []) if u != user_id]
+    if len(others) != len(job.submitters or []):
+        job.submitters = others
+        db.commit()
+    return others
+
+def precomputed(db: Session, job_type: str, **kwargs) -> artifacts.Artifact | None:
+    """Artefacto de un job terminado con los mismos datos actuales (p.ej. un reporte precalculado)."""
+    version = data_version(db, job_type, **kwargs)
+    if version is None:
+        return None
+    job = reusable_job(db, job_key(job_type, kwargs, version), finished_only=True)
+    return artifacts.resolve(job.result_path) if job is not None else None
+
+def call_wrapped(func_path: str, job_type: str, kwargs: dict, trace_context: dict | None = None,
+                 enqueued_at: float | None = None):
+    """Wrapper ejecutado en el worker RQ. Maneja DB y actualización de estado.
+
+    ``trace_context``/``enqueued_at`` vienen de ``enqueue_job``: la ejecución queda en la
+    misma traza que el request que la encoló, con la espera en cola como span aparte.
+    """
+    try:
+        if enqueued_at is not None:
+            tracing.record_interval(f"rq.queue_wait {job_type}", enqueued_at, time.time(), parent=trace_context,
+                                    **{"job.type": job_type})
+        with tracing.span(f"rq.job {job_type}", kind="consumer", parent=trace_context, **{"job.type": job_type}):
+            _run_job(func_path, job_type, kwargs)
+    finally:
+        # el work-horse sale con os._exit: exportar antes de que se pierda el buffer
+        tracing.flush()
+
+def _run_job(func_path: str, job_type: str, kwargs: dict):
     module_name, fn_name = func_path.split(":")
     from importlib import import_module
     module = import_module(module_name)
@@ -36,23 +119,34 @@ def call_wrapped(func_path: str, job_type: str, kwargs: dict):
         current = get_current_job()
         job_record = db.query(Job).filter_by(rq_id=current.id).first()
         if job_record:
+            if job_record.status == "cancelled" or job_progress.cancel_requested(job_record.id):
+                job_record.status = "cancelled"; job_record.updated_at = datetime.utcnow(); db.commit()
+                return
             job_record.status = "started"; job_record.updated_at = datetime.utcnow(); db.commit()
-        result = fn(db=db, **kwargs)
+        with job_progress.tracking(job_record.id) if job_record else nullcontext():
+            result = fn(db=db, **kwargs)
         result_path = None
-        # Si el resultado es bytes => lo escribimos a un archivo temporal
+        # Resultados al almacén de artefactos (bytes, archivo generado o resumen dict/list en JSON)
         if isinstance(result, (bytes, bytearray)):
-            fd, path = tempfile.mkstemp(prefix=f"job_{job_type}_", suffix=".bin")
-            with os.fdopen(fd, "wb") as f:
-                f.write(result)
-            result_path = path
+            result_path = str(artifacts.put(bytes(result)).path)
         elif isinstance(result, str) and os.path.exists(result):
-            result_path = result
+            result_path = str(artifacts.put_file(result).path)
+        elif isinstance(result, (dict, list)):
+            result_path = str(artifacts.put_json(result).path)
         if job_record:
             job_record.status = "finished"
             job_record.result_path = result_path
             job_record.updated_at = datetime.utcnow()
             db.commit()
+    except job_progress.JobCancelled:
+        # cancelación cooperativa: se descarta lo no confirmado y el job termina sin error
+        db.rollback()
+        if job_record:
+            job_record.status = "cancelled"
+            job_record.updated_at = datetime.utcnow()
+            db.commit()
     except Exception as e:  # pragma: no cover - logging simple
+        db.rollback()
         if job_record:
             job_record.status = "failed"
             job_record.error = f"{e}\n{traceback.format_exc()}"
@@ -64,3 +158,17 @@ def call_wrapped(func_path: str, job_type: str, kwargs: dict):
 
 def get_job_status(db: Session, job_id: int) -> Job | None:
     return db.get(Job, job_id)
+
+def cancel_job(db: Session, job: Job) -> Job:
+    """Pide la cancelación: un job en cola se saca de RQ; uno en curso se detiene en su próximo bloque."""
+    job_progress.request_cancel(job.id)
+    if job.status == "queued":
+        try:
+            from rq.job import Job as RQJob
+            RQJob.fetch(job.rq_id, connection=_redis_conn()).cancel()
+        except Exception:
+            pass  # ya lo tomó un worker: verá la marca al empezar
+        job.status = "cancelled"
+        job.updated_at = datetime.utcnow()
+        db.commit()
+    return job
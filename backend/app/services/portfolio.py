@@ -0,0 +1,155 @@
+"""Métricas de portafolio (multi-proyecto) calculadas en una sola pasada.
+
+Cada bloque (PV, EV, finanzas, riesgos, workflows) es una única consulta
+agrupada por ``project_id`` sobre los proyectos accesibles por el usuario,
+en lugar de N llamadas al dashboard por proyecto (5 consultas cada una).
+"""
+from __future__ import annotations
+from typing import Iterable, Iterator
+from sqlalchemy.orm import Session
+from sqlalchemy import select, func, case, and_
+from app.db.models.project import Project
+from app.db.models.budget import Chapter, Item, MeasurementBatch, MeasurementLine
+from app.db.models.risk import Risk
+from app.db.models.versioning import WorkflowInstance, WorkflowInstanceStep, WorkflowStep
+from app.db.models.audit import UserProjectRole
+from app.services.finance import financial_metrics_batch, empty_financial_metrics
+
+# KPIs planos por los que se puede ordenar / filtrar
+PORTFOLIO_KPIS = [
+    "pv", "ev", "progress_percent",
+    "invoiced_total", "paid_total", "pending_total", "paid_ratio", "overdue_total",
+    "risks_open", "risks_mitigating", "risks_closed",
+    "pending_steps", "pending_steps_total",
+]
+
+
+def _float(x):
+    try:
+        return float(x or 0)
+    except Exception:
+        return 0.0
+
+
+def accessible_projects_select(user_id: int, roles: list[str] | None = None):
+    """SELECT de project_id donde el usuario tiene algún rol (o uno de ``roles``), para usar en ``IN``."""
+    q = select(UserProjectRole.project_id).where(UserProjectRole.user_id == user_id)
+    if roles:
+        q = q.where(UserProjectRole.role.in_(roles))
+    return q.distinct()
+
+
+def portfolio_metrics(db: Session, user_id: int, roles: list[str] | None = None) -> list[dict]:
+    """Calcula los KPIs del dashboard para todos los proyectos accesibles.
+
+    Devuelve una fila plana por proyecto con las claves de ``PORTFOLIO_KPIS``.
+    """
+    accessible = accessible_projects_select(user_id, roles)
+    projects = db.query(Project.id, Project.name).filter(Project.id.in_(accessible)).order_by(Project.id).all()
+    if not projects:
+        return []
+
+    # --- PV por proyecto ---
+    pv_rows = db.query(Chapter.project_id, func.coalesce(func.sum(Item.quantity * Item.price), 0)) \
+        .join(Item, Item.chapter_id == Chapter.id) \
+        .filter(Chapter.project_id.in_(accessible), Chapter.deleted_at.is_(None), Item.deleted_at.is_(None)) \
+        .group_by(Chapter.project_id).all()
+    pv = {pid: _float(v) for pid, v in pv_rows}
+
+    # --- EV por proyecto (solo batches cerrados) ---
+    ev_rows = db.query(MeasurementBatch.project_id, func.coalesce(func.sum(MeasurementLine.qty * Item.price), 0)) \
+        .join(MeasurementLine, MeasurementLine.batch_id == MeasurementBatch.id) \
+        .join(Item, Item.id == MeasurementLine.item_id) \
+        .join(Chapter, Chapter.id == Item.chapter_id) \
+        .filter(
+            MeasurementBatch.project_id.in_(accessible),
+            MeasurementBatch.status == 'closed',
+            Chapter.project_id == MeasurementBatch.project_id,
+            Chapter.deleted_at.is_(None),
+            Item.deleted_at.is_(None)
+        ).group_by(MeasurementBatch.project_id).all()
+    ev = {pid: _float(v) for pid, v in ev_rows}
+
+    # --- Finanzas (una consulta de agregación condicional para todos los proyectos) ---
+    fin = financial_metrics_batch(db, accessible)
+
+    # --- Riesgos ---
+    risk_rows = db.query(
+        Risk.project_id,
+        func.coalesce(func.sum(case((Risk.status == 'open', 1), else_=0)), 0),
+        func.coalesce(func.sum(case((Risk.status == 'mitigating', 1), else_=0)), 0),
+        func.coalesce(func.sum(case((Risk.status == 'closed', 1), else_=0)), 0)
+    ).filter(Risk.project_id.in_(accessible)).group_by(Risk.project_id).all()
+    risks = {pid: (int(o or 0), int(m or 0), int(c or 0)) for pid, o, m, c in risk_rows}
+
+    # --- Workflows: pendientes totales y del usuario (rol requerido == rol del usuario en el proyecto) ---
+    wf_rows = db.query(
+        WorkflowInstance.project_id,
+        func.count(WorkflowInstanceStep.id),
+        func.coalesce(func.sum(case((UserProjectRole.id.isnot(None), 1), else_=0)), 0)
+    ).join(WorkflowInstanceStep, WorkflowInstanceStep.instance_id == WorkflowInstance.id) \
+        .join(WorkflowStep, WorkflowInstanceStep.step_id == WorkflowStep.id) \
+        .outerjoin(UserProjectRole, and_(
+            UserProjectRole.user_id == user_id,
+            UserProjectRole.project_id == WorkflowInstance.project_id,
+            UserProjectRole.role == WorkflowStep.role_required
+        )).filter(
+            WorkflowInstance.project_id.in_(accessible),
+            WorkflowInstance.status == 'running',
+            WorkflowInstanceStep.decision.is_(None),
+            WorkflowInstanceStep.position == WorkflowInstance.current_step
+        ).group_by(WorkflowInstance.project_id).all()
+    wf = {pid: (int(total or 0), int(mine or 0)) for pid, total, mine in wf_rows}
+
+    result = []
+    for pid, name in projects:
+        p_pv, p_ev = pv.get(pid, 0.0), ev.get(pid, 0.0)
+        f = fin.get(pid) or empty_financial_metrics()
+        r_open, r_mit, r_closed = risks.get(pid, (0, 0, 0))
+        wf_total, wf_mine = wf.get(pid, (0, 0))
+        result.append({
+            "project_id": pid,
+            "name": name,
+            "pv": p_pv,
+            "ev": p_ev,
+            "progress_percent": (p_ev / p_pv * 100) if p_pv else 0.0,
+            "invoiced_total": f["invoiced_total"],
+            "paid_total": f["paid_total"],
+            "pending_total": f["pending_total"],
+            "paid_ratio": f["paid_ratio"],
+            "overdue_total": f["overdue_total"],
+            "risks_open": r_open,
+            "risks_mitigating": r_mit,
+            "risks_closed": r_closed,
+            "pending_steps": wf_mine,
+            "pending_steps_total": wf_total,
+        })
+    return result
+
+
+def filter_and_sort(rows: Iterable[dict], sort_by: str = "project_id", descending: bool = False,
+                    kpi: str | None = None, kpi_min: float | None = None, kpi_max: float | None = None) -> list[dict]:
+    """Filtra por rango de un KPI y ordena por cualquier KPI (o project_id/name)."""
+    out = list(rows)
+    if kpi:
+        if kpi_min is not None:
+            out = [r for r in out if r[kpi] >= kpi_min]
+        if kpi_max is not None:
+            out = [r for r in out if r[kpi] <= kpi_max]
+    out.sort(key=lambda r: (r[sort_by] is None, r[sort_by]), reverse=descending)
+    return out
+
+
+def iter_json_array(rows: Iterable[dict], dumps) -> Iterator[str]:
+    """Serializa ``rows`` como un array JSON emitido fila a fila."""
+    yield "["
+    first = True
+    for r in rows:
+        yield ("" if first else ",") + dumps(r)
+        first = False
+    yield "]"
+
+
+def iter_ndjson(rows: Iterable[dict], dumps) -> Iterator[str]:
+    for r in rows:
+        yield dumps(r) + "\n"
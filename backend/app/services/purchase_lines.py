@@ -0,0 +1,197 @@
+"""Ingesta masiva de líneas de compras (RFQ, cotizaciones y órdenes de compra).
+
+Cada lote se valida completo antes de escribir: todos los ids referenciados se
+verifican con una sola consulta ``IN`` acotada al proyecto / RFQ, y los errores se
+reportan por línea (número de línea 1-based, campo y mensaje). Si no hay errores,
+las líneas se insertan con executemany en la misma transacción que la cabecera.
+"""
+from __future__ import annotations
+from decimal import Decimal, InvalidOperation
+from typing import Any, Iterable
+from sqlalchemy.orm import Session
+from sqlalchemy import insert
+from app.db.models.budget import Chapter, Item
+from app.db.models.project import Project
+from app.db.models.purchases import Supplier, RFQ, RFQItem, Quote, QuoteLine, PurchaseOrder, PurchaseOrderLine
+from app.services.tabular_io import as_int, parse_amount
+from app.services.commitments import record_po_created, over_committed_items
+
+
+class LineValidationError(Exception):
+    """Errores por línea; no se escribió nada."""
+
+    def __init__(self, errors: list[dict]):
+        super().__init__(f"{len(errors)} líneas inválidas")
+        self.errors = errors
+
+
+def _as_decimal(value: Any, default: Decimal | None = None) -> Decimal | None:
+    if value is None or value == "":
+        return default
+    if isinstance(value, str):
+        return parse_amount(value)
+    try:
+        d = Decimal(str(value))
+    except InvalidOperation:
+        return None
+    return d if d.is_finite() else None
+
+
+def _project_items(db: Session, project_id: int, ids: set[int], codes: set[str]) -> tuple[set[int], dict[str, int]]:
+    """Ítems vigentes del proyecto: ids válidos y mapa código -> id (una consulta)."""
+    if not ids and not codes:
+        return set(), {}
+    q = db.query(Item.id, Item.code).join(Chapter, Chapter.id == Item.chapter_id) \
+        .filter(Chapter.project_id == project_id, Item.deleted_at.is_(None), Chapter.deleted_at.is_(None))
+    if ids and codes:
+        q = q.filter(Item.id.in_(ids) | Item.code.in_(codes))
+    elif ids:
+        q = q.filter(Item.id.in_(ids))
+    else:
+        q = q.filter(Item.code.in_(codes))
+    valid, by_code = set(), {}
+    for item_id, code in q.all():
+        valid.add(item_id)
+        if code in codes:
+            by_code.setdefault(code, item_id)
+    return valid, by_code
+
+
+def _resolve_items(db: Session, project_id: int, lines: list[dict], errors: list[dict]) -> list[int | None]:
+    """Resuelve ``item_id`` o ``item_code`` de cada línea contra los ítems del proyecto."""
+    ids = {i for i in (as_int(l.get("item_id")) for l in lines) if i is not None}
+    codes = {str(l["item_code"]).strip() for l in lines if l.get("item_id") in (None, "") and l.get("item_code")}
+    valid, by_code = _project_items(db, project_id, ids, codes)
+    out: list[int | None] = []
+    for n, l in enumerate(lines, start=1):
+        if l.get("item_id") not in (None, ""):
+            item_id = as_int(l.get("item_id"))
+            if item_id not in valid:
+                errors.append({"line": n, "field": "item_id", "error": "Ítem no existe en el proyecto"})
+                item_id = None
+        elif l.get("item_code"):
+            item_id = by_code.get(str(l["item_code"]).strip())
+            if item_id is None:
+                errors.append({"line": n, "field": "item_code", "error": "Código de ítem no existe en el proyecto"})
+        else:
+            errors.append({"line": n, "field": "item_id", "error": "Falta item_id o item_code"})
+            item_id = None
+        out.append(item_id)
+    return out
+
+
+def _number(lines: list[dict], field: str, errors: list[dict], default: Decimal | None = Decimal("0")) -> list[Decimal | None]:
+    out = []
+    for n, l in enumerate(lines, start=1):
+        value = _as_decimal(l.get(field), default)
+        if value is None or value < 0:
+            errors.append({"line": n, "field": field, "error": "Número inválido"})
+            value = None
+        out.append(value)
+    return out
+
+
+def _require(db: Session, model, id_: int | None, label: str) -> None:
+    if id_ is None or db.query(model.id).filter(model.id == id_).first() is None:
+        raise LineValidationError([{"line": 0, "field": label, "error": f"{label} no existe"}])
+
+
+def _raise_if(errors: list[dict]) -> None:
+    if errors:
+        errors.sort(key=lambda e: e["line"])
+        raise LineValidationError(errors)
+
+
+def create_rfq(db: Session, project_id: int, lines: Iterable[dict]) -> dict:
+    """Crea un RFQ con sus ítems (``item_id`` | ``item_code``, ``qty``)."""
+    lines = list(lines)
+    _require(db, Project, project_id, "project_id")
+    errors: list[dict] = []
+    item_ids = _resolve_items(db, project_id, lines, errors)
+    qtys = _number(lines, "qty", errors)
+    _raise_if(errors)
+    rfq = RFQ(project_id=project_id)
+    db.add(rfq); db.flush()
+    rfq_item_ids: list[int] = []
+    if lines:
+        # ids en el orden de las líneas, para que el cliente arme la cotización
+        stmt = insert(RFQItem).returning(RFQItem.id, sort_by_parameter_order=True)
+        rfq_item_ids = list(db.execute(stmt, [{"rfq_id": rfq.id, "item_id": i, "qty": q} for i, q in zip(item_ids, qtys)]).scalars())
+    db.commit()
+    return {"rfq_id": rfq.id, "lines": len(lines), "rfq_item_ids": rfq_item_ids}
+
+
+def create_quote(db: Session, rfq_id: int, supplier_id: int, lines: Iterable[dict]) -> dict:
+    """Crea una cotización; cada línea referencia ``rfq_item_id`` o el ``item_id`` del RFQ."""
+    lines = list(lines)
+    _require(db, RFQ, rfq_id, "rfq_id")
+    _require(db, Supplier, supplier_id, "supplier_id")
+    rfq_items = db.query(RFQItem.id, RFQItem.item_id).filter(RFQItem.rfq_id == rfq_id).all()
+    valid = {rid for rid, _ in rfq_items}
+    by_item = {}
+    for rid, item_id in rfq_items:
+        by_item.setdefault(item_id, rid)
+    errors: list[dict] = []
+    rfq_item_ids: list[int | None] = []
+    for n, l in enumerate(lines, start=1):
+        if l.get("rfq_item_id") not in (None, ""):
+            rid = as_int(l.get("rfq_item_id"))
+            if rid not in valid:
+                errors.append({"line": n, "field": "rfq_item_id", "error": "Ítem no pertenece al RFQ"})
+        else:
+            rid = by_item.get(as_int(l.get("item_id")))
+            if rid is None:
+                errors.append({"line": n, "field": "item_id", "error": "Ítem no pertenece al RFQ"})
+        rfq_item_ids.append(rid)
+    prices = _number(lines, "unit_price", errors)
+    _raise_if(errors)
+    q = Quote(rfq_id=rfq_id, supplier_id=supplier_id)
+    db.add(q); db.flush()
+    if lines:
+        db.execute(insert(QuoteLine), [{"quote_id": q.id, "rfq_item_id": r, "unit_price": p} for r, p in zip(rfq_item_ids, prices)])
+    db.commit()
+    return {"quote_id": q.id, "lines": len(lines)}
+
+
+def create_po(db: Session, project_id: int, supplier_id: int, lines: Iterable[dict], rfq_id: int | None = None) -> dict:
+    """Crea una OC con líneas (``item_id`` | ``item_code``, ``qty``, ``unit_price``)."""
+    lines = list(lines)
+    _require(db, Project, project_id, "project_id")
+    _require(db, Supplier, supplier_id, "supplier_id")
+    if rfq_id is not None:
+        _require(db, RFQ, rfq_id, "rfq_id")
+    errors: list[dict] = []
+    item_ids = _resolve_items(db, project_id, lines, errors)
+    qtys = _number(lines, "qty", errors)
+    prices = _number(lines, "unit_price", errors)
+    _raise_if(errors)
+    po = PurchaseOrder(project_id=project_id, supplier_id=supplier_id, rfq_id=rfq_id)
+    db.add(po); db.flush()
+    if lines:
+        db.execute(insert(PurchaseOrderLine), [
+            {"po_id": po.id, "item_id": i, "qty": q, "unit_price": p} for i, q, p in zip(item_ids, qtys, prices)
+        ])
+    affected = record_po_created(db, po)
+    db.commit()
+    return {"po_id": po.id, "lines": len(lines),
+            "over_committed_items": [r["item_id"] for r in over_committed_items(db, project_id, affected)]}
+
+
+# Alias de columnas aceptados en planillas (encabezados normalizados por tabular_io)
+UPLOAD_ALIASES = {
+    "item_id": ("item_id", "id_item"),
+    "item_code": ("item_code", "codigo", "code", "codigo_item"),
+    "rfq_item_id": ("rfq_item_id",),
+    "qty": ("qty", "cantidad", "quantity"),
+    "unit_price": ("unit_price", "precio_unitario", "precio", "price"),
+}
+
+
+def normalize_upload_row(raw: dict) -> dict:
+    row = {}
+    for field, aliases in UPLOAD_ALIASES.items():
+        for alias in aliases:
+            if raw.get(alias) not in (None, ""):
+                row[field] = raw[alias]
+                break
+    return row
@@ -0,0 +1,164 @@
+"""Motor de comparación de cotizaciones de un RFQ.
+
+- Totales por cotización: ``SUM(unit_price * rfq_item.qty)`` en una consulta agrupada.
+- Matriz proveedor × ítem del RFQ (última cotización de cada proveedor) en NumPy.
+- Adjudicación más barata repartida entre proveedores: ``nanargmin`` por columna.
+- Resultado cacheado por RFQ hasta que llega una nueva cotización (token = último
+  ``Quote.id`` + cantidad de ítems del RFQ, verificado con una consulta escalar).
+"""
+from __future__ import annotations
+import threading
+from collections import OrderedDict
+import numpy as np
+from sqlalchemy.orm import Session
+from sqlalchemy import select, func, and_
+from app.db.models.purchases import RFQItem, Quote, QuoteLine
+
+CACHE_MAX_RFQS = 256
+
+_cache: "OrderedDict[int, tuple[tuple, dict]]" = OrderedDict()
+_cache_lock = threading.Lock()
+
+
+def invalidate_rfq(rfq_id: int) -> None:
+    with _cache_lock:
+        _cache.pop(rfq_id, None)
+
+
+def _cache_token(db: Session, rfq_id: int) -> tuple:
+    last_quote = select(func.max(Quote.id)).where(Quote.rfq_id == rfq_id).scalar_subquery()
+    n_items = select(func.count(RFQItem.id)).where(RFQItem.rfq_id == rfq_id).scalar_subquery()
+    return tuple(db.execute(select(last_quote, n_items)).one())
+
+
+def quote_totals(db: Session, rfq_id: int) -> list[dict]:
+    """Total por cotización (precio × cantidad solicitada) y cobertura de ítems."""
+    rows = db.query(
+        Quote.id, Quote.supplier_id,
+        func.coalesce(func.sum(QuoteLine.unit_price * RFQItem.qty), 0),
+        func.count(func.distinct(RFQItem.id)),
+    ).outerjoin(QuoteLine, QuoteLine.quote_id == Quote.id) \
+        .outerjoin(RFQItem, and_(RFQItem.id == QuoteLine.rfq_item_id, RFQItem.rfq_id == Quote.rfq_id)) \
+        .filter(Quote.rfq_id == rfq_id) \
+        .group_by(Quote.id, Quote.supplier_id).all()
+    return [
+        {"quote_id": qid, "supplier_id": sid, "total": float(total or 0), "lines_quoted": int(n or 0)}
+        for qid, sid, total, n in rows
+    ]
+
+
+def price_matrix(db: Session, rfq_id: int):
+    """Matriz de precios unitarios ``(proveedores, ítems)`` con NaN donde no hay precio.
+
+    Devuelve ``(supplier_ids, rfq_item_ids, item_ids, qty, prices, quote_ids)``; por
+    proveedor se usa su cotización más reciente.
+    """
+    items = db.query(RFQItem.id, RFQItem.item_id, RFQItem.qty) \
+        .filter(RFQItem.rfq_id == rfq_id).order_by(RFQItem.id).all()
+    latest = select(func.max(Quote.id)).where(Quote.rfq_id == rfq_id).group_by(Quote.supplier_id)
+    lines = db.query(Quote.supplier_id, Quote.id, QuoteLine.rfq_item_id, QuoteLine.unit_price) \
+        .join(QuoteLine, QuoteLine.quote_id == Quote.id) \
+        .filter(Quote.id.in_(latest)).all()
+
+    rfq_item_ids = np.fromiter((r[0] for r in items), dtype=np.int64, count=len(items))
+    item_ids = np.fromiter((r[1] or 0 for r in items), dtype=np.int64, count=len(items))
+    qty = np.fromiter((float(r[2] or 0) for r in items), dtype=np.float64, count=len(items))
+    l_supplier = np.fromiter((r[0] for r in lines), dtype=np.int64, count=len(lines))
+    l_quote = np.fromiter((r[1] for r in lines), dtype=np.int64, count=len(lines))
+    l_item = np.fromiter((r[2] for r in lines), dtype=np.int64, count=len(lines))
+    l_price = np.fromiter((float(r[3]) if r[3] is not None else np.nan for r in lines), dtype=np.float64, count=len(lines))
+
+    supplier_ids, s_idx = np.unique(l_supplier, return_inverse=True)
+    quote_ids = np.zeros(len(supplier_ids), dtype=np.int64)
+    quote_ids[s_idx] = l_quote
+    # posiciones de cada línea en el eje de ítems (descarta líneas de ítems ajenos al RFQ)
+    i_idx = np.searchsorted(rfq_item_ids, l_item)
+    valid = i_idx < len(rfq_item_ids)
+    valid[valid] = rfq_item_ids[i_idx[valid]] == l_item[valid]
+    prices = np.full((len(supplier_ids), len(rfq_item_ids)), np.nan)
+    prices[s_idx[valid], i_idx[valid]] = l_price[valid]
+    return supplier_ids, rfq_item_ids, item_ids, qty, prices, quote_ids
+
+
+def cheapest_award(supplier_ids: np.ndarray, qty: np.ndarray, prices: np.ndarray) -> dict:
+    """Adjudica cada ítem al proveedor con menor precio; reporta el reparto por proveedor."""
+    n_items = prices.shape[1]
+    quoted = ~np.isnan(prices).all(axis=0) if prices.size else np.zeros(n_items, dtype=bool)
+    best = np.full(n_items, -1, dtype=np.int64)
+    if quoted.any():
+        best[quoted] = np.nanargmin(prices[:, quoted], axis=0)
+    cols = np.flatnonzero(quoted)
+    line_cost = np.zeros(n_items)
+    line_cost[cols] = prices[best[cols], cols] * qty[cols]
+    totals = np.bincount(best[cols], weights=line_cost[cols], minlength=len(supplier_ids))
+    counts = np.bincount(best[cols], minlength=len(supplier_ids))
+    # mejor proveedor único que cotizó todo el RFQ (referencia para el ahorro)
+    complete = ~np.isnan(prices).any(axis=1) if n_items else np.zeros(len(supplier_ids), dtype=bool)
+    single_totals = np.where(complete, np.nansum(prices * qty, axis=1), np.inf)
+    best_single = int(np.argmin(single_totals)) if complete.any() else None
+    total = float(line_cost.sum())
+    return {
+        "total": total,
+        "items_awarded": int(quoted.sum()),
+        "items_unquoted": int(n_items - quoted.sum()),
+        "best_supplier_idx": best,
+        "by_supplier": [
+            {"supplier_id": int(supplier_ids[k]), "items": int(counts[k]), "total": float(totals[k])}
+            for k in np.flatnonzero(counts)
+        ],
+        "best_single_supplier_id": int(supplier_ids[best_single]) if best_single is not None else None,
+        "best_single_total": float(single_totals[best_single]) if best_single is not None else None,
+        "savings_vs_single": float(single_totals[best_single] - total) if best_single is not None else None,
+    }
+
+
+def _compare(db: Session, rfq_id: int) -> dict:
+    ranking = quote_totals(db, rfq_id)
+    supplier_ids, rfq_item_ids, item_ids, qty, prices, quote_ids = price_matrix(db, rfq_id)
+    n_items = len(rfq_item_ids)
+    for r in ranking:
+        r["complete"] = n_items > 0 and r["lines_quoted"] >= n_items
+    # cotizaciones completas primero; dentro de cada grupo, menor total primero
+    ranking.sort(key=lambda r: (not r["complete"], r["total"]))
+    award = cheapest_award(supplier_ids, qty, prices)
+    best_idx = award.pop("best_supplier_idx")
+    award["lines"] = [
+        {
+            "rfq_item_id": int(rfq_item_ids[j]),
+            "item_id": int(item_ids[j]),
+            "qty": float(qty[j]),
+            "supplier_id": int(supplier_ids[best_idx[j]]) if best_idx[j] >= 0 else None,
+            "unit_price": float(prices[best_idx[j], j]) if best_idx[j] >= 0 else None,
+        }
+        for j in range(n_items)
+    ]
+    return {
+        "rfq_id": rfq_id,
+        "ranking": ranking,
+        "matrix": {
+            "supplier_ids": supplier_ids.tolist(),
+            "quote_ids": quote_ids.tolist(),
+            "rfq_item_ids": rfq_item_ids.tolist(),
+            "qty": qty.tolist(),
+            # NaN no es JSON válido: sin precio => None
+            "prices": [[None if np.isnan(v) else float(v) for v in row] for row in prices],
+        },
+        "award": award,
+    }
+
+
+def compare_quotes(db: Session, rfq_id: int) -> dict:
+    """Ranking, matriz y adjudicación del RFQ; se recalcula solo si cambió el token."""
+    token = _cache_token(db, rfq_id)
+    with _cache_lock:
+        hit = _cache.get(rfq_id)
+        if hit and hit[0] == token:
+            _cache.move_to_end(rfq_id)
+            return hit[1]
+    result = _compare(db, rfq_id)
+    with _cache_lock:
+        _cache[rfq_id] = (token, result)
+        _cache.move_to_end(rfq_id)
+        while len(_cache) > CACHE_MAX_RFQS:
+            _cache.popitem(last=False)
+    return result
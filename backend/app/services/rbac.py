@@ -2,8 +2,9 @@ from fastapi import HTTPException, Depends
 from sqlalchemy.orm import Session
 from app.db.session import get_db
 from app.db.models.audit import UserProjectRole
-from app.api.v1.auth import get_current_user
+from app.api.v1.auth import get_current_user, user_from_token
 from app.db.models.user import User
+from app.core.settings import get_settings
 
 # Roles base del sistema (podrán ampliarse en sprints futuros)
 ROLES = ["admin", "editor", "viewer"]
@@ -34,3 +35,26 @@ def assert_project_access(db: Session, user: User, project_id: int, min_roles: l
     if min_roles and r.role not in min_roles:
         raise HTTPException(status_code=403, detail="No permission")
     return True
+
+
+def token_project_role(db: Session, token: str | None, project_id: int, allowed: list[str]) -> tuple[User, str] | None:
+    """(usuario, rol) para conexiones WebSocket autenticadas por ``?token=``; None si no tiene acceso."""
+    user = user_from_token(db, token)
+    if user is None:
+        return None
+    r = _fetch_role(db, int(user.id), project_id)
+    if not r or r.role not in allowed:
+        return None
+    return user, r.role
+
+
+def is_platform_admin(user: User) -> bool:
+    admins = {u.strip() for u in get_settings().admin_usernames.split(",") if u.strip()}
+    return str(user.username) in admins
+
+
+def require_platform_admin(current_user: User = Depends(get_current_user)) -> User:
+    """Dependencia para endpoints de operación (no ligados a un proyecto)."""
+    if not is_platform_admin(current_user):
+        raise HTTPException(status_code=403, detail="No permission")
+    return current_user
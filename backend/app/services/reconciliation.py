@@ -0,0 +1,214 @@
+"""Conciliación bancaria automática (bulk) entre ``BankTransaction`` e ``Invoice``.
+
+Carga las transacciones sin conciliar y las facturas abiertas (saldo = amount - paid_amount) en arreglos NumPy
+y las empareja sin loops anidados:
+
+1. Regla ``dte``: números encontrados en ``description`` se buscan en un hash
+   ``(project_id, número DTE) -> factura``; el monto debe calzar con el saldo. Ambos lados
+   pasan por ``_normalize_dte`` (grupos de dígitos unidos, sin ceros a la izquierda), así
+   ``FE-001-004512`` en la factura y en la glosa dan el mismo número.
+2. Regla ``amount_date``: por proyecto, facturas ordenadas por saldo y
+   ``np.searchsorted`` para acotar candidatos dentro de la tolerancia de monto;
+   entre ellos se elige el más cercano en fecha dentro de la ventana.
+
+Cada factura y transacción se usa como máximo una vez. Con ``apply=True`` cada match
+registra un ``InvoicePayment`` por el saldo (referencia a la transacción), que suma al
+acumulado de la factura y al libro de costos como cualquier pago; transacciones, pagos y
+auditoría se escriben en lote (un solo commit).
+"""
+from __future__ import annotations
+import re
+from datetime import datetime
+from decimal import Decimal
+from typing import Iterable
+import numpy as np
+from sqlalchemy.orm import Session
+from sqlalchemy import update, insert, bindparam, func
+from app.db.models.versioning import Invoice, InvoicePayment, BankTransaction
+from app.services.audit import log_actions
+from app.services.cost_ledger import record_costs
+from app.services.invoices import _apply_payment_stmt
+from app.services.events import make_event, publish
+
+DTE_NUMBER_RE = re.compile(r"\d{3,}")
+# número DTE en una glosa: grupos de dígitos unidos por separadores (FE-001-004512, 001/4512)
+DTE_TOKEN_RE = re.compile(r"\d{3,}(?:[-/.]\d{3,})*")
+OPEN_STATUSES = ("pending", "accepted")
+
+
+def _normalize_dte(value: str | None) -> str | None:
+    if not value:
+        return None
+    digits = "".join(DTE_NUMBER_RE.findall(str(value)))
+    return digits.lstrip("0") or None
+
+
+def _dte_numbers(text: str | None) -> list[str]:
+    """Números DTE normalizados que aparecen en una glosa bancaria."""
+    numbers = (_normalize_dte(token) for token in DTE_TOKEN_RE.findall(text or ""))
+    return [n for n in numbers if n]
+
+
+def _load_transactions(db: Session, project_ids: Iterable[int] | None):
+    q = db.query(BankTransaction.id, BankTransaction.project_id, BankTransaction.date, BankTransaction.amount, BankTransaction.description) \
+        .filter(BankTransaction.matched_invoice_id.is_(None), BankTransaction.amount > 0)
+    if project_ids is not None:
+        q = q.filter(BankTransaction.project_id.in_(project_ids))
+    return q.order_by(BankTransaction.id).all()
+
+
+def _load_open_invoices(db: Session, project_ids: Iterable[int] | None):
+    q = db.query(
+        Invoice.id, Invoice.project_id, Invoice.dte_number, Invoice.created_at,
+        (func.coalesce(Invoice.amount, 0) - func.coalesce(Invoice.paid_amount, 0)).label("outstanding")
+    ).filter(Invoice.status.in_(OPEN_STATUSES))
+    if project_ids is not None:
+        q = q.filter(Invoice.project_id.in_(project_ids))
+    return q.order_by(Invoice.id).all()
+
+
+# día de una fecha None; match_transactions lo excluye explícitamente de la regla por fecha
+NO_DATE = np.iinfo(np.int64).min
+
+
+def _to_days(values) -> np.ndarray:
+    """Fechas/datetimes -> días desde epoch (int64); None -> ``NO_DATE``."""
+    out = np.full(len(values), NO_DATE, dtype=np.int64)
+    for i, v in enumerate(values):
+        if v is None:
+            continue
+        if isinstance(v, str):
+            v = datetime.fromisoformat(v)
+        out[i] = np.datetime64(v.date() if isinstance(v, datetime) else v, "D").astype(np.int64)
+    return out
+
+
+def match_transactions(
+    txn_project: np.ndarray, txn_amount: np.ndarray, txn_day: np.ndarray, txn_dte: list[list[str]],
+    inv_project: np.ndarray, inv_amount: np.ndarray, inv_day: np.ndarray, inv_dte: list[str | None],
+    amount_tolerance: float = 1.0, date_window_days: int = 45,
+) -> list[tuple[int, int, str]]:
+    """Devuelve pares ``(idx_txn, idx_factura, regla)`` sobre los arreglos de entrada.
+
+    ``inv_day`` es la fecha de emisión; se aceptan pagos desde ``date_window_days``
+    antes hasta ``date_window_days`` después de ella. Una transacción o factura sin fecha
+    (``NO_DATE``) solo puede calzar por DTE.
+    """
+    n_txn, n_inv = len(txn_amount), len(inv_amount)
+    txn_used = np.zeros(n_txn, dtype=bool)
+    inv_used = np.zeros(n_inv, dtype=bool)
+    matches: list[tuple[int, int, str]] = []
+
+    # 1) DTE: hash (proyecto, número) -> factura
+    dte_index = {}
+    for j, dte in enumerate(inv_dte):
+        if dte:
+            dte_index.setdefault((int(inv_project[j]), dte), j)
+    for i, numbers in enumerate(txn_dte):
+        for num in numbers:
+            j = dte_index.get((int(txn_project[i]), num))
+            if j is not None and not inv_used[j] and abs(txn_amount[i] - inv_amount[j]) <= amount_tolerance:
+                txn_used[i] = inv_used[j] = True
+                matches.append((i, j, "dte"))
+                break
+
+    # 2) Monto + ventana de fechas, por proyecto con búsqueda binaria vectorizada
+    txn_dated, inv_dated = txn_day != NO_DATE, inv_day != NO_DATE
+    for pid in np.unique(txn_project[~txn_used & txn_dated]):
+        t_idx = np.flatnonzero((txn_project == pid) & ~txn_used & txn_dated)
+        i_idx = np.flatnonzero((inv_project == pid) & ~inv_used & inv_dated)
+        if not len(t_idx) or not len(i_idx):
+            continue
+        order = np.argsort(inv_amount[i_idx], kind="stable")
+        i_sorted = i_idx[order]
+        amounts_sorted = inv_amount[i_sorted]
+        lo = np.searchsorted(amounts_sorted, txn_amount[t_idx] - amount_tolerance, side="left")
+        hi = np.searchsorted(amounts_sorted, txn_amount[t_idx] + amount_tolerance, side="right")
+        has_candidates = hi > lo
+        # Procesar primero transacciones con menos candidatos (menos ambiguas)
+        for k in np.argsort(hi - lo, kind="stable"):
+            if not has_candidates[k]:
+                continue
+            i = t_idx[k]
+            cand = i_sorted[lo[k]:hi[k]]
+            cand = cand[~inv_used[cand]]
+            if not len(cand):
+                continue
+            day_diff = np.abs(txn_day[i] - inv_day[cand])
+            ok = day_diff <= date_window_days
+            if not ok.any():
+                continue
+            cand, day_diff = cand[ok], day_diff[ok]
+            amount_diff = np.abs(inv_amount[cand] - txn_amount[i])
+            best = cand[np.lexsort((day_diff, amount_diff))[0]]
+            inv_used[best] = txn_used[i] = True
+            matches.append((int(i), int(best), "amount_date"))
+    return matches
+
+
+def auto_reconcile(
+    db: Session,
+    project_ids: list[int] | None = None,
+    apply: bool = False,
+    user_id: int | None = None,
+    amount_tolerance: float = 1.0,
+    date_window_days: int = 45,
+) -> dict:
+    """Propone (o aplica) conciliaciones para los proyectos indicados (None = todos)."""
+    txns = _load_transactions(db, project_ids)
+    invoices = _load_open_invoices(db, project_ids)
+    if not txns or not invoices:
+        return {"proposed": 0, "applied": 0, "matches": []}
+
+    txn_project = np.fromiter((t.project_id for t in txns), dtype=np.int64, count=len(txns))
+    txn_amount = np.fromiter((float(t.amount or 0) for t in txns), dtype=np.float64, count=len(txns))
+    txn_day = _to_days([t.date for t in txns])
+    txn_dte = [_dte_numbers(t.description) for t in txns]
+    inv_project = np.fromiter((r.project_id for r in invoices), dtype=np.int64, count=len(invoices))
+    inv_amount = np.fromiter((float(r.outstanding or 0) for r in invoices), dtype=np.float64, count=len(invoices))
+    inv_day = _to_days([r.created_at for r in invoices])
+    inv_dte = [_normalize_dte(r.dte_number) for r in invoices]
+
+    pairs = match_transactions(
+        txn_project, txn_amount, txn_day, txn_dte,
+        inv_project, inv_amount, inv_day, inv_dte,
+        amount_tolerance=amount_tolerance, date_window_days=date_window_days,
+    )
+    matches = [{
+        "bank_txn_id": txns[i].id,
+        "invoice_id": invoices[j].id,
+        "project_id": int(txn_project[i]),
+        "rule": rule,
+        "amount": float(txn_amount[i]),
+        "amount_diff": round(float(txn_amount[i] - inv_amount[j]), 2),
+        "days_diff": int(txn_day[i] - inv_day[j]) if txn_day[i] != NO_DATE and inv_day[j] != NO_DATE else None,
+    } for i, j, rule in pairs]
+
+    applied = 0
+    if apply and matches:
+        db.execute(update(BankTransaction), [
+            {"id": m["bank_txn_id"], "matched_invoice_id": m["invoice_id"]} for m in matches
+        ])
+        # pago por el saldo de cada factura: acumulado, estado y libro de costos como en register_payments_bulk
+        outstanding = {invoices[j].id: Decimal(str(invoices[j].outstanding or 0)) for _, j, _ in pairs}
+        db.execute(insert(InvoicePayment), [
+            {"invoice_id": m["invoice_id"], "amount": outstanding[m["invoice_id"]], "method": "transfer",
+             "reference": f"bank_txn:{m['bank_txn_id']}"}
+            for m in matches
+        ])
+        db.execute(
+            _apply_payment_stmt(bindparam("b_amount")).where(Invoice.__table__.c.id == bindparam("b_id")),
+            [{"b_id": m["invoice_id"], "b_amount": outstanding[m["invoice_id"]]} for m in matches],
+        )
+        record_costs(db, [
+            {"project_id": m["project_id"], "source": "payment", "amount": outstanding[m["invoice_id"]]} for m in matches
+        ])
+        log_actions(db, [
+            dict(project_id=m["project_id"], entity="invoice", entity_id=m["invoice_id"], action="bank_auto_reconcile",
+                 data={"bank_txn": m["bank_txn_id"], "rule": m["rule"]}, user_id=user_id)
+            for m in matches
+        ])
+        applied = len(matches)
+        projects = sorted({m["project_id"] for m in matches})
+        publish([make_event("invoice.reconciled", pid, "invoice", None, {"auto": True}, user_id) for pid in projects], db)
+    return {"proposed": len(matches), "applied": applied, "matches": matches}
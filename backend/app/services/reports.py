@@ -0,0 +1,139 @@
+"""Precálculo de reportes pesados (cierre de mes) en el almacén de artefactos.
+
+Cada reporte configurado en ``reports_precompute`` se encola por proyecto con
+``jobs.submit_job``: si los datos no cambiaron desde el último cálculo (misma versión de
+datos, ``app.services.data_version``) no se encola nada. Los endpoints de exportación
+sirven el artefacto con ``jobs.precomputed`` mientras siga vigente y calculan en línea si
+no lo está.
+
+Disparadores:
+
+- cada noche a las ``reports_precompute_hour`` UTC:
+  ``python -m app.services.reports`` (bucle; ``--once`` para cron);
+- al cerrar un batch de mediciones o fijar la línea base: grupo ``reports`` de
+  ``app.services.event_consumers``, con ``reports_precompute_enabled`` y
+  ``reports_on_batch_close``.
+"""
+from __future__ import annotations
+import argparse
+import logging
+import socket
+import time
+from datetime import datetime, timedelta
+from typing import Callable
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+from app.core.settings import get_settings
+from app.db.models.project import Project
+from app.db.models.versioning import BudgetVersion
+from app.services.evm import evm_metrics
+from app.services.exporting import export_budget_excel, export_budget_pdf, export_measurements_excel, \
+    export_versions_diff_excel
+from app.services.jobs import submit_job
+
+logger = logging.getLogger(__name__)
+
+# eventos que disparan el precálculo del proyecto
+TRIGGERS = {"measurement.batch_closed", "version.baseline_set"}
+
+
+def _baseline_diff(db: Session, project_id: int) -> list[tuple[str, Callable, dict]]:
+    baseline = db.query(Project.baseline_version_id).filter(Project.id == project_id).scalar()
+    latest = db.query(func.max(BudgetVersion.id)).filter(BudgetVersion.project_id == project_id).scalar()
+    if not baseline or not latest or baseline == latest:
+        return []
+    return [("export_versions_diff_excel", export_versions_diff_excel, {"v_from": baseline, "v_to": latest})]
+
+
+# reporte -> jobs (tipo, función, kwargs) a precalcular para un proyecto
+REPORTS: dict[str, Callable[[Session, int], list[tuple[str, Callable, dict]]]] = {
+    "budget_xlsx": lambda db, pid: [("export_budget_excel", export_budget_excel, {"project_id": pid})],
+    "budget_pdf": lambda db, pid: [("export_budget_pdf", export_budget_pdf, {"project_id": pid})],
+    "measurements_xlsx": lambda db, pid: [("export_measurements_excel", export_measurements_excel, {"project_id": pid})],
+    "baseline_diff_xlsx": _baseline_diff,
+    "evm_curves": lambda db, pid: [("evm_curves", evm_metrics, {"project_id": pid})],
+}
+
+
+def configured() -> list[str]:
+    names = [n.strip() for n in get_settings().reports_precompute.split(",") if n.strip()]
+    unknown = [n for n in names if n not in REPORTS]
+    if unknown:
+        logger.warning("reportes desconocidos en reports_precompute: %s", unknown)
+    return [n for n in names if n in REPORTS]
+
+
+def precompute_project(db: Session, project_id: int, reports: list[str] | None = None) -> list[dict]:
+    """Encola los reportes del proyecto cuyos datos cambiaron; un reporte que falla no frena al resto."""
+    out = []
+    for name in reports or configured():
+        try:
+            for job_type, fn, params in REPORTS[name](db, project_id):
+                job, deduplicated = submit_job(db, job_type, fn, **params)
+                out.append({"report": name, "job_id": job.id, "status": job.status, "deduplicated": deduplicated})
+        except Exception:
+            logger.exception("no se pudo precalcular %s del proyecto %s", name, project_id)
+            db.rollback()
+    return out
+
+
+def precompute_all(db: Session, reports: list[str] | None = None) -> dict:
+    queued = reused = 0
+    project_ids = [pid for (pid,) in db.query(Project.id).order_by(Project.id).all()]
+    for pid in project_ids:
+        for r in precompute_project(db, pid, reports):
+            if r["deduplicated"]:
+                reused += 1
+            else:
+                queued += 1
+    return {"projects": len(project_ids), "queued": queued, "reused": reused}
+
+
+# ---------- planificador ----------
+
+def next_run(now: datetime, hour: int) -> datetime:
+    run = now.replace(hour=hour, minute=0, second=0, microsecond=0)
+    return run if run > now else run + timedelta(days=1)
+
+
+def _claim(day: str) -> bool:
+    """Una sola corrida por día aunque haya varias instancias del planificador."""
+    if get_settings().realtime_backend == "memory":
+        return True
+    from app.core.redis import get_redis
+    return bool(get_redis().set(f"reports:precompute:{day}", socket.gethostname(), nx=True, ex=23 * 3600))
+
+
+def run_once(reports: list[str] | None = None, project_id: int | None = None) -> dict | list[dict]:
+    from app.db.session import SessionLocal
+    db = SessionLocal()
+    try:
+        if project_id is not None:
+            return precompute_project(db, project_id, reports)
+        return precompute_all(db, reports)
+    finally:
+        db.close()
+
+
+def run_scheduler() -> None:
+    settings = get_settings()
+    while True:
+        now = datetime.utcnow()
+        at = next_run(now, settings.reports_precompute_hour)
+        logger.info("próximo precálculo de reportes: %s UTC", at.isoformat(timespec="minutes"))
+        time.sleep((at - now).total_seconds())
+        if _claim(at.date().isoformat()):
+            logger.info("precálculo de reportes: %s", run_once())
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Precálculo de reportes pesados")
+    parser.add_argument("--once", action="store_true", help="una corrida y salir (para cron)")
+    parser.add_argument("--project", type=int, default=None, help="solo este proyecto (implica --once)")
+    parser.add_argument("--report", action="append", choices=sorted(REPORTS), help="repetible; default: reports_precompute")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+    if args.once or args.project is not None:
+        print(run_once(args.report, args.project))
+    else:
+        run_scheduler()
@@ -0,0 +1,139 @@
+"""Analítica de riesgos resuelta en SQL (sin cargar filas ``Risk`` en Python).
+
+- Matriz probabilidad × impacto: ``GROUP BY probability, impact, status`` (y ``project_id``
+  en la variante multi-proyecto).
+- Exposición ponderada ``P × I`` por categoría y por responsable.
+- Listado filtrable con paginación por cursor (``id`` ascendente).
+"""
+from __future__ import annotations
+import base64
+from datetime import date, datetime, timedelta
+from typing import Iterable
+from sqlalchemy.orm import Session
+from sqlalchemy import func, select
+from app.db.models.risk import Risk
+
+SCALE = 5
+STATUSES = ("open", "mitigating", "closed")
+MAX_PAGE_SIZE = 500
+DEFAULT_PAGE_SIZE = 100  # con cursor pero sin limit
+
+
+def encode_cursor(last_id: int) -> str:
+    return base64.urlsafe_b64encode(str(last_id).encode()).decode()
+
+
+def decode_cursor(cursor: str | None) -> int | None:
+    if not cursor:
+        return None
+    try:
+        return int(base64.urlsafe_b64decode(cursor.encode()).decode())
+    except Exception:
+        raise ValueError("cursor inválido")
+
+
+def risk_filters(status: Iterable[str] | None = None, category: Iterable[str] | None = None,
+                 created_from: date | None = None, created_to: date | None = None) -> list:
+    cond = []
+    if status:
+        cond.append(Risk.status.in_(list(status)))
+    if category:
+        cond.append(Risk.category.in_(list(category)))
+    if created_from:
+        cond.append(Risk.created_at >= datetime.combine(created_from, datetime.min.time()))
+    if created_to:
+        # fecha inclusiva
+        cond.append(Risk.created_at < datetime.combine(created_to + timedelta(days=1), datetime.min.time()))
+    return cond
+
+
+def _empty_matrix() -> list[list[int]]:
+    return [[0] * SCALE for _ in range(SCALE)]
+
+
+def _in_scale(p, i) -> bool:
+    return 1 <= (p or 0) <= SCALE and 1 <= (i or 0) <= SCALE
+
+
+def matrix_rows(db: Session, project_ids, filters: list):
+    """Conteos agrupados (project_id, probability, impact, status)."""
+    return db.query(Risk.project_id, Risk.probability, Risk.impact, Risk.status, func.count(Risk.id)) \
+        .filter(Risk.project_id.in_(project_ids), *filters) \
+        .group_by(Risk.project_id, Risk.probability, Risk.impact, Risk.status).all()
+
+
+def build_matrices(rows) -> dict[int, dict]:
+    """Matriz total y por estado, por proyecto, a partir de las filas agrupadas."""
+    out: dict[int, dict] = {}
+    for pid, p, i, status, n in rows:
+        entry = out.setdefault(pid, {"matrix": _empty_matrix(), "by_status": {}})
+        if not _in_scale(p, i):
+            continue
+        entry["matrix"][int(p) - 1][int(i) - 1] += int(n)
+        by_status = entry["by_status"].setdefault(status or "open", _empty_matrix())
+        by_status[int(p) - 1][int(i) - 1] += int(n)
+    return out
+
+
+def exposure_by(db: Session, project_ids, column, filters: list) -> list[dict]:
+    """Exposición P × I agrupada por ``column`` (categoría o responsable), mayor primero."""
+    score = func.coalesce(Risk.probability, 0) * func.coalesce(Risk.impact, 0)
+    rows = db.query(column, func.count(Risk.id), func.coalesce(func.sum(score), 0), func.coalesce(func.max(score), 0)) \
+        .filter(Risk.project_id.in_(project_ids), *filters) \
+        .group_by(column).order_by(func.sum(score).desc()).all()
+    return [
+        {"key": key, "count": int(n), "exposure": int(total), "avg_exposure": float(total) / n if n else 0.0,
+         "max_exposure": int(mx), "weighted_score": float(total) / (n * SCALE * SCALE) if n else 0.0}
+        for key, n, total, mx in rows
+    ]
+
+
+def project_analytics(db: Session, project_id: int, filters: list) -> dict:
+    matrices = build_matrices(matrix_rows(db, [project_id], filters)).get(project_id) or {"matrix": _empty_matrix(), "by_status": {}}
+    by_category = exposure_by(db, [project_id], Risk.category, filters)
+    return {
+        "project_id": project_id,
+        "total": sum(c["count"] for c in by_category),
+        "exposure": sum(c["exposure"] for c in by_category),
+        "matrix": matrices["matrix"],
+        "matrix_by_status": matrices["by_status"],
+        "by_category": by_category,
+        "by_owner": exposure_by(db, [project_id], Risk.owner, filters),
+    }
+
+
+def portfolio_heatmap(db: Session, project_ids: select, filters: list) -> dict:
+    """Matrices por proyecto + matriz agregada y exposición por proyecto (dos consultas agrupadas)."""
+    matrices = build_matrices(matrix_rows(db, project_ids, filters))
+    score = func.coalesce(Risk.probability, 0) * func.coalesce(Risk.impact, 0)
+    exposure = {pid: (int(n), int(total)) for pid, n, total in db.query(
+        Risk.project_id, func.count(Risk.id), func.coalesce(func.sum(score), 0)
+    ).filter(Risk.project_id.in_(project_ids), *filters).group_by(Risk.project_id).all()}
+    overall = _empty_matrix()
+    projects = []
+    for pid in sorted(matrices):
+        m = matrices[pid]["matrix"]
+        for r in range(SCALE):
+            for c in range(SCALE):
+                overall[r][c] += m[r][c]
+        n, total = exposure.get(pid, (0, 0))
+        projects.append({"project_id": pid, "total": n, "exposure": total, "matrix": m})
+    projects.sort(key=lambda x: -x["exposure"])
+    return {"matrix": overall, "projects": projects}
+
+
+def list_risks_page(db: Session, project_id: int, filters: list, limit: int | None, cursor: str | None = None) -> tuple[list, str | None]:
+    """Página de riesgos ordenada por id; devuelve (filas, cursor siguiente o None).
+
+    Sin ``limit`` ni ``cursor`` devuelve la lista completa (comportamiento previo a la paginación).
+    """
+    q = db.query(Risk).filter(Risk.project_id == project_id, *filters)
+    after = decode_cursor(cursor)
+    if limit is None and after is None:
+        return q.order_by(Risk.id).all(), None
+    limit = limit or DEFAULT_PAGE_SIZE
+    if after is not None:
+        q = q.filter(Risk.id > after)
+    rows = q.order_by(Risk.id).limit(limit + 1).all()
+    next_cursor = encode_cursor(rows[limit - 1].id) if len(rows) > limit else None
+    return rows[:limit], next_cursor
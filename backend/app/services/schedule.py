@@ -0,0 +1,220 @@
+"""Calendario de la línea base y curva de valor planificado PV(t).
+
+Cada ítem de la versión toma el calendario de su ítem (``level='item'``) o, si no
+tiene, el de su capítulo (``level='chapter'``). Los montos se agrupan por
+(inicio, fin, perfil) y la curva acumulada se calcula con NumPy sobre una grilla
+diaria (matriz grupos × días), agregada luego a semanas si se pide.
+
+Perfiles (fracción acumulada ``F(x)`` con ``x`` = avance del plazo en [0, 1]):
+ - ``linear``: x
+ - ``s_curve``: 3x² - 2x³ (lento al inicio y al final)
+ - ``front_loaded``: 1 - (1 - x)²
+
+Ítems sin calendario se reparten linealmente en la ventana total del calendario.
+Las curvas se cachean por versión (LRU acotado por proceso); el token es
+``BudgetVersion.schedule_revision``, que sube en cada ``replace_schedule``, así los demás
+procesos ven el cambio aunque el calendario nuevo tenga la misma cantidad de entradas.
+"""
+from __future__ import annotations
+import threading
+from collections import OrderedDict
+from datetime import date, datetime
+from typing import Any
+import numpy as np
+from sqlalchemy.orm import Session
+from sqlalchemy import func, delete, insert, update
+from app.db.models.versioning import BudgetVersion, BudgetVersionItem, ScheduleEntry
+from app.db.models.project import Project
+
+PROFILES = {
+    "linear": lambda x: x,
+    "s_curve": lambda x: x * x * (3 - 2 * x),
+    "front_loaded": lambda x: 1 - (1 - x) ** 2,
+}
+LEVELS = ("item", "chapter")
+BUCKETS = ("day", "week")
+
+CACHE_MAX_VERSIONS = 256
+
+_cache: "OrderedDict[int, tuple[int, dict]]" = OrderedDict()
+_cache_lock = threading.Lock()
+
+
+def _parse_date(value: Any) -> date | None:
+    if isinstance(value, datetime):
+        return value.date()
+    if isinstance(value, date):
+        return value
+    try:
+        return date.fromisoformat(str(value)[:10])
+    except (TypeError, ValueError):
+        return None
+
+
+def replace_schedule(db: Session, version_id: int, entries: list[dict]) -> dict:
+    """Reemplaza el calendario de la versión. Valida todo antes de escribir; errores por línea."""
+    codes = {"item": set(), "chapter": set()}
+    for chapter_code, item_code in db.query(BudgetVersionItem.chapter_code, BudgetVersionItem.item_code) \
+            .filter(BudgetVersionItem.version_id == version_id).all():
+        codes["item"].add(item_code)
+        codes["chapter"].add(chapter_code)
+    errors: list[dict] = []
+    rows: list[dict] = []
+    seen = set()
+    for n, e in enumerate(entries, start=1):
+        level = e.get("level") or "item"
+        code = str(e.get("code") or "").strip()
+        start, end = _parse_date(e.get("start_date")), _parse_date(e.get("end_date"))
+        profile = e.get("profile") or "linear"
+        if level not in LEVELS:
+            errors.append({"line": n, "field": "level", "error": "Nivel inválido"})
+        elif code not in codes[level]:
+            errors.append({"line": n, "field": "code", "error": f"Código no existe en la versión ({level})"})
+        elif (level, code) in seen:
+            errors.append({"line": n, "field": "code", "error": "Código duplicado"})
+        if start is None or end is None or end < start:
+            errors.append({"line": n, "field": "end_date", "error": "Fechas inválidas"})
+        if profile not in PROFILES:
+            errors.append({"line": n, "field": "profile", "error": "Perfil inválido"})
+        seen.add((level, code))
+        rows.append({"version_id": version_id, "level": level, "code": code,
+                     "start_date": start, "end_date": end, "profile": profile})
+    if errors:
+        return {"entries": 0, "errors": errors}
+    db.execute(delete(ScheduleEntry).where(ScheduleEntry.version_id == version_id))
+    if rows:
+        db.execute(insert(ScheduleEntry), rows)
+    db.execute(update(BudgetVersion).where(BudgetVersion.id == version_id)
+               .values(schedule_revision=BudgetVersion.schedule_revision + 1))
+    db.commit()
+    invalidate_version(version_id)
+    return {"entries": len(rows), "errors": []}
+
+
+def list_schedule(db: Session, version_id: int) -> list[dict]:
+    return [
+        {"level": e.level, "code": e.code, "start_date": e.start_date, "end_date": e.end_date, "profile": e.profile}
+        for e in db.query(ScheduleEntry).filter(ScheduleEntry.version_id == version_id)
+        .order_by(ScheduleEntry.level, ScheduleEntry.code).all()
+    ]
+
+
+def invalidate_version(version_id: int) -> None:
+    with _cache_lock:
+        _cache.pop(version_id, None)
+
+
+def schedule_revision(db: Session, version_id: int) -> int:
+    return db.query(BudgetVersion.schedule_revision).filter(BudgetVersion.id == version_id).scalar() or 0
+
+
+def cumulative_profile(starts: np.ndarray, ends: np.ndarray, profiles: list[str], amounts: np.ndarray,
+                       n_days: int) -> np.ndarray:
+    """PV acumulado al cierre de cada día ``0..n_days-1`` (offsets de inicio/fin inclusivos)."""
+    days = np.arange(n_days)
+    duration = (ends - starts + 1).astype(np.float64)
+    x = np.clip((days[None, :] - starts[:, None] + 1) / duration[:, None], 0.0, 1.0)
+    profile_arr = np.asarray(profiles)
+    for name, fn in PROFILES.items():
+        mask = profile_arr == name
+        if mask.any():
+            x[mask] = fn(x[mask])
+    return amounts @ x
+
+
+def _compute(db: Session, version_id: int) -> dict:
+    amounts = db.query(
+        BudgetVersionItem.chapter_code, BudgetVersionItem.item_code,
+        func.coalesce(BudgetVersionItem.qty, 0) * func.coalesce(BudgetVersionItem.unit_price, 0),
+    ).filter(BudgetVersionItem.version_id == version_id).all()
+    entries = db.query(ScheduleEntry).filter(ScheduleEntry.version_id == version_id).all()
+    total = float(sum(float(a or 0) for _, _, a in amounts))
+    if not entries:
+        return {"total": total, "unscheduled_total": total, "start": None, "days": np.array([], dtype="datetime64[D]"),
+                "cumulative": np.array([])}
+    by_level = {(e.level, e.code): e for e in entries}
+    origin = min(e.start_date for e in entries)
+    last = max(e.end_date for e in entries)
+    groups: dict[tuple[int, int, str], float] = {}
+    unscheduled = 0.0
+    for chapter_code, item_code, amount in amounts:
+        e = by_level.get(("item", item_code)) or by_level.get(("chapter", chapter_code))
+        if e is None:
+            unscheduled += float(amount or 0)
+            continue
+        key = ((e.start_date - origin).days, (e.end_date - origin).days, e.profile)
+        groups[key] = groups.get(key, 0.0) + float(amount or 0)
+    n_days = (last - origin).days + 1
+    if unscheduled:
+        key = (0, n_days - 1, "linear")
+        groups[key] = groups.get(key, 0.0) + unscheduled
+    keys = list(groups)
+    cumulative = cumulative_profile(
+        np.fromiter((k[0] for k in keys), dtype=np.int64, count=len(keys)),
+        np.fromiter((k[1] for k in keys), dtype=np.int64, count=len(keys)),
+        [k[2] for k in keys],
+        np.fromiter(groups.values(), dtype=np.float64, count=len(keys)),
+        n_days,
+    )
+    return {
+        "total": total,
+        "unscheduled_total": unscheduled,
+        "start": origin,
+        "days": np.datetime64(origin, "D") + np.arange(n_days),
+        "cumulative": cumulative,
+    }
+
+
+def _curve_data(db: Session, version_id: int) -> dict:
+    token = schedule_revision(db, version_id)
+    with _cache_lock:
+        hit = _cache.get(version_id)
+        if hit and hit[0] == token:
+            _cache.move_to_end(version_id)
+            return hit[1]
+    data = _compute(db, version_id)
+    with _cache_lock:
+        _cache[version_id] = (token, data)
+        _cache.move_to_end(version_id)
+        while len(_cache) > CACHE_MAX_VERSIONS:
+            _cache.popitem(last=False)
+    return data
+
+
+def pv_curve(db: Session, version_id: int, bucket: str = "day") -> dict:
+    """Curva PV de la versión en buckets diarios o semanales (fin de cada semana desde el inicio)."""
+    data = _curve_data(db, version_id)
+    days, cumulative = data["days"], data["cumulative"]
+    if bucket == "week" and len(days):
+        idx = np.arange(6, len(days), 7)
+        if not len(idx) or idx[-1] != len(days) - 1:
+            idx = np.append(idx, len(days) - 1)
+        days, cumulative = days[idx], cumulative[idx]
+    per_bucket = np.diff(cumulative, prepend=0.0)
+    return {
+        "version_id": version_id,
+        "bucket": bucket,
+        "total": data["total"],
+        "unscheduled_total": data["unscheduled_total"],
+        "points": [
+            {"date": str(d), "pv": float(p), "cumulative_pv": float(c)}
+            for d, p, c in zip(days, per_bucket, cumulative)
+        ],
+    }
+
+
+def pv_at(db: Session, version_id: int, when: date | datetime | list) -> float | list[float] | None:
+    """PV acumulado de la versión al cierre de ``when`` (o de cada fecha de una lista); None sin calendario."""
+    data = _curve_data(db, version_id)
+    days, cumulative = data["days"], data["cumulative"]
+    if not len(days):
+        return None
+    many = isinstance(when, list)
+    targets = np.array([np.datetime64(_parse_date(w), "D") for w in (when if many else [when])])
+    idx = np.searchsorted(days, targets, side="right") - 1
+    values = np.where(idx < 0, 0.0, cumulative[np.clip(idx, 0, len(days) - 1)])
+    return values.tolist() if many else float(values[0])
+
+
+def baseline_version_id(db: Session, project_id: int) -> int | None:
+    return db.query(Project.baseline_version_id).filter(Project.id == project_id).scalar()
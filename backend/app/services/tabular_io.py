@@ -0,0 +1,139 @@
+"""Lectores tabulares en streaming (CSV / XLSX) que emiten una fila ``dict`` a la vez.
+
+Los encabezados se normalizan (minúsculas, sin tildes ni espacios extremos) para
+que los consumidores mapeen alias de columnas sin depender del formato exacto.
+Los valores de celda se convierten con ``parse_date`` / ``parse_amount`` / ``as_int``.
+"""
+from __future__ import annotations
+import csv
+import os
+import re
+import unicodedata
+from datetime import date, datetime
+from decimal import Decimal, InvalidOperation
+from functools import lru_cache
+from typing import Iterator, Any
+
+CSV_SNIFF_BYTES = 64 * 1024
+DATE_FORMATS = ("%Y-%m-%d", "%d/%m/%Y", "%d-%m-%Y", "%Y/%m/%d", "%d.%m.%Y", "%Y%m%d")
+
+
+def normalize_header(name: Any) -> str:
+    text = str(name or "").strip().lower()
+    text = unicodedata.normalize("NFKD", text)
+    return "".join(c for c in text if not unicodedata.combining(c)).replace(" ", "_")
+
+
+def iter_csv_rows(path: str, encoding: str = "utf-8-sig") -> Iterator[dict]:
+    """Itera filas de un CSV detectando el separador (``;`` habitual en cartolas, ``,`` o tab)."""
+    with open(path, newline="", encoding=encoding, errors="replace") as f:
+        sample = f.read(CSV_SNIFF_BYTES)
+        f.seek(0)
+        try:
+            dialect = csv.Sniffer().sniff(sample, delimiters=";,\t|")
+        except csv.Error:
+            dialect = csv.excel
+        reader = csv.reader(f, dialect)
+        header = None
+        for row in reader:
+            if not any(cell.strip() for cell in row):
+                continue
+            if header is None:
+                header = [normalize_header(h) for h in row]
+                continue
+            yield dict(zip(header, row))
+
+
+def iter_xlsx_rows(path: str, sheet: str | None = None) -> Iterator[dict]:
+    """Itera filas de un XLSX en modo ``read_only`` (no carga la hoja completa en memoria)."""
+    from openpyxl import load_workbook
+    wb = load_workbook(path, read_only=True, data_only=True)
+    try:
+        ws = wb[sheet] if sheet else wb.active
+        header = None
+        for values in ws.iter_rows(values_only=True):
+            if values is None or all(v is None or str(v).strip() == "" for v in values):
+                continue
+            if header is None:
+                header = [normalize_header(h) for h in values]
+                continue
+            yield dict(zip(header, values))
+    finally:
+        wb.close()
+
+
+def iter_table_rows(path: str, filename: str | None = None) -> Iterator[dict]:
+    """Despacha según extensión (``filename`` si se entrega, si no ``path``)."""
+    ext = os.path.splitext((filename or path).lower())[1]
+    if ext in (".xlsx", ".xlsm"):
+        return iter_xlsx_rows(path)
+    if ext in (".csv", ".txt", ".tsv"):
+        return iter_csv_rows(path)
+    raise ValueError(f"Formato no soportado: {ext or 'sin extensión'}")
+
+
+# ---------- valores de celda ----------
+
+@lru_cache(maxsize=4096)
+def _parse_date_str(value: str) -> date | None:
+    value = value.strip()[:10]  # descarta hora: '2025-01-15T10:00' / '15/01/2025 10:00'
+    for fmt in DATE_FORMATS:
+        try:
+            return datetime.strptime(value, fmt).date()
+        except ValueError:
+            continue
+    return None
+
+
+def parse_date(value: Any) -> date | None:
+    """Fechas de cartola; los strings se cachean (una cartola repite pocas fechas distintas)."""
+    if value is None or value == "":
+        return None
+    if isinstance(value, datetime):
+        return value.date()
+    if isinstance(value, date):
+        return value
+    text = str(value).strip()
+    if len(text) >= 8 and text[:8].isdigit():  # OFX: YYYYMMDD[HHMMSS[.XXX][TZ]]
+        text = text[:8]
+    return _parse_date_str(text)
+
+
+def parse_amount(value: Any) -> Decimal | None:
+    """Montos '1.234.567,89' (formato CL), '1234.56', '$ -1,000' o numéricos.
+    Un separador seguido de exactamente 3 dígitos se interpreta como de miles.
+    """
+    if value is None or value == "":
+        return None
+    if isinstance(value, (int, float, Decimal)):
+        return Decimal(str(value))
+    text = re.sub(r"[^\d,.\-]", "", str(value))
+    if not text or text in ("-", ".", ","):
+        return None
+    if "," in text and "." in text:
+        # el último separador es el decimal
+        if text.rfind(",") > text.rfind("."):
+            text = text.replace(".", "").replace(",", ".")
+        else:
+            text = text.replace(",", "")
+    elif "," in text:
+        head, _, tail = text.rpartition(",")
+        # '1,000' / '1,000,000' => miles; '123,45' => decimal
+        text = text.replace(",", "") if (len(tail) == 3 and head) or text.count(",") > 1 else head + "." + tail
+    elif "." in text:
+        head, _, tail = text.rpartition(".")
+        # '1.234.567' / '1.100' => miles (cartolas CLP); '1234.56' => decimal
+        if text.count(".") > 1 or (len(tail) == 3 and head.lstrip("-")):
+            text = text.replace(".", "")
+    try:
+        return Decimal(text)
+    except InvalidOperation:
+        return None
+
+
+def as_int(value: Any) -> int | None:
+    """Ids de celdas CSV/XLSX ('12', '12.0', 12.0); None si está vacío o no es número."""
+    try:
+        return int(float(value)) if value not in (None, "") else None
+    except (TypeError, ValueError):
+        return None
@@ -0,0 +1,107 @@
+"""Subidas de importación (Excel/BC3): a disco por bloques, con hash al vuelo.
+
+Starlette ya deja el cuerpo multipart en un ``SpooledTemporaryFile`` (en disco pasado
+1 MB); ``save_upload`` lo copia por bloques a ``uploads_dir`` calculando sha256 y tamaño,
+sin tener nunca el archivo completo en memoria. Los endpoints de importación son ``def``
+(threadpool de FastAPI), así el parseo no bloquea el event loop; por encima de
+``import_inline_max_mb`` la importación va a la cola de jobs, por lo que el worker debe
+ver el mismo ``uploads_dir``.
+
+Cada importación queda en ``import_uploads``: volver a subir el mismo archivo con el
+mismo nombre de proyecto devuelve el proyecto ya creado (si el usuario tiene rol en él).
+"""
+from __future__ import annotations
+import hashlib
+import os
+import uuid
+from contextlib import contextmanager
+from dataclasses import dataclass
+from pathlib import Path
+from typing import BinaryIO, Iterator
+from fastapi import UploadFile
+from sqlalchemy.orm import Session
+from app.core.settings import get_settings
+from app.db.models.audit import UserProjectRole
+from app.db.models.upload import ImportUpload
+from app.services.audit import log_action
+from app.services.bc3_parser import import_budget_bc3
+from app.services.excel_io import import_budget_xlsx
+
+CHUNK = 1024 * 1024
+
+# tipo -> (importador, sufijo del archivo en disco)
+IMPORTERS = {
+    "excel": (import_budget_xlsx, ".xlsx"),
+    "bc3": (import_budget_bc3, ".bc3"),
+}
+
+
+@dataclass(frozen=True)
+class StoredUpload:
+    path: Path
+    sha256: str
+    size: int
+
+    def discard(self) -> None:
+        self.path.unlink(missing_ok=True)
+
+
+def uploads_dir() -> Path:
+    path = Path(get_settings().uploads_dir).resolve()
+    path.mkdir(parents=True, exist_ok=True)
+    return path
+
+
+def save_upload(src: BinaryIO, suffix: str) -> StoredUpload:
+    """Copia ``src`` a ``uploads_dir`` por bloques; el nombre es único (no por contenido)."""
+    path = uploads_dir() / f"{uuid.uuid4().hex}{suffix}"
+    digest = hashlib.sha256()
+    size = 0
+    try:
+        with open(path, "wb") as out:
+            for chunk in iter(lambda: src.read(CHUNK), b""):
+                digest.update(chunk)
+                out.write(chunk)
+                size += len(chunk)
+    except BaseException:
+        path.unlink(missing_ok=True)
+        raise
+    return StoredUpload(path, digest.hexdigest(), size)
+
+
+@contextmanager
+def upload_on_disk(file: UploadFile) -> Iterator[StoredUpload]:
+    """Copia de una subida en disco (sufijo según su nombre, p.ej. para ``iter_table_rows``); se borra al salir."""
+    upload = save_upload(file.file, os.path.splitext(file.filename or "")[1].lower())
+    try:
+        yield upload
+    finally:
+        upload.discard()
+
+
+def find_imported(db: Session, kind: str, sha256: str, project_name: str, user_id: int) -> int | None:
+    """Proyecto creado antes con el mismo archivo y nombre, entre los que el usuario tiene rol."""
+    row = db.query(ImportUpload.project_id) \
+        .join(UserProjectRole, (UserProjectRole.project_id == ImportUpload.project_id)
+              & (UserProjectRole.user_id == user_id)) \
+        .filter(ImportUpload.sha256 == sha256, ImportUpload.kind == kind, ImportUpload.project_name == project_name) \
+        .order_by(ImportUpload.id.desc()).first()
+    return row[0] if row else None
+
+
+def import_upload(db: Session, kind: str, path: str, project_name: str, user_id: int | None,
+                  filename: str | None, sha256: str, size: int) -> dict:
+    """Importa el archivo subido (en línea o como job) y lo registra; el archivo se borra siempre."""
+    importer, _ = IMPORTERS[kind]
+    try:
+        project_id = importer(db, path, project_name)
+    finally:
+        Path(path).unlink(missing_ok=True)
+    # Asignar rol admin al usuario si aún no existe rol para ese proyecto
+    if user_id is not None and not db.query(UserProjectRole).filter_by(user_id=user_id, project_id=project_id).first():
+        db.add(UserProjectRole(user_id=user_id, project_id=project_id, role="admin"))
+    db.add(ImportUpload(sha256=sha256, kind=kind, project_name=project_name, project_id=project_id,
+                        user_id=user_id, filename=filename, size=size))
+    db.commit()
+    log_action(db, project_id, "project", project_id, f"import_{kind}", {"filename": filename}, user_id)
+    return {"project_id": project_id}
@@ -0,0 +1,203 @@
+"""Bandeja de aprobaciones y decisiones en lote de workflows.
+
+La bandeja cruza los roles del usuario (``user_project_roles``) con las instancias
+``running`` de esos proyectos, su paso actual sin decidir y el rol requerido por ese
+paso. Usa ``ix_workflow_instances_proj_status_step`` (project_id, status, current_step)
+y ``ix_workflow_inst_steps_instance_pos_decision`` para el paso actual.
+
+``decide_many`` resuelve N instancias con una sola consulta (instancia + paso actual +
+rol requerido + rol del usuario + existencia del siguiente paso), valida todo antes de
+escribir y aplica pasos, instancias y auditoría con executemany en una transacción.
+
+Cada transición (inicio, decisión, paso pendiente, fin) se publica en el bus de eventos
+después del commit (``app.services.events``).
+"""
+from __future__ import annotations
+from datetime import datetime
+from sqlalchemy.orm import Session, aliased
+from sqlalchemy import and_, bindparam, func, update
+from app.core.cache import cached_json, get_cache
+from app.db.models.audit import UserProjectRole
+from app.db.models.versioning import Workflow, WorkflowStep, WorkflowInstance, WorkflowInstanceStep
+from app.services.audit import log_action, log_actions
+from app.services.events import make_event, publish
+from app.services.risk_analytics import encode_cursor, decode_cursor
+
+DECISIONS = ("approve", "reject")
+MAX_PAGE_SIZE = 200
+MAX_BULK = 500
+PENDING_TTL = 300  # respaldo; el consumidor "dashboard" invalida en cada transición
+
+
+class WorkflowConflict(Exception):
+    """Otra decisión concurrente cambió alguna instancia; no se aplicó nada."""
+
+
+def _event(type_: str, project_id: int, instance_id: int, entity_type: str, entity_id: int,
+           user_id: int | None, **data) -> dict:
+    return make_event(type_, project_id, "workflow_instance", instance_id,
+                      {"entity_type": entity_type, "entity_id": entity_id, **data}, user_id)
+
+
+def start_instance(db: Session, user_id: int, wf: Workflow, entity_type: str, entity_id: int) -> WorkflowInstance:
+    """Crea la instancia con sus pasos y publica ``workflow.started`` + ``workflow.step_pending``."""
+    inst = WorkflowInstance(workflow_id=wf.id, project_id=wf.project_id, entity_type=entity_type, entity_id=entity_id, created_by=user_id)
+    db.add(inst); db.flush()
+    steps = db.query(WorkflowStep).filter(WorkflowStep.workflow_id == wf.id).order_by(WorkflowStep.position).all()
+    for s in steps:
+        db.add(WorkflowInstanceStep(instance_id=inst.id, step_id=s.id, position=s.position))
+    db.commit(); log_action(db, wf.project_id, "workflow_instance", inst.id, "start", {"entity_id": entity_id}, user_id)
+    events = [_event("workflow.started", wf.project_id, inst.id, entity_type, entity_id, user_id, workflow_id=wf.id)]
+    if steps:
+        events.append(_event("workflow.step_pending", wf.project_id, inst.id, entity_type, entity_id, user_id,
+                             step=steps[0].position, role_required=steps[0].role_required))
+    publish(events, db)
+    return inst
+
+
+def pending_key(project_id: int) -> str:
+    return f"dashboard:workflow_pending:{project_id}"
+
+
+def pending_by_role(db: Session, project_id: int) -> dict[str, int]:
+    """Pasos actuales sin decidir del proyecto, por rol requerido (cacheado)."""
+    def compute():
+        rows = db.query(WorkflowStep.role_required, func.count(WorkflowInstanceStep.id)) \
+            .join(WorkflowInstanceStep, WorkflowInstanceStep.step_id == WorkflowStep.id) \
+            .join(WorkflowInstance, WorkflowInstanceStep.instance_id == WorkflowInstance.id) \
+            .filter(WorkflowInstance.project_id == project_id, WorkflowInstance.status == "running",
+                    WorkflowInstanceStep.decision.is_(None),
+                    WorkflowInstanceStep.position == WorkflowInstance.current_step) \
+            .group_by(WorkflowStep.role_required).all()
+        return {role: int(n) for role, n in rows}
+    return cached_json(pending_key(project_id), PENDING_TTL, compute)
+
+
+def invalidate_pending(project_id: int) -> None:
+    get_cache().delete(pending_key(project_id))
+
+
+def inbox_page(db: Session, user_id: int, limit: int, cursor: str | None = None,
+               project_id: int | None = None, entity_type: str | None = None) -> tuple[list[dict], str | None]:
+    """Instancias cuyo paso actual espera una decisión del rol del usuario (orden por id)."""
+    q = db.query(
+        WorkflowInstance.id, WorkflowInstance.project_id, WorkflowInstance.workflow_id, Workflow.name,
+        WorkflowInstance.entity_type, WorkflowInstance.entity_id, WorkflowInstance.current_step,
+        WorkflowInstance.created_at, WorkflowStep.name, WorkflowStep.role_required,
+    ).select_from(UserProjectRole) \
+        .join(WorkflowInstance, and_(WorkflowInstance.project_id == UserProjectRole.project_id,
+                                     WorkflowInstance.status == "running")) \
+        .join(WorkflowInstanceStep, and_(WorkflowInstanceStep.instance_id == WorkflowInstance.id,
+                                         WorkflowInstanceStep.position == WorkflowInstance.current_step,
+                                         WorkflowInstanceStep.decision.is_(None))) \
+        .join(WorkflowStep, and_(WorkflowStep.id == WorkflowInstanceStep.step_id,
+                                 WorkflowStep.role_required == UserProjectRole.role)) \
+        .join(Workflow, Workflow.id == WorkflowInstance.workflow_id) \
+        .filter(UserProjectRole.user_id == user_id)
+    if project_id is not None:
+        q = q.filter(UserProjectRole.project_id == project_id)
+    if entity_type:
+        q = q.filter(WorkflowInstance.entity_type == entity_type)
+    after = decode_cursor(cursor)
+    if after is not None:
+        q = q.filter(WorkflowInstance.id > after)
+    rows = q.order_by(WorkflowInstance.id).limit(limit + 1).all()
+    next_cursor = encode_cursor(rows[limit - 1][0]) if len(rows) > limit else None
+    return [
+        {"instance_id": iid, "project_id": pid, "workflow_id": wid, "workflow": wname, "entity_type": etype,
+         "entity_id": eid, "current_step": step, "step_name": sname, "role_required": role, "created_at": created}
+        for iid, pid, wid, wname, etype, eid, step, created, sname, role in rows[:limit]
+    ], next_cursor
+
+
+def _pending(db: Session, user_id: int | None, instance_ids: list[int]) -> dict[int, object]:
+    """Estado de decisión de cada instancia en una consulta."""
+    current = aliased(WorkflowInstanceStep)
+    nxt = aliased(WorkflowInstanceStep)
+    nxt_step = aliased(WorkflowStep)
+    rows = db.query(
+        WorkflowInstance.id.label("id"), WorkflowInstance.project_id.label("project_id"),
+        WorkflowInstance.status.label("status"), WorkflowInstance.current_step.label("position"),
+        WorkflowInstance.entity_type.label("entity_type"), WorkflowInstance.entity_id.label("entity_id"),
+        current.id.label("step_id"), WorkflowStep.role_required.label("role_required"),
+        UserProjectRole.role.label("user_role"), nxt.id.label("next_id"), nxt_step.role_required.label("next_role"),
+    ).outerjoin(current, and_(current.instance_id == WorkflowInstance.id,
+                              current.position == WorkflowInstance.current_step)) \
+        .outerjoin(WorkflowStep, WorkflowStep.id == current.step_id) \
+        .outerjoin(UserProjectRole, and_(UserProjectRole.project_id == WorkflowInstance.project_id,
+                                         UserProjectRole.user_id == user_id,
+                                         # solo el rol exigido: con varios roles habría una fila por rol
+                                         UserProjectRole.role == WorkflowStep.role_required)) \
+        .outerjoin(nxt, and_(nxt.instance_id == WorkflowInstance.id,
+                             nxt.position == WorkflowInstance.current_step + 1)) \
+        .outerjoin(nxt_step, nxt_step.id == nxt.step_id) \
+        .filter(WorkflowInstance.id.in_(instance_ids)).all()
+    return {r.id: r for r in rows}
+
+
+def decide_many(db: Session, user_id: int | None, instance_ids: list[int], decision: str,
+                comment: str | None = None, system: bool = False) -> dict:
+    """Aprueba o rechaza el paso actual de varias instancias; todo o nada.
+
+    Devuelve ``{"results": [...], "errors": [...]}``; con errores no se escribe nada. Cada
+    error lleva ``instance_id``, ``error`` y ``code`` (``not_found`` | ``invalid`` | ``forbidden``).
+    ``system=True`` (reglas de avance automático) omite la verificación de rol.
+    """
+    if decision not in DECISIONS:
+        return {"results": [], "errors": [{"instance_id": None, "error": "Decisión inválida", "code": "invalid"}]}
+    ids = list(dict.fromkeys(instance_ids))
+    state = _pending(db, user_id, ids) if ids else {}
+    errors: list[dict] = []
+    for iid in ids:
+        r = state.get(iid)
+        if r is None:
+            errors.append({"instance_id": iid, "error": "Instancia no encontrada", "code": "not_found"})
+        elif r.status != "running" or r.step_id is None:
+            errors.append({"instance_id": iid, "error": "Instancia no válida para decisión", "code": "invalid"})
+        elif not system and (r.user_role is None or r.user_role != r.role_required):
+            errors.append({"instance_id": iid, "error": "No permission", "code": "forbidden"})
+    if errors:
+        return {"results": [], "errors": errors}
+    if not ids:
+        return {"results": [], "errors": []}
+
+    now = datetime.utcnow()
+    steps, instances, results, audit, events = [], [], [], [], []
+    for iid in ids:
+        r = state[iid]
+        if decision == "reject":
+            status, new_step = "rejected", r.position
+        elif r.next_id is not None:
+            status, new_step = "running", r.position + 1
+        else:
+            status, new_step = "approved", r.position
+        steps.append({"b_id": r.step_id, "decision": decision, "decided_by": user_id, "decided_at": now, "comment": comment})
+        instances.append({"b_id": iid, "b_step": r.position, "status": status, "current_step": new_step})
+        results.append({"instance_id": iid, "status": status, "current_step": new_step})
+        data = {"decision": decision, "step": r.position, "bulk": len(ids) > 1}
+        if system:
+            data["auto"] = True
+        audit.append(dict(project_id=r.project_id, entity="workflow_instance", entity_id=iid, action="decide",
+                          data=data, user_id=user_id))
+        base = (r.project_id, iid, r.entity_type, r.entity_id, user_id)
+        events.append(_event("workflow.decided", *base, decision=decision, step=r.position, auto=system))
+        if status == "running":
+            events.append(_event("workflow.step_pending", *base, step=new_step, role_required=r.next_role))
+        else:
+            events.append(_event("workflow.completed", *base, status=status))
+
+    t_step = WorkflowInstanceStep.__table__
+    db.execute(update(t_step).where(t_step.c.id == bindparam("b_id")), steps)
+    t_inst = WorkflowInstance.__table__
+    # la guarda status/current_step detecta decisiones concurrentes sobre la misma instancia
+    res = db.execute(
+        update(t_inst).where(t_inst.c.id == bindparam("b_id"), t_inst.c.status == "running",
+                             t_inst.c.current_step == bindparam("b_step")),
+        instances,
+    )
+    if res.rowcount is not None and res.rowcount >= 0 and res.rowcount != len(instances):
+        db.rollback()
+        raise WorkflowConflict("Instancias modificadas concurrentemente")
+    log_actions(db, audit)  # un solo INSERT + commit de toda la transacción
+    publish(events, db)
+    return {"results": results, "errors": []}
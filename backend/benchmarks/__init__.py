@@ -0,0 +1 @@
+"""Benchmarks de rendimiento (ver ``conftest.py``)."""
@@ -0,0 +1,121 @@
+"""Fixtures de benchmarks: BD SQLite propia, proyectos sintéticos por tamaño y registro de resultados.
+
+Uso (desde ``backend/``)::
+
+    python -m pytest benchmarks -q                          # 1k, compara consultas con el baseline
+    python -m pytest benchmarks -q --bench-size 10k --bench-size 100k
+    python -m pytest benchmarks -q --bench-compare          # también tiempos (tolerancia 25%)
+    python -m pytest benchmarks -q --bench-save             # reescribe baselines/{size}.json
+
+Los resultados de cada corrida quedan en ``benchmarks/results/{size}.json``. Las opciones
+``--bench-*`` se registran en ``backend/conftest.py``; ``pytest -q`` a secas no corre los
+benchmarks (``testpaths = tests`` en ``pytest.ini``).
+"""
+import os
+import tempfile
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from fastapi.testclient import TestClient
+
+os.environ.setdefault("SKIP_MIGRATIONS", "true")
+os.environ["REALTIME_BACKEND"] = "memory"
+
+from app.main import app  # noqa: E402
+from app.db.base import Base  # noqa: E402
+from app.db.session import get_db  # noqa: E402
+from benchmarks.datagen import SIZES, generate_project  # noqa: E402
+from benchmarks.harness import BASELINE_DIR, RESULTS_DIR, Bench, load, regressions, save  # noqa: E402
+
+_benches: dict[str, Bench] = {}
+
+
+def pytest_generate_tests(metafunc):
+    if "size" in metafunc.fixturenames:
+        metafunc.parametrize("size", metafunc.config.getoption("bench_size") or ["1k"], scope="session")
+
+
+def pytest_sessionfinish(session, exitstatus):
+    for size, bench in _benches.items():
+        if not bench.results:
+            continue
+        doc = bench.document()
+        save(RESULTS_DIR / f"{size}.json", doc)
+        if session.config.getoption("bench_save", None):
+            save(BASELINE_DIR / f"{size}.json", doc)
+
+
+@pytest.fixture(scope="session")
+def engine():
+    fd, path = tempfile.mkstemp(prefix="benchdb", suffix=".sqlite")
+    os.close(fd)
+    eng = create_engine(f"sqlite:///{path}", connect_args={"check_same_thread": False})
+    Base.metadata.create_all(eng)
+    yield eng
+    eng.dispose()
+    os.unlink(path)
+
+
+@pytest.fixture(scope="session")
+def session_factory(engine):
+    return sessionmaker(bind=engine, autoflush=False, autocommit=False)
+
+
+@pytest.fixture(scope="session")
+def client(session_factory):
+    def override_get_db():
+        db = session_factory()
+        try:
+            yield db
+        finally:
+            db.close()
+    app.dependency_overrides[get_db] = override_get_db
+    yield TestClient(app)
+    app.dependency_overrides.pop(get_db, None)
+
+
+@pytest.fixture(scope="session")
+def auth(client):
+    r = client.post("/api/v1/auth/register", json={"username": "bench_user", "password": "bench"})
+    assert r.status_code == 200, r.text
+    token = r.json()["access_token"]
+    me = client.get("/api/v1/auth/me", headers={"Authorization": f"Bearer {token}"}).json()
+    return {"headers": {"Authorization": f"Bearer {token}"}, "user_id": me["id"]}
+
+
+@pytest.fixture(scope="session")
+def dataset(size, session_factory, auth):
+    """Proyecto de solo lectura para los caminos de consulta."""
+    db = session_factory()
+    try:
+        return generate_project(db, SIZES[size], auth["user_id"], seed=42)
+    finally:
+        db.close()
+
+
+@pytest.fixture(scope="session")
+def scratch(size, session_factory, auth):
+    """Proyecto aparte para los caminos que escriben (snapshot/restore)."""
+    db = session_factory()
+    try:
+        return generate_project(db, SIZES[size], auth["user_id"], seed=7)
+    finally:
+        db.close()
+
+
+@pytest.fixture
+def bench(request, size, engine):
+    """``bench(name, fn, rounds=None, warmup=True)``: mide y falla si hay regresión frente al baseline."""
+    config = request.config
+    recorder = _benches.setdefault(size, Bench(engine, size, config.getoption("bench_rounds")))
+    baseline = load(BASELINE_DIR / f"{size}.json")
+
+    def run(name, fn, rounds=None, warmup=True):
+        stats = recorder.run(name, fn, rounds, warmup)
+        if baseline is not None and not config.getoption("bench_save"):
+            problems = regressions(baseline, {"benchmarks": {name: stats}}, config.getoption("bench_tolerance"),
+                                   timing=config.getoption("bench_compare"))
+            if problems:
+                pytest.fail("; ".join(problems))
+        return stats
+    return run
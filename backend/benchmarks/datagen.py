@@ -0,0 +1,166 @@
+"""Generador determinista de proyectos grandes para los benchmarks.
+
+Misma semilla y tamaño -> mismos códigos, cantidades y precios, así los tiempos y conteos
+de consultas son comparables entre corridas. Inserta con executemany (Core) para que
+generar 100k ítems tome segundos y no minutos.
+
+Por proyecto de ``n_items`` ítems:
+- capítulos de ``ITEMS_PER_CHAPTER`` ítems, APU de ``APU_PER_ITEM`` recursos por ítem;
+- ``BATCHES`` lotes de medición cerrados, cada uno con ~``MEASURED_SHARE`` de los ítems;
+- dos versiones (``v_from`` = estado inicial, ``v_to`` = ~10% de precios cambiados, 1%
+  de ítems quitados y 1% agregados);
+- una factura cada ``ITEMS_PER_INVOICE`` ítems y dos movimientos bancarios por factura
+  (uno calza con la factura, el otro no).
+"""
+from __future__ import annotations
+import random
+from datetime import date, timedelta
+from sqlalchemy import insert, select
+from sqlalchemy.orm import Session
+from app.db.models.audit import UserProjectRole
+from app.db.models.budget import APU, Chapter, Item, MeasurementBatch, MeasurementLine, Resource
+from app.db.models.project import Project
+from app.db.models.versioning import BankTransaction, BudgetVersion, BudgetVersionItem, Invoice
+
+SIZES = {"1k": 1_000, "10k": 10_000, "100k": 100_000}
+ITEMS_PER_CHAPTER = 100
+APU_PER_ITEM = 3
+RESOURCES = 200
+BATCHES = 5
+MEASURED_SHARE = 0.2
+ITEMS_PER_INVOICE = 100
+CHUNK = 5_000
+START = date(2025, 1, 6)
+UNITS = ("m2", "m3", "ml", "kg", "u", "gl")
+
+
+def _chunks(rows: list[dict]):
+    for i in range(0, len(rows), CHUNK):
+        yield rows[i:i + CHUNK]
+
+
+def _insert(db: Session, model, rows: list[dict]) -> None:
+    for chunk in _chunks(rows):
+        db.execute(insert(model), chunk)
+
+
+def _items(n_items: int, seed: int) -> list[dict]:
+    rnd = random.Random(seed)
+    return [
+        {
+            "chapter": f"C{i // ITEMS_PER_CHAPTER + 1:04d}",
+            "code": f"C{i // ITEMS_PER_CHAPTER + 1:04d}.{i % ITEMS_PER_CHAPTER + 1:03d}",
+            "name": f"Partida {i + 1}",
+            "unit": UNITS[i % len(UNITS)],
+            "qty": round(rnd.uniform(1, 500), 3),
+            "price": round(rnd.uniform(1_000, 250_000), 2),
+            "apu": [(rnd.randrange(RESOURCES), round(rnd.uniform(0.01, 5), 6)) for _ in range(APU_PER_ITEM)],
+        }
+        for i in range(n_items)
+    ]
+
+
+def bc3_text(n_items: int, seed: int = 42) -> str:
+    """Presupuesto en formato BC3 simplificado (C/I/R) para el camino de importación."""
+    rnd = random.Random(seed + 1)
+    costs = [round(rnd.uniform(500, 50_000), 2) for _ in range(RESOURCES)]
+    lines = ["# BC3 sintético para benchmarks"]
+    last_chapter = None
+    for it in _items(n_items, seed):
+        if it["chapter"] != last_chapter:
+            last_chapter = it["chapter"]
+            lines.append(f"C;{last_chapter};Capitulo {last_chapter}")
+        lines.append(f"I;{it['chapter']};{it['code']};{it['name']};{it['unit']};{it['qty']}")
+        for r, coeff in it["apu"]:
+            lines.append(f"R;{it['code']};MAT;R{r:04d};Recurso {r};{coeff};{costs[r]}")
+    return "\n".join(lines) + "\n"
+
+
+def generate_project(db: Session, n_items: int, user_id: int | None = None, seed: int = 42,
+                     name: str | None = None) -> dict:
+    """Crea un proyecto completo y devuelve sus ids (``project_id``, ``v_from``, ``v_to``, ...)."""
+    rnd = random.Random(seed + 2)
+    items = _items(n_items, seed)
+
+    project = Project(name=name or f"bench-{n_items}-{seed}", currency="CLP")
+    db.add(project); db.flush()
+    pid = project.id
+    if user_id is not None:
+        db.add(UserProjectRole(user_id=user_id, project_id=pid, role="admin"))
+
+    chapter_codes = list(dict.fromkeys(it["chapter"] for it in items))
+    _insert(db, Chapter, [{"project_id": pid, "code": c, "name": f"Capitulo {c}"} for c in chapter_codes])
+    chapter_ids = dict(db.execute(select(Chapter.code, Chapter.id).where(Chapter.project_id == pid)).all())
+    _insert(db, Item, [
+        {"chapter_id": chapter_ids[it["chapter"]], "code": it["code"], "name": it["name"], "unit": it["unit"],
+         "quantity": it["qty"], "price": it["price"]}
+        for it in items
+    ])
+    item_ids = dict(db.execute(select(Item.code, Item.id).join(Chapter, Chapter.id == Item.chapter_id)
+                               .where(Chapter.project_id == pid)).all())
+
+    # recursos propios del proyecto (los códigos llevan el id para no chocar entre proyectos)
+    _insert(db, Resource, [
+        {"type": "MAT", "code": f"P{pid}-R{r:04d}", "name": f"Recurso {r}", "unit": "u",
+         "unit_cost": round(rnd.uniform(500, 50_000), 4)}
+        for r in range(RESOURCES)
+    ])
+    resource_ids = dict(db.execute(select(Resource.code, Resource.id).where(Resource.code.like(f"P{pid}-R%"))).all())
+    _insert(db, APU, [
+        {"item_id": item_ids[it["code"]], "resource_id": resource_ids[f"P{pid}-R{r:04d}"], "coeff": coeff}
+        for it in items for r, coeff in it["apu"]
+    ])
+
+    batch_ids = []
+    for b in range(BATCHES):
+        batch = MeasurementBatch(project_id=pid, name=f"EP {b + 1}", status="closed")
+        db.add(batch); db.flush()
+        batch_ids.append(batch.id)
+        measured = rnd.sample(items, max(1, int(n_items * MEASURED_SHARE)))
+        _insert(db, MeasurementLine, [
+            {"batch_id": batch.id, "item_id": item_ids[it["code"]], "qty": round(it["qty"] * rnd.uniform(0.05, 0.2), 3)}
+            for it in measured
+        ])
+
+    v_from = BudgetVersion(project_id=pid, name="bench-from", created_by=user_id)
+    v_to = BudgetVersion(project_id=pid, name="bench-to", created_by=user_id)
+    db.add_all([v_from, v_to]); db.flush()
+    base = [
+        {"chapter_code": it["chapter"], "chapter_name": f"Capitulo {it['chapter']}", "item_code": it["code"],
+         "item_name": it["name"], "unit": it["unit"], "qty": it["qty"], "unit_price": it["price"]}
+        for it in items
+    ]
+    _insert(db, BudgetVersionItem, [{**row, "version_id": v_from.id} for row in base])
+    changed = []
+    for i, row in enumerate(base):
+        if i % 100 == 0:
+            continue  # quitado en v_to
+        if i % 10 == 1:
+            row = {**row, "unit_price": round(row["unit_price"] * rnd.uniform(0.9, 1.2), 2)}
+        changed.append({**row, "version_id": v_to.id})
+    changed += [
+        {"version_id": v_to.id, "chapter_code": "CNEW", "chapter_name": "Adicionales", "item_code": f"CNEW.{k + 1:05d}",
+         "item_name": f"Adicional {k + 1}", "unit": "u", "qty": 1, "unit_price": 1000}
+        for k in range(max(1, n_items // 100))
+    ]
+    _insert(db, BudgetVersionItem, changed)
+
+    n_invoices = max(1, n_items // ITEMS_PER_INVOICE)
+    _insert(db, Invoice, [
+        {"project_id": pid, "dte_number": f"{pid}-{k + 1:06d}", "status": "accepted",
+         "amount": round(rnd.uniform(100_000, 50_000_000), 2), "paid_amount": 0, "currency": "CLP"}
+        for k in range(n_invoices)
+    ])
+    invoices = db.execute(select(Invoice.id, Invoice.dte_number, Invoice.amount).where(Invoice.project_id == pid)).all()
+    bank = []
+    for k, inv in enumerate(invoices):
+        day = START + timedelta(days=k % 365)
+        bank.append({"project_id": pid, "date": day, "description": f"Pago factura {inv.dte_number}",
+                     "amount": inv.amount, "source": "manual", "content_hash": f"bench-{pid}-{k}-a"})
+        bank.append({"project_id": pid, "date": day, "description": f"Cargo varios {k}",
+                     "amount": -round(rnd.uniform(1_000, 500_000), 2), "source": "manual", "content_hash": f"bench-{pid}-{k}-b"})
+    _insert(db, BankTransaction, bank)
+
+    db.commit()
+    return {"project_id": pid, "v_from": v_from.id, "v_to": v_to.id, "batch_ids": batch_ids,
+            "items": n_items, "chapters": len(chapter_codes), "invoices": n_invoices}
@@ -0,0 +1,139 @@
+"""Medición de tiempos y consultas SQL, y baselines JSON.
+
+Cada benchmark corre ``rounds`` veces (más una de calentamiento) y registra min/mediana/
+media/max en ms y la cantidad de consultas de la última ronda (las consultas son
+deterministas; los tiempos no). Los resultados se guardan por tamaño en
+``benchmarks/baselines/{size}.json``; al comparar, más consultas que el baseline siempre
+es regresión y el tiempo solo si se pide (``--bench-compare``), porque depende de la máquina.
+
+Comparar dos archivos a mano::
+
+    python -m benchmarks.harness baselines/1k.json results/1k.json
+"""
+from __future__ import annotations
+import json
+import platform
+import statistics
+import sys
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Callable
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+BENCH_DIR = Path(__file__).resolve().parent
+BASELINE_DIR = BENCH_DIR / "baselines"
+RESULTS_DIR = BENCH_DIR / "results"
+
+
+class QueryCounter:
+    """Cuenta sentencias ejecutadas en ``engine`` (un executemany cuenta como una)."""
+
+    def __init__(self, engine: Engine):
+        self.engine = engine
+        self.count = 0
+
+    def _on_execute(self, conn, cursor, statement, parameters, context, executemany):
+        self.count += 1
+
+    def __enter__(self) -> "QueryCounter":
+        event.listen(self.engine, "before_cursor_execute", self._on_execute)
+        return self
+
+    def __exit__(self, *exc) -> None:
+        event.remove(self.engine, "before_cursor_execute", self._on_execute)
+
+
+class Bench:
+    """Registro de resultados de una corrida para un tamaño."""
+
+    def __init__(self, engine: Engine, size: str, rounds: int):
+        self.engine = engine
+        self.size = size
+        self.rounds = rounds
+        self.results: dict[str, dict] = {}
+
+    def run(self, name: str, fn: Callable[[], object], rounds: int | None = None, warmup: bool = True) -> dict:
+        if warmup:
+            fn()
+        times = []
+        queries = 0
+        for _ in range(rounds or self.rounds):
+            with QueryCounter(self.engine) as qc:
+                t0 = time.perf_counter()
+                fn()
+                times.append((time.perf_counter() - t0) * 1000)
+            queries = qc.count
+        stats = {
+            "rounds": len(times),
+            "min_ms": round(min(times), 3),
+            "median_ms": round(statistics.median(times), 3),
+            "mean_ms": round(statistics.fmean(times), 3),
+            "max_ms": round(max(times), 3),
+            "queries": queries,
+        }
+        self.results[name] = stats
+        return stats
+
+    def document(self) -> dict:
+        return {
+            "size": self.size,
+            "created_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            "machine": {"python": platform.python_version(), "platform": platform.platform(),
+                        "processor": platform.processor() or platform.machine()},
+            "benchmarks": dict(sorted(self.results.items())),
+        }
+
+
+def load(path: Path) -> dict | None:
+    if not path.exists():
+        return None
+    return json.loads(path.read_text(encoding="utf-8"))
+
+
+def save(path: Path, doc: dict) -> None:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(json.dumps(doc, indent=2, sort_keys=False) + "\n", encoding="utf-8")
+
+
+def regressions(baseline: dict, current: dict, tolerance: float, timing: bool) -> list[str]:
+    """Mensajes de regresión de ``current`` frente a ``baseline`` (mismo tamaño)."""
+    out = []
+    for name, cur in current.get("benchmarks", {}).items():
+        base = baseline.get("benchmarks", {}).get(name)
+        if base is None:
+            continue
+        if cur["queries"] > base["queries"]:
+            out.append(f"{name}: {cur['queries']} consultas (baseline {base['queries']})")
+        if timing and cur["median_ms"] > base["median_ms"] * (1 + tolerance):
+            out.append(f"{name}: mediana {cur['median_ms']:.1f} ms (baseline {base['median_ms']:.1f} ms, "
+                       f"tolerancia {tolerance:.0%})")
+    return out
+
+
+def table(baseline: dict, current: dict) -> str:
+    lines = [f"{'benchmark':<28}{'base ms':>12}{'actual ms':>12}{'Δ%':>9}{'base q':>9}{'q':>7}"]
+    for name in sorted(set(baseline.get("benchmarks", {})) | set(current.get("benchmarks", {}))):
+        b = baseline.get("benchmarks", {}).get(name)
+        c = current.get("benchmarks", {}).get(name)
+        if b is None or c is None:
+            lines.append(f"{name:<28}{'-' if b is None else b['median_ms']:>12}{'-' if c is None else c['median_ms']:>12}")
+            continue
+        delta = (c["median_ms"] / b["median_ms"] - 1) * 100 if b["median_ms"] else 0.0
+        lines.append(f"{name:<28}{b['median_ms']:>12.1f}{c['median_ms']:>12.1f}{delta:>8.1f}%"
+                     f"{b['queries']:>9}{c['queries']:>7}")
+    return "\n".join(lines)
+
+
+if __name__ == "__main__":
+    if len(sys.argv) != 3:
+        sys.exit("uso: python -m benchmarks.harness BASELINE.json ACTUAL.json")
+    base_doc, cur_doc = load(Path(sys.argv[1])), load(Path(sys.argv[2]))
+    if base_doc is None or cur_doc is None:
+        sys.exit("archivo no encontrado")
+    print(table(base_doc, cur_doc))
+    problems = regressions(base_doc, cur_doc, tolerance=0.25, timing=True)
+    for p in problems:
+        print("REGRESIÓN", p)
+    sys.exit(1 if problems else 0)
@@ -0,0 +1,90 @@
+"""Perfila los servicios pesados sobre los proyectos sintéticos de los benchmarks.
+
+    python -m benchmarks.profile --size 10k                      # todos
+    python -m benchmarks.profile --size 100k --target import_bc3 --interval 2
+
+Genera el proyecto en una BD SQLite temporal, ejecuta cada servicio con el muestreador
+de ``app.core.profiling`` sobre el hilo actual y guarda ``{id}.json`` + ``{id}.svg`` en
+``profiling_dir`` (o ``--out``). Imprime las funciones con más muestras propias.
+"""
+from __future__ import annotations
+import argparse
+import os
+import tempfile
+import threading
+import time
+from collections import Counter
+
+os.environ.setdefault("SKIP_MIGRATIONS", "true")
+os.environ["REALTIME_BACKEND"] = "memory"
+
+from sqlalchemy import create_engine  # noqa: E402
+from sqlalchemy.orm import sessionmaker  # noqa: E402
+import app.main  # noqa: E402,F401  registra todos los modelos
+from app.core.profiling import Sampler, save_profile  # noqa: E402
+from app.core.settings import get_settings  # noqa: E402
+from app.db.base import Base  # noqa: E402
+from app.services.bc3_parser import import_budget_bc3  # noqa: E402
+from app.services.evm import evm_metrics  # noqa: E402
+from app.services.exporting import export_budget_pdf  # noqa: E402
+from benchmarks.datagen import SIZES, bc3_text, generate_project  # noqa: E402
+
+
+def _import_bc3(db, data, size, workdir):
+    path = os.path.join(workdir, f"bench-{size}.bc3")
+    if not os.path.exists(path):
+        with open(path, "w", encoding="utf-8") as fh:
+            fh.write(bc3_text(SIZES[size]))
+    return lambda: import_budget_bc3(db, path, f"profile-import-{size}")
+
+
+TARGETS = {
+    "import_bc3": _import_bc3,
+    "export_budget_pdf": lambda db, data, size, workdir: lambda: export_budget_pdf(db, data["project_id"]),
+    "evm_overview": lambda db, data, size, workdir: lambda: evm_metrics(db, data["project_id"]),
+}
+
+
+def top_self(stacks: dict[str, int], n: int = 10) -> list[tuple[str, int]]:
+    leaf = Counter()
+    for stack, count in stacks.items():
+        leaf[stack.rsplit(";", 1)[-1]] += count
+    return leaf.most_common(n)
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description="Perfila servicios pesados con datos sintéticos")
+    parser.add_argument("--size", default="1k", choices=sorted(SIZES))
+    parser.add_argument("--target", action="append", choices=sorted(TARGETS), help="repetible; default: todos")
+    parser.add_argument("--interval", type=float, default=None, help="ms entre muestras")
+    parser.add_argument("--out", default=None, help="directorio de salida (default: profiling_dir)")
+    args = parser.parse_args(argv)
+    if args.out:
+        get_settings().profiling_dir = args.out
+
+    with tempfile.TemporaryDirectory(prefix="profile") as workdir:
+        engine = create_engine(f"sqlite:///{os.path.join(workdir, 'profile.sqlite')}")
+        Base.metadata.create_all(engine)
+        db = sessionmaker(bind=engine, autoflush=False)()
+        t0 = time.perf_counter()
+        data = generate_project(db, SIZES[args.size])
+        print(f"proyecto {args.size}: {data['items']} ítems en {time.perf_counter() - t0:.1f}s")
+        for name in args.target or list(TARGETS):
+            fn = TARGETS[name](db, data, args.size, workdir)
+            sampler = Sampler(args.interval)
+            sampler.add_thread(threading.get_ident())
+            t0 = time.perf_counter()
+            with sampler:
+                fn()
+            elapsed = (time.perf_counter() - t0) * 1000
+            meta = save_profile(sampler, {"target": name, "size": args.size, "duration_ms": round(elapsed, 2)})
+            print(f"\n{name}: {elapsed:.0f} ms, {meta['samples']} muestras -> {meta['id']}.svg")
+            for frame, count in top_self(dict(sampler.stacks)):
+                print(f"  {count / max(meta['samples'], 1):6.1%}  {frame}")
+        db.close()
+        engine.dispose()
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
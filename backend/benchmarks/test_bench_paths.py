@@ -0,0 +1,106 @@
+"""Tiempo y consultas SQL de los caminos pesados sobre proyectos de 1k/10k/100k ítems.
+
+Se mide a través de la API (auth y RBAC incluidos), como lo ve un cliente. Los límites
+``max_queries`` son independientes del tamaño: un camino que hace una consulta por ítem
+o por capítulo los supera en cuanto el proyecto crece. Los caminos que hoy escalan con el
+tamaño no llevan límite fijo; su conteo queda en el baseline y no puede subir.
+"""
+from benchmarks.datagen import SIZES, bc3_text
+
+
+def _ok(r):
+    assert r.status_code == 200, r.text[:300]
+    return r
+
+
+def test_import_bc3(client, auth, size, bench):
+    content = bc3_text(SIZES[size]).encode()
+    stats = bench("import_bc3", lambda: _ok(client.post(
+        "/api/v1/imports/bc3", data={"project_name": f"bench-import-{size}"},
+        files={"file": ("bench.bc3", content, "text/plain")}, headers=auth["headers"])), rounds=1, warmup=False)
+    assert stats["queries"] > 0
+
+
+def test_tree(client, auth, dataset, bench):
+    pid = dataset["project_id"]
+    r = _ok(client.get(f"/api/v1/budgets/projects/{pid}/tree", headers=auth["headers"]))
+    assert sum(len(ch["items"]) for ch in r.json()["chapters"]) == dataset["items"]
+    stats = bench("tree", lambda: _ok(client.get(f"/api/v1/budgets/projects/{pid}/tree", headers=auth["headers"])))
+    assert stats["queries"] <= 6
+
+
+def test_summary(client, auth, dataset, bench):
+    pid = dataset["project_id"]
+    r = _ok(client.get(f"/api/v1/budgets/projects/{pid}/summary", headers=auth["headers"]))
+    assert r.json()["total_items"] == dataset["items"]
+    stats = bench("summary", lambda: _ok(client.get(f"/api/v1/budgets/projects/{pid}/summary", headers=auth["headers"])))
+    assert stats["queries"] <= 6
+
+
+def test_evm(client, auth, dataset, bench):
+    pid = dataset["project_id"]
+    stats = bench("evm", lambda: _ok(client.get(f"/api/v1/evm/projects/{pid}", headers=auth["headers"])))
+    assert stats["queries"] <= 15
+
+
+def test_progress(client, auth, dataset, bench):
+    pid = dataset["project_id"]
+    r = _ok(client.get(f"/api/v1/measurements/project/{pid}/progress", headers=auth["headers"]))
+    assert len(r.json()["items"]) == dataset["items"]
+    bench("progress", lambda: _ok(client.get(f"/api/v1/measurements/project/{pid}/progress", headers=auth["headers"])))
+
+
+def test_diff(client, auth, dataset, bench):
+    q = f"v_from={dataset['v_from']}&v_to={dataset['v_to']}"
+    r = _ok(client.get(f"/api/v1/versions/diff?{q}", headers=auth["headers"]))
+    assert len(r.json()["removed"]) == dataset["items"] // 100
+    stats = bench("diff", lambda: _ok(client.get(f"/api/v1/versions/diff?{q}", headers=auth["headers"])))
+    assert stats["queries"] <= 4
+
+
+def test_diff_live(client, auth, dataset, bench):
+    q = f"project_id={dataset['project_id']}&version_id={dataset['v_to']}"
+    stats = bench("diff_live", lambda: _ok(client.get(f"/api/v1/versions/diff/live?{q}", headers=auth["headers"])))
+    assert stats["queries"] <= 6
+
+
+def test_snapshot(client, auth, scratch, bench):
+    pid = scratch["project_id"]
+    bench("snapshot", lambda: _ok(client.post(f"/api/v1/versions/{pid}/snapshot?name=bench", headers=auth["headers"])),
+          warmup=False)
+
+
+def test_restore(client, auth, scratch, bench):
+    q = f"project_id={scratch['project_id']}&make_snapshot=false"
+    bench("restore", lambda: _ok(client.post(f"/api/v1/versions/restore/{scratch['v_from']}?{q}",
+                                             headers=auth["headers"])), rounds=1, warmup=False)
+    r = _ok(client.get(f"/api/v1/budgets/projects/{scratch['project_id']}/summary", headers=auth["headers"]))
+    assert r.json()["total_items"] == scratch["items"]
+
+
+def test_export_budget_xlsx(client, auth, dataset, bench):
+    pid = dataset["project_id"]
+    bench("export_budget_xlsx", lambda: _ok(client.get(f"/api/v1/exports/budget/{pid}.xlsx", headers=auth["headers"])))
+
+
+def test_export_measurements_xlsx(client, auth, dataset, bench):
+    pid = dataset["project_id"]
+    bench("export_measurements_xlsx",
+          lambda: _ok(client.get(f"/api/v1/exports/measurements/{pid}.xlsx", headers=auth["headers"])))
+
+
+def test_export_diff_xlsx(client, auth, dataset, bench):
+    q = f"v_from={dataset['v_from']}&v_to={dataset['v_to']}"
+    stats = bench("export_diff_xlsx", lambda: _ok(client.get(f"/api/v1/exports/diff.xlsx?{q}", headers=auth["headers"])))
+    assert stats["queries"] <= 6  # diff (3) + versión de datos y búsqueda del precalculado
+
+
+def test_dashboard(client, auth, dataset, bench):
+    pid = dataset["project_id"]
+    stats = bench("dashboard", lambda: _ok(client.get(f"/api/v1/dashboard/projects/{pid}", headers=auth["headers"])))
+    assert stats["queries"] <= 20
+
+
+def test_portfolio(client, auth, dataset, bench):
+    stats = bench("portfolio", lambda: _ok(client.get("/api/v1/dashboard/portfolio", headers=auth["headers"])))
+    assert stats["queries"] <= 20
@@ -0,0 +1,17 @@
+"""Opciones de línea de comandos de los benchmarks.
+
+Van en el conftest raíz porque pytest solo registra ``pytest_addoption`` de los conftest
+que ve al arrancar; así ``pytest -q`` (solo ``tests``) y ``pytest benchmarks`` aceptan las
+mismas opciones.
+"""
+from benchmarks.datagen import SIZES
+
+
+def pytest_addoption(parser):
+    group = parser.getgroup("bench", "benchmarks")
+    group.addoption("--bench-size", action="append", choices=sorted(SIZES), default=None,
+                    help="tamaño de proyecto (repetible; default 1k)")
+    group.addoption("--bench-rounds", type=int, default=3, help="rondas medidas por benchmark")
+    group.addoption("--bench-save", action="store_true", help="guardar resultados como baseline")
+    group.addoption("--bench-compare", action="store_true", help="fallar también por regresión de tiempo")
+    group.addoption("--bench-tolerance", type=float, default=0.25, help="tolerancia de tiempo (0.25 = 25%%)")
@@ -16,6 +16,8 @@ if str(BACKEND_DIR) not in sys.path:
 # Forzar uso de sqlite aislado y saltar migraciones en tests
 os.environ["DATABASE_URL"] = "sqlite:///./test.db"  # override simple
 os.environ["SKIP_MIGRATIONS"] = "true"
+os.environ["REALTIME_BACKEND"] = "memory"  # eventos y caché en proceso, consumidores inline
+os.environ["QUERY_DEBUG_HEADER"] = "true"  # X-Debug-Queries para los presupuestos de consultas
 
 from app.main import app
 from app.db.base import Base
@@ -27,6 +29,7 @@ from app.db.models import versioning as _m_versioning  # noqa: F401
 from app.db.models import audit as _m_audit  # noqa: F401
 from app.db.models import risk as _m_risk  # noqa: F401
 from app.db.session import get_db
+from app.core.query_stats import install as install_query_stats
 
 
 @pytest.fixture(scope="session")
@@ -35,6 +38,7 @@ def engine():
     url = f"sqlite:///{path}"
     eng = create_engine(url, connect_args={"check_same_thread": False})
     Base.metadata.create_all(eng)
+    install_query_stats(eng)
     yield eng
     eng.dispose()
 
@@ -68,3 +72,58 @@ def auth_token(client):
     if r.status_code != 200:
         raise AssertionError(f"Fallo al registrar usuario de test: {r.status_code} {r.text}")
     return r.json()["access_token"]
+
+
+@pytest.fixture
+def query_budget():
+    """``query_budget(response, max_queries)``: falla si el request ejecutó más SQL que el presupuesto.
+
+    El request debe enviarse con el header ``X-Debug-Queries: 1``.
+    """
+    import json
+
+    def check(response, max_queries: int) -> int:
+        count = int(response.headers["X-DB-Queries"])
+        top = json.loads(response.headers.get("X-DB-Top-Statements", "[]"))
+        assert count <= max_queries, f"{count} consultas > {max_queries}: " + json.dumps(top, indent=1)
+        return count
+    return check
+
+
+class FakeQueue:
+    """Cola RQ de mentira: guarda lo encolado (``calls``: kwargs de ``enqueue``; ``funcs``)."""
+
+    def __init__(self):
+        self.calls: list[dict] = []
+        self.funcs: list = []
+
+    def enqueue(self, fn, **kwargs):
+        self.funcs.append(fn)
+        self.calls.append(kwargs)
+        return type('RQJob', (), {'id': f'fake-{id(self)}-{len(self.calls)}'})()
+
+
+@pytest.fixture
+def job_queue(monkeypatch, tmp_path):
+    """Reemplaza la cola de jobs por ``FakeQueue`` y usa un almacén de artefactos temporal."""
+    from app.core.settings import get_settings
+    from app.services import jobs
+    fake = FakeQueue()
+    monkeypatch.setattr(jobs, 'get_queue', lambda name='default': fake)
+    monkeypatch.setattr(get_settings(), 'artifacts_dir', str(tmp_path / 'artifacts'))
+    return fake
+
+
+@pytest.fixture
+def small_project():
+    """``small_project(db, name)``: proyecto con un capítulo y un ítem; devuelve ``(project_id, item)``."""
+    from app.db.models.budget import Chapter, Item
+    from app.db.models.project import Project
+
+    def make(db, name: str = 'obra'):
+        p = Project(name=name); db.add(p); db.flush()
+        ch = Chapter(project_id=p.id, code='01', name='Obra'); db.add(ch); db.flush()
+        it = Item(chapter_id=ch.id, code='01.01', name='Excavación', unit='m3', quantity=10, price=100)
+        db.add(it); db.commit()
+        return p.id, it
+    return make
@@ -0,0 +1,108 @@
+import gzip
+import json
+import os
+import time
+import uuid
+import pytest
+from app.core.settings import get_settings
+from app.db.models.job import Job
+from app.services import artifacts
+
+
+@pytest.fixture
+def store(tmp_path, monkeypatch):
+    settings = get_settings()
+    monkeypatch.setattr(settings, 'artifacts_dir', str(tmp_path / 'artifacts'))
+    monkeypatch.setattr(settings, 'artifacts_compression', 'gzip')
+    monkeypatch.setattr(artifacts, '_last_evict', time.time())
+    return tmp_path / 'artifacts'
+
+
+def _finished_job(db, path: str, client, token) -> Job:
+    me = client.get('/api/v1/auth/me', headers={'Authorization': f'Bearer {token}'}).json()['id']
+    job = Job(rq_id=f'test-{uuid.uuid4().hex}', type='export_budget_excel', status='finished', result_path=path,
+              created_by=me, submitters=[me])
+    db.add(job); db.commit(); db.refresh(job)
+    return job
+
+
+def test_put_is_content_addressed(store):
+    pdf = b'%PDF-1.4\n' + os.urandom(4000)
+    a = artifacts.put(pdf)
+    b = artifacts.put(pdf)
+    assert a.path == b.path and a.ext == 'pdf' and a.encoding is None
+    assert a.media_type == 'application/pdf'
+    assert a.path.parent.parent == store.resolve()
+    rows = ('codigo;descripcion;importe\n' + 'A;x;1\n' * 500).encode()
+    csv_art = artifacts.put(rows)
+    assert csv_art.ext == 'csv' and csv_art.encoding == 'gzip' and csv_art.path.name.endswith('.csv.gz')
+    assert gzip.decompress(csv_art.path.read_bytes()) == rows
+    assert artifacts.put_json({'ok': 1}).ext == 'json'
+    assert artifacts.resolve(csv_art.path) == csv_art
+    assert artifacts.resolve(store / 'missing.pdf') is None
+
+
+def test_download_streams_with_ranges(client, auth_token, db_session, store):
+    data = b'%PDF-1.4\n' + bytes(range(256)) * 40
+    art = artifacts.put(data)
+    job = _finished_job(db_session, str(art.path), client, auth_token)
+    h = {'Authorization': f'Bearer {auth_token}'}
+    url = f'/api/v1/jobs/{job.id}/download'
+
+    r = client.get(url, headers=h)
+    assert r.status_code == 200 and r.content == data
+    assert r.headers['content-type'] == 'application/pdf'
+    assert r.headers['accept-ranges'] == 'bytes'
+    assert f'export_budget_excel_{job.id}.pdf' in r.headers['content-disposition']
+    etag = r.headers['etag']
+    assert etag == f'"{art.sha256}"'
+
+    r = client.get(url, headers={**h, 'Range': 'bytes=10-19'})
+    assert r.status_code == 206 and r.content == data[10:20]
+    assert r.headers['content-range'] == f'bytes 10-19/{len(data)}'
+    r = client.get(url, headers={**h, 'Range': 'bytes=-5'})
+    assert r.status_code == 206 and r.content == data[-5:]
+    r = client.get(url, headers={**h, 'Range': f'bytes={len(data)}-'})
+    assert r.status_code == 416
+    r = client.get(url, headers={**h, 'Range': 'bytes=0-3', 'If-Range': '"otro"'})
+    assert r.status_code == 200 and r.content == data
+    assert client.get(url, headers={**h, 'If-None-Match': etag}).status_code == 304
+
+    # job ajeno sin proyecto: nadie más lo descarga
+    other = client.post('/api/v1/auth/register', json={'username': f'ajeno_{uuid.uuid4().hex[:8]}', 'password': 'pass'})
+    assert client.get(url, headers={'Authorization': f"Bearer {other.json()['access_token']}"}).status_code == 403
+
+    art.path.unlink()
+    assert client.get(url, headers=h).status_code == 410
+
+
+def test_download_compressed_json(client, auth_token, db_session, store):
+    payload = [{'item': i, 'descripcion': 'partida'} for i in range(200)]
+    art = artifacts.put_json(payload)
+    assert art.encoding == 'gzip'
+    job = _finished_job(db_session, str(art.path), client, auth_token)
+    h = {'Authorization': f'Bearer {auth_token}'}
+    url = f'/api/v1/jobs/{job.id}/download'
+
+    r = client.get(url, headers={**h, 'Accept-Encoding': 'gzip'})
+    assert r.headers['content-encoding'] == 'gzip'
+    assert json.loads(r.content) == payload
+    r = client.get(url, headers={**h, 'Accept-Encoding': 'identity'})
+    assert 'content-encoding' not in r.headers
+    assert r.headers['accept-ranges'] == 'none'
+    assert json.loads(r.content) == payload
+
+
+def test_evict_by_ttl_and_size(store, monkeypatch):
+    settings = get_settings()
+    now = time.time()
+    old = artifacts.put(b'%PDF-1.4 viejo' + os.urandom(2000))
+    os.utime(old.path, (now - 10 * 3600, now - 10 * 3600))
+    mid = artifacts.put(b'%PDF-1.4 medio' + os.urandom(600 * 1024))
+    os.utime(mid.path, (now - 60, now - 60))
+    new = artifacts.put(b'%PDF-1.4 nuevo' + os.urandom(600 * 1024))
+    monkeypatch.setattr(settings, 'artifacts_ttl_hours', 1)
+    monkeypatch.setattr(settings, 'artifacts_max_mb', 1)
+    stats = artifacts.evict(now)
+    assert stats['removed'] == 2
+    assert not old.path.exists() and not mid.path.exists() and new.path.exists()
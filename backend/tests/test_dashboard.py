@@ -39,3 +39,91 @@ def test_dashboard_basic(client, auth_token):
     assert data['budget']['ev'] == 40   # 4 * 10
     assert data['risks']['open'] == 1
     assert 'pending_steps' in data['workflows']
+
+
+def test_portfolio_dashboard(client, auth_token):
+    """Portafolio: KPIs agrupados para todos los proyectos del usuario, con orden y filtro."""
+    headers = {'Authorization': f'Bearer {auth_token}'}
+    project_ids = []
+    for name, qty in [('PortA', 10), ('PortB', 30)]:
+        pid = client.post('/api/v1/budgets/projects', json={'name': name, 'currency': 'CLP'}, headers=headers).json()['id']
+        ch = client.post('/api/v1/budgets/chapters', json={'project_id': pid, 'code': 'C1', 'name': 'Cap'}, headers=headers).json()['id']
+        it = client.post('/api/v1/budgets/items', json={'chapter_id': ch, 'code': 'I1', 'name': 'Item', 'unit': 'u', 'quantity': qty}, headers=headers).json()['id']
+        client.post(f'/api/v1/budgets/items/{it}/apu', json=[{'resource_code': 'RP', 'resource_name': 'Res', 'resource_type': 'mat', 'unit': 'u', 'unit_cost': 1, 'coeff': 1}], headers=headers)
+        project_ids.append(pid)
+    client.post('/api/v1/risks/', json={'project_id': project_ids[1], 'category': 'plazo', 'description': 'R', 'probability': 2, 'impact': 2}, headers=headers)
+
+    r = client.get('/api/v1/dashboard/portfolio', params={'sort_by': 'pv', 'order': 'desc'}, headers=headers)
+    assert r.status_code == 200, r.text
+    rows = r.json()
+    assert [row['project_id'] for row in rows] == [project_ids[1], project_ids[0]]
+    assert rows[0]['pv'] == 30 and rows[1]['pv'] == 10
+    assert rows[0]['risks_open'] == 1 and rows[1]['risks_open'] == 0
+
+    r = client.get('/api/v1/dashboard/portfolio', params={'kpi': 'pv', 'kpi_min': 20, 'format': 'ndjson'}, headers=headers)
+    assert r.status_code == 200
+    lines = [l for l in r.text.splitlines() if l]
+    assert len(lines) == 1 and f'"project_id": {project_ids[1]}' in lines[0]
+
+    r = client.get('/api/v1/dashboard/portfolio', params={'sort_by': 'nope'}, headers=headers)
+    assert r.status_code == 400
+
+
+def test_dashboard_live_deltas(client, auth_token):
+    """El feed en vivo envía un snapshot y luego solo las claves de los fragmentos que cambiaron."""
+    h = {'Authorization': f'Bearer {auth_token}'}
+    project_id = client.post('/api/v1/budgets/projects', json={'name': 'LiveDash', 'currency': 'CLP'}, headers=h).json()['id']
+    chapter_id = client.post('/api/v1/budgets/chapters', json={'project_id': project_id, 'code': 'C1', 'name': 'Cap'}, headers=h).json()['id']
+    item_id = client.post('/api/v1/budgets/items', json={'chapter_id': chapter_id, 'code': 'I1', 'name': 'Item', 'unit': 'u', 'quantity': 10}, headers=h).json()['id']
+    client.post(f'/api/v1/budgets/items/{item_id}/apu', json=[{'resource_code': 'RL1', 'resource_name': 'R', 'resource_type': 'mat', 'unit': 'u', 'unit_cost': 5, 'coeff': 2}], headers=h)
+
+    with client.websocket_connect(f'/api/v1/dashboard/projects/{project_id}/live/ws?token={auth_token}') as ws:
+        snap = ws.receive_json()
+        assert snap['type'] == 'dashboard.snapshot'
+        assert snap['fragments']['budget']['pv'] == 100
+        assert snap['fragments']['workflows']['pending_steps'] == 0
+
+        # Riesgo nuevo -> solo cambia risks.open
+        client.post('/api/v1/risks/', json={'project_id': project_id, 'category': 'x', 'description': 'R', 'probability': 2, 'impact': 2}, headers=h)
+        delta = ws.receive_json()
+        assert delta['type'] == 'dashboard.delta'
+        assert delta['fragments'] == {'risks': {'open': 1}}
+
+        # Medición cerrada -> EV y avance del fragmento budget (pv no cambia)
+        batch_id = client.post('/api/v1/measurements/batches', json={'project_id': project_id, 'name': 'B'}, headers=h).json()['batch_id']
+        client.post('/api/v1/measurements/batches/lines', json={'batch_id': batch_id, 'lines': [{'item_id': item_id, 'qty': 5}]}, headers=h)
+        client.post(f'/api/v1/measurements/batches/{batch_id}/close', headers=h)
+        delta = ws.receive_json()
+        assert delta['fragments'] == {'budget': {'ev': 50.0, 'progress_percent': 50.0}}
+
+        # Factura -> fragmento finance
+        client.post('/api/v1/invoices/', json={'project_id': project_id, 'amount': 1000, 'currency': 'CLP'}, headers=h)
+        delta = ws.receive_json()
+        assert list(delta['fragments']) == ['finance']
+
+    # Sin token válido no hay feed
+    import pytest
+    from starlette.websockets import WebSocketDisconnect
+    with pytest.raises(WebSocketDisconnect):
+        with client.websocket_connect(f'/api/v1/dashboard/projects/{project_id}/live/ws?token=bad') as ws:
+            ws.receive_json()
+
+
+def test_refresh_fragments_only_with_viewers(db_session, small_project):
+    """Sin conexiones en vivo los eventos no recalculan ni reescriben fragmentos, aunque sigan en la caché."""
+    from app.core.cache import get_cache
+    from app.db.models.risk import Risk
+    from app.services.dashboard import _live_key, _viewers_key, live_snapshot, mark_watched, refresh_fragments
+
+    project_id, _ = small_project(db_session, 'Espectadores')
+    cache = get_cache()
+    live_snapshot(db_session, project_id)
+    cache.delete(_viewers_key(project_id))  # la última conexión se fue y la marca expiró
+
+    db_session.add(Risk(project_id=project_id, category='x', description='R', probability=2, impact=2))
+    db_session.commit()
+    assert refresh_fragments(db_session, project_id, ('risks',)) == {}
+    assert cache.get(_live_key(project_id, 'risks'))['open'] == 0
+
+    mark_watched(project_id)
+    assert refresh_fragments(db_session, project_id, ('risks',)) == {'risks': {'open': 1}}
@@ -61,8 +61,204 @@ def test_evm_basic_flow(db_session, client):
     assert round(data['planned_value'],2) == 90.0
     # EV esperado: ejecutado 5*5 + 10*2 = 25 + 20 = 45
     assert round(data['earned_value'],2) == 45.0
-    assert round(data['actual_cost'],2) == 45.0
+    # sin OC aprobadas ni pagos aún no hay costo real
+    assert round(data['actual_cost'],2) == 0.0
     assert data['spi'] == pytest.approx(0.5)
-    assert data['cpi'] == pytest.approx(1.0)
+    assert data['cpi'] == 0
     assert len(data['curve_s']) == 1
     assert round(data['curve_s'][0]['cumulative_ev'],2) == 45.0
+    assert data['curve_ac'] == []
+
+
+def test_evm_actual_cost_from_ledger(db_session, client):
+    from datetime import date
+    from app.db.models.versioning import Invoice
+    from app.services.cost_ledger import daily_series, rebuild_cost_ledger
+    headers = auth_headers(client)
+    project_id, _ = create_basic_budget(db_session)
+    items = db_session.query(Item).join(Chapter, Item.chapter_id==Chapter.id).filter(Chapter.project_id==project_id).order_by(Item.code).all()
+    r = client.post('/api/v1/measurements/batches', json={'project_id':project_id,'name':'B AC'}, headers=headers)
+    batch_id = r.json()['batch_id']
+    client.post('/api/v1/measurements/batches/lines', json={'batch_id': batch_id, 'lines': [{'item_id': items[0].id, 'qty': 6}]}, headers=headers)
+    client.post(f'/api/v1/measurements/batches/{batch_id}/close', headers=headers)  # EV = 30
+
+    supplier_id = client.post('/api/v1/purchases/suppliers', json={'name': 'Supp EVM'}, headers=headers).json()['id']
+    po_id = client.post('/api/v1/purchases/po', json={'project_id': project_id, 'supplier_id': supplier_id,
+                        'lines': [{'item_id': items[0].id, 'qty': 5, 'unit_price': 4}]}, headers=headers).json()['po_id']
+    # creada no genera costo; aprobada sí (una sola vez aunque luego se reciba)
+    for status in ('approved', 'received'):
+        assert client.patch(f'/api/v1/purchases/po/{po_id}/status', json={'status': status}, headers=headers).status_code == 200
+    inv = Invoice(project_id=project_id, amount=100, status='accepted')
+    db_session.add(inv); db_session.commit()
+    from app.services.invoices import register_payment
+    register_payment(db_session, None, inv, 20, 'transfer', None)
+
+    data = client.get(f'/api/v1/evm/projects/{project_id}', headers=headers).json()
+    assert data['actual_cost'] == pytest.approx(40.0)  # 5*4 (OC) + 20 (pago)
+    assert data['cpi'] == pytest.approx(30 / 40)
+    assert data['eac'] == pytest.approx(90 / 0.75)
+    assert data['etc'] == pytest.approx(120 - 40)
+    assert data['vac'] == pytest.approx(90 - 120)
+    today = date.today().isoformat()
+    assert data['curve_ac'] == [{'day': today, 'po': 20.0, 'payment': 20.0, 'amount': 40.0, 'cumulative': 40.0}]
+
+    # fecha de corte pasada: EV y AC también se cortan, no solo PV
+    from datetime import timedelta
+    past = (date.today() - timedelta(days=2)).isoformat()
+    data = client.get(f'/api/v1/evm/projects/{project_id}', params={'as_of': past}, headers=headers).json()
+    assert data['earned_value'] == 0 and data['actual_cost'] == 0
+    assert data['curve_s'] == [] and data['curve_ac'] == [] and data['cpi'] == 0
+
+    before = daily_series(db_session, project_id)
+    rebuild_cost_ledger(db_session, project_id)
+    assert [p['cumulative'] for p in daily_series(db_session, project_id)] == [p['cumulative'] for p in before]
+
+
+def test_cost_ledger_rebuild_matches_incremental(db_session, client):
+    from datetime import datetime, timedelta
+    from app.db.models.purchases import PurchaseOrder
+    from app.services.cost_ledger import daily_series, rebuild_cost_ledger
+    headers = auth_headers(client)
+    project_id, _ = create_basic_budget(db_session)
+    item_id = db_session.query(Item.id).join(Chapter, Item.chapter_id == Chapter.id) \
+        .filter(Chapter.project_id == project_id).first()[0]
+    supplier_id = client.post('/api/v1/purchases/suppliers', json={'name': 'Supp ledger'}, headers=headers).json()['id']
+
+    def po(qty, *statuses):
+        po_id = client.post('/api/v1/purchases/po', json={'project_id': project_id, 'supplier_id': supplier_id,
+                            'lines': [{'item_id': item_id, 'qty': qty, 'unit_price': 10}]}, headers=headers).json()['po_id']
+        for status in statuses:
+            assert client.patch(f'/api/v1/purchases/po/{po_id}/status', json={'status': status}, headers=headers).status_code == 200
+        return po_id
+
+    po(1, 'approved', 'closed')   # cerrada después de aprobada: conserva el costo
+    po(2, 'closed')               # de creada a cerrada: también es costo
+    old = po(3, 'approved')
+    po(4)                         # creada: sin costo
+    # creada hace días, aprobada hoy: el costo va al día de aprobación
+    db_session.query(PurchaseOrder).filter_by(id=old).update({'created_at': datetime.utcnow() - timedelta(days=5)})
+    db_session.commit()
+
+    incremental = daily_series(db_session, project_id)
+    assert [(p['po'], p['cumulative']) for p in incremental] == [(60.0, 60.0)]
+    rebuild_cost_ledger(db_session, project_id)
+    assert daily_series(db_session, project_id) == incremental
+
+
+def test_evm_pv_from_baseline_schedule(db_session, client):
+    from app.api.v1.versions import snapshot_logic
+    from app.db.models.audit import UserProjectRole
+    from app.db.models.user import User
+    headers = auth_headers(client)
+    project_id, _ = create_basic_budget(db_session)
+    user = db_session.query(User).filter_by(username='evm_user').first()
+    db_session.add(UserProjectRole(project_id=project_id, user_id=user.id, role='admin')); db_session.commit()
+    vid = snapshot_logic(db_session, project_id, 'LB', None)
+    r = client.post(f'/api/v1/versions/{project_id}/baseline', params={'version_id': vid}, headers=headers)
+    assert r.status_code == 200, r.text
+
+    bad = {'entries': [{'level': 'item', 'code': 'NOPE', 'start_date': '2025-01-01', 'end_date': '2025-01-10'},
+                       {'level': 'chapter', 'code': 'CX', 'start_date': '2025-01-10', 'end_date': '2025-01-01', 'profile': 'x'}]}
+    r = client.put(f'/api/v1/versions/version/{vid}/schedule', json=bad, headers=headers)
+    assert r.status_code == 400
+    assert [(e['line'], e['field']) for e in r.json()['detail']['errors']] == [(1, 'code'), (2, 'end_date'), (2, 'profile')]
+
+    # IT1 (50) lineal en 10 días; IT2 (40) toma el calendario S de su capítulo en 20 días
+    entries = [{'level': 'item', 'code': 'IT1', 'start_date': '2025-01-01', 'end_date': '2025-01-10'},
+               {'level': 'chapter', 'code': 'CX', 'start_date': '2025-01-01', 'end_date': '2025-01-20', 'profile': 's_curve'}]
+    r = client.put(f'/api/v1/versions/version/{vid}/schedule', json={'entries': entries}, headers=headers)
+    assert r.status_code == 200 and r.json()['entries'] == 2
+
+    curve = client.get(f'/api/v1/versions/version/{vid}/pv_curve', params={'bucket': 'day'}, headers=headers).json()
+    points = curve['points']
+    assert len(points) == 20 and points[-1]['cumulative_pv'] == pytest.approx(90.0)
+    assert points[4]['date'] == '2025-01-05' and points[4]['cumulative_pv'] == pytest.approx(25 + 40 * 0.15625)
+    weekly = client.get(f'/api/v1/versions/version/{vid}/pv_curve', headers=headers).json()['points']
+    assert [p['date'] for p in weekly] == ['2025-01-07', '2025-01-14', '2025-01-20']
+    assert sum(p['pv'] for p in weekly) == pytest.approx(90.0)
+
+    data = client.get(f'/api/v1/evm/projects/{project_id}', params={'as_of': '2025-01-05'}, headers=headers).json()
+    assert data['pv_source'] == 'baseline_schedule'
+    assert data['planned_value'] == pytest.approx(31.25)
+    assert data['budget_at_completion'] == pytest.approx(90.0)
+    assert len(data['curve_pv']) == 3
+    data = client.get(f'/api/v1/evm/projects/{project_id}', params={'as_of': '2024-12-31'}, headers=headers).json()
+    assert data['planned_value'] == 0
+
+
+def test_pv_cache_token_changes_on_every_schedule_write(db_session, monkeypatch):
+    """Otro proceso que reemplaza el calendario con la misma cantidad de entradas invalida la curva cacheada."""
+    from datetime import date
+    from app.api.v1.versions import snapshot_logic
+    from app.services import schedule
+    project_id, _ = create_basic_budget(db_session)
+    vid = snapshot_logic(db_session, project_id, 'LB', None)
+    other = snapshot_logic(db_session, project_id, 'LB2', None)
+    entry = {'level': 'chapter', 'code': 'CX', 'start_date': '2025-01-01', 'end_date': '2025-01-10'}
+    schedule.replace_schedule(db_session, vid, [entry])
+    assert schedule.pv_at(db_session, vid, date(2025, 1, 5)) == pytest.approx(45.0)
+
+    # sin invalidación local (como en otro worker): el token de la versión igual cambia
+    monkeypatch.setattr(schedule, 'invalidate_version', lambda version_id: None)
+    schedule.replace_schedule(db_session, vid, [{**entry, 'end_date': '2025-01-20'}])
+    assert schedule.pv_at(db_session, vid, date(2025, 1, 5)) == pytest.approx(22.5)
+
+    # LRU acotado
+    monkeypatch.setattr(schedule, 'CACHE_MAX_VERSIONS', 1)
+    schedule.replace_schedule(db_session, other, [entry])
+    schedule.pv_at(db_session, other, date(2025, 1, 5))
+    assert list(schedule._cache) == [other]
+
+
+def test_monte_carlo_forecast_is_deterministic_and_cached(db_session, client, monkeypatch):
+    from app.db.models.risk import Risk
+    from app.db.models.audit import UserProjectRole
+    from app.db.models.user import User
+    from app.services.forecast import run_forecast, gather_inputs, simulate, default_params
+    headers = auth_headers(client)
+    project_id, _ = create_basic_budget(db_session)
+    user = db_session.query(User).filter_by(username='evm_user').first()
+    db_session.add(UserProjectRole(project_id=project_id, user_id=user.id, role='viewer'))
+    db_session.add_all([
+        Risk(project_id=project_id, category='plazo', description='lluvias', probability=5, impact=5, status='open'),
+        Risk(project_id=project_id, category='tecnico', description='cerrado', probability=5, impact=5, status='closed'),
+    ])
+    db_session.commit()
+
+    import app.services.forecast as forecast
+    monkeypatch.setattr(forecast, 'CHUNK_CELLS', 10000)  # varios chunks con pocas entradas
+    first = run_forecast(db_session, project_id, workers=1, iterations=20000, seed=7)
+    assert not first['cached']
+    eac = first['eac']
+    assert eac['p10'] < eac['p50'] < eac['p90']
+    # BAC 90 con factores ~[0.9, 1.27] y un riesgo (85% de 9-18) => EAC entre 80 y 130
+    assert 80 < eac['p10'] and eac['p90'] < 130
+    assert first['tornado'][0]['kind'] == 'risk'  # el riesgo domina la varianza
+    assert {t['label'] for t in first['tornado']} == {'plazo', 'IT1', 'IT2'}
+
+    # misma semilla => mismo resultado, independiente de la partición en procesos
+    params = default_params(iterations=20000, seed=7)
+    again = simulate(gather_inputs(db_session, project_id), params, workers=2)
+    assert again['eac'] == eac
+
+    assert run_forecast(db_session, project_id, workers=1, iterations=20000, seed=7)['cached']
+    r = client.post(f'/api/v1/jobs/forecast/{project_id}', params={'iterations': 20000, 'seed': 7}, headers=headers)
+    assert r.status_code == 200 and r.json()['cached'] and r.json()['result']['eac'] == eac
+    r = client.get(f'/api/v1/evm/projects/{project_id}/forecast', headers=headers)
+    assert r.status_code == 200 and r.json()['input_hash'] == first['input_hash']
+    # rangos inválidos se rechazan al encolar, no en el worker
+    for bad in ({'qty_low': 0.1}, {'price_low': -1}, {'qty_high': -0.1}, {'price_low': 0.05, 'price_high': 0.01}):
+        r = client.post(f'/api/v1/jobs/forecast/{project_id}', params={'iterations': 20000, **bad}, headers=headers)
+        assert r.status_code == 400, bad
+    with pytest.raises(ValueError):
+        default_params(price_spread=[0.1, 0.2])
+    assert default_params(qty_spread=[0, 0])['qty_spread'] == [0.0, 0.0]
+
+
+def test_forecast_chunks_respect_cell_budget():
+    from app.services.forecast import CHUNK_CELLS, chunk_sizes
+    # 100k ítems: el chunk baja de 256 iteraciones para no pasar de CHUNK_CELLS celdas
+    sizes = chunk_sizes(10000, 100_000)
+    assert sum(sizes) == 10000 and max(sizes) * 100_000 <= CHUNK_CELLS
+    assert chunk_sizes(10, 10 * CHUNK_CELLS) == [1] * 10
+    assert chunk_sizes(5000, 10) == [5000]
@@ -26,7 +26,7 @@ def test_invoice_lifecycle(client, db_session, auth_token):
     # registrar pago parcial
     r3 = client.post(f"/api/v1/invoices/{inv['id']}/payments", json={"amount": 400, "method": "transfer"}, headers=headers)
     assert r3.status_code == 200
-    inv_after = r3.json(); assert inv_after["status"] == "accepted"
+    inv_after = r3.json(); assert inv_after["status"] == "accepted"; assert inv_after["paid_amount"] == 400
     # pago final
     r4 = client.post(f"/api/v1/invoices/{inv['id']}/payments", json={"amount": 600, "method": "transfer"}, headers=headers)
     assert r4.status_code == 200
@@ -59,3 +59,115 @@ def test_bank_import_and_reconcile(client, db_session, auth_token):
     r_rec = client.post("/api/v1/invoices/bank/reconcile", json={"bank_txn_id": bt.id, "invoice_id": inv['id']}, headers=headers)
     assert r_rec.status_code == 200, r_rec.text
     data = r_rec.json(); assert data["invoice_status"] == "paid"
+
+
+def test_financial_metrics_partial_payments_and_aging(db_session):
+    from datetime import datetime, timedelta
+    from app.db.models.versioning import Invoice
+    from app.services.finance import financial_metrics, financial_metrics_batch
+    now = datetime.utcnow()
+    p = Project(name="Proj Finance")
+    db_session.add(p); db_session.commit(); db_session.refresh(p)
+    fresh = Invoice(project_id=p.id, amount=1000, paid_amount=400, status="accepted", created_at=now - timedelta(days=5))
+    old = Invoice(project_id=p.id, amount=500, status="accepted", created_at=now - timedelta(days=75))
+    paid = Invoice(project_id=p.id, amount=200, status="paid", created_at=now - timedelta(days=100))
+    rejected = Invoice(project_id=p.id, amount=999, status="rejected", created_at=now)
+    db_session.add_all([fresh, old, paid, rejected]); db_session.flush()
+    db_session.commit()
+
+    m = financial_metrics(db_session, p.id, as_of=now)
+    assert m["invoiced_total"] == 1700
+    assert m["paid_total"] == 600
+    assert m["pending_total"] == 1100
+    assert m["partially_paid_count"] == 1
+    assert m["partially_paid_outstanding"] == 600
+    assert m["overdue_total"] == 500
+    assert m["aging"] == {"0_30": 600, "31_60": 0, "61_90": 500, "90_plus": 0}
+
+    empty = Project(name="Proj Finance Empty")
+    db_session.add(empty); db_session.commit()
+    batch = financial_metrics_batch(db_session, [p.id, empty.id], as_of=now)
+    assert batch[p.id] == m and empty.id not in batch
+    assert financial_metrics(db_session, empty.id)["invoiced_total"] == 0
+
+
+def test_bank_import_is_idempotent_and_reads_files(client, db_session, auth_token):
+    from app.db.models.versioning import BankTransaction
+    token = auth_token
+    me = client.get("/api/v1/auth/me", headers={"Authorization": f"Bearer {token}"})
+    user = db_session.query(User).filter_by(username=me.json()["username"]).first()
+    p = Project(name="Proj Bank Ingest")
+    db_session.add(p); db_session.commit(); db_session.refresh(p)
+    db_session.add(UserProjectRole(project_id=p.id, user_id=user.id, role="admin")); db_session.commit()
+    headers = {"Authorization": f"Bearer {token}"}
+
+    items = [
+        {"date": "2025-02-01", "description": "Pago A", "amount": 100, "balance": 1100},
+        {"date": "2025-02-01", "description": "Pago A", "amount": 100, "balance": 1100},  # duplicada en el mismo archivo
+        {"date": "no-date", "description": "Mala", "amount": 5},
+    ]
+    r = client.post("/api/v1/invoices/bank/import", json={"project_id": p.id, "items": items}, headers=headers)
+    assert r.status_code == 200, r.text
+    assert r.json()["new"] == 1 and r.json()["duplicate"] == 1 and r.json()["rejected"] == 1
+    r = client.post("/api/v1/invoices/bank/import", json={"project_id": p.id, "items": items[:1]}, headers=headers)
+    assert r.json()["created"] == 0 and r.json()["duplicate"] == 1
+
+    # cartola CSV (separador ';', montos formato CL, cargo/abono); la primera fila ya existe
+    csv_content = "Fecha;Descripción;Cargo;Abono;Saldo\n01/02/2025;Pago A;;100;1.100\n02/02/2025;Comisión;1.500;;-400\n03/02/2025;Depósito DTE 12;;2.000,50;1.600,50\n"
+    r = client.post("/api/v1/invoices/bank/import/file", data={"project_id": str(p.id)},
+                    files={"file": ("cartola.csv", csv_content.encode(), "text/csv")}, headers=headers)
+    assert r.status_code == 200, r.text
+    assert r.json()["new"] == 2 and r.json()["duplicate"] == 1 and r.json()["rejected"] == 0
+
+    ofx_content = """OFXHEADER:100
+<OFX><BANKMSGSRSV1><STMTTRNRS><STMTRS><BANKTRANLIST>
+<STMTTRN>
+<TRNTYPE>CREDIT
+<DTPOSTED>20250205120000[-3:CLT]
+<TRNAMT>750.00
+<NAME>Cliente X
+</STMTTRN>
+</BANKTRANLIST></STMTRS></STMTTRNRS></BANKMSGSRSV1></OFX>
+"""
+    for expected_new in (1, 0):
+        r = client.post("/api/v1/invoices/bank/import/file", data={"project_id": str(p.id)},
+                        files={"file": ("stmt.ofx", ofx_content.encode(), "application/x-ofx")}, headers=headers)
+        assert r.status_code == 200, r.text
+        assert r.json()["new"] == expected_new
+
+    amounts = sorted(float(a) for (a,) in db_session.query(BankTransaction.amount).filter(BankTransaction.project_id == p.id))
+    assert amounts == [-1500.0, 100.0, 750.0, 2000.5]
+
+
+def test_bulk_payments(client, db_session, auth_token):
+    from app.db.models.versioning import Invoice, InvoicePayment
+    token = auth_token
+    me = client.get("/api/v1/auth/me", headers={"Authorization": f"Bearer {token}"})
+    user = db_session.query(User).filter_by(username=me.json()["username"]).first()
+    p = Project(name="Proj Bulk Payments")
+    db_session.add(p); db_session.commit(); db_session.refresh(p)
+    db_session.add(UserProjectRole(project_id=p.id, user_id=user.id, role="admin")); db_session.commit()
+    headers = {"Authorization": f"Bearer {token}"}
+    a = Invoice(project_id=p.id, amount=1000, status="accepted", dte_number="DTE-A1")
+    b = Invoice(project_id=p.id, amount=500, status="accepted")
+    db_session.add_all([a, b]); db_session.commit()
+
+    # una línea inválida => no se aplica nada
+    bad = [{"invoice_id": a.id, "amount": 100}, {"invoice_id": 999999, "amount": 10}, {"invoice_id": b.id, "amount": -5}]
+    r = client.post("/api/v1/invoices/payments/bulk", json={"project_id": p.id, "payments": bad}, headers=headers)
+    assert r.status_code == 400
+    assert [e["line"] for e in r.json()["detail"]["errors"]] == [2, 3]
+    assert db_session.query(InvoicePayment).filter(InvoicePayment.invoice_id == a.id).count() == 0
+
+    ok = [{"invoice_id": a.id, "amount": 300}, {"dte_number": "DTE-A1", "amount": 200}, {"invoice_id": b.id, "amount": 500}]
+    r = client.post("/api/v1/invoices/payments/bulk", json={"project_id": p.id, "payments": ok}, headers=headers)
+    assert r.status_code == 200, r.text
+    assert r.json()["applied"] == 3 and r.json()["invoices_paid"] == [b.id]
+
+    csv_content = "invoice_id,monto,method\n%d,500,transfer\n" % a.id
+    r = client.post("/api/v1/invoices/payments/bulk/file", data={"project_id": str(p.id)},
+                    files={"file": ("pagos.csv", csv_content.encode(), "text/csv")}, headers=headers)
+    assert r.status_code == 200, r.text
+    db_session.expire_all()
+    assert (float(a.paid_amount), a.status) == (1000.0, "paid")
+    assert (float(b.paid_amount), b.status) == (500.0, "paid")
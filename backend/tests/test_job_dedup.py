@@ -0,0 +1,76 @@
+import uuid
+from app.db.models.audit import UserProjectRole
+from app.services import artifacts, jobs
+from app.services.exporting import export_budget_excel
+
+
+def _user(client, token=None) -> tuple[int, dict]:
+    if token is None:
+        r = client.post('/api/v1/auth/register', json={'username': f'ajeno_{uuid.uuid4().hex[:8]}', 'password': 'pass'})
+        token = r.json()['access_token']
+    h = {'Authorization': f'Bearer {token}'}
+    return client.get('/api/v1/auth/me', headers=h).json()['id'], h
+
+
+def test_identical_exports_share_a_job(client, auth_token, db_session, job_queue, small_project):
+    me, h = _user(client, auth_token)
+    pid, item = small_project(db_session, 'dedup')
+    db_session.add(UserProjectRole(user_id=me, project_id=pid, role='viewer')); db_session.commit()
+    first = client.post(f'/api/v1/jobs/export/budget/{pid}', headers=h).json()
+    assert first['deduplicated'] is False and first['status'] == 'queued'
+    again = client.post(f'/api/v1/jobs/export/budget/{pid}', headers=h).json()
+    assert again == {**first, 'deduplicated': True}
+    assert len(job_queue.calls) == 1
+    # otro tipo de exportación del mismo proyecto no se mezcla
+    pdf = client.post(f'/api/v1/jobs/export/budget_pdf/{pid}', headers=h).json()
+    assert pdf['job_id'] != first['job_id'] and len(job_queue.calls) == 2
+
+    # terminado con artefacto vigente: se devuelve el mismo job para descargar
+    job = jobs.get_job_status(db_session, first['job_id'])
+    job.status = 'finished'
+    job.result_path = str(artifacts.put(b'PK\x03\x04[Content_Types].xml').path)
+    db_session.commit()
+    done = client.post(f'/api/v1/jobs/export/budget/{pid}', headers=h).json()
+    assert done == {'job_id': first['job_id'], 'status': 'finished', 'deduplicated': True}
+
+    # cambian los datos -> nueva versión -> nuevo job
+    item.price = 120
+    db_session.commit()
+    changed = client.post(f'/api/v1/jobs/export/budget/{pid}', headers=h).json()
+    assert changed['deduplicated'] is False and changed['job_id'] != first['job_id']
+    assert len(job_queue.calls) == 3
+
+
+def test_expired_artifact_is_recomputed(db_session, job_queue, small_project):
+    pid, _ = small_project(db_session, 'dedup')
+    job, dedup = jobs.submit_job(db_session, 'export_budget_excel', export_budget_excel, project_id=pid)
+    assert not dedup
+    job.status = 'finished'
+    job.result_path = str(artifacts.put(b'%PDF-1.4 x').path)
+    db_session.commit()
+    artifacts.resolve(job.result_path).path.unlink()
+    again, dedup = jobs.submit_job(db_session, 'export_budget_excel', export_budget_excel, project_id=pid)
+    assert not dedup and again.id != job.id
+
+
+def test_dedup_does_not_leak_jobs_across_users(client, auth_token, db_session, job_queue, small_project):
+    me, h = _user(client, auth_token)
+    pid, _ = small_project(db_session, 'dedup ajeno')
+    db_session.add(UserProjectRole(user_id=me, project_id=pid, role='viewer')); db_session.commit()
+    job_id = client.post(f'/api/v1/jobs/export/budget/{pid}', headers=h).json()['job_id']
+    job = jobs.get_job_status(db_session, job_id)
+    job.status = 'finished'
+    job.result_path = str(artifacts.put(b'PK\x03\x04[Content_Types].xml').path)
+    db_session.commit()
+
+    # sin rol en el proyecto: ni se engancha al job ni lo ve ni lo descarga
+    _, other = _user(client)
+    assert client.post(f'/api/v1/jobs/export/budget/{pid}', headers=other).status_code == 403
+    assert client.post('/api/v1/jobs/export/diff', params={'v_from': 999999, 'v_to': 999998}, headers=other).status_code == 404
+    assert client.get(f'/api/v1/jobs/{job_id}', headers=other).status_code == 403
+    assert client.get(f'/api/v1/jobs/{job_id}/download', headers=other).status_code == 403
+    # con rol de lectura sí, aunque no lo haya pedido
+    reader, reader_h = _user(client)
+    db_session.add(UserProjectRole(user_id=reader, project_id=pid, role='viewer')); db_session.commit()
+    assert client.post(f'/api/v1/jobs/export/budget/{pid}', headers=reader_h).json()['job_id'] == job_id
+    assert client.get(f'/api/v1/jobs/{job_id}/download', headers=reader_h).status_code == 200
@@ -0,0 +1,113 @@
+import uuid
+from types import SimpleNamespace
+import pytest
+from sqlalchemy.orm import sessionmaker
+from app.core.settings import get_settings
+from app.db.models.audit import UserProjectRole
+from app.db.models.job import Job
+from app.db.models.project import Project
+from app.services import jobs, job_progress
+from app.services.bc3_parser import import_budget_bc3
+
+_JOB_ID = object()  # se reemplaza por el id del Job creado
+
+
+def _cancelling_import(db, name: str, job_id: int):
+    """Servicio de prueba: crea el proyecto y se cancela a mitad de camino."""
+    db.add(Project(name=name)); db.flush()
+    job_progress.stage('items', total=5)
+    for i in range(5):
+        if i == 2:
+            job_progress.request_cancel(job_id)
+        job_progress.advance()
+    db.commit()
+
+
+@pytest.fixture
+def worker(engine, monkeypatch):
+    """Ejecuta ``call_wrapped`` como lo haría el worker RQ, contra la BD de tests."""
+    monkeypatch.setattr(jobs, 'SessionLocal', sessionmaker(bind=engine, autoflush=False, autocommit=False))
+    monkeypatch.setattr(get_settings(), 'job_progress_interval_s', 0.0)
+
+    def run(db, job_type: str, fn, **kwargs) -> Job:
+        job = Job(rq_id=f'test-{uuid.uuid4().hex}', type=job_type, status='queued')
+        db.add(job); db.commit()
+        monkeypatch.setattr('rq.get_current_job', lambda: SimpleNamespace(id=job.rq_id))
+        kwargs = {k: (job.id if v is _JOB_ID else v) for k, v in kwargs.items()}
+        jobs.call_wrapped(f'{fn.__module__}:{fn.__name__}', job_type, kwargs)
+        db.expire_all()
+        return job
+    return run
+
+
+def test_bc3_import_reports_stages(client, auth_token, db_session, worker, tmp_path):
+    path = tmp_path / 'p.bc3'
+    path.write_text('C;01;Obra gruesa\n'
+                    'I;01.01;Excavación;m3;10;01\n'
+                    'R;01.01;MAT;CEM;Cemento;1.5;100\n'
+                    'I;01.02;Relleno;m3;5;01\n', encoding='utf-8')
+    job = worker(db_session, 'import_bc3', import_budget_bc3, path=str(path), project_name='bc3 progreso')
+    assert job.status == 'finished'
+    job.created_by = _me(client, auth_token); db_session.commit()
+    r = client.get(f'/api/v1/jobs/{job.id}', headers={'Authorization': f'Bearer {auth_token}'})
+    progress = r.json()['progress']
+    assert progress['status'] == 'finished' and progress['percent'] == 100.0
+    assert [s['name'] for s in progress['stages']] == ['parse', 'items']
+    assert progress['planned_stages'] == ['parse', 'items']
+    assert progress['total'] and progress['done'] == progress['total']
+
+
+def test_cancel_running_job_rolls_back(db_session, worker):
+    name = f'cancelado-{uuid.uuid4().hex[:6]}'
+    job = worker(db_session, 'slow', _cancelling_import, name=name, job_id=_JOB_ID)
+    assert job.status == 'cancelled'
+    assert db_session.query(Project).filter_by(name=name).count() == 0
+    progress = job_progress.get_progress(job.id)
+    assert progress['status'] == 'cancelled' and progress['done'] == 3
+    assert progress['percent'] == 60.0 and progress['eta_seconds'] is not None
+
+
+def _me(client, token) -> int:
+    return client.get('/api/v1/auth/me', headers={'Authorization': f'Bearer {token}'}).json()['id']
+
+
+def _register(client) -> str:
+    r = client.post('/api/v1/auth/register', json={'username': f'otro_{uuid.uuid4().hex[:8]}', 'password': 'pass'})
+    return r.json()['access_token']
+
+
+def test_cancel_endpoint(client, auth_token, db_session, worker):
+    h = {'Authorization': f'Bearer {auth_token}'}
+    me = _me(client, auth_token)
+    job = Job(rq_id=f'test-{uuid.uuid4().hex}', type='export_budget_excel', status='queued',
+              created_by=me, submitters=[me])
+    db_session.add(job); db_session.commit()
+    # otro usuario sin rol en el proyecto no puede cancelarlo
+    other = {'Authorization': f'Bearer {_register(client)}'}
+    assert client.post(f'/api/v1/jobs/{job.id}/cancel', headers=other).status_code == 403
+    r = client.post(f'/api/v1/jobs/{job.id}/cancel', headers=h)
+    assert r.status_code == 200 and r.json()['status'] == 'cancelled'
+    assert job_progress.cancel_requested(job.id)
+    assert client.post(f'/api/v1/jobs/{job.id}/cancel', headers=h).status_code == 409
+    assert client.post('/api/v1/jobs/999999/cancel', headers=h).status_code == 404
+
+
+def test_cancel_shared_job_detaches(client, auth_token, db_session, worker):
+    h = {'Authorization': f'Bearer {auth_token}'}
+    me = _me(client, auth_token)
+    other_token = _register(client)
+    other = _me(client, other_token)
+    project = Project(name=f'compartido-{uuid.uuid4().hex[:6]}'); db_session.add(project); db_session.flush()
+    db_session.add(UserProjectRole(user_id=me, project_id=project.id, role='admin'))
+    job = Job(rq_id=f'test-{uuid.uuid4().hex}', type='export_budget_excel', status='queued',
+              project_id=project.id, created_by=other, submitters=[other])
+    db_session.add(job); db_session.commit()
+    # un envío deduplicado se engancha; el admin del proyecto ya no puede cancelarlo
+    jobs.attach_submitter(db_session, job, me)
+    assert job.submitters == [other, me]
+    r = client.post(f'/api/v1/jobs/{job.id}/cancel', headers={'Authorization': f'Bearer {other_token}'})
+    assert r.json() == {'id': job.id, 'status': 'queued', 'cancel_requested': False, 'detached': True}
+    db_session.expire_all()
+    assert job.submitters == [me] and not job_progress.cancel_requested(job.id)
+    # ya sin otros enganchados sí se cancela
+    assert client.post(f'/api/v1/jobs/{job.id}/cancel', headers=h).json()['status'] == 'cancelled'
@@ -0,0 +1,52 @@
+import logging
+import re
+
+
+def _sample(metrics: str, name: str, **labels) -> float | None:
+    for line in metrics.splitlines():
+        if not line.startswith(name + '{'):
+            continue
+        found = dict(re.findall(r'(\w+)="([^"]*)"', line[:line.rindex('}')]))
+        if all(found.get(k) == v for k, v in labels.items()):
+            return float(line.rsplit(' ', 1)[1])
+    return None
+
+
+def test_metrics_use_route_templates(client, auth_token):
+    h = {'Authorization': f'Bearer {auth_token}'}
+    ids = [client.post('/api/v1/budgets/projects', json={'name': f'Met{i}', 'currency': 'CLP'}, headers=h).json()['id'] for i in range(2)]
+    for pid in ids:
+        assert client.get(f'/api/v1/evm/projects/{pid}', headers=h).status_code == 200
+    client.get('/api/v1/no/existe/123')
+
+    metrics = client.get('/metrics').text
+    # una serie por plantilla, no por id
+    assert _sample(metrics, 'app_request_duration_seconds_count', method='GET', path='/api/v1/evm/projects/{project_id}') >= 2
+    assert f'/api/v1/evm/projects/{ids[0]}"' not in metrics
+    assert _sample(metrics, 'app_requests_total', method='GET', path='<unmatched>', status='404') >= 1
+    assert _sample(metrics, 'app_response_size_bytes_sum', method='GET', path='/api/v1/evm/projects/{project_id}') > 0
+    # /metrics se está sirviendo mientras se genera la respuesta
+    assert _sample(metrics, 'app_requests_in_progress', method='GET') >= 1
+
+
+def test_access_log_is_queued_json(client):
+    from app.core import access_log
+    records = []
+
+    class Capture(logging.Handler):
+        def emit(self, record):
+            records.append(record.msg)
+
+    client.get('/health')  # inicializa el listener
+    handler = Capture()
+    access_log.logger.addHandler(handler)
+    try:
+        r = client.get('/health', headers={'X-Debug-Queries': '1'})
+    finally:
+        access_log.logger.removeHandler(handler)
+    assert r.headers['X-DB-Queries'] == '1'  # SELECT 1
+    entry = records[-1]
+    assert entry['route'] == '/health' and entry['status'] == 200
+    assert entry['bytes'] == len(r.content)
+    assert {'duration_ms', 'db_queries', 'db_ms', 'db_repeated'} <= set(entry)
+    access_log.flush()
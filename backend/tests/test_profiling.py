@@ -0,0 +1,84 @@
+import time
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from app.core import profiling
+from app.core.settings import get_settings
+
+
+def _busy(ms: float) -> None:
+    end = time.perf_counter() + ms / 1000
+    while time.perf_counter() < end:
+        sum(range(200))
+
+
+def test_signed_token():
+    token = profiling.sign_token(int(time.time()) + 60, secret='s3cret')
+    assert profiling.verify_token(token, secret='s3cret')
+    assert not profiling.verify_token(token, secret='otro')
+    assert not profiling.verify_token(token[:-1] + ('0' if token[-1] != '0' else '1'), secret='s3cret')
+    expired = profiling.sign_token(int(time.time()) - 1, secret='s3cret')
+    assert not profiling.verify_token(expired, secret='s3cret')
+
+
+def test_profiling_middleware_samples_sync_endpoint(tmp_path, monkeypatch):
+    settings = get_settings()
+    monkeypatch.setattr(settings, 'profiling_secret', 'k')
+    monkeypatch.setattr(settings, 'profiling_dir', str(tmp_path))
+    monkeypatch.setattr(settings, 'profiling_interval_ms', 1.0)
+    monkeypatch.setattr(settings, 'profiling_sample_rate', 0.0)
+
+    mini = FastAPI()
+    mini.add_middleware(profiling.ProfilingMiddleware)
+
+    @mini.get('/slow/{n}')
+    def slow_endpoint(n: int):
+        _busy(60)
+        return {'n': n}
+
+    profiling.instrument_routes(mini)
+    c = TestClient(mini)
+
+    # sin header ni muestreo: no se perfila
+    r = c.get('/slow/1')
+    assert r.status_code == 200 and 'x-profile-id' not in r.headers
+    # firma inválida tampoco
+    assert 'x-profile-id' not in c.get('/slow/1', headers={'X-Profile': '1.abc'}).headers
+
+    r = c.get('/slow/2', headers={'X-Profile': profiling.sign_token(int(time.time()) + 60)})
+    assert r.json() == {'n': 2}
+    pid = r.headers['x-profile-id']
+    data = profiling.load_profile(pid)
+    assert data['route'] == '/slow/{n}' and data['status'] == 200
+    assert data['samples'] > 5
+    # las muestras vienen del hilo del threadpool que ejecutó el endpoint
+    assert any('slow_endpoint' in stack and '_busy' in stack for stack in data['stacks'])
+    assert profiling.svg_path(pid).read_text().startswith('<svg')
+    assert [p['id'] for p in profiling.list_profiles()] == [pid]
+
+
+def test_admin_profile_endpoints(client, auth_token, tmp_path, monkeypatch):
+    settings = get_settings()
+    monkeypatch.setattr(settings, 'profiling_dir', str(tmp_path))
+    h = {'Authorization': f'Bearer {auth_token}'}
+    sampler = profiling.Sampler(1.0)
+    sampler.stacks.update({'a;b': 3, 'a;c': 1})
+    sampler.samples = 4
+    meta = profiling.save_profile(sampler, {'method': 'GET', 'route': '/x'})
+
+    assert client.get('/api/v1/admin/profiles', headers=h).status_code == 403
+
+    username = client.get('/api/v1/auth/me', headers=h).json()['username']
+    monkeypatch.setattr(settings, 'admin_usernames', f'otro, {username}')
+    listed = client.get('/api/v1/admin/profiles', headers=h).json()
+    assert [p['id'] for p in listed] == [meta['id']] and 'stacks' not in listed[0]
+    assert client.get(f"/api/v1/admin/profiles/{meta['id']}", headers=h).json()['stacks'] == {'a;b': 3, 'a;c': 1}
+    svg = client.get(f"/api/v1/admin/profiles/{meta['id']}/flamegraph.svg", headers=h)
+    assert svg.headers['content-type'].startswith('image/svg+xml') and '75.0%' in svg.text
+    assert client.get('/api/v1/admin/profiles/nope', headers=h).status_code == 404
+
+    # el token solo se emite con el perfilado habilitado
+    assert client.post('/api/v1/admin/profiles/token', headers=h).status_code == 400
+    monkeypatch.setattr(settings, 'profiling_enabled', True)
+    monkeypatch.setattr(settings, 'profiling_secret', 'k')
+    tok = client.post('/api/v1/admin/profiles/token?ttl=120', headers=h).json()
+    assert tok['header'] == 'X-Profile' and profiling.verify_token(tok['value'])
@@ -31,11 +31,10 @@ def test_purchases_flow(client, auth_token):
     r = client.post("/api/v1/purchases/rfq", json={"project_id": project_id, "items": [{"item_id": item_id, "qty": 5}]}, headers={"Authorization": f"Bearer {auth_token}"})
     assert r.status_code == 200
     rfq_id = r.json()["rfq_id"]
+    rfq_item_id = r.json()["rfq_item_ids"][0]
 
     # Añadir Quote
-    # Obtener rfq_items id: simplificación -> rfq_items consecutivos, consultar ranking luego
-    # Creamos cotización usando rfq_item_id=1 asunción: base limpia en test.
-    r = client.post("/api/v1/purchases/quote", json={"rfq_id": rfq_id, "supplier_id": supplier_id, "lines": [{"rfq_item_id": 1, "unit_price": 100}]}, headers={"Authorization": f"Bearer {auth_token}"})
+    r = client.post("/api/v1/purchases/quote", json={"rfq_id": rfq_id, "supplier_id": supplier_id, "lines": [{"rfq_item_id": rfq_item_id, "unit_price": 100}]}, headers={"Authorization": f"Bearer {auth_token}"})
     assert r.status_code == 200
     quote_id = r.json()["quote_id"]
 
@@ -66,3 +65,142 @@ def test_purchases_flow(client, auth_token):
     assert r.status_code == 200
     listed = r.json()
     assert any(p['id'] == po_id for p in listed)
+
+
+def test_quote_comparison(client, db_session, auth_token):
+    from app.db.models.project import Project
+    from app.db.models.budget import Chapter, Item
+    headers = {"Authorization": f"Bearer {auth_token}"}
+    p = Project(name="Proj Quotes")
+    db_session.add(p); db_session.commit()
+    ch = Chapter(project_id=p.id, code="Q", name="Cap Q")
+    db_session.add(ch); db_session.commit()
+    items = [Item(chapter_id=ch.id, code=f"Q{i}", name=f"Item {i}", unit="u", quantity=1, price=1) for i in range(3)]
+    db_session.add_all(items); db_session.commit()
+    suppliers = [client.post("/api/v1/purchases/suppliers", json={"name": f"Supp Q{i}"}, headers=headers).json()["id"] for i in range(3)]
+
+    r = client.post("/api/v1/purchases/rfq", json={"project_id": p.id, "items": [
+        {"item_id": items[0].id, "qty": 10}, {"item_id": items[1].id, "qty": 2}, {"item_id": items[2].id, "qty": 1}]}, headers=headers)
+    rfq_id = r.json()["rfq_id"]
+    ri = r.json()["rfq_item_ids"]
+
+    def quote(supplier, prices):
+        lines = [{"rfq_item_id": ri[k], "unit_price": v} for k, v in prices.items()]
+        assert client.post("/api/v1/purchases/quote", json={"rfq_id": rfq_id, "supplier_id": supplier, "lines": lines}, headers=headers).status_code == 200
+
+    quote(suppliers[0], {0: 5, 1: 100, 2: 50})   # 50 + 200 + 50 = 300
+    quote(suppliers[1], {0: 8, 1: 40, 2: 60})    # 80 + 80 + 60 = 220
+    quote(suppliers[2], {0: 1})                  # incompleta: 10
+    ranking = client.get(f"/api/v1/purchases/rank/{rfq_id}", headers=headers).json()
+    assert [(q["supplier_id"], q["total"], q["complete"]) for q in ranking] == [
+        (suppliers[1], 220.0, True), (suppliers[0], 300.0, True), (suppliers[2], 10.0, False)]
+
+    data = client.get(f"/api/v1/purchases/rank/{rfq_id}/compare", headers=headers).json()
+    assert data["matrix"]["prices"][2] == [1.0, None, None]
+    award = data["award"]
+    assert [l["supplier_id"] for l in award["lines"]] == [suppliers[2], suppliers[1], suppliers[0]]
+    assert award["total"] == 10 + 80 + 50
+    assert award["best_single_supplier_id"] == suppliers[1] and award["savings_vs_single"] == 80
+
+    # una nueva cotización invalida el resultado cacheado
+    quote(suppliers[2], {0: 1, 1: 1, 2: 1})
+    ranking = client.get(f"/api/v1/purchases/rank/{rfq_id}", headers=headers).json()
+    assert ranking[0]["supplier_id"] == suppliers[2] and ranking[0]["total"] == 13.0
+
+
+def test_bulk_purchase_lines_validation_and_upload(client, db_session, auth_token):
+    from app.db.models.project import Project
+    from app.db.models.budget import Chapter, Item
+    from app.db.models.purchases import PurchaseOrderLine
+    headers = {"Authorization": f"Bearer {auth_token}"}
+    p, other = Project(name="Proj Bulk Lines"), Project(name="Proj Bulk Lines Other")
+    db_session.add_all([p, other]); db_session.commit()
+    ch, och = Chapter(project_id=p.id, code="B", name="Cap B"), Chapter(project_id=other.id, code="O", name="Cap O")
+    db_session.add_all([ch, och]); db_session.commit()
+    items = [Item(chapter_id=ch.id, code=f"BL{i}", name=f"Item {i}", quantity=1, price=1) for i in range(3)]
+    foreign = Item(chapter_id=och.id, code="FX", name="Ajeno", quantity=1, price=1)
+    db_session.add_all(items + [foreign]); db_session.commit()
+    supplier_id = client.post("/api/v1/purchases/suppliers", json={"name": "Supp Bulk"}, headers=headers).json()["id"]
+
+    # ítem de otro proyecto, código inexistente y cantidad inválida => 400 por línea, nada creado
+    bad = [{"item_id": items[0].id, "qty": 1}, {"item_id": foreign.id, "qty": 1}, {"item_code": "NOPE"}, {"item_id": items[1].id, "qty": "x"}]
+    r = client.post("/api/v1/purchases/rfq", json={"project_id": p.id, "items": bad}, headers=headers)
+    assert r.status_code == 400
+    assert [(e["line"], e["field"]) for e in r.json()["detail"]["errors"]] == [(2, "item_id"), (3, "item_code"), (4, "qty")]
+
+    csv_rfq = "Código;Cantidad\n" + "".join(f"BL{i};{i + 1}\n" for i in range(3))
+    r = client.post("/api/v1/purchases/rfq/upload", data={"project_id": str(p.id)},
+                    files={"file": ("rfq.csv", csv_rfq.encode(), "text/csv")}, headers=headers)
+    assert r.status_code == 200, r.text
+    rfq_id, ri = r.json()["rfq_id"], r.json()["rfq_item_ids"]
+    assert r.json()["lines"] == 3
+
+    # cotización por item_id del RFQ; una línea con rfq_item ajeno
+    r = client.post("/api/v1/purchases/quote", json={"rfq_id": rfq_id, "supplier_id": supplier_id, "lines": [
+        {"item_id": items[0].id, "unit_price": 10}, {"rfq_item_id": 10 ** 9, "unit_price": 1}]}, headers=headers)
+    assert r.status_code == 400 and r.json()["detail"]["errors"][0]["line"] == 2
+    csv_quote = "rfq_item_id,precio_unitario\n" + "".join(f"{rid},{10 * (k + 1)}\n" for k, rid in enumerate(ri))
+    r = client.post("/api/v1/purchases/quote/upload", data={"rfq_id": str(rfq_id), "supplier_id": str(supplier_id)},
+                    files={"file": ("q.csv", csv_quote.encode(), "text/csv")}, headers=headers)
+    assert r.status_code == 200, r.text
+    ranking = client.get(f"/api/v1/purchases/rank/{rfq_id}", headers=headers).json()
+    assert ranking[0]["total"] == 10 * 1 + 20 * 2 + 30 * 3
+
+    r = client.post("/api/v1/purchases/po", json={"project_id": p.id, "supplier_id": 10 ** 9, "lines": []}, headers=headers)
+    assert r.status_code == 400
+    csv_po = "item_code,qty,unit_price\nBL0,1,10\nBL2,3,30\n"
+    r = client.post("/api/v1/purchases/po/upload", data={"project_id": str(p.id), "supplier_id": str(supplier_id), "rfq_id": str(rfq_id)},
+                    files={"file": ("po.csv", csv_po.encode(), "text/csv")}, headers=headers)
+    assert r.status_code == 200, r.text
+    lines = db_session.query(PurchaseOrderLine).filter(PurchaseOrderLine.po_id == r.json()["po_id"]).order_by(PurchaseOrderLine.id).all()
+    assert [(l.item_id, float(l.qty)) for l in lines] == [(items[0].id, 1.0), (items[2].id, 3.0)]
+
+
+def test_commitment_rollup_and_variance(client, db_session, auth_token):
+    from app.db.models.project import Project
+    from app.db.models.budget import Chapter, Item
+    from app.db.models.user import User
+    from app.db.models.audit import UserProjectRole
+    from app.services.commitments import commitment_variance, rebuild_commitments
+    headers = {"Authorization": f"Bearer {auth_token}"}
+    user = db_session.query(User).filter_by(username=client.get("/api/v1/auth/me", headers=headers).json()["username"]).first()
+    p = Project(name="Proj Commitments")
+    db_session.add(p); db_session.commit()
+    db_session.add(UserProjectRole(project_id=p.id, user_id=user.id, role="admin"))
+    ch = Chapter(project_id=p.id, code="C", name="Cap C")
+    db_session.add(ch); db_session.commit()
+    a = Item(chapter_id=ch.id, code="CA", name="A", quantity=10, price=10)  # 100
+    b = Item(chapter_id=ch.id, code="CB", name="B", quantity=5, price=20)   # 100
+    db_session.add_all([a, b]); db_session.commit()
+    supplier_id = client.post("/api/v1/purchases/suppliers", json={"name": "Supp Commit"}, headers=headers).json()["id"]
+
+    def po(lines):
+        r = client.post("/api/v1/purchases/po", json={"project_id": p.id, "supplier_id": supplier_id, "lines": lines}, headers=headers)
+        assert r.status_code == 200, r.text
+        return r.json()["po_id"]
+
+    po1 = po([{"item_id": a.id, "qty": 6, "unit_price": 10}, {"item_id": b.id, "qty": 2, "unit_price": 20}])
+    po2 = po([{"item_id": a.id, "qty": 6, "unit_price": 10}])
+    data = client.get(f"/api/v1/purchases/commitments/project/{p.id}", headers=headers).json()
+    row_a = next(i for i in data["items"] if i["item_id"] == a.id)
+    assert row_a["committed"] == 0 and row_a["pending"] == 120 and row_a["over_committed_with_pending"]
+
+    r = client.patch(f"/api/v1/purchases/po/{po1}/status", json={"status": "approved"}, headers=headers)
+    assert r.json()["over_committed_items"] == []
+    r = client.patch(f"/api/v1/purchases/po/{po2}/status", json={"status": "approved"}, headers=headers)
+    assert r.json()["over_committed_items"] == [a.id]
+    client.patch(f"/api/v1/purchases/po/{po1}/status", json={"status": "received"}, headers=headers)
+
+    data = client.get(f"/api/v1/purchases/commitments/project/{p.id}", headers=headers).json()
+    assert data["totals"]["committed"] == 160 and data["totals"]["variance"] == 40
+    assert data["chapters"][0]["over_committed_items"] == 1
+    row_a = next(i for i in data["items"] if i["item_id"] == a.id)
+    assert row_a["by_status"] == {"created": 0, "approved": 60, "received": 60, "closed": 0}
+    assert row_a["variance"] == -20 and row_a["over_committed"]
+    over = client.get(f"/api/v1/purchases/commitments/project/{p.id}?only_over=true", headers=headers).json()
+    assert [i["item_id"] for i in over["items"]] == [a.id]
+
+    # el rollup incremental coincide con el recálculo completo
+    before = commitment_variance(db_session, p.id)
+    rebuild_commitments(db_session, p.id)
+    assert commitment_variance(db_session, p.id) == before
@@ -0,0 +1,57 @@
+from app.core.query_stats import statement_shape, track_queries, QueryStats
+
+DEBUG = {'X-Debug-Queries': '1'}
+
+
+def test_statement_shape_normalizes_literals_and_in_lists():
+    a = statement_shape("SELECT * FROM items WHERE id IN (?, ?, ?) AND code = 'A1' LIMIT 10")
+    b = statement_shape("SELECT *  FROM items\n WHERE id IN (?) AND code = 'B22' LIMIT 20")
+    assert a == b == "SELECT * FROM items WHERE id IN (?…) AND code = ? LIMIT ?"
+    # los sufijos numéricos de alias no son literales
+    assert "anon_1" in statement_shape("SELECT anon_1.id FROM (SELECT 1) AS anon_1")
+
+
+def test_repeated_shapes_flag_n_plus_one():
+    stats = QueryStats()
+    for i in range(12):
+        stats.record(f"SELECT qty FROM measurement_lines WHERE item_id = {i}", 0.001)
+    stats.record("SELECT count(*) FROM items", 0.002)
+    assert stats.count == 13
+    assert stats.repeated(10) == [{"count": 12, "ms": 12.0, "sql": "SELECT qty FROM measurement_lines WHERE item_id = ?"}]
+    assert stats.summary()["db_repeated"][0]["count"] == 12
+
+
+def test_debug_header_and_query_budgets(client, auth_token, query_budget):
+    h = {'Authorization': f'Bearer {auth_token}'}
+    project_id = client.post('/api/v1/budgets/projects', json={'name': 'QBudget', 'currency': 'CLP'}, headers=h).json()['id']
+    for c in range(3):
+        chapter_id = client.post('/api/v1/budgets/chapters', json={'project_id': project_id, 'code': f'C{c}', 'name': 'Cap'}, headers=h).json()['id']
+        for i in range(4):
+            client.post('/api/v1/budgets/items', json={'chapter_id': chapter_id, 'code': f'C{c}.{i}', 'name': 'It', 'unit': 'u', 'quantity': 1}, headers=h)
+
+    # Sin el header de debug no se exponen las sentencias
+    r = client.get(f'/api/v1/budgets/projects/{project_id}/tree', headers=h)
+    assert 'X-DB-Queries' not in r.headers
+
+    # El árbol no depende de la cantidad de ítems: usuario + rol + capítulos + ítems
+    r = client.get(f'/api/v1/budgets/projects/{project_id}/tree', headers={**h, **DEBUG})
+    assert r.status_code == 200
+    assert query_budget(r, 4) >= 3
+    assert float(r.headers['X-DB-Time-Ms']) >= 0
+
+    r = client.get(f'/api/v1/budgets/projects/{project_id}/summary', headers={**h, **DEBUG})
+    query_budget(r, 4)
+
+    # Métricas por request junto a la latencia
+    metrics = client.get('/metrics').text
+    assert 'app_request_db_queries_bucket' in metrics
+    assert 'app_request_db_duration_seconds_sum' in metrics
+
+
+def test_track_queries_outside_requests(db_session):
+    from sqlalchemy import text
+    with track_queries() as stats:
+        db_session.execute(text("SELECT 1")).all()
+        db_session.execute(text("SELECT 2")).all()
+    assert stats.count == 2
+    assert len(stats.shapes) == 1
@@ -0,0 +1,86 @@
+from datetime import date, datetime
+import numpy as np
+from app.db.models.project import Project
+from app.db.models.audit import UserProjectRole, AuditLog
+from app.db.models.user import User
+from app.db.models.cost import CostLedgerDay
+from app.db.models.versioning import Invoice, InvoicePayment, BankTransaction
+
+
+def _setup_project(client, db_session, token, name):
+    me = client.get("/api/v1/auth/me", headers={"Authorization": f"Bearer {token}"})
+    user = db_session.query(User).filter_by(username=me.json()["username"]).first()
+    p = Project(name=name)
+    db_session.add(p); db_session.commit(); db_session.refresh(p)
+    db_session.add(UserProjectRole(project_id=p.id, user_id=user.id, role="admin")); db_session.commit()
+    return p
+
+
+def test_auto_reconcile_by_dte_and_amount(client, db_session, auth_token):
+    headers = {"Authorization": f"Bearer {auth_token}"}
+    p = _setup_project(client, db_session, auth_token, "Proj Auto Rec")
+    created = datetime(2025, 3, 1)
+    by_dte = Invoice(project_id=p.id, amount=1000, status="accepted", dte_number="DTE-000777", created_at=created)
+    by_amount = Invoice(project_id=p.id, amount=2500, status="accepted", created_at=created)
+    far = Invoice(project_id=p.id, amount=4000, status="accepted", created_at=created)
+    db_session.add_all([by_dte, by_amount, far]); db_session.flush()
+    db_session.add_all([
+        # misma cifra que by_amount pero referencia DTE -> gana la regla dte
+        BankTransaction(project_id=p.id, date=date(2025, 3, 10), amount=1000, description="Transf. pago factura 777"),
+        BankTransaction(project_id=p.id, date=date(2025, 3, 20), amount=2500.4, description="Deposito cliente"),
+        # fuera de ventana de fechas
+        BankTransaction(project_id=p.id, date=date(2025, 9, 1), amount=4000, description="Deposito"),
+    ])
+    db_session.commit()
+
+    r = client.post("/api/v1/invoices/bank/auto_reconcile", json={"project_id": p.id}, headers=headers)
+    assert r.status_code == 200, r.text
+    data = r.json()
+    assert data["proposed"] == 2 and data["applied"] == 0
+    rules = {m["invoice_id"]: m["rule"] for m in data["matches"]}
+    assert rules == {by_dte.id: "dte", by_amount.id: "amount_date"}
+
+    r = client.post("/api/v1/invoices/bank/auto_reconcile", json={"project_id": p.id, "apply": True}, headers=headers)
+    assert r.json()["applied"] == 2
+    db_session.expire_all()
+    assert db_session.get(Invoice, by_dte.id).status == "paid"
+    assert db_session.get(Invoice, far.id).status == "accepted"
+    # cada match queda como pago real: acumulado, referencia a la transacción y libro de costos
+    payments = db_session.query(InvoicePayment).filter(InvoicePayment.invoice_id.in_([by_dte.id, by_amount.id])).all()
+    assert sorted(float(x.amount) for x in payments) == [1000, 2500]
+    assert all(x.reference.startswith("bank_txn:") for x in payments)
+    assert float(db_session.get(Invoice, by_amount.id).paid_amount) == 2500
+    ledger = db_session.query(CostLedgerDay).filter_by(project_id=p.id, source="payment").all()
+    assert sum(float(x.amount) for x in ledger) == 3500
+    unmatched = db_session.query(BankTransaction).filter(BankTransaction.project_id == p.id, BankTransaction.matched_invoice_id.is_(None)).count()
+    assert unmatched == 1
+    audits = db_session.query(AuditLog).filter_by(project_id=p.id, action="bank_auto_reconcile").count()
+    assert audits == 2
+    # idempotente: nada más que conciliar
+    r = client.post("/api/v1/invoices/bank/auto_reconcile", json={"project_id": p.id, "apply": True}, headers=headers)
+    assert r.json()["proposed"] == 0
+
+
+def test_missing_dates_never_match_by_window():
+    from app.services.reconciliation import _to_days, match_transactions
+    one = np.array([1])
+    no_date = _to_days([None])
+    pair = dict(txn_project=one, txn_amount=np.array([500.0]), txn_dte=[[]],
+                inv_project=one, inv_amount=np.array([500.0]), inv_dte=[None])
+    assert match_transactions(txn_day=no_date, inv_day=no_date, **pair) == []
+    assert match_transactions(txn_day=_to_days([date(2025, 3, 1)]), inv_day=no_date, **pair) == []
+    assert match_transactions(txn_day=no_date, inv_day=_to_days([date(2025, 3, 1)]), **pair) == []
+    # por DTE sí, aunque falte la fecha
+    assert match_transactions(txn_day=no_date, inv_day=no_date, **{**pair, "txn_dte": [["777"]], "inv_dte": ["777"]}) \
+        == [(0, 0, "dte")]
+
+
+def test_dte_with_several_digit_groups():
+    """Factura y glosa normalizan el DTE igual aunque tenga varios grupos de dígitos."""
+    from app.services.reconciliation import _dte_numbers, _normalize_dte, match_transactions
+    assert _normalize_dte("FE-001-004512") == "1004512"
+    assert _dte_numbers("Pago FE-001-004512 obra 2025") == ["1004512", "2025"]
+    one, day = np.array([1]), np.array([0])
+    pairs = match_transactions(one, np.array([800.0]), day, [_dte_numbers("Transf FE-001-004512")],
+                               one, np.array([800.0]), day, [_normalize_dte("FE-001-004512")], date_window_days=0)
+    assert pairs == [(0, 0, "dte")]
@@ -0,0 +1,50 @@
+from datetime import datetime
+from app.core.settings import get_settings
+from app.services import artifacts, jobs, reports
+from app.services.event_consumers import precompute_reports
+
+
+def test_precompute_and_serve_while_fresh(client, auth_token, db_session, job_queue, small_project):
+    h = {'Authorization': f'Bearer {auth_token}'}
+    pid, item = small_project(db_session, 'reportes')
+    first = reports.precompute_project(db_session, pid)
+    # sin línea base no hay diff que precalcular
+    assert {r['report'] for r in first} == {'budget_xlsx', 'budget_pdf', 'measurements_xlsx', 'evm_curves'}
+    assert not any(r['deduplicated'] for r in first) and len(job_queue.calls) == 4
+    assert all(r['deduplicated'] for r in reports.precompute_project(db_session, pid))
+    assert len(job_queue.calls) == 4
+
+    # el worker terminó el XLSX: el endpoint lo sirve desde el almacén
+    budget = next(r for r in first if r['report'] == 'budget_xlsx')
+    job = jobs.get_job_status(db_session, budget['job_id'])
+    art = artifacts.put(b'PK\x03\x04[Content_Types].xml precalculado')
+    job.status, job.result_path = 'finished', str(art.path)
+    db_session.commit()
+    r = client.get(f'/api/v1/exports/budget/{pid}.xlsx', headers=h)
+    assert r.status_code == 200 and r.content.endswith(b'precalculado')
+    assert r.headers['etag'] == f'"{art.sha256}"'
+
+    # datos nuevos: deja de estar vigente y se calcula en línea
+    item.quantity = 6
+    db_session.commit()
+    r = client.get(f'/api/v1/exports/budget/{pid}.xlsx', headers=h)
+    assert r.status_code == 200 and 'etag' not in r.headers and r.content.startswith(b'PK')
+
+
+def test_batch_close_triggers_precompute(db_session, job_queue, small_project, monkeypatch):
+    settings = get_settings()
+    pid, _ = small_project(db_session, 'reportes')
+    event = {'type': 'measurement.batch_closed', 'project_id': pid, 'data': {}}
+    precompute_reports(db_session, event)
+    assert job_queue.calls == []  # opt-in
+    monkeypatch.setattr(settings, 'reports_precompute_enabled', True)
+    monkeypatch.setattr(settings, 'reports_precompute', 'measurements_xlsx,evm_curves')
+    precompute_reports(db_session, {**event, 'type': 'risk.created'})
+    assert job_queue.calls == []
+    precompute_reports(db_session, event)
+    assert [c['job_type'] for c in job_queue.calls] == ['export_measurements_excel', 'evm_curves']
+
+
+def test_next_run():
+    assert reports.next_run(datetime(2026, 10, 19, 1, 30), 2) == datetime(2026, 10, 19, 2, 0)
+    assert reports.next_run(datetime(2026, 10, 19, 2, 0), 2) == datetime(2026, 10, 20, 2, 0)
@@ -66,3 +66,47 @@ def test_risks_flow(client: TestClient):
     matrix2 = r.json()['matrix']
     assert matrix2[3][4] == 0
     assert matrix2[3][3] == 1
+
+
+def test_risk_analytics_pagination_and_heatmap(client: TestClient):
+    token, user_id = register(client, 'risk_analyst')
+    headers = {'Authorization': f'Bearer {token}'}
+    projects = []
+    for name in ('RiskA', 'RiskB'):
+        r = client.post('/api/v1/budgets/projects', json={'name': name, 'currency': 'CLP'}, headers=headers)
+        projects.append(r.json()['id'])
+    specs = [
+        (projects[0], 'financiero', 4, 5, 'Compras'),
+        (projects[0], 'financiero', 2, 2, 'Compras'),
+        (projects[0], 'plazo', 3, 3, 'Obra'),
+        (projects[1], 'plazo', 5, 5, 'Obra'),
+    ]
+    ids = []
+    for pid, cat, p, i, owner in specs:
+        r = client.post('/api/v1/risks/', json={'project_id': pid, 'category': cat, 'description': 'x', 'probability': p, 'impact': i, 'owner': owner}, headers=headers)
+        ids.append(r.json()['id'])
+    client.patch(f'/api/v1/risks/{ids[1]}', json={'status': 'closed'}, headers=headers)
+
+    data = client.get(f'/api/v1/risks/project/{projects[0]}/analytics', headers=headers).json()
+    assert data['total'] == 3 and data['exposure'] == 20 + 4 + 9
+    assert data['matrix'][3][4] == 1 and data['matrix_by_status']['closed'][1][1] == 1
+    assert [(c['key'], c['exposure']) for c in data['by_category']] == [('financiero', 24), ('plazo', 9)]
+    assert {o['key']: o['count'] for o in data['by_owner']} == {'Compras': 2, 'Obra': 1}
+    data = client.get(f'/api/v1/risks/project/{projects[0]}/analytics', params={'status': ['open', 'mitigating']}, headers=headers).json()
+    assert data['total'] == 2 and data['matrix_by_status'].keys() == {'open'}
+    assert client.get(f'/api/v1/risks/project/{projects[0]}/analytics', params={'status': 'bogus'}, headers=headers).status_code == 400
+
+    # sin limit ni cursor: lista completa, sin header de paginación
+    r = client.get(f'/api/v1/risks/project/{projects[0]}', headers=headers)
+    assert [x['id'] for x in r.json()] == ids[:3] and 'X-Next-Cursor' not in r.headers
+    # paginación por cursor
+    r = client.get(f'/api/v1/risks/project/{projects[0]}', params={'limit': 2}, headers=headers)
+    assert [x['id'] for x in r.json()] == ids[:2]
+    r = client.get(f'/api/v1/risks/project/{projects[0]}', params={'limit': 2, 'cursor': r.headers['X-Next-Cursor']}, headers=headers)
+    assert [x['id'] for x in r.json()] == ids[2:3] and 'X-Next-Cursor' not in r.headers
+    r = client.get(f'/api/v1/risks/project/{projects[0]}', params={'category': 'plazo', 'created_to': '2000-01-01'}, headers=headers)
+    assert r.json() == []
+
+    heat = client.get('/api/v1/risks/portfolio/heatmap', headers=headers).json()
+    assert [p['project_id'] for p in heat['projects']] == [projects[0], projects[1]]
+    assert heat['matrix'][4][4] == 1 and sum(map(sum, heat['matrix'])) == 4
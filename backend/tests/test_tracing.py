@@ -0,0 +1,71 @@
+import pytest
+from app.core import tracing
+from app.services import jobs
+
+
+def _noop_job(db, n):
+    return None
+
+
+def test_tracing_disabled_is_noop():
+    assert not tracing.enabled()
+    assert tracing.inject_context() == {}
+    assert tracing.current_trace_id() is None
+    with tracing.span('x', kind='producer', foo=1) as s:
+        assert s is None
+    tracing.record_interval('y', 0.0, 1.0)
+
+
+def test_enqueue_passes_trace_context(db_session, job_queue):
+    job = jobs.enqueue_job(db_session, 'noop', _noop_job, n=3)
+    assert job.rq_id.startswith('fake-')
+    fn, kwargs = job_queue.funcs[0], job_queue.calls[0]
+    assert fn is jobs.call_wrapped
+    assert kwargs['kwargs'] == {'n': 3}
+    assert kwargs['trace_context'] == {}
+    assert isinstance(kwargs['enqueued_at'], float)
+
+
+def test_worker_flushes_spans_even_on_failure(monkeypatch):
+    flushed = []
+    monkeypatch.setattr(tracing, 'flush', lambda timeout_millis=5000: flushed.append(timeout_millis))
+
+    def boom(*args):
+        raise RuntimeError('falla el job')
+    monkeypatch.setattr(jobs, '_run_job', boom)
+    with pytest.raises(RuntimeError):
+        jobs.call_wrapped('x:y', 'noop', {}, trace_context={}, enqueued_at=0.0)
+    assert flushed == [5000]
+
+
+def test_flush_calls_provider(monkeypatch):
+    calls = []
+    provider = type('Provider', (), {'force_flush': lambda self, t: calls.append(t)})()
+    monkeypatch.setattr(tracing, '_configured', True)
+    monkeypatch.setattr(tracing, 'trace', type('Trace', (), {'get_tracer_provider': staticmethod(lambda: provider)}))
+    tracing.flush(100)
+    assert calls == [100]
+
+
+def test_spans_propagate_through_carrier(monkeypatch):
+    pytest.importorskip('opentelemetry.sdk')
+    from opentelemetry import trace
+    from opentelemetry.sdk.trace import TracerProvider
+    from opentelemetry.sdk.trace.export import SimpleSpanProcessor
+    from opentelemetry.sdk.trace.export.in_memory_span_exporter import InMemorySpanExporter
+
+    exporter = InMemorySpanExporter()
+    provider = TracerProvider()
+    provider.add_span_processor(SimpleSpanProcessor(exporter))
+    monkeypatch.setattr(tracing, '_configured', True)
+    monkeypatch.setattr(tracing, 'tracer', lambda: provider.get_tracer('test'))
+
+    with tracing.span('rq.enqueue t', kind='producer'):
+        carrier = tracing.inject_context()
+    assert 'traceparent' in carrier
+    with tracing.span('rq.job t', kind='consumer', parent=carrier):
+        pass
+    producer, consumer = exporter.get_finished_spans()
+    assert consumer.context.trace_id == producer.context.trace_id
+    assert consumer.parent.span_id == producer.context.span_id
+    assert consumer.kind == trace.SpanKind.CONSUMER
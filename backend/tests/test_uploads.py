@@ -0,0 +1,56 @@
+import pytest
+from app.core.settings import get_settings
+from app.db.models.project import Project
+from app.services.uploads import import_upload
+
+BC3 = b"C;01;Obra\nI;01;01.01;Excavacion;m3;10\nR;01.01;MAT;CEM;Cemento;1.5;100\n"
+
+
+@pytest.fixture
+def uploads(monkeypatch, tmp_path):
+    monkeypatch.setattr(get_settings(), 'uploads_dir', str(tmp_path / 'uploads'))
+    return tmp_path / 'uploads'
+
+
+def _post(client, token, name, content=BC3):
+    return client.post('/api/v1/imports/bc3', data={'project_name': name},
+                       files={'file': ('obra.bc3', content, 'text/plain')},
+                       headers={'Authorization': f'Bearer {token}'})
+
+
+def test_identical_reupload_is_short_circuited(client, auth_token, db_session, uploads):
+    first = _post(client, auth_token, 'subida repetida')
+    assert first.status_code == 200 and 'duplicate' not in first.json()
+    again = _post(client, auth_token, 'subida repetida')
+    assert again.json() == {'project_id': first.json()['project_id'], 'duplicate': True}
+    assert db_session.query(Project).filter_by(name='subida repetida').count() == 1
+    # otro nombre u otro contenido sí importan de nuevo
+    other = _post(client, auth_token, 'otra obra')
+    assert other.json()['project_id'] != first.json()['project_id']
+    changed = _post(client, auth_token, 'subida repetida', BC3 + b"I;01;01.02;Relleno;m3;5\n")
+    assert 'duplicate' not in changed.json()
+    assert list(uploads.iterdir()) == []
+
+
+def test_large_upload_goes_to_queue(client, auth_token, db_session, uploads, job_queue, monkeypatch):
+    monkeypatch.setattr(get_settings(), 'import_inline_max_mb', 0)
+    r = _post(client, auth_token, 'obra grande')
+    assert r.status_code == 202 and r.json()['duplicate'] is False
+    again = _post(client, auth_token, 'obra grande')
+    assert again.status_code == 202 and again.json() == {**r.json(), 'duplicate': True}
+    assert len(job_queue.calls) == 1 and job_queue.calls[0]['job_type'] == 'import_bc3'
+    # el archivo espera al worker en uploads_dir; la re-subida se descartó
+    kwargs = job_queue.calls[0]['kwargs']
+    assert [p.name for p in uploads.iterdir()] == [kwargs['path'].rsplit('/', 1)[-1]]
+
+    result = import_upload(db_session, **kwargs)
+    assert db_session.get(Project, result['project_id']).name == 'obra grande'
+    assert list(uploads.iterdir()) == []
+
+
+def test_invalid_upload_is_rejected(client, auth_token, uploads):
+    r = client.post('/api/v1/imports/excel', data={'project_name': 'roto'},
+                    files={'file': ('roto.xlsx', b'no es un xlsx', 'application/octet-stream')},
+                    headers={'Authorization': f'Bearer {auth_token}'})
+    assert r.status_code == 400
+    assert list(uploads.iterdir()) == []
@@ -122,3 +122,142 @@ def test_workflow_rejection(client, db_session):
     r = client.post(f"/api/v1/workflows/instance/{inst_id}/decide", json={"decision": "approve"}, headers={"Authorization": f"Bearer {editor_token}"})
     assert r.status_code == 400
     # Fin del test
+
+
+def test_workflow_inbox_and_bulk_decide(client, db_session):
+    admin = register(client, "admin_wf3@example.com")
+    editor = register(client, "editor_wf3@example.com")
+    admin_h = {"Authorization": f"Bearer {admin['access_token']}"}
+    editor_h = {"Authorization": f"Bearer {editor['access_token']}"}
+    p1 = create_project(client, admin["access_token"], "WF Inbox 1")
+    p2 = create_project(client, admin["access_token"], "WF Inbox 2")
+    assign_role(client, admin["access_token"], p1, editor["user_id"], "editor")
+    instances = []
+    for pid in (p1, p2):
+        wf_id = client.post("/api/v1/workflows/", json={"project_id": pid, "name": "Inbox", "entity_type": "item",
+                                                         "steps": ["admin", "editor"]}, headers=admin_h).json()["workflow_id"]
+        for entity_id in range(3):
+            r = client.post("/api/v1/workflows/start", json={"workflow_id": wf_id, "entity_type": "item", "entity_id": entity_id}, headers=admin_h)
+            instances.append(r.json()["instance_id"])
+
+    # Bandeja del admin: 6 instancias en dos proyectos, paginadas por cursor
+    r = client.get("/api/v1/workflows/inbox", params={"limit": 4}, headers=admin_h)
+    assert r.status_code == 200, r.text
+    first = r.json()
+    assert [x["instance_id"] for x in first] == instances[:4]
+    assert first[0]["role_required"] == "admin" and first[0]["current_step"] == 1
+    r2 = client.get("/api/v1/workflows/inbox", params={"limit": 4, "cursor": r.headers["X-Next-Cursor"]}, headers=admin_h)
+    assert [x["instance_id"] for x in r2.json()] == instances[4:]
+    assert "X-Next-Cursor" not in r2.headers
+    r = client.get("/api/v1/workflows/inbox", params={"project_id": p2}, headers=admin_h)
+    assert {x["project_id"] for x in r.json()} == {p2}
+    # El editor aún no tiene nada pendiente (paso 1 es de admin)
+    assert client.get("/api/v1/workflows/inbox", headers=editor_h).json() == []
+
+    # Lote con una instancia ajena al editor -> no se aplica nada
+    r = client.post("/api/v1/workflows/instances/decide", json={"instance_ids": instances[:3], "decision": "approve"}, headers=editor_h)
+    assert r.status_code == 400
+    assert {e["code"] for e in r.json()["detail"]["errors"]} == {"forbidden"}
+
+    # Admin aprueba el paso 1 de las 3 instancias de p1 en un lote
+    r = client.post("/api/v1/workflows/instances/decide", json={"instance_ids": instances[:3], "decision": "approve"}, headers=admin_h)
+    assert r.status_code == 200, r.text
+    assert r.json()["decided"] == 3
+    assert all(x["status"] == "running" and x["current_step"] == 2 for x in r.json()["results"])
+    inbox_editor = client.get("/api/v1/workflows/inbox", headers=editor_h).json()
+    assert [x["instance_id"] for x in inbox_editor] == instances[:3]
+
+    # Editor: aprueba dos y rechaza una
+    r = client.post("/api/v1/workflows/instances/decide", json={"instance_ids": instances[:2], "decision": "approve"}, headers=editor_h)
+    assert [x["status"] for x in r.json()["results"]] == ["approved", "approved"]
+    r = client.post("/api/v1/workflows/instances/decide", json={"instance_ids": [instances[2]], "decision": "reject", "comment": "No"}, headers=editor_h)
+    assert r.json()["results"][0]["status"] == "rejected"
+    assert client.get("/api/v1/workflows/inbox", headers=editor_h).json() == []
+    # Ya decididas -> inválidas
+    r = client.post("/api/v1/workflows/instances/decide", json={"instance_ids": instances[:1] + [999999], "decision": "approve"}, headers=admin_h)
+    assert r.status_code == 400
+    assert [e["code"] for e in r.json()["detail"]["errors"]] == ["invalid", "not_found"]
+
+    detail = client.get(f"/api/v1/workflows/instance/{instances[2]}", headers=admin_h).json()
+    assert detail["steps"][1]["decision"] == "reject" and detail["steps"][1]["comment"] == "No"
+
+
+def test_decide_with_several_roles_on_project(client, db_session):
+    from app.db.models.audit import UserProjectRole
+    admin = register(client, "admin_wf5@example.com")
+    multi = register(client, "multi_wf5@example.com")
+    admin_h = {"Authorization": f"Bearer {admin['access_token']}"}
+    project_id = create_project(client, admin["access_token"], "WF multi rol")
+    # el rol exigido no es el último: antes quedaba la fila de 'viewer' y daba forbidden
+    db_session.add_all([UserProjectRole(user_id=multi["user_id"], project_id=project_id, role="editor"),
+                        UserProjectRole(user_id=multi["user_id"], project_id=project_id, role="viewer")])
+    db_session.commit()
+    item_id = create_item(client, admin["access_token"], create_chapter(client, admin["access_token"], project_id))
+    wf_id = client.post("/api/v1/workflows/", json={"project_id": project_id, "name": "WF multi", "entity_type": "item",
+                                                    "steps": ["editor"]}, headers=admin_h).json()["workflow_id"]
+    inst_id = client.post("/api/v1/workflows/start", json={"workflow_id": wf_id, "entity_type": "item", "entity_id": item_id},
+                          headers=admin_h).json()["instance_id"]
+    r = client.post("/api/v1/workflows/instances/decide", json={"instance_ids": [inst_id], "decision": "approve"},
+                    headers={"Authorization": f"Bearer {multi['access_token']}"})
+    assert r.status_code == 200, r.text
+    assert r.json()["results"] == [{"instance_id": inst_id, "status": "approved", "current_step": 1}]
+
+
+def test_workflow_events_notifications_and_auto_advance(client, db_session, monkeypatch):
+    from app.core.settings import get_settings
+    admin = register(client, "admin_wf4@example.com")
+    editor = register(client, "editor_wf4@example.com")
+    admin_h = {"Authorization": f"Bearer {admin['access_token']}"}
+    editor_h = {"Authorization": f"Bearer {editor['access_token']}"}
+    project_id = create_project(client, admin["access_token"], "WF Events")
+    assign_role(client, admin["access_token"], project_id, editor["user_id"], "editor")
+    wf_id = client.post("/api/v1/workflows/", json={"project_id": project_id, "name": "Ev", "entity_type": "item",
+                                                     "steps": ["admin", "editor"]}, headers=admin_h).json()["workflow_id"]
+
+    # Dashboard cachea los pendientes; el consumidor "dashboard" invalida con cada transición
+    assert client.get(f"/api/v1/dashboard/projects/{project_id}", headers=admin_h).json()["workflows"]["pending_steps_total"] == 0
+    with client.websocket_connect(f"/api/v1/events/project/{project_id}/ws?token={editor['access_token']}") as ws:
+        inst_id = client.post("/api/v1/workflows/start", json={"workflow_id": wf_id, "entity_type": "item", "entity_id": 1},
+                              headers=admin_h).json()["instance_id"]
+        assert ws.receive_json()["type"] == "workflow.started"
+        pending = ws.receive_json()
+        assert pending["type"] == "workflow.step_pending" and pending["data"]["role_required"] == "admin"
+    dash = client.get(f"/api/v1/dashboard/projects/{project_id}", headers=admin_h).json()["workflows"]
+    assert dash == {"pending_steps": 1, "pending_steps_total": 1}
+
+    client.post(f"/api/v1/workflows/instance/{inst_id}/decide", json={"decision": "approve"}, headers=admin_h)
+    events = client.get(f"/api/v1/events/project/{project_id}", headers=editor_h).json()
+    assert [e["type"] for e in events] == ["workflow.started", "workflow.step_pending", "workflow.decided", "workflow.step_pending"]
+    after = client.get(f"/api/v1/events/project/{project_id}", params={"after": events[1]["id"]}, headers=editor_h).json()
+    assert [e["id"] for e in after] == [e["id"] for e in events[2:]]
+    assert client.get(f"/api/v1/dashboard/projects/{project_id}", headers=editor_h).json()["workflows"]["pending_steps"] == 1
+
+    # Notificación al editor por el paso pendiente; al admin (creador) cuando termina
+    notes = client.get("/api/v1/events/notifications", headers=editor_h).json()
+    assert [(n["kind"], n["entity_id"]) for n in notes] == [("workflow.step_pending", inst_id)]
+    client.post(f"/api/v1/workflows/instance/{inst_id}/decide", json={"decision": "reject"}, headers=editor_h)
+    notes = client.get("/api/v1/events/notifications", headers=admin_h).json()
+    assert notes[0]["kind"] == "workflow.completed" and notes[0]["data"]["status"] == "rejected"
+    assert client.post("/api/v1/events/notifications/read", json={}, headers=admin_h).json()["updated"] >= 1
+    assert client.get("/api/v1/events/notifications", headers=admin_h).json() == []
+
+    # Sin rol en el proyecto no hay feed
+    outsider = register(client, "outsider_wf4@example.com")
+    r = client.get(f"/api/v1/events/project/{project_id}", headers={"Authorization": f"Bearer {outsider['access_token']}"})
+    assert r.status_code == 403
+
+    # Avance automático: OC bajo el umbral se aprueba sin intervención
+    monkeypatch.setattr(get_settings(), "workflow_auto_approve_po_max", 1000)
+    chapter_id = create_chapter(client, admin["access_token"], project_id)
+    item_id = create_item(client, admin["access_token"], chapter_id)
+    supplier_id = client.post("/api/v1/purchases/suppliers", json={"name": "Prov WF4"}, headers=admin_h).json()["id"]
+    po_id = client.post("/api/v1/purchases/po", json={"project_id": project_id, "supplier_id": supplier_id,
+                                                      "lines": [{"item_id": item_id, "qty": 2, "unit_price": 100}]},
+                        headers=admin_h).json()["po_id"]
+    wf_po = client.post("/api/v1/workflows/", json={"project_id": project_id, "name": "OC", "entity_type": "purchase_order",
+                                                     "steps": ["admin", "editor"]}, headers=admin_h).json()["workflow_id"]
+    inst_po = client.post("/api/v1/workflows/start", json={"workflow_id": wf_po, "entity_type": "purchase_order", "entity_id": po_id},
+                          headers=admin_h).json()["instance_id"]
+    detail = client.get(f"/api/v1/workflows/instance/{inst_po}", headers=admin_h).json()
+    assert detail["status"] == "approved"
+    assert [s["decision"] for s in detail["steps"]] == ["approve", "approve"]